@@ -0,0 +1,552 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the bdsim engine
+
+Measures the example models, synthetic diagrams that stress one dimension
+of the engine at a time: long chains of blocks, wide fan-out, many clocks,
+many zero-crossing detectors and many states, and a large random diagram.
+
+    python benchmarks/bench.py                          # run all cases
+    python benchmarks/bench.py -k chain -k events       # cases matching a pattern
+    python benchmarks/bench.py -o results.json          # save the results
+    python benchmarks/bench.py --baseline results.json  # compare with a baseline
+
+For each case the results are
+
+    compile_s     time for BlockDiagram.compile()
+    run_s         wall time of BDSim.run()
+    evals_per_s   block diagram evaluations per second of run time
+    ydot_us       time per state derivative evaluation, as made by the solver
+    mem_peak_kb   peak memory allocated during the run, measured by tracemalloc
+
+and the time to import bdsim is measured in a fresh interpreter.  Times are
+the minimum over the repeats.
+
+When a baseline is given, every result more than ``--tolerance`` worse than
+the baseline is reported and the exit status is 1.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import runpy
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, NamedTuple
+
+import numpy as np
+import scipy
+from ansitable import ANSITable, Column
+
+import bdsim
+from bdsim.blockdiagram import BlockDiagram
+from bdsim.testing import random_diagram
+
+EXAMPLES_DIR = Path(__file__).resolve().parents[1] / "examples"
+EXAMPLES = ["vanderpol", "bouncing-ball", "multi-clock", "cartpole", "pid"]
+
+# result -> True if a larger value is better
+METRICS = {
+    "compile_s": False,
+    "run_s": False,
+    "evals_per_s": True,
+    "ydot_us": False,
+    "mem_peak_kb": False,
+}
+
+
+class Case(NamedTuple):
+    """A compiled block diagram and how to run it"""
+
+    sim: Any
+    bd: BlockDiagram
+    args: tuple
+    kwargs: dict
+    compile_s: float
+
+
+# ------------------------------------------------------------------------- #
+# example models
+
+
+class _Captured(Exception):
+    def __init__(self, sim: Any, bd: BlockDiagram, args: tuple, kwargs: dict):
+        self.case = (sim, bd, args, kwargs)
+
+
+def example(name: str) -> Callable[[], Case]:
+    """
+    Case for an example script
+
+    :param name: script name in the examples folder, without extension
+    :type name: str
+    :return: function that builds the case
+    :rtype: callable
+
+    The script is executed with graphics, animation and output disabled, up to
+    its call to :meth:`BDSim.run`.  The run arguments are captured and
+    :meth:`BlockDiagram.compile` is timed.
+    """
+
+    def build() -> Case:
+        compile_times = []
+        compile = BlockDiagram.compile
+        run = bdsim.BDSim.run
+
+        def timed_compile(self: BlockDiagram, *args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return compile(self, *args, **kwargs)
+            finally:
+                compile_times.append(time.perf_counter() - start)
+
+        def capture(self: Any, bd: BlockDiagram, *args: Any, **kwargs: Any) -> None:
+            raise _Captured(self, bd, args, kwargs)
+
+        script = EXAMPLES_DIR / f"{name}.py"
+        argv = sys.argv
+        sys.argv = [
+            str(script),
+            "--no-graphics",
+            "--no-animation",
+            "--no-hold",
+            "--no-progress",
+            "--quiet",
+        ]
+        BlockDiagram.compile = timed_compile  # type: ignore[method-assign]
+        bdsim.BDSim.run = capture  # type: ignore[method-assign]
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                runpy.run_path(str(script), run_name="__main__")
+        except _Captured as captured:
+            sim, bd, args, kwargs = captured.case
+        else:
+            raise RuntimeError(f"example {name} does not call BDSim.run")
+        finally:
+            sys.argv = argv
+            BlockDiagram.compile = compile  # type: ignore[method-assign]
+            bdsim.BDSim.run = run  # type: ignore[method-assign]
+        return Case(sim, bd, args, kwargs, sum(compile_times))
+
+    return build
+
+
+# ------------------------------------------------------------------------- #
+# synthetic diagrams
+
+
+def _sim() -> Any:
+    return bdsim.BDSim(
+        graphics=False,
+        animation=False,
+        progress=False,
+        banner=False,
+        quiet=True,
+        hold=False,
+        sysargs=False,
+    )
+
+
+def _compiled(sim: Any, bd: BlockDiagram, T: float) -> Case:
+    start = time.perf_counter()
+    bd.compile(report=False)
+    return Case(sim, bd, (), {"T": T}, time.perf_counter() - start)
+
+
+def chain(n: int) -> Callable[[], Case]:
+    """Integrator with negative feedback through a chain of ``n`` gains"""
+
+    def build() -> Case:
+        sim = _sim()
+        bd = sim.blockdiagram()
+        integ = bd.INTEGRATOR(x0=1)
+        previous = integ
+        for i in range(n):
+            gain = bd.GAIN(-1 if i == n - 1 else 1)
+            bd.connect(previous, gain)
+            previous = gain
+        bd.connect(previous, integ)
+        return _compiled(sim, bd, T=5)
+
+    return build
+
+
+def fanout(n: int) -> Callable[[], Case]:
+    """Integrator whose output fans out to ``n`` gains that are summed"""
+
+    def build() -> Case:
+        sim = _sim()
+        bd = sim.blockdiagram()
+        integ = bd.INTEGRATOR(x0=1)
+        total = bd.SUM("-" * n)
+        for i in range(n):
+            gain = bd.GAIN(1 / n)
+            bd.connect(integ, gain)
+            bd.connect(gain, total[i])
+        bd.connect(total, integ)
+        return _compiled(sim, bd, T=5)
+
+    return build
+
+
+def clocks(m: int) -> Callable[[], Case]:
+    """First-order plant sampled by ``m`` zero-order holds on distinct clocks"""
+
+    def build() -> Case:
+        sim = _sim()
+        bd = sim.blockdiagram()
+        plant = bd.LTI_SISO(1, [1, 1])
+        bd.connect(bd.CONSTANT(1), plant)
+        for i in range(m):
+            zoh = bd.ZOH(bd.clock(0.05 * (1 + i / m)))
+            bd.connect(plant, zoh)
+            bd.connect(zoh, bd.NULL())
+        return _compiled(sim, bd, T=5)
+
+    return build
+
+
+def events(k: int) -> Callable[[], Case]:
+    """Harmonic oscillator with ``k`` zero-crossing detectors on its output"""
+
+    def build() -> Case:
+        sim = _sim()
+        bd = sim.blockdiagram()
+        x = bd.INTEGRATOR(x0=1)
+        v = bd.INTEGRATOR(x0=0)
+        neg = bd.GAIN(-1)
+        bd.connect(v, x)
+        bd.connect(x, neg)
+        bd.connect(neg, v)
+        for i in range(k):
+            level = bd.SUM("+-")
+            bd.connect(x, level[0])
+            bd.connect(bd.CONSTANT((i + 0.5) / k - 0.5), level[1])
+            bd.connect(level, bd.EVENT("^", lambda block: None))
+        return _compiled(sim, bd, T=10)
+
+    return build
+
+
+def states(s: int) -> Callable[[], Case]:
+    """State-space system with ``s`` coupled states driven by a constant"""
+
+    def build() -> Case:
+        sim = _sim()
+        bd = sim.blockdiagram()
+        A = -np.eye(s) + 0.5 * np.eye(s, k=1) - 0.5 * np.eye(s, k=-1)
+        plant = bd.LTI_SS(A, np.ones((s, 1)), np.ones((1, s)) / s)
+        bd.connect(bd.CONSTANT(1), plant)
+        bd.connect(plant, bd.NULL())
+        return _compiled(sim, bd, T=5)
+
+    return build
+
+
+def random(blocks: int) -> Callable[[], Case]:
+    """Random diagram of about ``blocks`` blocks, see :mod:`bdsim.testing`"""
+
+    def build() -> Case:
+        sim = _sim()
+        bd = random_diagram(
+            sim, blocks=blocks, depth=8, clocks=3, states=20, subsystems=4, seed=0
+        )
+        return _compiled(sim, bd, T=2)
+
+    return build
+
+
+CASES: dict[str, Callable[[], Case]] = {
+    **{f"example:{name}": example(name) for name in EXAMPLES},
+    "chain-10": chain(10),
+    "chain-100": chain(100),
+    "fanout-100": fanout(100),
+    "clocks-10": clocks(10),
+    "events-10": events(10),
+    "states-100": states(100),
+    "random-500": random(500),
+}
+
+# ------------------------------------------------------------------------- #
+# measurement
+
+
+def measure_ydot(case: Case, out: Any, duration: float = 0.2) -> float | None:
+    """
+    Time the state derivative evaluation of a case that has been run
+
+    :return: time per evaluation in microseconds, None if there are no states
+    :rtype: float or None
+
+    The evaluation is made as in the solver's right-hand side function, at
+    the final state of the run, on the lean evaluation path of the run.
+    """
+    bd = case.bd
+    if bd.nstates == 0:
+        return None
+    simstate = case.sim._last_context.simstate
+    t, x = float(out.t[-1]), np.array(out.x[-1])
+    # the run restores the instrumented path when it ends
+    bd.instrument(False)
+    try:
+        n = 0
+        start = time.perf_counter()
+        while True:
+            for _ in range(100):
+                bd.evaluate(bd.state_map(x, simstate), t, sinks=False, inplace=True)
+                bd.deriv(t)
+            n += 100
+            elapsed = time.perf_counter() - start
+            if elapsed > duration:
+                return elapsed / n * 1e6
+    finally:
+        bd.instrument(True)
+
+
+def measure_case(build: Callable[[], Case], repeat: int) -> dict[str, Any]:
+    """
+    Measure a case
+
+    :param build: function that builds the case
+    :type build: callable
+    :param repeat: number of times each measurement is repeated
+    :type repeat: int
+    :return: results
+    :rtype: dict
+    """
+    compile_s = []
+    for _ in range(repeat):
+        case = build()
+        compile_s.append(case.compile_s)
+
+    run_s = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = case.sim.run(case.bd, *case.args, **case.kwargs)
+        run_s.append(time.perf_counter() - start)
+    stats = out.stats
+    ydot_us = measure_ydot(case, out)
+
+    tracemalloc.start()
+    try:
+        case.sim.run(case.bd, *case.args, **case.kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "blocks": len(case.bd.blocklist),
+        "states": int(case.bd.nstates),
+        "clocks": len(case.bd.clocklist),
+        "evaluations": int(stats.evaluations),
+        "ydot_calls": int(stats.ydot_calls),
+        "compile_s": min(compile_s),
+        "run_s": min(run_s),
+        "evals_per_s": stats.evaluations / min(run_s),
+        "ydot_us": ydot_us,
+        "mem_peak_kb": peak / 1024,
+    }
+
+
+def measure_import(repeat: int) -> float:
+    """Minimum time to import bdsim in a fresh interpreter, in seconds"""
+    code = (
+        "import time; start = time.perf_counter(); import bdsim; "
+        "print(time.perf_counter() - start)"
+    )
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={**os.environ, "MPLBACKEND": "Agg"},
+        )
+        times.append(float(result.stdout.split()[-1]))
+    return min(times)
+
+
+def run_suite(
+    patterns: list[str] | None = None, repeat: int = 3, verbose: bool = True
+) -> dict[str, Any]:
+    """
+    Run the benchmark suite
+
+    :param patterns: run only the cases whose name contains one of these,
+        defaults to all cases
+    :type patterns: list of str, optional
+    :param repeat: number of times each measurement is repeated, defaults to 3
+    :type repeat: int, optional
+    :param verbose: print the name of each case as it is run, defaults to True
+    :type verbose: bool, optional
+    :return: results, as saved to the results file
+    :rtype: dict
+    """
+    results: dict[str, Any] = {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "bdsim": bdsim.__version__,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "scipy": scipy.__version__,
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "import_s": measure_import(repeat),
+        "cases": {},
+    }
+    for name, build in CASES.items():
+        if patterns and not any(pattern in name for pattern in patterns):
+            continue
+        if verbose:
+            print(f"  {name}", file=sys.stderr)
+        results["cases"][name] = measure_case(build, repeat)
+    return results
+
+
+# ------------------------------------------------------------------------- #
+# reporting
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float = 0.2
+) -> list[tuple[str, str, float, float]]:
+    """
+    Results that are worse than a baseline
+
+    :param results: results from :func:`run_suite`
+    :type results: dict
+    :param baseline: baseline results from :func:`run_suite`
+    :type baseline: dict
+    :param tolerance: fractional change that is a regression, defaults to 0.2
+    :type tolerance: float, optional
+    :return: regressions as (case, metric, baseline value, value)
+    :rtype: list of tuple
+
+    Cases and results that are not in both are ignored.
+    """
+    pairs = [("bdsim", "import_s", baseline.get("import_s"), results.get("import_s"))]
+    for case, values in results["cases"].items():
+        base = baseline.get("cases", {}).get(case, {})
+        for metric in METRICS:
+            pairs.append((case, metric, base.get(metric), values.get(metric)))
+
+    regressions = []
+    for case, metric, old, new in pairs:
+        if not old or new is None:
+            continue
+        if METRICS.get(metric, False):
+            worse = old / max(new, 1e-300)
+        else:
+            worse = new / old
+        if worse > 1 + tolerance:
+            regressions.append((case, metric, old, new))
+    return regressions
+
+
+def report(results: dict[str, Any]) -> None:
+    """Print a table of results"""
+    table = ANSITable(
+        Column("case", headalign="^", colalign="<"),
+        Column("blocks", headalign="^", colalign=">"),
+        Column("states", headalign="^", colalign=">"),
+        Column("compile (ms)", headalign="^", colalign=">", fmt="{:.2f}"),
+        Column("run (ms)", headalign="^", colalign=">", fmt="{:.1f}"),
+        Column("evals/s", headalign="^", colalign=">", fmt="{:.0f}"),
+        Column("ydot (us)", headalign="^", colalign=">"),
+        Column("mem peak (kB)", headalign="^", colalign=">", fmt="{:.0f}"),
+        border="thin",
+    )
+    for name, values in results["cases"].items():
+        ydot_us = values["ydot_us"]
+        table.row(
+            name,
+            values["blocks"],
+            values["states"],
+            values["compile_s"] * 1e3,
+            values["run_s"] * 1e3,
+            values["evals_per_s"],
+            "-" if ydot_us is None else f"{ydot_us:.1f}",
+            values["mem_peak_kb"],
+        )
+    table.print()
+    print(f"import bdsim: {results['import_s'] * 1e3:.0f} ms")
+
+
+def report_regressions(regressions: list[tuple[str, str, float, float]]) -> None:
+    """Print a table of regressions found by :func:`compare`"""
+    table = ANSITable(
+        Column("case", headalign="^", colalign="<"),
+        Column("metric", headalign="^", colalign="<"),
+        Column("baseline", headalign="^", colalign=">", fmt="{:.4g}"),
+        Column("now", headalign="^", colalign=">", fmt="{:.4g}"),
+        Column("change %", headalign="^", colalign=">", fmt="{:+.0f}"),
+        border="thin",
+    )
+    for case, metric, old, new in regressions:
+        table.row(case, metric, old, new, (new / old - 1) * 100)
+    table.print()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="benchmark the bdsim engine",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    parser.add_argument(
+        "-k",
+        dest="patterns",
+        action="append",
+        metavar="PATTERN",
+        help="run only cases whose name contains PATTERN, can be repeated",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="repeats of each measurement"
+    )
+    parser.add_argument("-o", "--output", help="save the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="compare with this results file")
+    parser.add_argument(
+        "-t",
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="fractional change that is reported as a regression",
+    )
+    parser.add_argument("-l", "--list", action="store_true", help="list the cases")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name in CASES:
+            print(name)
+        return 0
+
+    results = run_suite(args.patterns, repeat=args.repeat)
+    report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nregressions against {args.baseline}:")
+            report_regressions(regressions)
+            return 1
+        print(f"\nno regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,9 @@
 # from bdsim.block_types import GraphicsBlock
 
 from .run_sim import *
-
-# from .run_realtime import *
+from .run_realtime import *
+from .channel import *
+from .cosim import *
 from .blockdiagram import *
 from .components import *
 from .block_types import GraphicsBlock
@@ -0,0 +1,289 @@
+"""Atomic subsystems, instances that share one compiled subsystem template."""
+
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from bdsim.block import ContinuousBlock, EventSource
+
+if TYPE_CHECKING:
+    from bdsim.block import Block
+    from bdsim.blockdiagram import BlockDiagram
+    from bdsim.fusion import FusedChain
+
+# ------------------------------------------------------------------------- #
+#
+# A subsystem is normally flattened into its parent diagram, every instance is
+# a separate copy of its blocks and wires.  An atomic subsystem is instead
+# compiled once, as a SubsystemTemplate, and each instance in the parent
+# diagram is a single AtomicSubsystem block that owns only:
+#
+#   - its slice of the parent's continuous state vector
+#   - its parameter overrides, (block, attribute) -> value
+#
+# On every call the instance binds its overrides to the template blocks,
+# publishes its inputs as the outputs of the template's INPORT block and
+# evaluates the template's execution plan.  Compile time and memory therefore
+# scale with the number of distinct subsystem definitions, not instances.
+#
+# ------------------------------------------------------------------------- #
+
+
+class SubsystemTemplate:
+    """
+    Compiled subsystem definition shared by atomic subsystem instances
+
+    :param definition: block diagram that defines the subsystem
+    :type definition: BlockDiagram
+    :param verbose: print details of compilation, defaults to False
+    :type verbose: bool, optional
+    :raises ValueError: the subsystem contains blocks that cannot be shared
+
+    The definition is copied and compiled as a standalone diagram.  It may
+    contain function and continuous-time blocks, including nested subsystems,
+    but not clocked, sink, graphics or event blocks since these have state or
+    side effects that are not held in the continuous state vector.
+
+    Blocks in the template are shared by all instances, so they must not keep
+    internal state other than their continuous state.
+    """
+
+    def __init__(self, definition: BlockDiagram, verbose: bool = False) -> None:
+        self.definition = definition
+
+        bd = deepcopy(definition)
+        inports = [b for b in bd.blocklist if b.type == "inport"]
+        outports = [b for b in bd.blocklist if b.type == "outport"]
+        bd.compile(evaluate=False, verbose=verbose)
+        self.bd = bd
+        self.name = definition.name
+        self.inport: Block = inports[0]
+        self.outport: Block = outports[0]
+
+        for b in bd.blocklist:
+            if b.blockclass in ("sampled", "sink", "graphics") or isinstance(
+                b, EventSource
+            ):
+                raise ValueError(
+                    f"atomic subsystem {self.name}: block {b.name} of class "
+                    f"{b.blockclass} is not supported"
+                )
+
+        # continuous states, in blocklist order as for BlockDiagram.state_map
+        self._slices: list[tuple[Block, slice]] = []
+        index = 0
+        for b in bd.blocklist:
+            if b.blockclass == "continuous":
+                self._slices.append((b, slice(index, index + b.nstates)))
+                index += b.nstates
+        self.nstates = index
+        self.statenames = list(bd.statenames)
+
+        # the outputs depend on the inputs only through the output cone
+        cone = bd.upstream([self.outport])
+        self.feedthrough = self.inport in cone
+
+        plan = [
+            (b, fused)
+            for b, fused in bd._exec_plan
+            if b is not self.inport and b is not self.outport
+        ]
+        self.plan: list[tuple[Block, FusedChain | None]] = plan
+        self.output_plan: list[tuple[Block, FusedChain | None]] = [
+            (b, fused) for b, fused in plan if b in cone
+        ]
+
+        self._defaults: dict[tuple[Block, str], Any] = {}
+        self._bound: dict[tuple[Block, str], Any] | None = None
+        self._started: Any = None
+
+    def __repr__(self) -> str:
+        return f"SubsystemTemplate({self.name}, nstates={self.nstates})"
+
+    def resolve(
+        self, params: dict[str, dict[str, Any]] | None
+    ) -> dict[tuple[Block, str], Any]:
+        """
+        Resolve parameter overrides for an instance
+
+        :param params: attribute values keyed by template block name
+        :type params: dict of dict, optional
+        :raises ValueError: unknown block or attribute
+        :return: attribute values keyed by (block, attribute name)
+        :rtype: dict
+
+        For example ``{"gain.0": {"K": 2}}`` sets the attribute ``K`` of the
+        template block named ``gain.0``.  Attributes are set directly, so they
+        must be ones that the block reads at run time.
+        """
+        # restore the default values before recording any new ones
+        self.bind({})
+
+        overrides: dict[tuple[Block, str], Any] = {}
+        for name, attrs in (params or {}).items():
+            block = self.bd.blocknames.get(name)
+            if block is None:
+                raise ValueError(
+                    f"atomic subsystem {self.name} has no block named {name}"
+                )
+            for attr, value in attrs.items():
+                if not hasattr(block, attr):
+                    raise ValueError(
+                        f"atomic subsystem {self.name}: block {name} has no "
+                        f"attribute {attr}"
+                    )
+                self._defaults.setdefault((block, attr), getattr(block, attr))
+                overrides[(block, attr)] = value
+        self._bound = None
+        return overrides
+
+    def bind(self, overrides: dict[tuple[Block, str], Any]) -> None:
+        """
+        Set the template block parameters for an instance
+
+        :param overrides: attribute values from :meth:`resolve`
+        :type overrides: dict
+
+        Attributes that are not overridden are set to their default values.
+        Binding the same overrides twice in a row does nothing.
+        """
+        if overrides is self._bound:
+            return
+        for (block, attr), default in self._defaults.items():
+            setattr(block, attr, overrides.get((block, attr), default))
+        self._bound = overrides
+
+    def initialstate(self, overrides: dict[tuple[Block, str], Any]) -> np.ndarray:
+        """Initial continuous state for an instance"""
+        self.bind(overrides)
+        x0 = np.array([])
+        for b, _ in self._slices:
+            x0 = np.r_[x0, b.getstate0_safe()]
+        return x0
+
+    def evaluate(
+        self,
+        plan: list[tuple[Block, FusedChain | None]],
+        t: float,
+        u: list[Any],
+        x: np.ndarray | None,
+        overrides: dict[tuple[Block, str], Any],
+    ) -> dict[Block, np.ndarray]:
+        """
+        Evaluate the template for an instance
+
+        :param plan: :attr:`plan` or :attr:`output_plan`
+        :type plan: list
+        :param t: simulation time
+        :type t: float
+        :param u: instance input values
+        :type u: list
+        :param x: instance continuous state
+        :type x: ndarray
+        :param overrides: instance parameter overrides from :meth:`resolve`
+        :type overrides: dict
+        :return: block->state map for the template blocks
+        :rtype: dict
+
+        Block errors are raised as :class:`~bdsim.exceptions.BlockRuntimeError`
+        against the template block.
+        """
+        self.bind(overrides)
+        state_map = {b: x[s] for b, s in self._slices} if x is not None else {}
+
+        if plan is self.plan or self.feedthrough:
+            self.inport._publish_output_values(u)
+
+        for b, fused in plan:
+            block_state = state_map.get(b)
+            if fused is not None:
+                out = fused(t)
+            else:
+                out = b.output_safe(t, b.inport_values, block_state)
+            if not isinstance(out, (tuple, list)) or len(out) != b.nout:
+                b._raise_runtime_error(
+                    "output",
+                    AssertionError(f"block {b} output must be a list of {b.nout}"),
+                    t=t,
+                    inputs=b.inport_values,
+                    state=block_state,
+                )
+            b._publish_output_values(out)
+        return state_map
+
+    def deriv(self, t: float, state_map: dict[Block, np.ndarray]) -> np.ndarray:
+        """Harvest the derivatives of the template blocks after :meth:`evaluate`"""
+        if not self._slices:
+            return np.array([])
+        return np.concatenate(
+            [
+                np.asarray(
+                    b.deriv_safe(t, b.inport_values, state_map[b]), dtype=float
+                ).reshape(-1)
+                for b, _ in self._slices
+            ]
+        )
+
+    def start(self, simstate: Any) -> None:
+        """Start the template blocks, once per simulation"""
+        if self._started is simstate:
+            return
+        for b in self.bd.blocklist:
+            b.start_safe(simstate)
+        self._started = simstate
+
+
+class AtomicSubsystem(ContinuousBlock):
+    """
+    Instance of an atomic subsystem
+
+    :param template: compiled subsystem definition
+    :type template: SubsystemTemplate
+    :param params: parameter overrides, see :meth:`SubsystemTemplate.resolve`
+    :type params: dict of dict, optional
+    :param blockargs: |BlockOptions|
+    :type blockargs: dict
+
+    Created by :meth:`BlockDiagram.compile` in place of a ``SUBSYSTEM`` block
+    with ``atomic=True``.  An instance whose subsystem has no continuous
+    states is a function block.
+
+    .. note:: The signals inside an atomic subsystem are not published to the
+        parent diagram, they cannot be watched or logged.
+    """
+
+    def __init__(
+        self,
+        template: SubsystemTemplate,
+        params: dict[str, dict[str, Any]] | None = None,
+        **blockargs: Any,
+    ) -> None:
+        self.template = template
+        self._overrides = template.resolve(params)
+        name = blockargs.get("name") or template.name
+        if template.nstates > 0 and "snames" not in blockargs:
+            blockargs["snames"] = [f"{name}/{s}" for s in template.statenames]
+        super().__init__(
+            nin=template.inport.nout,
+            nout=template.outport.nin,
+            x0=template.initialstate(self._overrides),
+            feedthrough=template.feedthrough,
+            **blockargs,
+        )
+        if template.nstates == 0:
+            self.blockclass = "function"
+
+    def start(self, simstate: Any) -> None:
+        self.template.start(simstate)
+
+    def output(self, t: float, u: list[Any], x: np.ndarray) -> list[Any]:
+        self.template.evaluate(self.template.output_plan, t, u, x, self._overrides)
+        return self.template.outport.inport_values
+
+    def deriv(self, t: float, u: list[Any], x: np.ndarray) -> np.ndarray:
+        template = self.template
+        state_map = template.evaluate(template.plan, t, u, x, self._overrides)
+        return template.deriv(t, state_map)
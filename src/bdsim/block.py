@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Any, Callable, cast
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, cast
 import warnings
 
 import numpy as np
@@ -28,6 +28,20 @@ class PortValueSlot:
         self.value: Any = None
 
 
+class PortSignature(NamedTuple):
+    """Type, shape and dtype of an output port, recorded at compile time"""
+
+    type: type
+    shape: tuple[int, ...] | None  # None unless an ndarray
+    dtype: np.dtype | None  # None unless an ndarray
+
+    @classmethod
+    def of(cls, value: Any) -> PortSignature:
+        if isinstance(value, np.ndarray):
+            return cls(np.ndarray, value.shape, value.dtype)
+        return cls(type(value), None, None)
+
+
 class Block(ABC, Port):
     """_summary_
 
@@ -85,6 +99,13 @@ class Block(ABC, Port):
     #   Wires remain the topology model. During compile(), after subsystem
     #   flattening and wire hookup, each destination input port is bound to
     #   the source output slot for fast runtime access.
+    #
+    # Signatures and in-place outputs:
+    #   compile() evaluates the diagram once and records the type, shape and
+    #   dtype of every output port in self._outport_signatures.  A block that
+    #   defines output_inplace(t, u, x, out) is given preallocated arrays,
+    #   self._output_buffers, for its ndarray ports and may write its outputs
+    #   into them rather than allocating new arrays.
     # ========================================================================
 
     # Subclasses may define port counts and labels as plain class variables.
@@ -108,6 +129,8 @@ class Block(ABC, Port):
     _bd: BlockDiagram | None = None
 
     _output_values: list | None = None  # access by block.output_value(i)
+    _outport_signatures: list[PortSignature] | None = None  # set by compile
+    _output_buffers: list[np.ndarray | None] | None = None  # for output_inplace
 
     _x_view: np.ndarray | None
 
@@ -119,6 +142,9 @@ class Block(ABC, Port):
     _clock: Clock | None
 
     _graphics: bool = False
+    _fusible: bool = False  # stateless block that can be fused into a chain
+    _linear: bool = False  # linear time-invariant block, see islinear
+    _timefunction: bool = False  # output depends only on time, see istimefunction
     _parameters: dict[str, Any]
 
     # these lists are used to record the wires connected to the block, set by connect()
@@ -510,6 +536,40 @@ class Block(ABC, Port):
         """True if the block owns continuous or discrete state."""
         return self.nstates > 0 or self.ndstates > 0
 
+    @property
+    def hasmemory(self) -> bool:
+        """
+        True if the output does not depend on the current input
+
+        The output is computed from memory, the state of a block without direct
+        feedthrough or the input history of a delay.  These blocks are evaluated
+        first and break algebraic loops.
+        """
+        return self.hasstate and not self._feedthrough
+
+    @property
+    def islinear(self) -> bool:
+        """
+        True if the block is linear and time invariant
+
+        The output, and the derivative of a continuous state, are affine
+        functions of the inputs and state that do not depend on time.  Linear
+        parts of a diagram driven by sampled signals are solved exactly
+        between clock ticks, see :meth:`BlockDiagram.sampled_linear`.
+        """
+        return self._linear
+
+    @property
+    def istimefunction(self) -> bool:
+        """
+        True if the output of the block is a function of time only
+
+        The output of a source block such as ``WAVEFORM`` is fixed once the
+        simulation has started, while the output of a block such as ``INPORT``
+        or ``SOCKETSOURCE`` depends on values set during the run.
+        """
+        return self._timefunction
+
     # ---------------------------------------------------------------------- #
 
     @property
@@ -736,6 +796,38 @@ class Block(ABC, Port):
         for port, value in enumerate(self._output_values):
             self._outport_slots[port].value = value
 
+    def outport_signature(self, i: int) -> PortSignature:
+        """
+        Get the signature of an output port.
+
+        :param i: Output port index
+        :type i: int
+        :return: type, shape and dtype of the port value
+        :rtype: PortSignature
+
+        The signature is recorded when the block diagram is compiled, from the
+        output values computed with the initial state.
+
+        :seealso: :meth:`outport_value`
+        """
+        assert (
+            self._outport_signatures is not None
+        ), f"block {self.name} output signatures not recorded, compile first"
+        return self._outport_signatures[i]
+
+    def _record_outport_signatures(self) -> None:
+        """Record output signatures and preallocate in-place output buffers."""
+        if self._output_values is None or any(
+            v is None for v in self._output_values
+        ):
+            return
+        self._outport_signatures = [PortSignature.of(v) for v in self._output_values]
+        if hasattr(self, "output_inplace"):
+            self._output_buffers = [
+                np.empty(sig.shape, dtype=sig.dtype) if sig.shape is not None else None
+                for sig in self._outport_signatures
+            ]
+
     def outport_slot(self, i: int) -> PortValueSlot:
         assert i < self.nout, f"block {self.name} output port index {i} out of range"
         return self._outport_slots[i]
@@ -787,6 +879,12 @@ class Block(ABC, Port):
         except Exception as err:
             self._raise_runtime_error("output", err, t=t, inputs=u, state=x)
 
+    def output_inplace_safe(self, t: Any, u: Any, x: Any, out: Any) -> Any:
+        try:
+            return self.output_inplace(t, u, x, out)  # type: ignore[attr-defined]
+        except Exception as err:
+            self._raise_runtime_error("output", err, t=t, inputs=u, state=x)
+
     def deriv_safe(self, t: Any, u: Any, x: Any) -> Any:
         try:
             return self.deriv(t, u, x)
@@ -1163,6 +1261,8 @@ class Block(ABC, Port):
             PortValueSlot() for _ in range(self.nout)
         ]
         self._inport_slots: list[PortValueSlot | None] = [None] * self.nin
+        self._outport_signatures = None
+        self._output_buffers = None
 
         # used to build execution plan at compile time, set by compile() method
         self._sequence = None
@@ -1686,6 +1786,34 @@ class Block(ABC, Port):
     def start(self, simstate: SimulationState) -> None:  # begin a simulation
         pass
 
+    def checkpoint(self) -> Any:
+        """
+        Internal state of the block for a simulation checkpoint
+
+        :return: internal state, or None if the block has none
+        :rtype: any
+
+        Continuous and discrete states are captured by the simulator.  A block
+        that keeps other run-time state, for example a data buffer, overrides
+        this and :meth:`restore`.  The returned value must not be modified
+        by later simulation steps.
+
+        :seealso: :meth:`BDSim.checkpoint`
+        """
+        return None
+
+    def restore(self, state: Any) -> None:
+        """
+        Restore internal state of the block from a simulation checkpoint
+
+        :param state: internal state from :meth:`checkpoint`
+        :type state: any
+
+        Called after :meth:`start` when a simulation is resumed from a
+        checkpoint.
+        """
+        pass
+
     def validate_start(self) -> None:
         """Validate block initialization completed after ``start``."""
         pass
@@ -1947,12 +2075,24 @@ class SubsystemBlock(Block):
     such as gain, summation or various mappings.
     """
 
-    def __init__(self, subsystem: BlockDiagram, **blockargs: Any) -> None:
+    def __init__(
+        self,
+        subsystem: BlockDiagram,
+        atomic: bool = False,
+        params: dict[str, dict[str, Any]] | None = None,
+        **blockargs: Any,
+    ) -> None:
         """
         Create a subsystem block.
 
         :param subsystem: the subsystem to wrap
         :type subsystem: BlockDiagram
+        :param atomic: share one compiled copy of the subsystem between all
+            instances, defaults to False
+        :type atomic: bool, optional
+        :param params: parameter overrides for an atomic subsystem, attribute
+            values keyed by block name, defaults to None
+        :type params: dict of dict, optional
         :param blockargs: |BlockOptions|
         :type blockargs: dict
         :return: subsystem block base class
@@ -1979,9 +2119,16 @@ class SubsystemBlock(Block):
         self.nin = inports[0].nout
         self.nout = outports[0].nin
 
+        if params is not None and not atomic:
+            raise ValueError(
+                f"Subsystem({self.name}) parameter overrides require atomic=True"
+            )
+
         self.subsystem = subsystem
         self.inport = inports[0]
         self.outport = outports[0]
+        self.atomic = atomic
+        self.params = params
 
 
 class EventSource:
@@ -0,0 +1,147 @@
+"""Block arrays, one diagram node that represents N identical blocks."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from bdsim.block import ContinuousBlock
+
+if TYPE_CHECKING:
+    from bdsim.block import Block
+
+# ------------------------------------------------------------------------- #
+#
+# A block array evaluates N copies of a prototype block.  Its state is the
+# prototype state stacked N times, one row per element, and every signal on its
+# input and output wires is stacked with a leading dimension of N.
+#
+# A block class can provide vectorized methods that operate on all elements in
+# one call:
+#
+#   output_array(t, U, X) -> list of stacked output values
+#   deriv_array(t, U, X)  -> ndarray(N, nstates)
+#
+# where U is the list of stacked input values and X is the state as an
+# ndarray(N, nstates).  Otherwise the prototype's output() and deriv() are
+# called for each element in turn.
+#
+# ------------------------------------------------------------------------- #
+
+
+class BlockArray(ContinuousBlock):
+    """
+    Array of N identical blocks
+
+    :param n: number of elements
+    :type n: int
+    :param prototype: block that describes each element
+    :type prototype: Block
+    :param x0: initial state of every element as an ndarray(n, nstates),
+        defaults to the prototype's initial state for every element
+    :type x0: array_like, optional
+    :param blockargs: |BlockOptions|
+    :type blockargs: dict
+    :raises ValueError: prototype is not a function or continuous-time block
+
+    The prototype must be a function or continuous-time block, it is not
+    added to any block diagram.  Element ``i`` of the array has the state
+    ``x[i, :]`` and its inputs and outputs are element ``i`` of the stacked
+    signals on the array's wires.  Scalar inputs are applied to every element.
+
+    :seealso: :meth:`BlockDiagram.blockarray`
+    """
+
+    def __init__(
+        self,
+        n: int,
+        prototype: Block,
+        x0: Any = None,
+        **blockargs: Any,
+    ) -> None:
+        if prototype.blockclass not in ("function", "continuous"):
+            raise ValueError(
+                f"block array of {prototype.type} blocks is not supported, "
+                "elements must be function or continuous-time blocks"
+            )
+        if n < 1:
+            raise ValueError("block array must have at least one element")
+
+        self.n = n
+        self.prototype = prototype
+        self.element_nstates = prototype.nstates
+
+        if prototype.nstates == 0:
+            X0 = np.zeros((n, 0))
+        elif x0 is None:
+            X0 = np.tile(np.asarray(prototype.getstate0(), dtype=float), (n, 1))
+        else:
+            X0 = np.array(x0, dtype=float).reshape(n, prototype.nstates)
+
+        super().__init__(
+            nin=prototype.nin,
+            nout=prototype.nout,
+            x0=X0.reshape(-1),
+            feedthrough=getattr(prototype, "_feedthrough", False),
+            **blockargs,
+        )
+        if prototype.nstates == 0:
+            self.blockclass = "function"
+        self._vectorized = hasattr(prototype, "output_array")
+
+    @property
+    def islinear(self) -> bool:
+        return self.prototype.islinear
+
+    def start(self, simstate: Any) -> None:
+        self.prototype.start(simstate)
+
+    def _stack_inputs(self, u: list[Any]) -> list[np.ndarray]:
+        U = []
+        for port, value in enumerate(u):
+            value = np.asarray(value)
+            if value.ndim == 0:
+                value = np.broadcast_to(value, (self.n,))
+            elif value.shape[0] != self.n:
+                raise ValueError(
+                    f"input {port} has leading dimension {value.shape[0]}, "
+                    f"expecting {self.n}"
+                )
+            U.append(value)
+        return U
+
+    def _states(self, x: np.ndarray | None) -> np.ndarray | list[None]:
+        if self.element_nstates == 0:
+            return [None] * self.n
+        return np.asarray(x).reshape(self.n, self.element_nstates)
+
+    def output(self, t: float, u: list[Any], x: np.ndarray) -> list[Any]:
+        X = self._states(x)
+        if self.prototype.hasstate and not self.prototype._feedthrough:
+            # output depends only on the state, inputs may not be valid yet
+            U: list[Any] = [None] * self.nin
+        else:
+            U = self._stack_inputs(u)
+        if self._vectorized:
+            return self.prototype.output_array(t, U, X)  # type: ignore[attr-defined]
+
+        outputs = [
+            self.prototype.output(t, [None if Ui is None else Ui[i] for Ui in U], X[i])
+            for i in range(self.n)
+        ]
+        return [np.array([y[port] for y in outputs]) for port in range(self.nout)]
+
+    def deriv(self, t: float, u: list[Any], x: np.ndarray) -> np.ndarray:
+        X = self._states(x)
+        U = self._stack_inputs(u)
+        if hasattr(self.prototype, "deriv_array"):
+            Xd = self.prototype.deriv_array(t, U, X)
+        else:
+            Xd = np.array(
+                [
+                    self.prototype.deriv(t, [Ui[i] for Ui in U], X[i])
+                    for i in range(self.n)
+                ]
+            )
+        return np.asarray(Xd, dtype=float).reshape(-1)
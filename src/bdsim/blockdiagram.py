@@ -12,7 +12,7 @@ import sys
 from tempfile import _TemporaryFileWrapper
 import traceback
 import warnings
-from typing import TYPE_CHECKING, Any, NoReturn
+from typing import TYPE_CHECKING, Any, Iterable, NoReturn
 
 if TYPE_CHECKING:
     from typing import Self
@@ -37,6 +37,9 @@ else:
 from bdsim.components import *
 from bdsim.components import Counter
 from bdsim.connect import EndPlug, Plug, Port, StartPlug, Wire
+from bdsim.fusion import FusedChain, find_fused_chains
+from bdsim.atomic import AtomicSubsystem, SubsystemTemplate
+from bdsim.blockarray import BlockArray
 
 # ------------------------------------------------------------------------- #
 
@@ -91,6 +94,13 @@ class BlockDiagram(BlockDiagramMixin):
         self.n_auto_gain = Counter()
         self.n_auto_pow = Counter()
         self._state_map: dict[Block, np.ndarray | None] = {}
+        self.fused_chains: list[FusedChain] = []
+        self._exec_plan: list[tuple[Block, FusedChain | None]] = []
+        self._fuse = True
+        self.subsystem_templates: dict[int, SubsystemTemplate] = {}
+        self._subsystem_definitions: dict[tuple[str, int], BlockDiagram] = {}
+        self.components: list[list[Block]] = []
+        self.exact: list[list[Block]] = []
         self.compiled = False
 
     def __getitem__(self, id: int | str) -> Block:
@@ -141,6 +151,53 @@ class BlockDiagram(BlockDiagramMixin):
         self.clocklist.append(clock)
         return clock
 
+    def blockarray(
+        self,
+        n: int,
+        block: str | type[Block],
+        *args: Any,
+        x0: Any = None,
+        name: str | None = None,
+        **kwargs: Any,
+    ) -> BlockArray:
+        """
+        Add an array of identical blocks
+
+        :param n: number of elements
+        :type n: int
+        :param block: block name such as ``"INTEGRATOR"``, or block class
+        :type block: str or Block subclass
+        :param args: positional arguments for the block constructor
+        :param x0: initial state of every element as an ndarray(n, nstates),
+            defaults to the block's initial state for every element
+        :type x0: array_like, optional
+        :param name: name of the array block, defaults to None
+        :type name: str, optional
+        :param kwargs: keyword arguments for the block constructor
+        :return: the array block
+        :rtype: BlockArray
+
+        The array is a single block in the diagram that evaluates ``n`` copies
+        of the block.  Signals on its wires have a leading dimension of ``n``
+        and its states are stacked in the continuous state vector.  For
+        example::
+
+            robots = bd.blockarray(1000, "INTEGRATOR", x0=np.zeros((1000, 2)))
+
+        Blocks that define ``output_array`` and ``deriv_array`` methods, such
+        as ``INTEGRATOR`` and ``LTI_SS``, evaluate all elements in one call.
+
+        :seealso: :class:`~bdsim.blockarray.BlockArray`
+        """
+        if isinstance(block, str):
+            block = self.runtime._resolve_block_class(block.upper())
+        assert isinstance(block, type)
+        if x0 is not None and "x0" in inspect.signature(block.__init__).parameters:
+            # the prototype takes the state shape from the first element
+            kwargs["x0"] = np.asarray(x0)[0]
+        prototype = block(*args, **kwargs)
+        return BlockArray(n, prototype, x0=x0, name=name, bd=self)
+
     # ---------------------------------------------------------------------- #
 
     def connect(self, start: Port, *ends: Port, name: str | None = None) -> None:
@@ -359,6 +416,7 @@ class BlockDiagram(BlockDiagramMixin):
         evaluate: bool = True,
         report: bool = False,
         verbose: bool = False,
+        fuse: bool = True,
     ) -> bool:
         """
         Compile the block diagram
@@ -367,6 +425,8 @@ class BlockDiagram(BlockDiagramMixin):
         :type subsystem: bool, optional
         :param doimport: import subsystems, defaults to True
         :type doimport: bool, optional
+        :param fuse: fuse chains of stateless function blocks, defaults to True
+        :type fuse: bool, optional
         :raises RuntimeError: various block diagram errors
         :return: Compile status
         :rtype: bool
@@ -374,13 +434,20 @@ class BlockDiagram(BlockDiagramMixin):
         Performs a number of operations:
 
             - Check sanity of block parameters
-            - Recursively clone and import subsystems
+            - Recursively clone and import subsystems, atomic subsystems share
+              one compiled template per definition, saved in the attribute
+              ``subsystem_templates``
             - Check for loops without dynamics
             - Check for inputs driven by more than one wire
             - Check for unconnected inputs and outputs
             - Link all output ports to outgoing wires
             - Link all input ports to incoming wires
             - Evaluate all blocks in the network
+            - Fuse chains of stateless function blocks, see :meth:`fuse_chains`
+            - Find the independent parts of the continuous dynamics, saved in the
+              attribute ``components``, see :meth:`continuous_components`, and
+              those that can be solved exactly, saved in the attribute
+              ``exact``, see :meth:`sampled_linear`
 
         """
 
@@ -526,8 +593,8 @@ class BlockDiagram(BlockDiagramMixin):
             print("  ☑ checking for algebraic loops...")
 
         def _is_algebraic_participant(block: Block) -> bool:
-            return block.blockclass == "function" or (
-                block.hasstate and block._feedthrough
+            return not block.hasmemory and (
+                block.blockclass == "function" or block.hasstate
             )
 
         visited: set[Block] = set()
@@ -538,8 +605,9 @@ class BlockDiagram(BlockDiagramMixin):
             # Walk upstream through each input source because algebraic loops are
             # dependency cycles: a block can only be in the same algebraic loop as
             # the blocks that feed its current inputs.  We traverse only function
-            # blocks and stateful blocks with direct feedthrough, since those are
-            # the only blocks whose outputs depend on current-time input values.
+            # blocks and stateful blocks with direct feedthrough, but not blocks
+            # with memory such as a delay, since those are the only blocks whose
+            # outputs depend on current-time input values.
             visited.add(block)
             active_path.append(block)
             active_set.add(block)
@@ -603,6 +671,23 @@ class BlockDiagram(BlockDiagramMixin):
             # run all the blocks for one step
             self.evaluate(state_map, 0.0, sinks=False)
 
+            # record the type, shape and dtype of every output port, blocks
+            # that have a signature are not validated again by evaluate()
+            for b in self.blocklist:
+                b._record_outport_signatures()
+
+        self._fuse = fuse
+        if not subsystem and fuse and not error:
+            # fuse chains of stateless function blocks, after the evaluation
+            # above has validated their outputs
+            if verbose:
+                print("  ☑ fusing chains of function blocks...")
+            self.fuse_chains()
+
+        if not subsystem and not error:
+            self.components = self.continuous_components()
+            self.exact = [c for c in self.components if self.sampled_linear(c)]
+
         if error:
             # show report if there was an error
             if not report:
@@ -642,6 +727,25 @@ class BlockDiagram(BlockDiagramMixin):
                 # not a Subsystem block, just add the block to the list
                 b._depth = depth
                 blocks.append(b)
+            elif b.atomic:
+                # atomic Subsystem block, replace it with a single block that
+                # evaluates a compiled template shared by all its instances
+                template = self.subsystem_templates.get(id(b.subsystem))
+                if template is None or template.definition is not b.subsystem:
+                    if verbose:
+                        print(f"{'  '*(depth+1)}compiling atomic subsystem ", b.name)
+                    template = SubsystemTemplate(b.subsystem, verbose=verbose)
+                    self.subsystem_templates[id(b.subsystem)] = template
+                instance = AtomicSubsystem(template, params=b.params, name=b.name)
+                instance._bd = bd
+                instance._depth = depth
+                blocks.append(instance)
+
+                for w in bd.wirelist:
+                    if w.start.block == b:
+                        w.start.block = instance
+                    if w.end.block == b:
+                        w.end.block = instance
             else:
                 # Subsystem block encountered, recurse to find its constituent blocks and wires
                 # do not add it to the block list, it was just a container for the subsystem blocks and wires
@@ -758,6 +862,8 @@ class BlockDiagram(BlockDiagramMixin):
         t: float,
         checkfinite: bool = True,
         sinks: bool = True,
+        inplace: bool = False,
+        plan: list[tuple[Block, FusedChain | None]] | None = None,
     ) -> None:
         """
         Evaluate all blocks in the network using the compiled execution schedule
@@ -770,16 +876,34 @@ class BlockDiagram(BlockDiagramMixin):
         :type checkfinite: bool
         :param sinks: evaluate sink blocks, defaults to Trye
         :type sinks: bool, optional
-        :param simstate: simulation state
+        :param inplace: allow blocks to write outputs into preallocated arrays,
+            defaults to False
+        :type inplace: bool, optional
+        :param plan: evaluate only this part of the execution plan, defaults to
+            the whole plan
+        :type plan: list, optional
 
         Performs the following steps:
 
         1. Read state values from the provided runtime state map
         2. Execute the blocks in the order given by the ``plan``. The block
-           outputs are "sent" to their connected inputs.
+           outputs are "sent" to their connected inputs.  A fused chain of
+           function blocks is executed by a single call, see :meth:`fuse_chains`.
 
         Sink blocks are not executed here, but after completion their inputs
         will all be valid.
+
+        The output of a block is checked to be a list of the right length
+        only until its signature has been recorded by :meth:`compile`.
+
+        If ``inplace`` is True, blocks that define ``output_inplace`` write
+        their array outputs into buffers that are reused by the next
+        evaluation.  It is only safe when no output value is retained after the
+        evaluation, such as when computing the state derivative.
+
+        If ``plan`` is given, typically from :meth:`cone_plan`, only the blocks
+        in it are reset and evaluated.  Other blocks keep their previous
+        outputs.
         """
 
         # TODO: don't copy outputs to inputs of next block, have inputs
@@ -789,65 +913,134 @@ class BlockDiagram(BlockDiagramMixin):
             self.runtime.DEBUG(
                 "state", ">>>>>>>>> t={}, x={} >>>>>>>>>>>>>>>>", t, state_map
             )
+            self._evaluate_plan(state_map, t, checkfinite, inplace, plan, safe=True)
 
-            # reset all the blocks ready for the evalation
-            self.reset()
+            if sinks:
+                for b in self.blocklist:
+                    if isinstance(b, SinkBlock):
+                        b.step_safe(t, b.inport_values)
+        except BlockRuntimeError as err:
+            self._handle_block_runtime_error(err)
+
+    def _evaluate_lean(
+        self,
+        state_map: dict[Block, np.ndarray | None],
+        t: float,
+        checkfinite: bool = True,
+        sinks: bool = True,
+        inplace: bool = False,
+        plan: list[tuple[Block, FusedChain | None]] | None = None,
+    ) -> None:
+        # evaluate() without debug tracing, block methods are called directly
+        try:
+            self._evaluate_plan(state_map, t, checkfinite, inplace, plan, safe=False)
+
+            if sinks:
+                for b in self.blocklist:
+                    if isinstance(b, SinkBlock):
+                        try:
+                            b.step(t, b.inport_values)
+                        except Exception as err:
+                            b._raise_runtime_error(
+                                "step", err, t=t, inputs=b.inport_values
+                            )
+        except BlockRuntimeError as err:
+            self._handle_block_runtime_error(err)
 
-            self._state_map = state_map
+    def _evaluate_plan(
+        self,
+        state_map: dict[Block, np.ndarray | None],
+        t: float,
+        checkfinite: bool,
+        inplace: bool,
+        plan: list[tuple[Block, FusedChain | None]] | None,
+        safe: bool,
+    ) -> None:
+        # the plan loop shared by evaluate() and _evaluate_lean().  If safe,
+        # block methods are called through their *_safe wrappers and outputs
+        # are traced, otherwise they are called directly.  An exception is
+        # raised as a BlockRuntimeError of the block being evaluated
+        if plan is None:
+            self.reset()
+            plan = self._exec_plan
+        else:
+            for b, _ in plan:
+                b.reset_safe()
+        self._state_map = state_map
 
+        if safe:
             self.runtime.DEBUG("propagate", "t={:.3f}", t)
 
-            for sequence, group in enumerate(self.plan):
-                for b in group:
-                    # inports = None if sequence == 0 else b.inport_values
-                    inports = b.inport_values
-                    block_state = state_map.get(b)
-                    out = b.output_safe(t, inports, block_state)
+        b = None
+        try:
+            for b, fused in plan:
+                if fused is not None:
+                    # evaluate the whole chain, returns output of its root block
+                    out = fused(t)
+                elif inplace and b._output_buffers is not None:
+                    output_inplace = (
+                        b.output_inplace_safe
+                        if safe
+                        else b.output_inplace  # type: ignore[attr-defined]
+                    )
+                    out = output_inplace(
+                        t, b.inport_values, state_map.get(b), b._output_buffers
+                    )
+                elif safe:
+                    out = b.output_safe(t, b.inport_values, state_map.get(b))
+                else:
+                    out = b.output(t, b.inport_values, state_map.get(b))
 
+                if safe:
                     self.runtime.DEBUG("propagate", "block {:s}: output = {}", b, out)
 
+                if b._outport_signatures is None:
+                    # not yet validated, signatures are recorded by compile()
                     if not isinstance(out, (tuple, list)):
-                        b._raise_runtime_error(
-                            "output",
-                            AssertionError(
-                                f"block {b} output {b} must be a list: {type(out)}"
-                            ),
-                            t=t,
-                            inputs=inports,
-                            state=block_state,
+                        raise AssertionError(
+                            f"block {b} output must be a list: {type(out)}"
                         )
                     if len(out) != b.nout:
-                        b._raise_runtime_error(
-                            "output",
-                            AssertionError(
-                                f"block {b} output {b} has incorrect length: {len(out)} instead of {b.nout}"
-                            ),
-                            t=t,
-                            inputs=inports,
-                            state=block_state,
+                        raise AssertionError(
+                            f"block {b} output has incorrect length: {len(out)} "
+                            f"instead of {b.nout}"
                         )
+                if (
+                    checkfinite
+                    and isinstance(out, (int, float, np.ndarray))
+                    and not np.isfinite(out).any()
+                ):
+                    raise RuntimeError(f"block {b} output contains NaN")
+
+                b._publish_output_values(out)
+        except BlockRuntimeError:
+            raise
+        except Exception as err:
+            assert b is not None
+            b._raise_runtime_error(
+                "output", err, t=t, inputs=b.inport_values, state=state_map.get(b)
+            )
 
-                    if (
-                        checkfinite
-                        and isinstance(out, (int, float, np.ndarray))
-                        and not np.isfinite(out).any()
-                    ):
-                        b._raise_runtime_error(
-                            "output",
-                            RuntimeError(f"block {b} output contains NaN"),
-                            t=t,
-                            inputs=inports,
-                            state=block_state,
-                        )
+    def instrument(self, enable: bool = True) -> None:
+        """
+        Select the instrumented or lean evaluation path
 
-                    b._publish_output_values(out)
+        :param enable: use the instrumented path, defaults to True
+        :type enable: bool, optional
 
-            if sinks:
-                for b in self.blocklist:
-                    if isinstance(b, SinkBlock):
-                        b.step_safe(t, b.inport_values)
-        except BlockRuntimeError as err:
-            self._handle_block_runtime_error(err)
+        The instrumented :meth:`evaluate` and :meth:`deriv` trace values for
+        the debug options and call block methods through their ``*_safe``
+        wrappers, which the profiler times.  The lean path has no tracing and
+        calls the block methods directly, block errors are reported in the
+        same way.  :meth:`BDSim.run` selects the lean path unless debug or
+        profile options are given.
+        """
+        if enable:
+            self.__dict__.pop("evaluate", None)
+            self.__dict__.pop("deriv", None)
+        else:
+            self.evaluate = self._evaluate_lean  # type: ignore[method-assign]
+            self.deriv = self._deriv_lean  # type: ignore[method-assign]
 
     def schedule_generate(self) -> None:
         """
@@ -876,7 +1069,7 @@ class BlockDiagram(BlockDiagramMixin):
         group = []
         for b in self.blocklist:
             b._sequence = None
-            if b.blockclass == "source" or (b.hasstate and not b._feedthrough):
+            if b.blockclass == "source" or b.hasmemory:
                 b._sequence = 0
                 group.append(b)
         plan.append(group)
@@ -911,6 +1104,160 @@ class BlockDiagram(BlockDiagramMixin):
             )
 
         self.plan = plan
+        self.fused_chains = []
+        self._exec_plan = [(b, None) for group in plan for b in group]
+
+    def fuse_chains(self, watched: Iterable[Block] = (), enable: bool = True) -> None:
+        """
+        Fuse chains of stateless function blocks
+
+        :param watched: blocks whose outputs must be published, defaults to ()
+        :type watched: iterable of Block, optional
+        :param enable: enable fusion, defaults to True
+        :type enable: bool, optional
+
+        Blocks such as ``GAIN``, ``SUM`` or ``CLIP`` whose outputs all go to a
+        single fusible block are fused with it into a :class:`~bdsim.fusion.FusedChain`,
+        a single generated function that is evaluated at the position of the
+        chain's last block in the execution plan.  Intermediate values are kept
+        as locals of that function and are not published to the output slots,
+        validated or checked for finiteness.
+
+        The chains are saved in the attribute ``fused_chains``.  If ``enable`` is
+        False all chains are removed and every block is evaluated individually.
+
+        .. note:: Outputs of fused intermediate blocks are not available through
+            :meth:`Block.outport_value` after evaluation.  Blocks that are
+            watched or inspected must be given in ``watched``.
+
+        :seealso: :meth:`schedule_generate`
+        """
+        self.fused_chains = find_fused_chains(self, watched) if enable else []
+
+        roots = {chain.root: chain for chain in self.fused_chains}
+        fused = {b for chain in self.fused_chains for b in chain.blocks}
+        self._exec_plan = [
+            (b, roots.get(b))
+            for group in self.plan
+            for b in group
+            if b not in fused or b in roots
+        ]
+
+    def upstream(self, targets: Iterable[Block]) -> set[Block]:
+        """
+        Blocks that the inputs of the target blocks depend on
+
+        :param targets: target blocks
+        :type targets: iterable of Block
+        :return: blocks whose outputs affect the target inputs
+        :rtype: set of Block
+
+        The search stops at blocks with memory, such as stateful blocks without
+        direct feedthrough, since their outputs do not depend on their inputs.
+        These blocks are included but the blocks that feed them are not.
+        """
+        cone: set[Block] = set()
+        stack = list(targets)
+        while stack:
+            for source in stack.pop().sources:
+                if source in cone:
+                    continue
+                cone.add(source)
+                if not source.hasmemory:
+                    stack.append(source)
+        return cone
+
+    def continuous_components(self) -> list[list[Block]]:
+        """
+        Independent parts of the continuous dynamics
+
+        :return: continuous blocks of each part, in the order of the block list
+        :rtype: list of lists of Block
+
+        The continuous blocks are split into the weakly connected components
+        of the graph where block A is joined to block B if the derivative of A
+        depends on the state of B, through wires and blocks without memory.
+        Sampled blocks are constant between clock ticks, so a signal passed
+        through a sample and hold does not join the blocks on either side.
+
+        The state derivative of each part can be computed without the states
+        of the others, so each can be integrated with its own step size, see
+        the ``partition`` option of :meth:`BDSim.run`.
+        """
+        continuous = [b for b in self.blocklist if b.blockclass == "continuous"]
+        parent: dict[Block, Block] = {b: b for b in continuous}
+
+        def root(b: Block) -> Block:
+            while parent[b] is not b:
+                parent[b] = parent[parent[b]]
+                b = parent[b]
+            return b
+
+        for b in continuous:
+            for source in self.upstream([b]):
+                if source in parent:
+                    parent[root(source)] = root(b)
+
+        components: dict[Block, list[Block]] = {}
+        for b in continuous:
+            components.setdefault(root(b), []).append(b)
+        return list(components.values())
+
+    def sampled_linear(self, blocks: Iterable[Block]) -> bool:
+        r"""
+        Test if continuous dynamics are linear with held inputs
+
+        :param blocks: continuous blocks, such as a part of
+            :meth:`continuous_components`
+        :type blocks: iterable of Block
+        :return: True if the dynamics are linear and driven only by sampled
+            or constant signals
+        :rtype: bool
+
+        The blocks, and the blocks that compute their inputs, must be linear
+        and time invariant, see :attr:`Block.islinear`, except for those whose
+        inputs are held.  A signal is held if it is constant between clock
+        ticks: the output of a sampled block without direct feedthrough, such
+        as a zero-order hold, or of a constant or stateless block whose inputs
+        are held.  Between ticks the dynamics are then :math:`\dot{x} = A x + b`
+        with a constant :math:`b`, which :meth:`BDSim.run` solves exactly, see
+        :class:`~bdsim.exact.ExactPropagator`.
+        """
+        held: dict[Block, bool] = {}
+
+        def isheld(b: Block) -> bool:
+            if b not in held:
+                held[b] = False  # an algebraic loop is not held
+                if b.blockclass == "sampled":
+                    held[b] = b.hasmemory
+                elif b.blockclass == "function" or b.islinear:
+                    held[b] = (
+                        (b.nin > 0 or b.islinear)
+                        and not b.hasmemory
+                        and all(isheld(source) for source in b.sources)
+                    )
+            return held[b]
+
+        blocks = list(blocks)
+        if not all(b.blockclass == "continuous" and b.islinear for b in blocks):
+            return False
+        return all(b.islinear or isheld(b) for b in self.upstream(blocks))
+
+    def cone_plan(
+        self, targets: Iterable[Block]
+    ) -> list[tuple[Block, FusedChain | None]]:
+        """
+        Part of the execution plan that computes the inputs of the target blocks
+
+        :param targets: target blocks
+        :type targets: iterable of Block
+        :return: execution plan entries for :meth:`evaluate`
+        :rtype: list
+
+        :seealso: :meth:`upstream`
+        """
+        cone = self.upstream(targets)
+        return [(b, fused) for b, fused in self._exec_plan if b in cone]
 
     def schedule_dotfile(self, filename: str | io.TextIOWrapper) -> None:
         """
@@ -1354,6 +1701,7 @@ class BlockDiagram(BlockDiagramMixin):
         self,
         t: float,
         state_map: dict[Block, np.ndarray | None] | None = None,
+        blocks: list[Block] | None = None,
     ) -> np.ndarray[tuple[Any, ...], np.dtype[Any]] | Any:
         """
         Harvest derivatives from all blocks.
@@ -1362,11 +1710,14 @@ class BlockDiagram(BlockDiagramMixin):
         :type t: float
         :param state_map: optional block->state map, defaults to most recent evaluate
         :type state_map: dict, optional
+        :param blocks: harvest only these continuous blocks, such as a part of
+            :meth:`continuous_components`, defaults to all
+        :type blocks: list of Block, optional
         """
         try:
             active_state_map = self._state_map if state_map is None else state_map
             YD: np.ndarray[tuple[Any, ...], np.dtype[Any]] = np.array([])
-            for b in self.blocklist:
+            for b in self.blocklist if blocks is None else blocks:
                 if b.blockclass == "continuous":
                     block_state = active_state_map.get(b)
                     yd = b.deriv_safe(t, b.inport_values, block_state)
@@ -1394,6 +1745,44 @@ class BlockDiagram(BlockDiagramMixin):
         except BlockRuntimeError as err:
             self._handle_block_runtime_error(err)
 
+    def _deriv_lean(
+        self,
+        t: float,
+        state_map: dict[Block, np.ndarray | None] | None = None,
+        blocks: list[Block] | None = None,
+    ) -> np.ndarray[tuple[Any, ...], np.dtype[Any]] | Any:
+        # deriv() without debug tracing, see _evaluate_lean
+        active_state_map = self._state_map if state_map is None else state_map
+        derivs = []
+        b = None
+        try:
+            for b in self.blocklist if blocks is None else blocks:
+                if b.blockclass == "continuous":
+                    yd = b.deriv(t, b.inport_values, active_state_map.get(b))
+                    if not isinstance(yd, np.ndarray):
+                        raise AssertionError(f"deriv: block {b} did not return ndarray")
+                    if yd.ndim != 1 or yd.shape[0] != b.nstates:
+                        raise AssertionError(
+                            f"deriv: block {b} returns wrong shape {yd.shape}, "
+                            f"should be ({b.nstates},)"
+                        )
+                    derivs.append(yd)
+        except BlockRuntimeError as err:
+            self._handle_block_runtime_error(err)
+        except Exception as err:
+            assert b is not None
+            try:
+                b._raise_runtime_error(
+                    "deriv",
+                    err,
+                    t=t,
+                    inputs=b.inport_values,
+                    state=active_state_map.get(b),
+                )
+            except BlockRuntimeError as block_err:
+                self._handle_block_runtime_error(block_err)
+        return np.concatenate(derivs, dtype=float) if derivs else np.array([])
+
     def next(
         self,
         t: float,
@@ -1490,6 +1879,47 @@ class BlockDiagram(BlockDiagramMixin):
         except BlockRuntimeError as err:
             self._handle_block_runtime_error(err)
 
+    def codegen(self, path: str | os.PathLike | None = None) -> Any:
+        """
+        Generate a standalone NumPy module for the block diagram
+
+        :param path: file to write, defaults to a file in the bdsim cache directory
+        :type path: str or Path, optional
+        :return: loaded module bound to this block diagram
+        :rtype: module
+
+        The module contains straight-line code for the compiled diagram:
+
+        - ``f(t, x, xd_clocks)`` returns the continuous state derivative
+        - ``outputs(t, x, xd_clocks)`` returns a dict mapping block name to the
+          list of block outputs
+        - ``next_0(t, x, xd_clocks)``, ... return the next state of each clock,
+          these are also available as the tuple ``NEXT``
+
+        where ``x`` is the continuous state vector and ``xd_clocks`` is a
+        sequence of discrete state vectors, one per clock in ``clocklist``.
+
+        Blocks in the built-in library are emitted as NumPy expressions,
+        specialized for the signal types seen when the diagram is evaluated
+        with its initial state.  Other blocks call back to the original block
+        object.
+
+        The file is named by the diagram fingerprint, a hash of the block
+        types, parameters and wiring, and an existing file with the same
+        fingerprint is reused without generating the code again.
+
+        Example::
+
+            model = bd.codegen()
+            xdot = model.f(0.0, bd.getstate0(), [])
+
+        :seealso: :meth:`BDSim.run`
+        """
+        from bdsim import codegen
+
+        assert self.compiled, "block diagram must be compiled"
+        return codegen.load(self, codegen.write(self, path))
+
     def dotfile(self, filename: str | io.TextIOWrapper, shapes: Any = None) -> None:
         """
         Write a GraphViz dot file representing the network.
@@ -1943,6 +2373,11 @@ def bdload(
     Since ``eval`` executes code, only load trusted model files. Set
     ``allow_eval=False`` to refuse required ``=...`` expressions.
 
+    Expressions can create a clock with ``clock(period, ...)``, which takes
+    the arguments of :class:`Clock`, calls with the same arguments return the
+    same clock.  The ``subsys`` parameter of a ``SUBSYSTEM`` block can be the
+    name of a ``.bd`` file relative to the folder of ``filename``.
+
     """
 
     # load the JSON file
@@ -1966,7 +2401,17 @@ def bdload(
         _eval_ns.update({"SE3": SE3, "SE2": SE2})
     except ImportError:
         pass
+    clocks: dict[str, Clock] = {}
+
+    def clock(*args: Any, **kwargs: Any) -> Clock:
+        key = repr((args, sorted(kwargs.items())))
+        if key not in clocks:
+            clocks[key] = bd.clock(*args, **kwargs)
+        return clocks[key]
+
+    _eval_ns["clock"] = clock
     namespace = {**_eval_ns, **globalvars}
+    folder = os.path.dirname(os.path.abspath(filename))
 
     warned_eval = False
 
@@ -2078,6 +2523,15 @@ def bdload(
                 if block["block_type"] == "SCOPE" and "nin" not in params:
                     params["nin"] = block.get("inputsNum", 1)
 
+                subsys = params.get("subsys")
+                if (
+                    block["block_type"] == "SUBSYSTEM"
+                    and isinstance(subsys, str)
+                    and not os.path.isabs(subsys)
+                    and os.path.exists(os.path.join(folder, subsys))
+                ):
+                    params["subsys"] = os.path.join(folder, subsys)
+
                 newblock = block_init(name=block["title"], **params, **blockargs)
 
             except (
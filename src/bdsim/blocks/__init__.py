@@ -7,5 +7,6 @@ from .linalg import *
 from .displays import *
 from .connections import *
 from .spatial import *
+from .network import *
 
 url = "https://petercorke.github.io/bdsim/" + __package__
@@ -18,7 +18,7 @@ import importlib
 import types
 import copy
 from pathlib import Path
-from typing import Any, cast
+from typing import Any, Callable, cast
 
 import numpy as np
 
@@ -190,6 +190,8 @@ class Mux(FunctionBlock):
 
     nin: int = -1
     nout = 1  # type: ignore[assignment]
+    _fusible = True
+    _linear = True
 
     def __init__(self, nin: int = 1, **blockargs: Any) -> None:
         """
@@ -207,9 +209,33 @@ class Mux(FunctionBlock):
             if isinstance(input, (int, float, bool)):
                 out.append(input)
             elif isinstance(input, np.ndarray):
-                out.extend(input.flatten().tolist())
+                out.extend(input.ravel().tolist())
         return [np.array(out)]
 
+    def output_inplace(
+        self, t: float, inputs: list[Any], x: Any, out: list[Any]
+    ) -> list[Any]:
+        y = out[0]
+        if y is None or y.dtype.kind != "f":
+            # an integer buffer would silently truncate float inputs
+            return self.output(t, inputs, x)
+        i = 0
+        try:
+            for input in inputs:
+                if isinstance(input, (int, float, bool)):
+                    y[i] = input
+                    i += 1
+                elif isinstance(input, np.ndarray):
+                    n = input.size
+                    y[i : i + n] = input.ravel()
+                    i += n
+        except (ValueError, IndexError):
+            i = -1
+        if i != y.shape[0]:
+            # signal widths differ from the compile-time signature
+            return self.output(t, inputs, x)
+        return [y]
+
 
 # ------------------------------------------------------------------------ #
 class DeMux(FunctionBlock):
@@ -248,6 +274,8 @@ class DeMux(FunctionBlock):
 
     nin = 1  # type: ignore[assignment]
     nout: int = -1
+    _fusible = True
+    _linear = True
 
     def __init__(self, nout: int = 1, **blockargs: Any) -> None:
         """
@@ -303,6 +331,8 @@ class Index(FunctionBlock):
 
     nin = 1  # type: ignore[assignment]
     nout = 1  # type: ignore[assignment]
+    _fusible = True
+    _linear = True
 
     def __init__(
         self, index: list[int] | slice | str | None = None, **blockargs: Any
@@ -402,6 +432,19 @@ class SubSystem(SubsystemBlock):
         - The number of input and output ports is not specified, they are computed
           from the number of ports on the ``InPort`` and ``OutPort`` blocks within the
           subsystem.
+
+    If ``atomic`` is True the subsystem is not copied into the parent.  All
+    atomic instances of the same definition share one compiled copy of it, and
+    each instance holds only its slice of the continuous state vector and its
+    parameter overrides, for example::
+
+        robot = bd.SUBSYSTEM(vehicle, atomic=True, params={"gain": {"K": 2}})
+
+    sets the attribute ``K`` of the block named ``gain`` for this instance
+    only.  An atomic subsystem can contain only function and continuous-time
+    blocks, and its internal signals cannot be watched.  A ``BlockDiagram``
+    definition is copied when the parent diagram is compiled rather than when
+    the block is created.
     """
 
     nin: int = -1
@@ -415,6 +458,8 @@ class SubSystem(SubsystemBlock):
         allow_eval: bool | None = None,
         trace_eval: bool = False,
         globalvars: dict[str, Any] | None = None,
+        atomic: bool = False,
+        params: dict[str, dict[str, Any]] | None = None,
         **blockargs: Any,
     ) -> None:
         """
@@ -432,6 +477,12 @@ class SubSystem(SubsystemBlock):
         :param globalvars: (``.bd`` mode only) extra names available when evaluating
             ``"=..."`` parameter expressions.
         :type globalvars: dict, optional
+        :param atomic: share one compiled subsystem between all instances,
+            defaults to False
+        :type atomic: bool, optional
+        :param params: (atomic mode only) parameter overrides, attribute values
+            keyed by block name within the subsystem
+        :type params: dict of dict, optional
         :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
         :type blockargs: dict
         :raises ImportError: module not found or no BlockDiagram in it
@@ -447,18 +498,28 @@ class SubSystem(SubsystemBlock):
             if p.exists() and p.suffix == ".bd":
                 # .bd file mode: safe JSON load via bdload
 
-                if self._bd is None or self._bd.runtime is None:
+                # self._bd is not set until Block.__init__ is called below
+                parent = blockargs.get("bd", self._bd)
+                if parent is None or parent.runtime is None:
                     raise ValueError(
                         "SubSystem: loading a .bd file requires the block to be part "
                         "of a BDSim-managed diagram (created via sim.blockdiagram())"
                     )
-                new_subsystem = bdload(
-                    self._bd,
-                    str(p),
-                    globalvars=globalvars,
-                    allow_eval=allow_eval,
-                    trace_eval=trace_eval,
-                )
+                # atomic instances of an unchanged file share one definition
+                key = (str(p.resolve()), p.stat().st_mtime_ns)
+                definitions = parent._subsystem_definitions
+                if atomic and globalvars is None and key in definitions:
+                    new_subsystem = definitions[key]
+                else:
+                    new_subsystem = bdload(
+                        parent.runtime.blockdiagram(name=p.stem),
+                        str(p),
+                        globalvars=globalvars,
+                        allow_eval=allow_eval,
+                        trace_eval=trace_eval,
+                    )
+                    if atomic and globalvars is None:
+                        definitions[key] = new_subsystem
                 name = p.stem
             else:
                 # module import mode: executes the module — use only with trusted code
@@ -493,14 +554,20 @@ class SubSystem(SubsystemBlock):
         elif isinstance(subsys, BlockDiagram):
             # use an in-memory diagram
 
-            new_subsystem = copy.deepcopy(subsys) # make a snapshot copy to avoid later changes to the original affecting this block
+            if atomic:
+                # shared by all atomic instances, copied once at compile time
+                new_subsystem = subsys
+            else:
+                new_subsystem = copy.deepcopy(subsys) # make a snapshot copy to avoid later changes to the original affecting this block
             name = new_subsystem.name
         else:
             raise ValueError("argument must be filename or BlockDiagram instance")
 
         if "name" not in blockargs and name is not None:
             blockargs["name"] = name
-        super().__init__(subsystem=new_subsystem, **blockargs)
+        super().__init__(
+            subsystem=new_subsystem, atomic=atomic, params=params, **blockargs
+        )
 
 
 # ------------------------------------------------------------------------ #
@@ -531,6 +598,11 @@ class InPort(FunctionBlock):
     This block connects a subsystem to a parent block diagram.  Inputs to the
     parent-level ``SubSystem`` block appear as the outputs of this block.
 
+    If the block diagram is simulated on its own, for example as a partition
+    of a :class:`~bdsim.cosim.CoSimulation`, the outputs are given by the
+    attribute ``signal``, a function of time that returns a list of the
+    output values, or are zero if it is None.
+
     .. note:: Only one ``INPORT`` block can appear in a block diagram but it
         can have multiple ports.  This is different to Simulink(R) which
         would require multiple single-port input blocks.
@@ -547,10 +619,16 @@ class InPort(FunctionBlock):
         :type blockargs: dict
         """
         super().__init__(nout=nout, **blockargs)
+        self.signal: Callable[[float], list[Any]] | None = None
 
     def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
-        # signal feed through
+        if self.nin == 0:
+            # top-level diagram, the outputs are driven from outside
+            if self.signal is None:
+                return [0.0] * self.nout
+            return list(self.signal(t))
 
+        # signal feed through
         return inputs
 
 
@@ -583,6 +661,10 @@ class OutPort(FunctionBlock):
     inputs of this block become the outputs of the parent-level ``SubSystem``
     block.
 
+    If the block diagram is simulated on its own, for example as a partition
+    of a :class:`~bdsim.cosim.CoSimulation`, the block has no outputs and its
+    last input values are the attribute ``inport_values``.
+
     .. note:: Only one ``OUTPORT`` block can appear in a block diagram but it
         can have multiple ports.  This is different to Simulink(R) which
         would require multiple single-port output blocks.
@@ -601,6 +683,10 @@ class OutPort(FunctionBlock):
         super().__init__(nin=nin, **blockargs)
 
     def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
+        if self.nout == 0:
+            # top-level diagram, the inputs are read from outside
+            return []
+
         # signal feed through
         return inputs
 
@@ -4,6 +4,8 @@ Continuous-time blocks:
 - have inputs and outputs
 - have state variables
 - are a subclass of ``ContinuousBlock`` |rarr| ``Block``
+
+except for the transport delay, whose memory is its input history.
 """
 
 from __future__ import annotations
@@ -16,7 +18,7 @@ import math
 from math import sin, cos, atan2, sqrt, pi
 import spatialmath.base as smb  # type: ignore[import-not-found]
 from bdsim.blockdiagram import BlockDiagram
-from bdsim.components import ContinuousBlock, SubsystemBlock
+from bdsim.components import ContinuousBlock, FunctionBlock, SubsystemBlock
 
 Vector1D = int | float | tuple[float, ...] | list[float] | np.ndarray
 
@@ -144,6 +146,11 @@ class Integrator(ContinuousBlock):
             result = result.item()
         return [result]
 
+    @property
+    def islinear(self) -> bool:
+        # the limits are nonlinear
+        return self.min is None and self.max is None
+
     def deriv(self, t: float, u: list[Any], x: np.ndarray) -> np.ndarray:
         xd = smb.getvector(u[0])
         # TODO: event
@@ -160,6 +167,221 @@ class Integrator(ContinuousBlock):
 
         return self.gain * xd
 
+    def output_array(self, t: float, U: list[Any], X: np.ndarray) -> list[Any]:
+        # block array, one row of X per element
+        if X.shape[1] == 1:
+            return [X[:, 0]]
+        return [X]
+
+    def deriv_array(self, t: float, U: list[Any], X: np.ndarray) -> np.ndarray:
+        Xd = np.asarray(U[0], dtype=float).reshape(X.shape)
+        if self.min is not None:
+            Xd = np.where(X < self.min, 0, Xd)
+        if self.max is not None:
+            Xd = np.where(X > self.max, 0, Xd)
+        return self.gain * Xd
+
+
+# ------------------------------------------------------------------------ #
+
+
+class Delay(FunctionBlock):
+    r"""
+    :blockname:`DELAY`
+
+    Continuous-time transport delay.
+
+    :inputs: 1
+    :outputs: 1
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Input
+            - 0
+            - float, ndarray
+            - :math:`u`
+        *   - Output
+            - 0
+            - float, ndarray
+            - :math:`y`
+
+    The output is the input delayed by time :math:`T`
+
+    .. math::
+
+        y(t) = \left\{ \begin{array}{ll}
+            y_0 & t < T \\
+            u(t - T) & t \ge T
+        \end{array} \right.
+
+    which models latency, for example of a sensor, actuator or network, without
+    a fast clock.
+
+    The input is recorded at every logged time step of the simulation in a
+    ring buffer of ``capacity`` samples, and the output is linearly
+    interpolated from that history.  The block declares an event every
+    :math:`T` so that the solver never integrates further than :math:`T` past
+    the last recorded input, integration is not broken more often than that.
+    A diagram without continuous states is sampled at these events.  Samples
+    older than :math:`2T` are discarded.
+
+    Example::
+
+        delay = bd.DELAY(0.05)
+
+    .. note:: If the ``dt`` option of :meth:`~bdsim.BDSim.run` is given the
+        input is recorded, and interpolated, at that interval.
+
+    .. note:: The output does not depend on the current input, so the block
+        can close a feedback loop of function blocks.
+
+    :seealso: :class:`ZOH`
+    """
+
+    nin = 1
+    nout = 1
+
+    def __init__(
+        self,
+        T: float = 1,
+        y0: Vector1D = 0,
+        capacity: int = 1000,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param T: delay time, defaults to 1
+        :type T: float, optional
+        :param y0: output before the delay has elapsed, defaults to 0
+        :type y0: float or array_like, optional
+        :param capacity: maximum number of input samples within :math:`2T`,
+            defaults to 1000
+        :type capacity: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: delay or capacity not positive
+        """
+        super().__init__(**blockargs)
+        if T <= 0:
+            raise ValueError("delay must be > 0")
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+
+        self.T = T
+        self.y0 = y0
+        self.capacity = int(capacity)
+        # ring buffer of input history, oldest sample at index _first
+        self._t = np.empty((self.capacity,))
+        self._u: np.ndarray | None = None
+        self._shape: tuple[int, ...] = ()
+        self._first = 0
+        self._n = 0
+        self._simstate: Any = None
+
+    @property
+    def hasmemory(self) -> bool:
+        return True
+
+    def start(self, simstate: Any) -> None:
+        super().start(simstate)
+        self._u = None
+        self._first = 0
+        self._n = 0
+        self._simstate = simstate
+        if hasattr(simstate, "declare_sample_hook"):
+            simstate.declare_sample_hook(self.record)
+            simstate.declare_sample_event(self._break, (simstate.t or 0.0) + self.T)
+
+    def _break(self, t: float, simstate: Any) -> None:
+        # end the integration interval at most T after the last recorded input,
+        # a diagram without continuous states is sampled here
+        simstate.declare_sample_event(self._break, t + self.T)
+
+    def _slot(self, i: int) -> int:
+        return (self._first + i) % self.capacity
+
+    def record(self, t: float) -> None:
+        """
+        Record the input
+
+        :param t: simulation time
+        :type t: float
+        :raises RuntimeError: the history is full
+
+        Called by the simulator after every logged time step, when the input
+        of the block is valid.
+        """
+        u = np.asarray(self.inport_values[0], dtype=float)
+        if self._u is None:
+            self._u = np.empty((self.capacity, u.size))
+            self._shape = u.shape
+
+        # keep one sample at or before the oldest time that can be requested
+        horizon = t - 2 * self.T
+        while self._n > 1 and self._t[self._slot(1)] <= horizon:
+            self._first = self._slot(1)
+            self._n -= 1
+
+        if self._n > 0 and t <= self._t[self._slot(self._n - 1)]:
+            # the same time again, eg. at an interval boundary
+            i = self._slot(self._n - 1)
+        elif self._n == self.capacity:
+            raise RuntimeError(
+                f"block {self.name}: input history of {self.capacity} samples is"
+                " full, increase capacity"
+            )
+        else:
+            i = self._slot(self._n)
+            self._n += 1
+        self._t[i] = t
+        self._u[i] = u.reshape(-1)
+
+    def _search(self, t: float) -> int:
+        # logical index of the last sample at or before t, -1 if none
+        end = self._first + self._n
+        if end <= self.capacity:
+            return int(np.searchsorted(self._t[self._first : end], t, "right")) - 1
+        wrapped = end - self.capacity
+        if t >= self._t[0]:
+            i = int(np.searchsorted(self._t[:wrapped], t, "right")) - 1
+            return self.capacity - self._first + i
+        return int(np.searchsorted(self._t[self._first :], t, "right")) - 1
+
+    def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
+        i = self._search(t - self.T) if self._n > 0 else -1
+        if i < 0:
+            return [self.y0]
+        assert self._u is not None
+        a = self._slot(i)
+        if i == self._n - 1:
+            u = self._u[a]
+        else:
+            b = self._slot(i + 1)
+            s = (t - self.T - self._t[a]) / (self._t[b] - self._t[a])
+            u = self._u[a] + s * (self._u[b] - self._u[a])
+        if self._shape == ():
+            return [float(u[0])]
+        return [u.reshape(self._shape)]
+
+    def checkpoint(self) -> Any:
+        if self._u is None:
+            return None
+        slots = [self._slot(i) for i in range(self._n)]
+        return (self._t[slots].copy(), self._u[slots].copy(), self._shape)
+
+    def restore(self, state: Any) -> None:
+        t, u, self._shape = state
+        self._u = np.empty((self.capacity, u.shape[1]))
+        self._first = 0
+        self._n = len(t)
+        self._t[: self._n] = t
+        self._u[: self._n] = u
+
 
 # ------------------------------------------------------------------------ #
 
@@ -212,6 +434,7 @@ class LTI_SS(ContinuousBlock):
 
     nin = 1
     nout = 1
+    _linear = True
 
     def __init__(
         self,
@@ -283,6 +506,9 @@ class LTI_SS(ContinuousBlock):
         )
 
     def output(self, t: float, u: list[Any], x: np.ndarray) -> list[Any]:
+        if self.D is None and self.C.shape[0] == 1:
+            # scalar output, avoid the temporary (1,) array
+            return [float(self.C[0] @ x)]
         y = self.C @ x
         if self.D is not None:
             y = y + self.D @ np.array(u)
@@ -290,13 +516,40 @@ class LTI_SS(ContinuousBlock):
             return [y.item()]
         return [y]
 
+    def output_inplace(
+        self, t: float, u: list[Any], x: np.ndarray, out: list[Any]
+    ) -> list[Any]:
+        y = out[0]
+        if y is None:
+            return self.output(t, u, x)
+        try:
+            np.matmul(self.C, x, out=y)
+            if self.D is not None:
+                y += self.D @ np.array(u)
+        except (ValueError, TypeError):
+            # signal shape or type differs from the compile-time signature
+            return self.output(t, u, x)
+        return [y]
+
     def deriv(self, t: float, u: list[Any], x: np.ndarray) -> np.ndarray:
-        # Reshape u and x to (N,1), i.e. column vectors, so
-        # no problems with broadcasting between A@x and B@u
-        x = x.reshape(-1, 1)
-        u_arr = np.array(u).reshape(-1, 1)
-        xd = self.A @ x + self.B @ u_arr
-        return xd.flatten()
+        # u is the list of input port values, one per column of B
+        return self.A @ x + self.B @ np.array(u).reshape(-1)
+
+    def _stack_array_inputs(self, U: list[Any], n: int) -> np.ndarray:
+        # block array inputs as an ndarray(n, nin), one row per element
+        return np.concatenate([np.reshape(Ui, (n, -1)) for Ui in U], axis=1)
+
+    def output_array(self, t: float, U: list[Any], X: np.ndarray) -> list[Any]:
+        # block array, one row of X per element
+        Y = X @ self.C.T
+        if self.D is not None:
+            Y = Y + self._stack_array_inputs(U, X.shape[0]) @ self.D.T
+        if Y.shape[1] == 1:
+            return [Y[:, 0]]
+        return [Y]
+
+    def deriv_array(self, t: float, U: list[Any], X: np.ndarray) -> np.ndarray:
+        return X @ self.A.T + self._stack_array_inputs(U, X.shape[0]) @ self.B.T
 
 
 # ------------------------------------------------------------------------ #
@@ -551,6 +551,16 @@ class Scope(GraphicsBlock):
 
         plt.draw()
 
+    def checkpoint(self) -> Any:
+        if not self._enabled:
+            return None
+        return self.tdata.copy(), [y.copy() for y in self.ydata]
+
+    def restore(self, state: Any) -> None:
+        self.tdata, self.ydata = state
+        for i in range(0, self.nplots):
+            self.line[i].set_data(self.tdata, self.ydata[i])
+
     def step(self, t: float, inports: list[Any]) -> None:
         if not self._enabled:
             return
@@ -865,6 +875,15 @@ class ScopeXY(GraphicsBlock):
 
         plt.draw()
 
+    def checkpoint(self) -> Any:
+        if not self._enabled:
+            return None
+        return list(self.xdata), list(self.ydata)
+
+    def restore(self, state: Any) -> None:
+        self.xdata, self.ydata = state
+        self.line.set_data(self.xdata, self.ydata)
+
     def step(self, t: float, inports: list[Any]) -> None:
         if not self._enabled:
             return
@@ -14,7 +14,9 @@ from scipy import linalg
 import scipy.interpolate
 import math
 import inspect
+import itertools
 import warnings
+from copy import deepcopy
 import spatialmath.base as smb
 from typing import Any, Union, Callable, Optional
 from numpy.typing import ArrayLike
@@ -68,6 +70,7 @@ class Sum(FunctionBlock):
 
     nin: int = -1
     nout = 1
+    _fusible = True
 
     _modefuncs = {
         "r": lambda x: x,
@@ -115,6 +118,11 @@ class Sum(FunctionBlock):
         self.signs: str = signs
         self.mode: Optional[str] = mode
 
+    @property
+    def islinear(self) -> bool:
+        # angles are wrapped
+        return self.mode is None
+
     def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
         for i, input in enumerate(inputs):
             # code makes no assumption about types of inputs
@@ -207,6 +215,7 @@ class Prod(FunctionBlock):
 
     nin: int = -1
     nout = 1
+    _fusible = True
 
     def __init__(
         self, ops: str = "**", matrix: bool | None = None, **blockargs: Any
@@ -303,6 +312,7 @@ class Gain(FunctionBlock):
 
     nin = 1
     nout = 1
+    _fusible = True
 
     def __init__(
         self,
@@ -325,6 +335,10 @@ class Gain(FunctionBlock):
 
         self.add_param("K")
 
+    @property
+    def islinear(self) -> bool:
+        return bool(np.issubdtype(np.asarray(self.K).dtype, np.number))
+
     def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
         input = inputs[0]
 
@@ -339,6 +353,25 @@ class Gain(FunctionBlock):
         else:
             return [input * self.K]
 
+    def output_inplace(
+        self, t: float, inputs: list[Any], x: Any, out: list[Any]
+    ) -> list[Any]:
+        input = inputs[0]
+        y = out[0]
+        if y is None or not isinstance(input, np.ndarray):
+            return self.output(t, inputs, x)
+        try:
+            if not isinstance(self.K, np.ndarray):
+                np.multiply(input, self.K, out=y)
+            elif self.premul:
+                np.matmul(self.K, input, out=y)
+            else:
+                np.matmul(input, self.K, out=y)
+        except (ValueError, TypeError):
+            # signal shape or type differs from the compile-time signature
+            return self.output(t, inputs, x)
+        return [y]
+
 
 # ------------------------------------------------------------------------ #
 
@@ -472,6 +505,7 @@ class Clip(FunctionBlock):
 
     nin = 1
     nout = 1
+    _fusible = True
 
     def __init__(
         self,
@@ -577,6 +611,7 @@ class Function(FunctionBlock):
 
     nin: int = -1
     nout: int = -1
+    _fusible = True
 
     def __init__(
         self,
@@ -663,6 +698,16 @@ class Function(FunctionBlock):
             self.userdata.clear()
             print("clearing user data")
 
+    def checkpoint(self) -> Any:
+        if self.userdata is None:
+            return None
+        return deepcopy(self.userdata)
+
+    def restore(self, state: Any) -> None:
+        # the dict is also held in self.args, update it in place
+        assert self.userdata is not None
+        self.userdata.update(state)
+
     def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
 
         if callable(self.func):
@@ -832,6 +877,184 @@ class Interpolate(FunctionBlock):
         return [self.f(xnew)]
 
 
+# ------------------------------------------------------------------------ #
+
+
+class LUT(FunctionBlock):
+    r"""
+    :blockname:`LUT`
+
+    N-dimensional lookup table.
+
+    :inputs: N
+    :outputs: 1
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Input
+            - i
+            - int, float
+            - :math:`x_i`
+        *   - Output
+            - 0
+            - float, ndarray
+            - :math:`f(x_0, \ldots, x_{N-1})`
+
+    Multilinear interpolation in a table of a function sampled on a grid.
+    ``breakpoints`` is a list of N increasing 1D-arrays, one per input, and
+    ``table`` has a shape that starts with their lengths.  Any further
+    dimensions of ``table`` are the shape of the output.  For example, an
+    efficiency map of speed and torque::
+
+        eta = bd.LUT(table, [speed, torque])   # table.shape = (len(speed), len(torque))
+        bd.connect(w, eta[0])
+        bd.connect(tau, eta[1])
+
+    The grid cell of each input is found by arithmetic if its breakpoints are
+    uniformly spaced, otherwise by a search that starts from the cell of the
+    previous evaluation.  Inputs outside the grid are clamped to the edge of
+    the table, or if ``extrapolate`` is True the edge cell is extended
+    linearly.
+
+    In a :class:`~bdsim.BlockArray` all elements are looked up in one
+    vectorized call, see :meth:`lookup`.
+
+    :seealso: :class:`Interpolate` :class:`scipy.interpolate.RegularGridInterpolator`
+    """
+
+    nin: int = -1
+    nout = 1
+    _fusible = True
+
+    def __init__(
+        self,
+        table: ArrayLike,
+        breakpoints: list[ArrayLike],
+        extrapolate: bool = False,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param table: function values at the grid points
+        :type table: array_like
+        :param breakpoints: grid coordinates for each input
+        :type breakpoints: list of array_like
+        :param extrapolate: extrapolate beyond the grid rather than clamp,
+            defaults to False
+        :type extrapolate: bool, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: table and breakpoints do not match
+        """
+        self.breakpoints: list[np.ndarray] = [
+            np.asarray(b, dtype=float).ravel() for b in breakpoints
+        ]
+        self.table: np.ndarray = np.asarray(table, dtype=float)
+        n = len(self.breakpoints)
+        super().__init__(nin=n, **blockargs)
+
+        shape = tuple(len(b) for b in self.breakpoints)
+        if n == 0 or self.table.shape[:n] != shape:
+            raise ValueError(
+                f"table shape {self.table.shape} does not start with the "
+                f"breakpoint lengths {shape}"
+            )
+        self._uniform: list[tuple[float, float] | None] = []
+        for b in self.breakpoints:
+            if len(b) < 2 or np.any(np.diff(b) <= 0):
+                raise ValueError("breakpoints must have 2 or more increasing values")
+            h = (b[-1] - b[0]) / (len(b) - 1)
+            if np.allclose(np.diff(b), h, rtol=1e-9, atol=0):
+                self._uniform.append((b[0], h))
+            else:
+                self._uniform.append(None)
+        self.extrapolate: bool = extrapolate
+        self._cell: list[int] = [0] * n
+
+    def _locate(self, dim: int, x: float) -> tuple[int, float]:
+        # cell index and fractional position of x along one dimension
+        b = self.breakpoints[dim]
+        last = len(b) - 2
+        uniform = self._uniform[dim]
+        if uniform is not None:
+            s = (x - uniform[0]) / uniform[1]
+            i = min(max(int(math.floor(s)), 0), last)
+            f = s - i
+        else:
+            i = self._cell[dim]
+            if not b[i] <= x < b[i + 1]:
+                i = min(max(int(np.searchsorted(b, x, side="right")) - 1, 0), last)
+                self._cell[dim] = i
+            f = (x - b[i]) / (b[i + 1] - b[i])
+        if not self.extrapolate:
+            f = min(max(f, 0.0), 1.0)
+        return i, f
+
+    def output(self, t: float, inputs: list[Any], x: Any) -> list[Any]:
+        cell = []
+        fractions = []
+        for dim, u in enumerate(inputs):
+            i, f = self._locate(dim, float(u))
+            cell.append(slice(i, i + 2))
+            fractions.append(f)
+        # contract the 2^N corners of the cell one dimension at a time
+        y = self.table[tuple(cell)]
+        for f in fractions:
+            y = y[0] + (y[1] - y[0]) * f
+        if y.ndim == 0:
+            return [float(y)]
+        return [y]
+
+    def lookup(self, *inputs: ArrayLike) -> np.ndarray:
+        """
+        Look up many points at once
+
+        :param inputs: coordinates of the points, one array per input
+        :type inputs: array_like(M)
+        :return: function values
+        :rtype: ndarray(M,...)
+
+        The coordinates of the points along each dimension are arrays of the
+        same length, or scalars that apply to every point.
+        """
+        X = np.broadcast_arrays(*[np.asarray(u, dtype=float) for u in inputs])
+        index = []
+        fractions = []
+        for dim, x in enumerate(X):
+            b = self.breakpoints[dim]
+            uniform = self._uniform[dim]
+            if uniform is not None:
+                s = (x - uniform[0]) / uniform[1]
+                i = np.clip(np.floor(s).astype(int), 0, len(b) - 2)
+                f = s - i
+            else:
+                i = np.clip(np.searchsorted(b, x, side="right") - 1, 0, len(b) - 2)
+                f = (x - b[i]) / (b[i + 1] - b[i])
+            if not self.extrapolate:
+                f = np.clip(f, 0.0, 1.0)
+            index.append(i)
+            fractions.append(f)
+
+        # weighted sum over the 2^N corners of each point's cell
+        extra = (np.newaxis,) * (self.table.ndim - len(X))
+        y = 0.0
+        for corner in itertools.product((0, 1), repeat=len(X)):
+            w = 1.0
+            for c, f in zip(corner, fractions):
+                w = w * (f if c else 1.0 - f)
+            values = self.table[tuple(i + c for i, c in zip(index, corner))]
+            y = y + w[(...,) + extra] * values
+        return np.asarray(y)
+
+    def output_array(self, t: float, U: list[Any], X: np.ndarray) -> list[Any]:
+        return [self.lookup(*U)]
+
+
 if __name__ == "__main__":  # pragma: no cover
     from pathlib import Path
     import subprocess
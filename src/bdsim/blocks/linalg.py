@@ -332,6 +332,7 @@ class Slice2(FunctionBlock):
 
     nin = 1
     nout = 1
+    _fusible = True
 
     def __init__(self, rows: Any = None, cols: Any = None, **blockargs: Any) -> None:
         """
@@ -430,6 +431,7 @@ class Slice1(FunctionBlock):
 
     nin = 1
     nout = 1
+    _fusible = True
 
     def __init__(self, index: Any, **blockargs: Any) -> None:
         """
@@ -0,0 +1,960 @@
+"""
+Network blocks:
+
+- exchange signals with other processes over UDP, TCP or Unix-domain sockets,
+  or with processes on the same host through shared memory
+- do all socket I/O on a background thread
+- are a subclass of ``SourceBlock`` or ``SinkBlock`` |rarr| ``Block``
+
+"""
+
+from __future__ import annotations
+
+import collections
+import math
+import os
+import socket
+import threading
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from bdsim.channel import SharedChannel
+from bdsim.components import Clock, SinkBlock, SourceBlock
+
+# ------------------------------------------------------------------------ #
+#
+# A packet is one record of a NumPy dtype, its bytes are sent as they are so
+# the byte order is that of the dtype.  Each field of a structured dtype is an
+# output port of SOCKETSOURCE or an input port of SOCKETSINK, any other dtype
+# is a single port.
+#
+# The simulation and the I/O thread share a deque of packets.  Appending and
+# popping are atomic, so neither side takes a lock or waits for the other:
+#
+#   latest  the deque holds one packet, a new packet replaces the old one
+#   queue   the deque holds up to ``backlog`` packets, first in first out,
+#           when it is full the oldest packet is dropped
+#
+# Stream sockets carry back to back records.  The server end of a stream
+# socket listens and serves one peer at a time, the client end connects and
+# reconnects in the background until the run ends.  All sockets are closed by
+# an end hook of the run.
+#
+# ------------------------------------------------------------------------ #
+
+MODES = ("latest", "queue")
+
+# polling interval of the I/O threads, in seconds
+POLL = 0.05
+
+
+def _record_dtype(dtype: Any) -> np.dtype:
+    # a structured dtype, a plain dtype becomes the single field "value"
+    dtype = np.dtype(dtype)
+    if dtype.names is None:
+        dtype = np.dtype([("value", dtype)])
+    return dtype
+
+
+def _address(url: str) -> tuple[int, int, Any]:
+    # socket family, type and address of a udp://, tcp:// or unix:// URL
+    parts = urlsplit(url)
+    if parts.scheme == "udp":
+        return socket.AF_INET, socket.SOCK_DGRAM, (parts.hostname or "", parts.port)
+    if parts.scheme == "tcp":
+        return socket.AF_INET, socket.SOCK_STREAM, (parts.hostname or "", parts.port)
+    if parts.scheme == "unix":
+        return socket.AF_UNIX, socket.SOCK_STREAM, parts.netloc + parts.path
+    raise ValueError(
+        f"unknown socket URL {url!r}, expecting udp://, tcp:// or unix://"
+    )
+
+
+def _bind(family: int, kind: int, address: Any) -> socket.socket:
+    sock = socket.socket(family, kind)
+    if family == socket.AF_UNIX:
+        if os.path.exists(address):
+            os.unlink(address)
+    else:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(address)
+    if kind == socket.SOCK_STREAM:
+        sock.listen(1)
+    sock.settimeout(POLL)
+    return sock
+
+
+class _Endpoint:
+    """
+    One end of a socket connection, run by an I/O thread
+
+    :param url: socket address
+    :type url: str
+    :param server: bind to the address, otherwise connect to it
+    :type server: bool
+
+    For a stream socket :meth:`peer` returns the connected socket, accepting
+    or connecting if needed.  The methods are only called by the I/O thread.
+    """
+
+    def __init__(self, url: str, server: bool) -> None:
+        self.family, self.kind, self.address = _address(url)
+        self.server = server
+        self.stream = self.kind == socket.SOCK_STREAM
+        self.sock: socket.socket | None = None
+        self.conn: socket.socket | None = None
+        if server:
+            # bind now so that errors are raised by start() and the peer can
+            # connect as soon as the run starts
+            self.sock = _bind(self.family, self.kind, self.address)
+            if self.family != socket.AF_UNIX:
+                self.address = self.sock.getsockname()
+        elif not self.stream:
+            self.sock = socket.socket(self.family, self.kind)
+
+    def peer(self) -> socket.socket | None:
+        if not self.stream:
+            return self.sock
+        if self.conn is None:
+            try:
+                if self.server:
+                    assert self.sock is not None
+                    self.conn, _ = self.sock.accept()
+                else:
+                    conn = socket.socket(self.family, self.kind)
+                    conn.settimeout(POLL)
+                    try:
+                        conn.connect(self.address)
+                    except OSError:
+                        conn.close()
+                        time.sleep(POLL)
+                        return None
+                    self.conn = conn
+            except socket.timeout:
+                return None
+            self.conn.settimeout(POLL)
+        return self.conn
+
+    def drop(self) -> None:
+        # the peer has gone, wait for or make a new connection
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def close(self) -> None:
+        self.drop()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if self.server and self.family == socket.AF_UNIX:
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+
+
+# ------------------------------------------------------------------------ #
+
+
+class SocketSource(SourceBlock):
+    """
+    :blockname:`SOCKETSOURCE`
+
+    Receive signals from a socket.
+
+    :inputs: 0
+    :outputs: N
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Output
+            - i
+            - int, float, ndarray
+            - field :math:`i` of the last packet
+
+    Packets are received by a background thread from the socket at ``url``,
+    which is ``udp://host:port``, ``tcp://host:port`` or ``unix:///path``.
+    Each packet is one record of ``dtype``, and the block has an output for
+    each field of the record.  For example, a packet with a timestamp and a
+    3-vector in little-endian byte order::
+
+        dtype = [("time", "<f8"), ("velocity", "<f8", (3,))]
+        rx = bd.SOCKETSOURCE("udp://0.0.0.0:5005", dtype=dtype)
+
+    Without a ``clock`` the outputs are those of the latest packet, and change
+    whenever a packet arrives.  With a ``clock`` the outputs change only at
+    the clock ticks.  In ``mode="queue"``, which requires a clock, packets are
+    buffered and one is taken at each tick, otherwise the latest packet is
+    taken.  Before the first packet the outputs are from ``initial``.
+
+    The evaluation of the block never waits for the network.  The counts of
+    packets received, and dropped because the queue was full or a datagram
+    had the wrong size, are the attributes ``received`` and ``dropped``.
+
+    .. note:: By default TCP and Unix sockets listen for one peer at a time.
+        If ``server`` is False the block connects to the address instead.
+
+    :seealso: :class:`SocketSink`
+    """
+
+    nin = 0
+    nout = -1
+
+    def __init__(
+        self,
+        url: str,
+        dtype: Any = "<f8",
+        mode: str = "latest",
+        clock: Clock | None = None,
+        initial: Any = None,
+        server: bool = True,
+        backlog: int = 64,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param url: socket address
+        :type url: str
+        :param dtype: packet format, defaults to a little-endian float
+        :type dtype: numpy dtype or str, optional
+        :param mode: packet buffering, "latest" [default] or "queue"
+        :type mode: str, optional
+        :param clock: update the outputs at the ticks of this clock
+        :type clock: Clock, optional
+        :param initial: packet before the first is received, defaults to zeros
+        :type initial: tuple or array_like, optional
+        :param server: bind to the address rather than connect to it,
+            defaults to True
+        :type server: bool, optional
+        :param backlog: number of packets buffered in queue mode, defaults to 64
+        :type backlog: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: unknown URL or mode, or queue mode without a clock
+        """
+        self.dtype: np.dtype = _record_dtype(dtype)
+        assert self.dtype.names is not None
+        super().__init__(nout=len(self.dtype.names), **blockargs)
+
+        _address(url)
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}, must be latest or queue")
+        if mode == "queue" and clock is None:
+            raise ValueError("queue mode needs a clock")
+        self.url = url
+        self.mode = mode
+        self.clock = clock
+        self.server = server
+        self.backlog = backlog
+
+        packet = np.zeros((), dtype=self.dtype)
+        if initial is not None:
+            if len(self.dtype.names) == 1:
+                initial = (initial,)
+            packet[()] = tuple(initial)
+        self.initial: np.ndarray = packet
+
+        self.received = 0
+        self.dropped = 0
+        self._rx: collections.deque[np.ndarray] = collections.deque(maxlen=1)
+        self._packet = self.initial
+        self._endpoint: _Endpoint | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def address(self) -> Any:
+        """Address of the socket, with the port number if it was bound to 0"""
+        return None if self._endpoint is None else self._endpoint.address
+
+    def start(self, simstate: Any) -> None:
+        super().start(simstate)
+        self.close()
+        self.received = 0
+        self.dropped = 0
+        self._rx = collections.deque(maxlen=self.backlog if self.mode == "queue" else 1)
+        self._packet = self.initial
+        self._endpoint = _Endpoint(self.url, self.server)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._receive, name=f"SOCKETSOURCE({self.name})", daemon=True
+        )
+        self._thread.start()
+
+        if hasattr(simstate, "declare_end_hook"):
+            simstate.declare_end_hook(self.close)
+        if self.clock is not None and simstate is not None:
+            t0 = simstate.t or 0.0
+            self._tick_k = math.ceil((t0 - self.clock.offset) / self.clock.T - 1e-9)
+            simstate.declare_event(self._tick, self.clock.time(self._tick_k))
+
+    def _receive(self) -> None:
+        # I/O thread, receive packets until the block is closed
+        endpoint = self._endpoint
+        assert endpoint is not None
+        size = self.dtype.itemsize
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        n = 0
+        while not self._stop.is_set():
+            try:
+                sock = endpoint.peer()
+                if sock is None:
+                    continue
+                k = sock.recv_into(view[n:])
+                if endpoint.stream:
+                    if k == 0:
+                        endpoint.drop()
+                        n = 0
+                        continue
+                    n += k
+                    if n < size:
+                        continue
+                    n = 0
+                elif k != size:
+                    self.dropped += 1
+                    continue
+            except socket.timeout:
+                continue
+            except OSError:
+                if self._stop.is_set():
+                    return
+                endpoint.drop()
+                n = 0
+                continue
+            if self.mode == "queue" and len(self._rx) == self._rx.maxlen:
+                self.dropped += 1
+            self._rx.append(np.frombuffer(buffer, dtype=self.dtype)[0].copy())
+            self.received += 1
+
+    def _take(self) -> None:
+        # update the packet that is output
+        try:
+            if self.mode == "queue":
+                self._packet = self._rx.popleft()
+            else:
+                self._packet = self._rx[-1]
+        except IndexError:
+            pass
+
+    def _tick(self, t: float, simstate: Any) -> None:
+        self._take()
+        self._tick_k += 1
+        assert self.clock is not None
+        tnext = self.clock.time(self._tick_k)
+        if tnext <= simstate.tf:
+            simstate.declare_event(self._tick, tnext)
+
+    def output(self, t: float, inputs: list[Any], x: np.ndarray) -> list[Any]:
+        if self.clock is None:
+            self._take()
+        assert self.dtype.names is not None
+        out = []
+        for name in self.dtype.names:
+            value = self._packet[name]
+            out.append(value.item() if value.ndim == 0 else np.array(value))
+        return out
+
+    def close(self) -> None:
+        """
+        Stop receiving and close the socket
+
+        Called when the run ends.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._endpoint is not None:
+            self._endpoint.close()
+
+    def done(self, **kwargs: Any) -> None:
+        self.close()
+
+
+# ------------------------------------------------------------------------ #
+
+
+class SocketSink(SinkBlock):
+    """
+    :blockname:`SOCKETSINK`
+
+    Send signals to a socket.
+
+    :inputs: N
+    :outputs: 0
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Input
+            - i
+            - int, float, ndarray
+            - field :math:`i` of the packet
+
+    The inputs are packed into one record of ``dtype``, an input for each
+    field, and sent by a background thread to the socket at ``url``, which
+    is ``udp://host:port``, ``tcp://host:port`` or ``unix:///path``.  For
+    example::
+
+        dtype = [("time", "<f8"), ("command", "<f4", (2,))]
+        tx = bd.SOCKETSINK("udp://127.0.0.1:5006", dtype=dtype)
+        bd.connect(bd.TIME(), tx[0])
+        bd.connect(controller, tx[1])
+
+    Without a ``clock`` a packet is made at every logged simulation sample,
+    otherwise at every clock tick.  In ``mode="latest"`` only the newest packet waits to
+    be sent, older ones are replaced, in ``mode="queue"`` up to ``backlog``
+    packets wait.
+
+    The block never waits for the network.  The counts of packets sent, and
+    dropped because a newer packet replaced them or the queue was full, are
+    the attributes ``sent`` and ``dropped``.
+
+    .. note:: By default TCP and Unix sockets connect to a listening peer,
+        and reconnect if it goes away.  If ``server`` is True the block
+        listens for one peer instead.
+
+    :seealso: :class:`SocketSource`
+    """
+
+    nin = -1
+    nout = 0
+
+    def __init__(
+        self,
+        url: str,
+        dtype: Any = "<f8",
+        mode: str = "queue",
+        clock: Clock | None = None,
+        server: bool = False,
+        backlog: int = 64,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param url: socket address
+        :type url: str
+        :param dtype: packet format, defaults to a little-endian float
+        :type dtype: numpy dtype or str, optional
+        :param mode: packet buffering, "latest" or "queue" [default]
+        :type mode: str, optional
+        :param clock: send at the ticks of this clock
+        :type clock: Clock, optional
+        :param server: bind to the address rather than connect to it,
+            defaults to False
+        :type server: bool, optional
+        :param backlog: number of packets buffered in queue mode, defaults to 64
+        :type backlog: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: unknown URL or mode
+        """
+        self.dtype: np.dtype = _record_dtype(dtype)
+        assert self.dtype.names is not None
+        super().__init__(nin=len(self.dtype.names), **blockargs)
+
+        _address(url)
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode!r}, must be latest or queue")
+        self.url = url
+        self.mode = mode
+        self.clock = clock
+        self.server = server
+        self.backlog = backlog
+
+        self.sent = 0
+        self.dropped = 0
+        self._tx: collections.deque[bytes] = collections.deque(maxlen=1)
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._endpoint: _Endpoint | None = None
+        self._thread: threading.Thread | None = None
+        self._tnext = -math.inf
+        self._hooked = False
+
+    @property
+    def address(self) -> Any:
+        """Address of the socket, with the port number if it was bound to 0"""
+        return None if self._endpoint is None else self._endpoint.address
+
+    def start(self, simstate: Any) -> None:
+        super().start(simstate)
+        self.close()
+        self.sent = 0
+        self.dropped = 0
+        self._tx = collections.deque(maxlen=self.backlog if self.mode == "queue" else 1)
+        self._endpoint = _Endpoint(self.url, self.server)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._send, name=f"SOCKETSINK({self.name})", daemon=True
+        )
+        self._thread.start()
+
+        if hasattr(simstate, "declare_end_hook"):
+            simstate.declare_end_hook(self.close)
+        # send from a sample hook, step() is only called when graphics are
+        # updated
+        self._hooked = hasattr(simstate, "declare_sample_hook")
+        if self._hooked:
+            simstate.declare_sample_hook(self.record)
+        self._tnext = -math.inf
+        if self.clock is not None:
+            t0 = getattr(simstate, "t", None) or 0.0
+            self._tick_k = math.ceil((t0 - self.clock.offset) / self.clock.T - 1e-9)
+            self._tnext = self.clock.time(self._tick_k)
+
+    def step(self, t: float, inputs: list[Any]) -> None:
+        if not self._hooked:
+            self.record(t, inputs)
+
+    def record(self, t: float, inputs: list[Any] | None = None) -> None:
+        """
+        Make a packet of the inputs
+
+        :param t: simulation time
+        :type t: float
+        :param inputs: input values, defaults to the current inputs of the
+            block
+        :type inputs: list, optional
+
+        Called by the simulator after every logged sample, a packet is only
+        made at a clock tick if the block has a clock.
+        """
+        if inputs is None:
+            inputs = self.inport_values
+        if self.clock is not None:
+            # send at clock ticks, which are ends of integration intervals
+            if t < self._tnext - 1e-9:
+                return
+            self._tick_k = math.floor((t - self.clock.offset) / self.clock.T + 1e-9) + 1
+            self._tnext = self.clock.time(self._tick_k)
+        packet = np.zeros((), dtype=self.dtype)
+        packet[()] = tuple(inputs)
+        if len(self._tx) == self._tx.maxlen:
+            self.dropped += 1
+        self._tx.append(packet.tobytes())
+        self._ready.set()
+
+    def _send(self) -> None:
+        # I/O thread, send packets until the block is closed and the queue
+        # is empty
+        endpoint = self._endpoint
+        assert endpoint is not None
+        while True:
+            if not self._tx:
+                if self._stop.is_set():
+                    return
+                self._ready.wait(POLL)
+                self._ready.clear()
+                continue
+            sock = endpoint.peer()
+            if sock is None:
+                if self._stop.is_set():
+                    return
+                continue
+            data = self._tx.popleft()
+            try:
+                if endpoint.stream:
+                    sock.sendall(data)
+                else:
+                    sock.sendto(data, endpoint.address)
+            except OSError:
+                self.dropped += 1
+                if self._stop.is_set():
+                    return
+                endpoint.drop()
+                continue
+            self.sent += 1
+
+    def close(self) -> None:
+        """
+        Send the waiting packets, if possible, and close the socket
+
+        Called when the run ends.
+        """
+        self._stop.set()
+        self._ready.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._endpoint is not None:
+            self._endpoint.close()
+
+    def done(self, **kwargs: Any) -> None:
+        self.close()
+
+
+# ------------------------------------------------------------------------ #
+#
+# The shared-memory blocks exchange one record per channel, see
+# bdsim.channel, without a thread.  The record is read or written directly
+# by the block, which takes microseconds.
+#
+# In lockstep the simulation and the peer take turns at each clock tick
+# after the start of the run.  At the end of the interval SHMSINK writes its
+# inputs, the peer reads them and writes its reply, and the tick event of
+# SHMSOURCE waits for the reply.  SHMSINK also waits until the peer has
+# acknowledged the previous record, so no record is overwritten unread.
+#
+# ------------------------------------------------------------------------ #
+
+
+def _channel_dtype(dtype: Any) -> np.dtype:
+    # record format of a channel, an array is wrapped like _record_dtype
+    dtype = np.dtype(dtype)
+    return dtype if dtype.subdtype is None else _record_dtype(dtype)
+
+
+def _first_tick(clock: Clock, t0: float) -> int:
+    # index of the first clock tick at or after t0
+    return math.ceil((t0 - clock.offset) / clock.T - 1e-9)
+
+
+class ShmSource(SourceBlock):
+    """
+    :blockname:`SHMSOURCE`
+
+    Receive signals through shared memory.
+
+    :inputs: 0
+    :outputs: N
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Output
+            - i
+            - int, float, ndarray
+            - field :math:`i` of the last record
+
+    Records of ``dtype`` are read from the shared-memory channel ``channel``,
+    a :class:`~bdsim.SharedChannel`, which is written by a process on the
+    same host.  The block has an output for each field of the record.
+
+    Without a ``clock`` the outputs are those of the latest record.  With a
+    ``clock`` the outputs change only at the clock ticks, and with
+    ``lockstep`` each tick after the start of the run waits up to
+    ``timeout`` seconds for the peer to write a new record.  The reply to the
+    inputs of a :class:`ShmSink` at one tick is output after that tick.
+    Before the first record the outputs are from ``initial``.
+
+    By default the block creates the channel, and removes it when the run
+    ends, otherwise it attaches to a channel created by the peer.
+
+    Example, a plant simulated by a peer process in lockstep::
+
+        dtype = [("y", "<f8", (2,))]
+        u = bd.SHMSINK("plant_u", clock=clock, lockstep=True)
+        y = bd.SHMSOURCE("plant_y", dtype=dtype, clock=clock, lockstep=True)
+
+    and the peer runs the loop shown for :class:`~bdsim.SharedChannel`.  The
+    count of records taken is the attribute ``received``.
+
+    .. note:: In lockstep the diagram must be evaluated at the clock ticks,
+        so that :class:`ShmSink` writes before the reply is awaited, which is
+        the case if it has continuous states or blocks sampled by the clock.
+
+    :seealso: :class:`ShmSink` :class:`SocketSource`
+    """
+
+    nin = 0
+    nout = -1
+
+    def __init__(
+        self,
+        channel: str,
+        dtype: Any = "<f8",
+        clock: Clock | None = None,
+        lockstep: bool = False,
+        create: bool = True,
+        timeout: float = 1.0,
+        initial: Any = None,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param channel: name of the shared-memory channel
+        :type channel: str
+        :param dtype: record format, defaults to a little-endian float
+        :type dtype: numpy dtype or str, optional
+        :param clock: update the outputs at the ticks of this clock
+        :type clock: Clock, optional
+        :param lockstep: wait for a new record at each clock tick, defaults
+            to False
+        :type lockstep: bool, optional
+        :param create: create the channel rather than attach to it, defaults
+            to True
+        :type create: bool, optional
+        :param timeout: longest wait for the peer, in seconds, defaults to 1
+        :type timeout: float, optional
+        :param initial: record before the first is received, defaults to zeros
+        :type initial: tuple or array_like, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: lockstep without a clock
+        """
+        self.dtype: np.dtype = _record_dtype(dtype)
+        assert self.dtype.names is not None
+        super().__init__(nout=len(self.dtype.names), **blockargs)
+
+        if lockstep and clock is None:
+            raise ValueError("lockstep needs a clock")
+        self.channel = channel
+        self.clock = clock
+        self.lockstep = lockstep
+        self.create = create
+        self.timeout = timeout
+
+        packet = np.zeros((), dtype=self.dtype)
+        if initial is not None:
+            if len(self.dtype.names) == 1:
+                initial = (initial,)
+            packet[()] = tuple(initial)
+        self.initial: np.ndarray = packet
+
+        self.received = 0
+        self._format = _channel_dtype(dtype)
+        self._packet = self.initial
+        self._channel: SharedChannel | None = None
+
+    def start(self, simstate: Any) -> None:
+        super().start(simstate)
+        self.close()
+        self.received = 0
+        self._packet = self.initial
+        self._channel = SharedChannel(
+            self.channel, self._format, create=self.create, timeout=self.timeout
+        )
+
+        if hasattr(simstate, "declare_end_hook"):
+            simstate.declare_end_hook(self.close)
+        if self.clock is not None and simstate is not None:
+            t0 = simstate.t or 0.0
+            self._tick_k = _first_tick(self.clock, t0)
+            if self.lockstep and self.clock.time(self._tick_k) <= t0 + 1e-9:
+                self._tick_k += 1
+            simstate.declare_event(self._tick, self.clock.time(self._tick_k))
+
+    def _take(self) -> None:
+        # update the packet that is output
+        channel = self._channel
+        assert channel is not None
+        if self.lockstep:
+            n, record = channel.wait_read(self.received, self.timeout)
+        else:
+            n, record = channel.read()
+            if n == 0:
+                return
+        self.received = n
+        self._packet = np.array(record, dtype=channel.dtype).view(self.dtype)
+
+    def _tick(self, t: float, simstate: Any) -> None:
+        self._take()
+        self._tick_k += 1
+        assert self.clock is not None
+        tnext = self.clock.time(self._tick_k)
+        if tnext <= simstate.tf:
+            simstate.declare_event(self._tick, tnext)
+
+    def output(self, t: float, inputs: list[Any], x: np.ndarray) -> list[Any]:
+        if self.clock is None:
+            self._take()
+        assert self.dtype.names is not None
+        out = []
+        for name in self.dtype.names:
+            value = self._packet[name]
+            out.append(value.item() if value.ndim == 0 else np.array(value))
+        return out
+
+    def close(self) -> None:
+        """
+        Detach from the channel, and remove it if the block created it
+
+        Called when the run ends.
+        """
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+
+    def done(self, **kwargs: Any) -> None:
+        self.close()
+
+
+# ------------------------------------------------------------------------ #
+
+
+class ShmSink(SinkBlock):
+    """
+    :blockname:`SHMSINK`
+
+    Send signals through shared memory.
+
+    :inputs: N
+    :outputs: 0
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Input
+            - i
+            - int, float, ndarray
+            - field :math:`i` of the record
+
+    The inputs are packed into one record of ``dtype``, an input for each
+    field, and written to the shared-memory channel ``channel``, a
+    :class:`~bdsim.SharedChannel`, which is read by a process on the same
+    host.  A record replaces the previous one.
+
+    Without a ``clock`` a record is written at every logged simulation
+    sample, otherwise at every clock tick.  With ``lockstep`` a record is written at
+    each tick after the start of the run, and the block first waits up to
+    ``timeout`` seconds for the peer to acknowledge the previous record, so
+    none is lost.
+
+    By default the block creates the channel, and removes it when the run
+    ends, otherwise it attaches to a channel created by the peer.  The count
+    of records written is the attribute ``sent``.
+
+    :seealso: :class:`ShmSource` :class:`SocketSink`
+    """
+
+    nin = -1
+    nout = 0
+
+    def __init__(
+        self,
+        channel: str,
+        dtype: Any = "<f8",
+        clock: Clock | None = None,
+        lockstep: bool = False,
+        create: bool = True,
+        timeout: float = 1.0,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param channel: name of the shared-memory channel
+        :type channel: str
+        :param dtype: record format, defaults to a little-endian float
+        :type dtype: numpy dtype or str, optional
+        :param clock: write at the ticks of this clock
+        :type clock: Clock, optional
+        :param lockstep: wait for the peer to acknowledge the previous record,
+            defaults to False
+        :type lockstep: bool, optional
+        :param create: create the channel rather than attach to it, defaults
+            to True
+        :type create: bool, optional
+        :param timeout: longest wait for the peer, in seconds, defaults to 1
+        :type timeout: float, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: lockstep without a clock
+        """
+        self.dtype: np.dtype = _record_dtype(dtype)
+        assert self.dtype.names is not None
+        super().__init__(nin=len(self.dtype.names), **blockargs)
+
+        if lockstep and clock is None:
+            raise ValueError("lockstep needs a clock")
+        self.channel = channel
+        self.clock = clock
+        self.lockstep = lockstep
+        self.create = create
+        self.timeout = timeout
+
+        self.sent = 0
+        self._format = _channel_dtype(dtype)
+        self._channel: SharedChannel | None = None
+        self._tnext = -math.inf
+        self._hooked = False
+
+    def start(self, simstate: Any) -> None:
+        super().start(simstate)
+        self.close()
+        self.sent = 0
+        self._channel = SharedChannel(
+            self.channel, self._format, create=self.create, timeout=self.timeout
+        )
+
+        if hasattr(simstate, "declare_end_hook"):
+            simstate.declare_end_hook(self.close)
+        # write from a sample hook, step() is only called when graphics are
+        # updated
+        self._hooked = hasattr(simstate, "declare_sample_hook")
+        if self._hooked:
+            simstate.declare_sample_hook(self.record)
+        self._tnext = -math.inf
+        if self.clock is not None:
+            t0 = getattr(simstate, "t", None) or 0.0
+            self._tick_k = _first_tick(self.clock, t0)
+            if self.lockstep and self.clock.time(self._tick_k) <= t0 + 1e-9:
+                self._tick_k += 1
+            self._tnext = self.clock.time(self._tick_k)
+
+    def step(self, t: float, inputs: list[Any]) -> None:
+        if not self._hooked:
+            self.record(t, inputs)
+
+    def record(self, t: float, inputs: list[Any] | None = None) -> None:
+        """
+        Write a record of the inputs
+
+        :param t: simulation time
+        :type t: float
+        :param inputs: input values, defaults to the current inputs of the
+            block
+        :type inputs: list, optional
+
+        Called by the simulator after every logged sample, a record is only
+        written at a clock tick if the block has a clock.
+        """
+        if inputs is None:
+            inputs = self.inport_values
+        if self.clock is not None:
+            # write at clock ticks, which are ends of integration intervals
+            if t < self._tnext - 1e-9:
+                return
+            self._tick_k = math.floor((t - self.clock.offset) / self.clock.T + 1e-9) + 1
+            self._tnext = self.clock.time(self._tick_k)
+        channel = self._channel
+        assert channel is not None
+        packet = np.zeros((), dtype=self.dtype)
+        packet[()] = tuple(inputs)
+        if self.lockstep:
+            channel.wait_acked(self.timeout)
+        self.sent = channel.write(packet.view(channel.dtype))
+
+    def close(self) -> None:
+        """
+        Detach from the channel, and remove it if the block created it
+
+        Called when the run ends.
+        """
+        if self._channel is not None:
+            self._channel.close()
+            self._channel = None
+
+    def done(self, **kwargs: Any) -> None:
+        self.close()
@@ -11,7 +11,10 @@ Sink blocks:
 from __future__ import annotations
 
 import numpy as np
-from typing import Any, Callable, TextIO
+import os
+import queue
+import threading
+from typing import Any, BinaryIO, Callable, TextIO
 
 from bdsim.components import SinkBlock
 
@@ -480,6 +483,247 @@ class Watch(SinkBlock):
         pass  # do nothing
 
 
+# ------------------------------------------------------------------------ #
+#
+# TOFILE writes a NumPy .npy file of a structured array, one record per
+# sample with the fields t and one per input.  The record dtype is the header,
+# it holds the names, shapes and dtypes of the signals and is taken from the
+# first sample.
+#
+# Samples are copied into a preallocated chunk of records.  A full chunk is
+# handed to a writer thread through a bounded queue, so the simulation only
+# waits if the disk falls more than ``backlog`` chunks behind.  After each chunk
+# the writer rewrites the record count in the header, which has a fixed
+# length, so the file is always a valid .npy file of the samples written.
+#
+# ------------------------------------------------------------------------ #
+
+
+class ToFile(SinkBlock):
+    """
+    :blockname:`TOFILE`
+
+    Log signals to a file.
+
+    :inputs: N
+    :outputs: 0
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Input
+            - i
+            - int, float, ndarray
+            - :math:`x_i`
+
+    Write the time and the value of every input at each simulation sample to a
+    NumPy ``.npy`` file, in binary, from a background thread.  Memory use is
+    bounded, at most a few chunks of samples are held.
+
+    The file holds a structured array with a field ``t`` and a field for
+    each input, named by ``names`` or by the signal source.  The dtype and
+    shape of each field are those of the first sample.  For example::
+
+        bd.TOFILE("log.npy", nin=2, names=["u", "y"])
+        ...
+        data = np.load("log.npy", mmap_mode="r")
+        plt.plot(data["t"], data["y"])
+
+    The file can be played back by :class:`~bdsim.blocks.sources.FromData`.
+
+    .. note:: The file is complete when the run ends, but is a valid ``.npy``
+        file of the chunks written so far at any time.
+
+    :seealso: :class:`Print` :class:`Watch`
+    """
+
+    nin = -1
+    nout = 0
+
+    def __init__(
+        self,
+        file: str | os.PathLike,
+        nin: int = 1,
+        names: list[str] | None = None,
+        chunk: int = 4096,
+        backlog: int = 8,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param file: name of the file to write
+        :type file: str or Path
+        :param nin: number of input ports, defaults to 1
+        :type nin: int, optional
+        :param names: names of the input signals, defaults to the source names
+        :type names: list of str, optional
+        :param chunk: number of samples written at once, defaults to 4096
+        :type chunk: int, optional
+        :param backlog: number of chunks that can wait to be written, defaults
+            to 8
+        :type backlog: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: wrong number of names
+        """
+        super().__init__(nin=nin, **blockargs)
+        if names is not None and len(names) != nin:
+            raise ValueError(f"expecting {nin} names")
+        self.filename = os.fspath(file)
+        self.names = names
+        self.chunk = chunk
+        self.backlog = backlog
+
+        self._file: BinaryIO | None = None
+        self._buffer: np.ndarray | None = None
+        self._n = 0
+        self._count = 0
+        self._queue: queue.Queue[np.ndarray | None] | None = None
+        self._writer: threading.Thread | None = None
+        self._error: BaseException | None = None
+        self._hooked = False
+
+    def start(self, simstate: Any) -> None:
+        self.close()
+        self._buffer = None
+        self._count = 0
+        self._error = None
+        if hasattr(simstate, "declare_end_hook"):
+            simstate.declare_end_hook(self.close)
+        # record every sample, step() is only called when graphics are updated
+        self._hooked = hasattr(simstate, "declare_sample_hook")
+        if self._hooked:
+            simstate.declare_sample_hook(self.record)
+
+    def _fields(self, inputs: list[Any]) -> list[tuple[Any, ...]]:
+        fields: list[tuple[Any, ...]] = [("t", np.float64)]
+        wires = getattr(self, "_input_wires", [])
+        for i, value in enumerate(inputs):
+            if self.names is not None:
+                name = self.names[i]
+            elif i < len(wires) and wires[i] is not None:
+                name = f"{wires[i].start.block.name}[{wires[i].start.port}]"
+            else:
+                name = f"u{i}"
+            if name in [f[0] for f in fields]:
+                name = f"{name}_{i}"
+            value = np.asarray(value)
+            if value.dtype.hasobject:
+                raise ValueError(f"cannot log input {i} of type {type(value)}")
+            fields.append((name, value.dtype, value.shape))
+        return fields
+
+    def _header(self, count: int) -> bytes:
+        # .npy header with a fixed width record count
+        assert self._buffer is not None
+        descr = np.lib.format.dtype_to_descr(self._buffer.dtype)
+        header = (
+            f"{{'descr': {descr!r}, 'fortran_order': False, "
+            f"'shape': ({count:20d},), }}"
+        ).encode("latin1")
+        if len(header) + 11 < 65536:
+            prefix, size = np.lib.format.magic(1, 0), np.array(0, "<u2")
+        else:
+            prefix, size = np.lib.format.magic(2, 0), np.array(0, "<u4")
+        start = len(prefix) + size.itemsize
+        pad = -(start + len(header) + 1) % 64
+        header += b" " * pad + b"\n"
+        size[...] = len(header)
+        return prefix + size.tobytes() + header
+
+    def _open(self, inputs: list[Any]) -> None:
+        self._buffer = np.empty(self.chunk, dtype=self._fields(inputs))
+        self._n = 0
+        self._file = open(self.filename, "wb")
+        self._file.write(self._header(0))
+        self._queue = queue.Queue(maxsize=self.backlog)
+        self._writer = threading.Thread(
+            target=self._write, name=f"TOFILE({self.name})", daemon=True
+        )
+        self._writer.start()
+
+    def _write(self) -> None:
+        # writer thread, write chunks until the end of data marker
+        assert self._queue is not None and self._file is not None
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is not None:
+                continue
+            try:
+                self._file.write(chunk.data)
+                self._count += len(chunk)
+                self._file.seek(0)
+                self._file.write(self._header(self._count))
+                self._file.seek(0, os.SEEK_END)
+            except BaseException as err:
+                self._error = err
+
+    def _flush(self) -> None:
+        assert self._queue is not None and self._buffer is not None
+        if self._error is not None:
+            raise self._error
+        self._queue.put(self._buffer[: self._n])
+        self._buffer = np.empty(self.chunk, dtype=self._buffer.dtype)
+        self._n = 0
+
+    def step(self, t: float, inputs: list[Any]) -> None:
+        if not self._hooked:
+            self.record(t, inputs)
+
+    def record(self, t: float, inputs: list[Any] | None = None) -> None:
+        """
+        Record the inputs
+
+        :param t: simulation time
+        :type t: float
+        :param inputs: input values, defaults to the current inputs of the
+            block
+        :type inputs: list, optional
+
+        Called by the simulator after every logged sample.
+        """
+        if inputs is None:
+            inputs = self.inport_values
+        if self._file is None:
+            self._open(inputs)
+        assert self._buffer is not None
+        self._buffer[self._n] = (t, *inputs)
+        self._n += 1
+        if self._n == self.chunk:
+            self._flush()
+
+    def close(self) -> None:
+        """
+        Write the buffered samples and close the file
+
+        :raises OSError: the file could not be written
+
+        Called when the run ends.
+        """
+        if self._file is None:
+            return
+        assert self._queue is not None and self._writer is not None
+        try:
+            if self._n > 0 and self._error is None:
+                self._flush()
+        finally:
+            self._queue.put(None)
+            self._writer.join()
+            self._file.close()
+            self._file = None
+        if self._error is not None:
+            raise self._error
+
+    def done(self, **kwargs: Any) -> None:
+        self.close()
+
+
 if __name__ == "__main__":  # pragma: no cover
     from pathlib import Path
     import subprocess
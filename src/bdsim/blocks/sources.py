@@ -11,9 +11,13 @@ from __future__ import annotations
 
 import numpy as np
 import math
+import os
+import struct
+import zipfile
+import zlib
 from typing import Any
 
-from bdsim.components import EventSource, SourceBlock
+from bdsim.components import BDStruct, Clock, EventSource, SourceBlock
 
 
 # ------------------------------------------------------------------------ #
@@ -45,6 +49,8 @@ class Constant(SourceBlock):
 
     nin = 0
     nout = 1
+    _linear = True
+    _timefunction = True
 
     def __init__(self, value: Any = 0, **blockargs: Any) -> None:
         """
@@ -99,6 +105,7 @@ class Time(SourceBlock):
 
     nin = 0
     nout = 1
+    _timefunction = True
 
     def __init__(self, value: Any | None = None, **blockargs: Any) -> None:
         """
@@ -167,6 +174,7 @@ class WaveForm(SourceBlock, EventSource):
 
     nin = 0
     nout = 1
+    _timefunction = True
 
     def __init__(
         self,
@@ -347,6 +355,7 @@ class Piecewise(SourceBlock, EventSource):
 
     nin = 0
     nout = 1
+    _timefunction = True
 
     def __init__(
         self,
@@ -433,6 +442,7 @@ class Step(SourceBlock, EventSource):
 
     nin = 0
     nout = 1
+    _timefunction = True
 
     def __init__(
         self, T: float = 1, off: float = 0, on: float = 1, **blockargs: Any
@@ -512,6 +522,7 @@ class Ramp(SourceBlock, EventSource):
 
     nin = 0
     nout = 1
+    _timefunction = True
 
     def __init__(
         self, T: float = 1, off: float = 0, slope: float = 1, **blockargs: Any
@@ -546,6 +557,603 @@ class Ramp(SourceBlock, EventSource):
         return [out]
 
 
+# ------------------------------------------------------------------------ #
+#
+# Recorded data can be far larger than memory.  Large .npy files, and the
+# uncompressed members of .npz files written by numpy.savez, are memory
+# mapped so only the pages that are read are loaded.  The block keeps a
+# cursor, the index of the last sample at or before the previous evaluation
+# time.  Simulation time mostly advances by a small amount, so the cursor is
+# moved by hunting, a search that doubles its step away from the cursor until
+# it brackets the time followed by a bisection, which is O(1) for a small
+# step and O(log d) for a jump of d samples in either direction.
+#
+# The sample times are breakpoints of the signal.  They are declared to the
+# event queue one at a time, each breakpoint declaring the next, so the queue
+# does not hold an event for every sample of a long recording.
+#
+# ------------------------------------------------------------------------ #
+
+# files at least this large are memory mapped
+MMAP_SIZE = 1 << 24
+
+
+def _load_npz(path: str, key: str, mmap: bool) -> np.ndarray:
+    # load a member of a .npz file, memory mapped if it is uncompressed
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(key + ".npy")
+        if not mmap or info.compress_type != zipfile.ZIP_STORED:
+            with zf.open(info) as f:
+                return np.lib.format.read_array(f)
+    with open(path, "rb") as f:
+        # skip the zip local file header, its length is not in the directory
+        f.seek(info.header_offset + 26)
+        nname, nextra = struct.unpack("<HH", f.read(4))
+        f.seek(info.header_offset + 30 + nname + nextra)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=offset,
+        shape=shape,
+        order="F" if fortran else "C",
+    )
+
+
+def _load_recording(
+    data: Any, t: Any, signal: str | None, mmap: bool | None
+) -> tuple[np.ndarray, np.ndarray]:
+    # time vector and samples, one row per time, from any supported source
+    if isinstance(data, (str, os.PathLike)):
+        path = os.fspath(data)
+        if mmap is None:
+            mmap = os.path.getsize(path) >= MMAP_SIZE
+        if path.endswith(".npz"):
+            t = _load_npz(path, "t", mmap)
+            y = _load_npz(path, signal or "y", mmap)
+        else:
+            y = np.load(path, mmap_mode="r" if mmap else None)
+    elif isinstance(data, BDStruct):
+        if signal is None:
+            signal = "y" if "y" in data else "x"
+        t = data["t"]
+        y = data[signal]
+    else:
+        y = np.asarray(data)
+
+    if y.dtype.names is not None:
+        # records, as written by TOFILE
+        if t is None:
+            t = y["t"]
+        if signal is None:
+            signal = [name for name in y.dtype.names if name != "t"][0]
+        y = y[signal]
+    if t is None:
+        # time is the first column
+        if y.ndim != 2 or y.shape[1] < 2:
+            raise ValueError("data must have a time column and a value column")
+        t = y[:, 0]
+        y = y[:, 1] if y.shape[1] == 2 else y[:, 1:]
+    t = np.asarray(t)
+    if t.ndim != 1 or len(t) != len(y):
+        raise ValueError("time and data must be of the same length")
+    if len(t) == 0:
+        raise ValueError("no data")
+    return t, y
+
+
+class FromData(SourceBlock, EventSource):
+    """
+    :blockname:`FROMDATA`
+
+    Recorded data.
+
+    :inputs: 0
+    :outputs: 1
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Output
+            - 0
+            - float, ndarray
+            - :math:`y(t)`
+
+    Play back a recorded signal as a function of time.  The recording can be
+
+    - a ``.npy`` file holding an array whose first column is time and whose
+      other columns are the signal
+    - a ``.npz`` file with arrays ``t`` and ``y``, or the key given by
+      ``signal``, as written by ``numpy.savez(file, t=t, y=y)``
+    - the results of an earlier run, a :class:`BDStruct`, by default the
+      watched signals ``y`` or otherwise the state ``x``
+    - a ``.npy`` file of records with a field ``t`` and a field given by
+      ``signal``, by default the first other field, as written by
+      :class:`~bdsim.blocks.sinks.ToFile`
+    - an array whose first column is time, or an array of samples and the
+      times ``t``
+
+    For example::
+
+        wind = bd.FROMDATA("wind.npz")
+        replay = bd.FROMDATA(out, signal="x")
+
+    Times must be non-decreasing.  Between samples the output is linearly
+    interpolated, or held if ``kind="hold"``, and beyond the ends of the
+    recording it is the first or last sample.
+
+    Files of 16MB or more are memory mapped, so recordings can be larger than
+    memory, except for compressed ``.npz`` files which are loaded.  Each
+    evaluation is a short search from the previous one.
+
+    .. note:: If ``events`` is True the block declares an event for every
+        sample time, so that integration is not carried across a corner of
+        the signal.  For long recordings of a slowly varying signal set it
+        False and limit the step size instead.
+
+    :seealso: :class:`Piecewise` :class:`~bdsim.blocks.functions.Interpolate`
+    """
+
+    nin = 0
+    nout = 1
+    _timefunction = True
+
+    def __init__(
+        self,
+        data: Any,
+        t: Any = None,
+        signal: str | None = None,
+        kind: str = "linear",
+        events: bool = True,
+        mmap: bool | None = None,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param data: recording, a filename, results or an array
+        :type data: str, BDStruct or array_like
+        :param t: sample times if not part of ``data``, defaults to None
+        :type t: array_like(N), optional
+        :param signal: name of the signal in a ``.npz`` file, records or
+            results, defaults to None
+        :type signal: str, optional
+        :param kind: interpolation between samples, "linear" [default] or
+            "hold"
+        :type kind: str, optional
+        :param events: declare an event at every sample time, defaults to True
+        :type events: bool, optional
+        :param mmap: memory map the file, defaults to None, mapped if large
+        :type mmap: bool, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: unknown ``kind`` or badly shaped data
+        """
+        super().__init__(**blockargs)
+
+        if kind not in ("linear", "hold"):
+            raise ValueError(f"unknown interpolation {kind!r}, must be linear or hold")
+        self.kind: str = kind
+        self.events: bool = events
+        self.time, self.data = _load_recording(data, t, signal, mmap)
+        self._i: int = 0
+
+    def start(self, simstate: Any) -> None:
+        super().start(simstate)
+        self._i = 0
+        if simstate is not None and self.events:
+            self._break(simstate.t or 0.0, simstate)
+
+    def _break(self, t: float, simstate: Any) -> None:
+        # declare the next sample time as an event
+        i = self._locate(t) + 1
+        if i < len(self.time):
+            simstate.declare_event(self._break, float(self.time[i]))
+
+    def _locate(self, t: float) -> int:
+        # index of the last sample at or before t, -1 if none, found by
+        # hunting from the cursor
+        time = self.time
+        n = len(time)
+        i = self._i
+        if time[i] <= t:
+            lo, step = i, 1
+            hi = lo + step
+            while hi < n and time[hi] <= t:
+                lo, step = hi, step * 2
+                hi = lo + step
+            hi = min(hi, n)
+        else:
+            hi, step = i, 1
+            lo = hi - step
+            while lo > 0 and time[lo] > t:
+                hi, step = lo, step * 2
+                lo = hi - step
+            lo = max(lo, 0)
+        i = lo + int(np.searchsorted(time[lo:hi], t, side="right")) - 1
+        self._i = max(i, 0)
+        return i
+
+    def output(self, t: float, inputs: list[Any], x: np.ndarray) -> list[Any]:
+        i = self._locate(t)
+        if i < 0:
+            y = self.data[0]
+        elif self.kind == "hold" or i == len(self.time) - 1:
+            y = self.data[i]
+        else:
+            t0, t1 = self.time[i], self.time[i + 1]
+            y0 = self.data[i]
+            y = y0 + (self.data[i + 1] - y0) * ((t - t0) / (t1 - t0))
+        if np.ndim(y) == 0:
+            return [float(y)]
+        return [np.array(y, dtype=float)]
+
+
+# ------------------------------------------------------------------------ #
+#
+# The noise blocks are a deterministic function of time.  Samples lie on a
+# grid t_k = offset + k dt and sample k is found in O(1) as element k % chunk
+# of chunk k // chunk.  Each chunk is drawn in one vectorized call from its
+# own generator, seeded by the block's SeedSequence spawned with the chunk
+# number, so any chunk can be generated in any order and the signal does not
+# depend on the solver steps, on evaluation order or on a resumed run.
+#
+# The block's SeedSequence is its ``seed`` or, failing that, the ``seed`` of
+# BDSim.run() spawned with a hash of the block name, or fresh entropy.
+#
+# ------------------------------------------------------------------------ #
+
+
+class WhiteNoise(SourceBlock):
+    """
+    :blockname:`WHITENOISE`
+
+    Gaussian white noise.
+
+    :inputs: 0
+    :outputs: 1
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Output
+            - 0
+            - float, ndarray
+            - :math:`y(t)`
+
+    Independent normally distributed samples, with mean ``mean`` and standard
+    deviation ``std``, every ``dt`` seconds.  If ``std`` or ``mean`` is an
+    array the output is an array of independent noise signals of that shape.
+
+    If a ``clock`` is given the samples are taken at its ticks and held
+    between them.  Otherwise the signal is continuous, linearly interpolated
+    between samples, which suits variable-step integration.  For example::
+
+        noise = bd.WHITENOISE(std=0.1, dt=0.01, seed=42)
+        noise = bd.WHITENOISE(std=[0.1, 0.2], clock=bd.clock(0.1))
+
+    The signal is a function of time, determined by the seed.  Without a
+    ``seed`` the block uses the ``seed`` of :meth:`BDSim.run` and its name, so
+    that every block has an independent stream, and otherwise each run is
+    different.  Samples are generated ``chunk`` at a time.
+
+    :seealso: :class:`BandLimitedNoise` :class:`RandomWalk`
+    """
+
+    nin = 0
+    nout = 1
+    _timefunction = True
+
+    def __init__(
+        self,
+        std: Any = 1,
+        mean: Any = 0,
+        dt: float = 0.01,
+        clock: Clock | None = None,
+        hold: bool | None = None,
+        seed: Any = None,
+        chunk: int = 4096,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param std: standard deviation, defaults to 1
+        :type std: float or array_like, optional
+        :param mean: mean, defaults to 0
+        :type mean: float or array_like, optional
+        :param dt: sample interval, defaults to 0.01
+        :type dt: float, optional
+        :param clock: take samples at the ticks of this clock, overrides ``dt``
+        :type clock: Clock, optional
+        :param hold: hold the output between samples rather than interpolate,
+            defaults to True if ``clock`` is given
+        :type hold: bool, optional
+        :param seed: seed of the block's random stream, an int, sequence of
+            ints or ``numpy.random.SeedSequence``, defaults to None
+        :type seed: int or SeedSequence, optional
+        :param chunk: number of samples generated at once, defaults to 4096
+        :type chunk: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        :raises ValueError: non-positive sample interval or chunk size
+        """
+        super().__init__(**blockargs)
+
+        if clock is not None:
+            dt = clock.T
+            self.offset: float = clock.offset
+        else:
+            self.offset = 0.0
+        if dt <= 0:
+            raise ValueError("dt must be > 0")
+        if chunk < 1:
+            raise ValueError("chunk must be >= 1")
+        self.dt: float = dt
+        self.hold: bool = clock is not None if hold is None else hold
+        self.seed: Any = seed
+        self.chunk: int = int(chunk)
+
+        std = np.asarray(std, dtype=float)
+        mean = np.asarray(mean, dtype=float)
+        self._shape: tuple[int, ...] = np.broadcast_shapes(std.shape, mean.shape)
+        self._std: np.ndarray = np.broadcast_to(std, self._shape).ravel()
+        self._mean: np.ndarray = np.broadcast_to(mean, self._shape).ravel()
+
+        self.seedsequence: np.random.SeedSequence | None = None
+        self._cache: dict[int, np.ndarray] = {}
+
+    def start(self, simstate: Any) -> None:
+        self._reset(self._seed_sequence(getattr(simstate, "seed", None)))
+
+    def _seed_sequence(
+        self, runseed: np.random.SeedSequence | None
+    ) -> np.random.SeedSequence:
+        if self.seed is not None:
+            if isinstance(self.seed, np.random.SeedSequence):
+                return self.seed
+            return np.random.SeedSequence(self.seed)
+        if runseed is not None:
+            # the run's stream for this block, independent of other blocks
+            key = zlib.crc32(str(self.name).encode())
+            return np.random.SeedSequence(
+                runseed.entropy, spawn_key=(*runseed.spawn_key, key)
+            )
+        return np.random.SeedSequence()
+
+    def _reset(self, seed: np.random.SeedSequence | None) -> None:
+        self.seedsequence = seed
+        self._cache.clear()
+
+    def _generator(self, c: int) -> np.random.Generator:
+        # generator of chunk c, the c'th child of the block's SeedSequence
+        if self.seedsequence is None:
+            # output before the run started
+            self._reset(self._seed_sequence(None))
+        ss = self.seedsequence
+        return np.random.Generator(
+            np.random.PCG64(
+                np.random.SeedSequence(ss.entropy, spawn_key=(*ss.spawn_key, c))
+            )
+        )
+
+    def _generate(self, c: int) -> np.ndarray:
+        z = self._generator(c).standard_normal((self.chunk, len(self._std)))
+        return self._mean + self._std * z
+
+    def _sample(self, k: int) -> np.ndarray:
+        c, i = divmod(k, self.chunk)
+        samples = self._cache.get(c)
+        if samples is None:
+            if len(self._cache) >= 4:
+                del self._cache[next(iter(self._cache))]
+            samples = self._cache[c] = self._generate(c)
+        return samples[i]
+
+    def output(self, t: float, inputs: list[Any], x: np.ndarray) -> list[Any]:
+        s = (t - self.offset) / self.dt
+        k = max(math.floor(s + 1e-9), 0)
+        y = self._sample(k)
+        if not self.hold and s > k:
+            y = y + (self._sample(k + 1) - y) * (s - k)
+        if self._shape == ():
+            return [float(y[0])]
+        return [y.reshape(self._shape)]
+
+    def checkpoint(self) -> Any:
+        return self.seedsequence
+
+    def restore(self, state: Any) -> None:
+        self._reset(state)
+
+
+# ------------------------------------------------------------------------ #
+
+
+class BandLimitedNoise(WhiteNoise):
+    r"""
+    :blockname:`BANDLIMITEDNOISE`
+
+    Band-limited white noise.
+
+    :inputs: 0
+    :outputs: 1
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Output
+            - 0
+            - float, ndarray
+            - :math:`y(t)`
+
+    Approximates continuous white noise of power spectral density ``power``
+    by normally distributed samples of variance :math:`\mathtt{power}/dt`,
+    held for ``dt`` seconds.  The sample interval should be short compared
+    to the time constants of the system it drives.  For example::
+
+        noise = bd.BANDLIMITEDNOISE(power=0.1, dt=0.01)
+
+    Seeding is as for :class:`WhiteNoise`.
+
+    :seealso: :class:`WhiteNoise`
+    """
+
+    def __init__(
+        self,
+        power: Any = 0.1,
+        dt: float = 0.01,
+        clock: Clock | None = None,
+        seed: Any = None,
+        chunk: int = 4096,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param power: noise power spectral density, defaults to 0.1
+        :type power: float or array_like, optional
+        :param dt: sample interval, defaults to 0.01
+        :type dt: float, optional
+        :param clock: take samples at the ticks of this clock, overrides ``dt``
+        :type clock: Clock, optional
+        :param seed: seed of the block's random stream, defaults to None
+        :type seed: int or SeedSequence, optional
+        :param chunk: number of samples generated at once, defaults to 4096
+        :type chunk: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        """
+        super().__init__(
+            std=power,
+            dt=dt,
+            clock=clock,
+            hold=True,
+            seed=seed,
+            chunk=chunk,
+            **blockargs,
+        )
+        self.power = power
+        self._std = np.sqrt(self._std / self.dt)
+
+
+# ------------------------------------------------------------------------ #
+
+
+class RandomWalk(WhiteNoise):
+    r"""
+    :blockname:`RANDOMWALK`
+
+    Gaussian random walk.
+
+    :inputs: 0
+    :outputs: 1
+    :states: 0
+
+    .. list-table::
+        :header-rows: 1
+
+        *   - Port type
+            - Port number
+            - Types
+            - Description
+        *   - Output
+            - 0
+            - float, ndarray
+            - :math:`y(t)`
+
+    Integrated white noise, a sampled Wiener process that starts at ``x0`` and
+    whose increment over each ``dt`` is normally distributed with standard
+    deviation :math:`\mathtt{std} \sqrt{dt}`, so that the variance grows as
+    :math:`\mathtt{std}^2 t`.  For example::
+
+        drift = bd.RANDOMWALK(std=0.01, x0=[0, 0], seed=1)
+
+    Holding, interpolation and seeding are as for :class:`WhiteNoise`.  The
+    value of a sample depends on all the earlier chunks, a chunk is generated
+    once to find where the next starts.
+
+    :seealso: :class:`WhiteNoise`
+    """
+
+    def __init__(
+        self,
+        std: Any = 1,
+        x0: Any = 0,
+        dt: float = 0.01,
+        clock: Clock | None = None,
+        hold: bool | None = None,
+        seed: Any = None,
+        chunk: int = 4096,
+        **blockargs: Any,
+    ) -> None:
+        """
+        :param std: standard deviation of the increments over one second,
+            defaults to 1
+        :type std: float or array_like, optional
+        :param x0: initial value, defaults to 0
+        :type x0: float or array_like, optional
+        :param dt: sample interval, defaults to 0.01
+        :type dt: float, optional
+        :param clock: take samples at the ticks of this clock, overrides ``dt``
+        :type clock: Clock, optional
+        :param hold: hold the output between samples rather than interpolate,
+            defaults to True if ``clock`` is given
+        :type hold: bool, optional
+        :param seed: seed of the block's random stream, defaults to None
+        :type seed: int or SeedSequence, optional
+        :param chunk: number of samples generated at once, defaults to 4096
+        :type chunk: int, optional
+        :param blockargs: :meth:`common block options <bdsim.Block.__init__>`
+        :type blockargs: dict
+        """
+        super().__init__(
+            std=std,
+            mean=x0,
+            dt=dt,
+            clock=clock,
+            hold=hold,
+            seed=seed,
+            chunk=chunk,
+            **blockargs,
+        )
+        self._std = self._std * math.sqrt(self.dt)
+        self._starts: list[np.ndarray] = [self._mean]
+
+    def _reset(self, seed: np.random.SeedSequence | None) -> None:
+        super()._reset(seed)
+        # value of the first sample of each chunk generated so far
+        self._starts = [self._mean]
+
+    def _increments(self, c: int) -> np.ndarray:
+        z = self._generator(c).standard_normal((self.chunk, len(self._std)))
+        return self._std * z
+
+    def _generate(self, c: int) -> np.ndarray:
+        if self.seedsequence is None:
+            self._reset(self._seed_sequence(None))
+        while len(self._starts) <= c:
+            n = len(self._starts) - 1
+            self._starts.append(self._starts[n] + self._increments(n).sum(axis=0))
+        dx = self._increments(c)
+        return self._starts[c] + np.cumsum(dx, axis=0) - dx
+
+
 if __name__ == "__main__":  # pragma: no cover
     from pathlib import Path
     import subprocess
@@ -0,0 +1,297 @@
+"""Shared-memory channels for exchanging records with a process on the same host."""
+
+from __future__ import annotations
+
+import ast
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any
+
+import numpy as np
+
+__all__ = ["SharedChannel"]
+
+# ------------------------------------------------------------------------- #
+#
+# A channel carries one fixed-layout record, a NumPy dtype, from one writer to
+# one reader.  The shared memory block holds
+#
+#    0  magic          8 bytes "BDSIMCH1"
+#    8  seq            uint64, incremented before and after each write
+#   16  ack            uint64, records acknowledged by the reader
+#   24  descr length   uint32
+#   28  descr          the dtype as text, see numpy.lib.format.dtype_to_descr
+#    .  record         at the next multiple of 64 bytes
+#
+# seq is a sequence lock.  It is odd while the record is being written, and
+# a reader that sees the same even value before and after copying the record
+# has a consistent copy, otherwise it copies again.  Neither side takes a lock
+# so a reader never blocks the writer.  seq // 2 is the number of records
+# written.  A writer that dies mid-write leaves seq odd, so a read gives up
+# after a timeout.
+#
+# There are no memory fences, the lock relies on the stores to seq and the
+# record becoming visible to the other process in program order.  x86-64
+# guarantees this, and CPython doesn't reorder the stores, but weakly ordered
+# processors such as aarch64 do not.
+#
+# For lockstep operation the writer waits until the reader has acknowledged
+# the previous record before writing the next, and the reader waits for a new
+# record.  Waits spin on the counters, yielding the GIL, so that a record is
+# passed in microseconds.
+#
+# ------------------------------------------------------------------------- #
+
+MAGIC = b"BDSIMCH1"
+
+# names of the channels created by this process
+_created: set[str] = set()
+
+
+class SharedChannel:
+    """
+    One-way channel of records in shared memory
+
+    :param name: name of the shared memory block
+    :type name: str
+    :param dtype: record format, required to create the channel
+    :type dtype: numpy dtype or str, optional
+    :param create: create the channel, otherwise attach to it, defaults to
+        False
+    :type create: bool, optional
+    :param timeout: time to wait for the channel to be created, in seconds,
+        defaults to 0
+    :type timeout: float, optional
+    :raises FileExistsError: a channel of this name exists and ``create`` is True
+    :raises FileNotFoundError: the channel was not created within ``timeout``
+    :raises ValueError: the channel's record format is not ``dtype``, or
+        ``dtype`` is an array such as ``("<f8", (3,))``
+
+    One side creates the channel and the other attaches to it by name, the
+    record format is stored in the channel.  A record is a scalar or a
+    structured dtype, for example ``[("t", "<f8"), ("x", "<f8", (3,))]``.
+    The writer calls :meth:`write` and the reader :meth:`read`, or for
+    lockstep operation the writer calls :meth:`wait_acked` before each write
+    and the reader :meth:`wait_read`.
+
+    Example, in the peer process::
+
+        with SharedChannel("plant_u", timeout=10) as u, \\
+                SharedChannel("plant_y", timeout=10) as y:
+            n = 0
+            while True:
+                n, record = u.wait_read(n)
+                y.wait_acked()
+                y.write(model(record))
+
+    The creator unlinks the shared memory when it closes the channel.
+
+    .. warning:: The record is protected by a sequence lock without memory
+        fences.  This is only sound on x86-64 with CPython.  On weakly
+        ordered processors such as aarch64, for example Apple Silicon, the
+        reader may see a torn record.
+
+    :seealso: :class:`~bdsim.blocks.network.ShmSource`
+        :class:`~bdsim.blocks.network.ShmSink`
+    """
+
+    def __init__(
+        self,
+        name: str,
+        dtype: Any = None,
+        create: bool = False,
+        timeout: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.created = create
+        if create:
+            if dtype is None:
+                raise ValueError("dtype is required to create a channel")
+            self.dtype = np.dtype(dtype)
+            if self.dtype.subdtype is not None:
+                raise ValueError("a record with a shape must be a structured dtype")
+            descr = repr(np.lib.format.dtype_to_descr(self.dtype)).encode()
+            offset = -(-(28 + len(descr)) // 64) * 64
+            self.shm = shared_memory.SharedMemory(
+                name, create=True, size=offset + self.dtype.itemsize
+            )
+            _created.add(name)
+            buf = self.shm.buf
+            buf[8:24] = bytes(16)
+            buf[24:28] = np.uint32(len(descr)).tobytes()
+            buf[28 : 28 + len(descr)] = descr
+            # the magic is written last, the channel is then ready to attach
+            buf[0:8] = MAGIC
+        else:
+            self.shm = _attach(name, timeout)
+            buf = self.shm.buf
+            n = int(np.frombuffer(buf, np.uint32, 1, 24)[0])
+            text = bytes(buf[28 : 28 + n]).decode()
+            offset = -(-(28 + n) // 64) * 64
+            self.dtype = np.lib.format.descr_to_dtype(ast.literal_eval(text))
+            if dtype is not None and np.dtype(dtype) != self.dtype:
+                self.shm.close()
+                raise ValueError(
+                    f"channel {name!r} carries {self.dtype}, not {np.dtype(dtype)}"
+                )
+        self._counters = np.ndarray((2,), np.uint64, buffer=self.shm.buf, offset=8)
+        self._record = np.ndarray((), self.dtype, buffer=self.shm.buf, offset=offset)
+
+    def __repr__(self) -> str:
+        return (
+            f"SharedChannel({self.name!r}, dtype={self.dtype}, "
+            f"written={self.written}, acked={self.acked})"
+        )
+
+    def __enter__(self) -> SharedChannel:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    @property
+    def written(self) -> int:
+        """Number of records written"""
+        return int(self._counters[0]) // 2
+
+    @property
+    def acked(self) -> int:
+        """Number of records acknowledged by the reader"""
+        return int(self._counters[1])
+
+    def write(self, record: Any) -> int:
+        """
+        Write a record
+
+        :param record: the record, or a tuple of its fields
+        :type record: numpy record or tuple
+        :return: number of records written
+        :rtype: int
+        """
+        counters = self._counters
+        counters[0] += 1
+        self._record[()] = record
+        counters[0] += 1
+        return int(counters[0]) // 2
+
+    def read(self, timeout: float = 1.0) -> tuple[int, np.void]:
+        """
+        Read the latest record
+
+        :param timeout: longest wait for a write to complete in seconds,
+            defaults to 1
+        :type timeout: float, optional
+        :raises TimeoutError: a write did not complete within ``timeout``, for
+            example the writer died part-way through
+        :return: number of records written and a copy of the last one
+        :rtype: int, numpy record
+
+        If no record has been written the record is zero.
+        """
+        counters = self._counters
+        writing, deadline = None, 0.0
+        while True:
+            seq = int(counters[0])
+            if seq % 2 == 0:
+                record = self._record.copy()
+                if int(counters[0]) == seq:
+                    return seq // 2, record[()]
+            elif seq != writing:
+                # time each write from when it is first seen
+                writing, deadline = seq, time.perf_counter() + timeout
+            elif time.perf_counter() > deadline:
+                raise TimeoutError(
+                    f"write on channel {self.name!r} not completed within {timeout}s"
+                )
+            time.sleep(0)
+
+    def ack(self, n: int) -> None:
+        """
+        Acknowledge records
+
+        :param n: number of records read
+        :type n: int
+        """
+        self._counters[1] = n
+
+    def wait_read(self, n: int, timeout: float = 1.0) -> tuple[int, np.void]:
+        """
+        Wait for a new record, read and acknowledge it
+
+        :param n: number of records already read
+        :type n: int
+        :param timeout: longest wait in seconds, defaults to 1
+        :type timeout: float, optional
+        :raises TimeoutError: no record was written within ``timeout``
+        :return: number of records written and a copy of the last one
+        :rtype: int, numpy record
+        """
+        self._wait(lambda: self.written > n, timeout, "written")
+        n, record = self.read(timeout)
+        self.ack(n)
+        return n, record
+
+    def wait_acked(self, timeout: float = 1.0) -> None:
+        """
+        Wait until the reader has acknowledged every record
+
+        :param timeout: longest wait in seconds, defaults to 1
+        :type timeout: float, optional
+        :raises TimeoutError: the reader did not acknowledge within ``timeout``
+        """
+        self._wait(lambda: self.acked >= self.written, timeout, "acknowledged")
+
+    def _wait(self, ready: Any, timeout: float, what: str) -> None:
+        deadline = time.perf_counter() + timeout
+        while not ready():
+            if time.perf_counter() > deadline:
+                raise TimeoutError(
+                    f"no record {what} on channel {self.name!r} within {timeout}s"
+                )
+            time.sleep(0)
+
+    def close(self) -> None:
+        """
+        Detach from the channel, and remove it if this side created it
+        """
+        if self.shm is None:
+            return
+        # release the views of the buffer before it is closed
+        del self._counters, self._record
+        self.shm.close()
+        if self.created:
+            self.shm.unlink()
+            _created.discard(self.name)
+        self.shm = None  # type: ignore[assignment]
+
+
+def _attach(name: str, timeout: float) -> shared_memory.SharedMemory:
+    # attach to a channel created by the other side, which owns it, waiting
+    # for it to be created and initialized
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            shm = _open(name)
+        except (FileNotFoundError, ValueError):
+            # ValueError if it is created but still empty
+            if time.perf_counter() > deadline:
+                raise
+        else:
+            magic = bytes(shm.buf[0:8])
+            if magic == MAGIC:
+                return shm
+            shm.close()
+            if magic.strip(b"\0") or time.perf_counter() > deadline:
+                raise ValueError(f"shared memory {name!r} is not a bdsim channel")
+        time.sleep(0.01)
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    shm = shared_memory.SharedMemory(name)
+    if name not in _created:
+        # otherwise the resource tracker would remove it at exit
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+    return shm
@@ -0,0 +1,132 @@
+"""Simulation checkpoints, capture the state of a simulation and resume it."""
+
+from __future__ import annotations
+
+from copy import deepcopy
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from bdsim.block import Block
+from bdsim.components import ClockState
+
+if TYPE_CHECKING:
+    from bdsim.blockdiagram import BlockDiagram
+    from bdsim.components import Clock, SimulationState
+
+# ------------------------------------------------------------------------- #
+#
+# A checkpoint holds everything needed to continue a simulation from time t:
+#
+#   - the continuous state vector
+#   - the discrete state and tick counter of every clock
+#   - block events still pending in the event queue
+#   - block internal state from Block.checkpoint(), eg. plot data buffers or
+#     the user data of a persistent FUNCTION block
+#
+# Clock ticks are not stored as events, each clock schedules its next tick
+# from its restored tick counter when the resumed simulation starts.  Events
+# that blocks declare in start() are declared again, those before t are
+# discarded by the simulator.
+#
+# The checkpoint is never modified when a simulation is resumed from it, so
+# one checkpoint can seed any number of runs of the same block diagram.
+#
+# ------------------------------------------------------------------------- #
+
+
+class Checkpoint:
+    """
+    State of a simulation at one instant
+
+    :param bd: block diagram being simulated
+    :type bd: BlockDiagram
+    :param simstate: simulation state
+    :type simstate: SimulationState
+
+    Created by :meth:`BDSim.checkpoint` and passed to :meth:`BDSim.run` as
+    ``resume`` to continue the simulation from :attr:`t`.
+
+    :seealso: :meth:`fork`
+    """
+
+    def __init__(self, bd: BlockDiagram, simstate: SimulationState) -> None:
+        self.bd = bd
+        self.t = float(simstate.t or 0.0)
+        self.x = np.array(
+            simstate.x if simstate.x is not None else bd.getstate0(), dtype=float
+        )
+        events = sorted(simstate.eventq._heap)
+        # the tick counter is the next tick to schedule, rewind it over any
+        # tick that is already scheduled so that start() schedules it again
+        self.clocks: dict[Clock, tuple[np.ndarray, int]] = {
+            clock: (
+                np.array(cs.state),
+                cs.tick - sum(1 for _, _, source in events if source is clock),
+            )
+            for clock, cs in simstate.clock_states.items()
+        }
+        self.events: list[tuple[float, Block]] = [
+            (t, source)
+            for t, _, source in events
+            if isinstance(source, Block) and t > self.t
+        ]
+        self.blocks: dict[Block, Any] = {}
+        for b in bd.blocklist:
+            state = b.checkpoint()
+            if state is not None:
+                self.blocks[b] = state
+
+    def __repr__(self) -> str:
+        return (
+            f"Checkpoint({self.bd.name}, t={self.t:g}, nstates={len(self.x)}, "
+            f"clocks={len(self.clocks)}, blocks={len(self.blocks)})"
+        )
+
+    def fork(self) -> Checkpoint:
+        """
+        Copy the checkpoint and its block diagram
+
+        :return: checkpoint of an independent copy of the block diagram
+        :rtype: Checkpoint
+
+        The copy's block diagram is :attr:`bd` of the returned checkpoint.  Its
+        parameters can be changed without affecting the original, so that
+        several scenarios can branch from one warm-up simulation::
+
+            warm = sim.checkpoint()
+            branch = warm.fork()
+            branch.bd.blocknames["gain"].K = 2
+            out = sim.run(branch.bd, T=20, resume=branch)
+
+        Forking is only needed if the diagrams must coexist, a diagram can be
+        resumed from the same checkpoint any number of times.
+        """
+        return deepcopy(self)
+
+    def restore_clocks(self, simstate: SimulationState) -> None:
+        """
+        Restore clock states, before the blocks are started
+
+        :param simstate: simulation state of the resumed run
+        :type simstate: SimulationState
+        """
+        for clock, (state, tick) in self.clocks.items():
+            clock_state = ClockState(state)
+            clock_state.tick = tick
+            simstate.clock_states[clock] = clock_state
+
+    def restore_blocks(self, simstate: SimulationState) -> None:
+        """
+        Restore block internal state and events, after the blocks are started
+
+        :param simstate: simulation state of the resumed run
+        :type simstate: SimulationState
+        """
+        for b, state in self.blocks.items():
+            b.restore(deepcopy(state))
+        # blocks may have declared the same events again in start()
+        pending = {(t, id(source)) for t, _, source in simstate.eventq._heap}
+        for t, block in self.events:
+            if (t, id(block)) not in pending:
+                simstate.declare_event(block, t)
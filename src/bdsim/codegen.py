@@ -0,0 +1,634 @@
+"""Generate a standalone NumPy module from a compiled block diagram."""
+
+from __future__ import annotations
+
+import hashlib
+import importlib.util
+import marshal
+import math
+import os
+from pathlib import Path
+import tempfile
+from types import FunctionType, ModuleType
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from bdsim.block import Block
+    from bdsim.blockdiagram import BlockDiagram
+
+# bump this whenever the generated code changes, it is part of the fingerprint
+CODEGEN_VERSION = 1
+
+# ------------------------------------------------------------------------- #
+#
+# The generated module has the form:
+#
+#   FINGERPRINT = "..."
+#   NSTATES = n
+#   CLOCKS = ("clock name", ...)
+#
+#   def bind(blocks)                   bind original blocks, used for callbacks
+#   def outputs(t, x, xd_clocks)       dict of block name -> list of outputs
+#   def f(t, x, xd_clocks)             continuous state derivative
+#   def next_0(t, x, xd_clocks)        next state for clock 0, etc.
+#   NEXT = (next_0, ...)
+#
+# where x is the continuous state vector and xd_clocks is a sequence holding
+# the state vector of each clock, in the order of bd.clocklist.
+#
+# Each block is emitted as straight-line code by an emitter registered for its
+# class.  Blocks without an emitter, or whose parameters cannot be written as
+# literals, call back to the original block object.
+#
+# Emitters specialize on the signal types seen when the diagram is evaluated
+# with its initial state, eg. GAIN uses @ if both input and gain are arrays.
+#
+# ------------------------------------------------------------------------- #
+
+
+class _Unsupported(Exception):
+    """The block instance cannot be emitted, use a callback instead"""
+
+
+class _Context:
+    """Module-level constants shared by all emitters"""
+
+    def __init__(self) -> None:
+        self.constants: list[str] = []
+
+    def const(self, value: Any) -> str:
+        """
+        Return an expression for a parameter value
+
+        Python scalars are written inline, other values become module-level
+        constants.  Raises ``_Unsupported`` if the value has no literal form.
+        """
+        if isinstance(value, (bool, int)) and not isinstance(value, np.generic):
+            return repr(value)
+        if isinstance(value, float) and math.isfinite(value):
+            return repr(value)
+        name = f"_c{len(self.constants)}"
+        self.constants.append(f"{name} = {_literal(value)}")
+        return name
+
+
+def _literal(value: Any) -> str:
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (bool, int, float, complex)):
+        return repr(value)  # inf and nan are defined in the generated module
+    if isinstance(value, np.ndarray) and value.dtype.kind in "biufc":
+        return f"np.array({value.tolist()!r}, dtype=np.{value.dtype.name})"
+    if isinstance(value, (list, tuple)) and all(
+        isinstance(v, (bool, int, float)) for v in value
+    ):
+        return repr(value)
+    raise _Unsupported(f"no literal for {type(value).__name__}")
+
+
+def _index_literal(index: Any) -> str:
+    if isinstance(index, slice):
+        return repr(index)
+    if isinstance(index, list) and all(isinstance(i, int) for i in index):
+        return repr(index)
+    raise _Unsupported("unsupported index")
+
+
+class Emitter(NamedTuple):
+    """
+    Code emitters for one block class
+
+    Each function is called as ``emit(block, u, uval, x, ctx)`` where ``u`` is a
+    list of input expressions, ``uval`` the corresponding input values seen at
+    compile time, ``x`` the state expression (or None) and ``ctx`` a context
+    whose ``const`` method converts a parameter to an expression.  ``output``
+    returns a list of expressions, one per output port, ``deriv`` and ``next``
+    return one expression.  Any of them can raise ``_Unsupported``.
+    """
+
+    output: Callable[..., list[str]]
+    deriv: Callable[..., str] | None = None
+    next: Callable[..., str] | None = None
+
+
+_emitters: dict[type, Emitter] = {}
+
+
+def register_emitter(cls: type, emitter: Emitter) -> None:
+    """
+    Register a code emitter for a block class
+
+    :param cls: block class
+    :type cls: type
+    :param emitter: code emitters for the class
+    :type emitter: Emitter
+
+    Subclasses that do not override ``output``, ``deriv`` or ``next`` use the
+    emitter of their base class.
+    """
+    _emitters[cls] = emitter
+
+
+def _emitter_for(block: Block) -> Emitter | None:
+    if not _emitters:
+        _register_builtins()
+    cls = type(block)
+    for base in cls.__mro__:
+        emitter = _emitters.get(base)
+        if emitter is None:
+            continue
+        # the subclass must not change the behaviour of the registered class
+        if all(
+            getattr(cls, m, None) is getattr(base, m, None)
+            for m in ("output", "deriv", "next")
+        ):
+            return emitter
+        return None
+    return None
+
+
+# ------------------------------------------------------------------------- #
+# emitters for the built-in block library
+
+
+def _register_builtins() -> None:
+    from bdsim.blocks.connections import DeMux, Index, Mux
+    from bdsim.blocks.continuous import Integrator, LTI_SS
+    from bdsim.blocks.functions import Clip, Gain, Prod, Sum
+    from bdsim.blocks.linalg import Slice1, Slice2
+    from bdsim.blocks.sampled import ZOH
+    from bdsim.blocks.sources import Constant, Ramp, Step, Time
+
+    def constant(b, u, uval, x, ctx):
+        return [ctx.const(b.value)]
+
+    def time(b, u, uval, x, ctx):
+        return ["t"]
+
+    def step(b, u, uval, x, ctx):
+        return [f"({ctx.const(b.on)} if t >= {ctx.const(b.T)} else {ctx.const(b.off)})"]
+
+    def ramp(b, u, uval, x, ctx):
+        T, off = ctx.const(b.T), ctx.const(b.off)
+        return [f"({off} + {ctx.const(b.slope)} * (t - {T}) if t >= {T} else {off})"]
+
+    def gain(b, u, uval, x, ctx):
+        K = ctx.const(b.K)
+        if isinstance(uval[0], np.ndarray) and isinstance(b.K, np.ndarray):
+            return [f"({K} @ {u[0]})" if b.premul else f"({u[0]} @ {K})"]
+        return [f"({u[0]} * {K})"]
+
+    def sum_(b, u, uval, x, ctx):
+        if b.mode is not None:
+            raise _Unsupported("angle wrapping")
+        expr = u[0] if b.signs[0] == "+" else f"(-{u[0]})"
+        for sign, ui in zip(b.signs[1:], u[1:]):
+            expr += f" {sign} {ui}"
+        return [f"({expr})"]
+
+    def prod(b, u, uval, x, ctx):
+        expr = ""
+        for i, (op, ui, vi) in enumerate(zip(b.ops, u, uval)):
+            matrix = isinstance(vi, np.ndarray)
+            if i == 0:
+                if op == "*":
+                    expr = ui
+                else:
+                    expr = f"np.linalg.inv({ui})" if matrix else f"(1.0 / {ui})"
+            elif op == "*":
+                expr += f" @ {ui}" if matrix else f" * {ui}"
+            else:
+                expr += f" @ np.linalg.inv({ui})" if matrix else f" / {ui}"
+        return [f"({expr})"]
+
+    def clip(b, u, uval, x, ctx):
+        lo, hi = ctx.const(b.min), ctx.const(b.max)
+        if isinstance(uval[0], np.ndarray):
+            return [f"np.clip({u[0]}, {lo}, {hi})"]
+        return [f"min({hi}, max({u[0]}, {lo}))"]
+
+    def mux(b, u, uval, x, ctx):
+        items = []
+        for ui, vi in zip(u, uval):
+            if isinstance(vi, (int, float, bool)):
+                items.append(ui)
+            elif isinstance(vi, np.ndarray):
+                items.append(f"*{ui}.ravel().tolist()")
+        return [f"np.array([{', '.join(items)}])"]
+
+    def demux(b, u, uval, x, ctx):
+        return [f"{u[0]}[{i}]" for i in range(b.nout)]
+
+    def index(b, u, uval, x, ctx):
+        idx = b.index
+        if not isinstance(idx, list) or not all(isinstance(i, int) for i in idx):
+            raise _Unsupported("unsupported index")
+        if len(idx) == 1:
+            return [f"{u[0]}[{idx[0]}]"]
+        elif isinstance(uval[0], np.ndarray):
+            return [f"{u[0]}[{idx!r}]"]
+        return ["[" + ", ".join(f"{u[0]}[{i}]" for i in idx) + "]"]
+
+    def slice1(b, u, uval, x, ctx):
+        return [f"{u[0]}[{_index_literal(b.index)}]"]
+
+    def slice2(b, u, uval, x, ctx):
+        return [f"{u[0]}[{_index_literal(b.rows)}, {_index_literal(b.cols)}]"]
+
+    def integrator_output(b, u, uval, x, ctx):
+        return [f"{x}[0]" if b.nstates == 1 else x]
+
+    def integrator_deriv(b, u, uval, x, ctx):
+        xd = f"({ctx.const(b.gain)} * np.asarray({u[0]}, dtype=np.float64).reshape(-1))"
+        if b.min is not None:
+            xd = f"np.where({x} < {ctx.const(b.min)}, 0.0, {xd})"
+        if b.max is not None:
+            xd = f"np.where({x} > {ctx.const(b.max)}, 0.0, {xd})"
+        return xd
+
+    def lti_output(b, u, uval, x, ctx):
+        y = f"{ctx.const(b.C)} @ {x}"
+        if b.D is not None:
+            y += f" + {ctx.const(b.D)} @ np.array([{', '.join(u)}])"
+        return [f"({y}).item()" if b.C.shape[0] == 1 else f"({y})"]
+
+    def lti_deriv(b, u, uval, x, ctx):
+        uvec = f"np.array([{', '.join(u)}]).reshape(-1)"
+        return f"({ctx.const(b.A)} @ {x} + {ctx.const(b.B)} @ {uvec})"
+
+    def zoh_output(b, u, uval, x, ctx):
+        return [f"{x}.item()" if b.ndstates == 1 else x]
+
+    def zoh_next(b, u, uval, x, ctx):
+        return f"np.asarray({u[0]}, dtype=np.float64).reshape(-1)"
+
+    register_emitter(Constant, Emitter(constant))
+    register_emitter(Time, Emitter(time))
+    register_emitter(Step, Emitter(step))
+    register_emitter(Ramp, Emitter(ramp))
+    register_emitter(Gain, Emitter(gain))
+    register_emitter(Sum, Emitter(sum_))
+    register_emitter(Prod, Emitter(prod))
+    register_emitter(Clip, Emitter(clip))
+    register_emitter(Mux, Emitter(mux))
+    register_emitter(DeMux, Emitter(demux))
+    register_emitter(Index, Emitter(index))
+    register_emitter(Slice1, Emitter(slice1))
+    register_emitter(Slice2, Emitter(slice2))
+    register_emitter(Integrator, Emitter(integrator_output, deriv=integrator_deriv))
+    register_emitter(LTI_SS, Emitter(lti_output, deriv=lti_deriv))
+    register_emitter(ZOH, Emitter(zoh_output, next=zoh_next))
+
+
+# ------------------------------------------------------------------------- #
+
+
+def _probe(bd: BlockDiagram) -> dict[Block, list[Any]]:
+    # evaluate every block individually to capture the value of every signal
+    saved = (bd.fused_chains, bd._exec_plan)
+    try:
+        bd.fuse_chains(enable=False)
+        bd.evaluate(bd.initial_state_map(), 0.0, sinks=False)
+        return {
+            b: list(b._output_values or [])
+            for group in bd.plan
+            for b in group
+        }
+    finally:
+        bd.fused_chains, bd._exec_plan = saved
+
+
+def _cone(bd: BlockDiagram, targets: list[Block]) -> set[Block]:
+    # blocks whose outputs are needed to compute the inputs of the targets
+    needed: set[Block] = set()
+
+    def visit(b: Block) -> None:
+        for source in b.sources:
+            if source in needed:
+                continue
+            needed.add(source)
+            if not source.hasmemory:
+                visit(source)
+
+    for b in targets:
+        visit(b)
+    return needed
+
+
+def generate(bd: BlockDiagram) -> str:
+    """
+    Generate Python source for a compiled block diagram
+
+    :param bd: compiled block diagram
+    :type bd: BlockDiagram
+    :return: source code of the module
+    :rtype: str
+
+    The first line of the module is a comment holding the diagram fingerprint,
+    see :func:`diagram_fingerprint`.
+    """
+    values = _probe(bd)
+    ctx = _Context()
+    index = {b: i for i, b in enumerate(bd.blocklist)}
+    order = [b for group in bd.plan for b in group]
+
+    # state expressions
+    state: dict[Block, str] = {}
+    continuous: list[tuple[Block, int, int]] = []
+    offset = 0
+    for b in bd.blocklist:
+        if b.blockclass == "continuous":
+            state[b] = f"x[{offset}:{offset + b.nstates}]"
+            continuous.append((b, offset, offset + b.nstates))
+            offset += b.nstates
+    nstates = offset
+    discrete: list[list[tuple[Block, int, int]]] = []
+    for ci, clock in enumerate(bd.clocklist):
+        blocks = []
+        offset = 0
+        for b in clock.blocklist:
+            state[b] = f"xd_clocks[{ci}][{offset}:{offset + b.ndstates}]"
+            blocks.append((b, offset, offset + b.ndstates))
+            offset += b.ndstates
+        discrete.append(blocks)
+
+    def inputs(b: Block) -> tuple[list[str], list[Any]]:
+        u, uval = [], []
+        for wire in b._input_wires:
+            assert wire is not None, f"block {b.name} has an unconnected input"
+            source = wire.start.block
+            u.append(f"y{index[source]}_{wire.start.port}")
+            uval.append(values.get(source, [None] * source.nout)[wire.start.port])
+        return u, uval
+
+    emitters = {b: _emitter_for(b) for b in bd.blocklist}
+
+    # code to compute the outputs of every block in the plan
+    code: dict[Block, list[str]] = {}
+    for b in order:
+        i = index[b]
+        u, uval = inputs(b)
+        x = state.get(b, "None")
+        lines = []
+        emitter = emitters[b]
+        try:
+            if emitter is None:
+                raise _Unsupported
+            for port, expr in enumerate(emitter.output(b, u, uval, x, ctx)):
+                lines.append(f"    y{i}_{port} = {expr}")
+        except _Unsupported:
+            # a block with memory is computed before its inputs
+            args = ", ".join(["None"] * len(u) if b.hasmemory else u)
+            lines = [f"    y{i} = _B[{i}].output_safe(t, [{args}], {x})"]
+            lines += [f"    y{i}_{port} = y{i}[{port}]" for port in range(b.nout)]
+        code[b] = [f"    # {b.name} ({type(b).__name__})"] + lines
+
+    def body(targets: list[Block]) -> list[str]:
+        needed = _cone(bd, targets)
+        return [line for b in order if b in needed for line in code[b]]
+
+    def update(b: Block, kind: str) -> str:
+        u, uval = inputs(b)
+        x = state[b]
+        emitter = emitters[b]
+        func = getattr(emitter, kind) if emitter is not None else None
+        if func is not None:
+            try:
+                return func(b, u, uval, x, ctx)
+            except _Unsupported:
+                pass
+        return f"_B[{index[b]}].{kind}_safe(t, [{', '.join(u)}], {x})"
+
+    src = [
+        "",
+        "def outputs(t, x, xd_clocks):",
+        '    """Return the outputs of every evaluated block, by block name"""',
+    ]
+    for b in order:
+        src += code[b]
+    src.append("    return {")
+    for b in order:
+        ports = ", ".join(f"y{index[b]}_{p}" for p in range(b.nout))
+        src.append(f"        {b.name!r}: [{ports}],")
+    src += ["    }", ""]
+
+    src += [
+        "",
+        "def f(t, x, xd_clocks):",
+        '    """Return the derivative of the continuous state"""',
+    ]
+    src += body([b for b, _, _ in continuous])
+    src.append(f"    xdot = np.empty(({nstates},))")
+    for b, start, end in continuous:
+        src.append(f"    xdot[{start}:{end}] = {update(b, 'deriv')}")
+    src += ["    return xdot", ""]
+
+    for ci, blocks in enumerate(discrete):
+        src += [
+            "",
+            f"def next_{ci}(t, x, xd_clocks):",
+            f'    """Return the next state of clock {bd.clocklist[ci].name}"""',
+        ]
+        src += body([b for b, _, _ in blocks])
+        src.append(f"    xnext = np.empty(({blocks[-1][2] if blocks else 0},))")
+        for b, start, end in blocks:
+            src.append(f"    xnext[{start}:{end}] = np.ravel({update(b, 'next')})")
+        src += ["    return xnext", ""]
+
+    nexts = "".join(f"next_{ci}, " for ci in range(len(discrete)))
+    clocks = "".join(f"{c.name!r}, " for c in bd.clocklist)
+    header = [
+        f'"""Model generated by bdsim for block diagram {bd.name!r}."""',
+        "",
+        "import numpy as np",
+        "from math import inf, nan",
+        "",
+        f"NSTATES = {nstates}",
+        f"CLOCKS = ({clocks})",
+        f"BLOCKS = ({''.join(f'{b.name!r}, ' for b in bd.blocklist)})",
+        "",
+        "_B = None",
+        "",
+        *ctx.constants,
+        "",
+        "",
+        "def bind(blocks):",
+        '    """Bind the original block objects, used by blocks with callbacks"""',
+        "    global _B",
+        "    _B = tuple(blocks)",
+        "",
+    ]
+    footer = ["", f"NEXT = ({nexts})", ""]
+    text = "\n".join(header + src + footer)
+
+    fingerprint = diagram_fingerprint(bd)
+    return f"# fingerprint: {fingerprint}\n{text}\nFINGERPRINT = {fingerprint!r}\n"
+
+
+# ------------------------------------------------------------------------- #
+#
+# The fingerprint identifies the generated code without generating it, it is
+# a hash of everything generate() depends on: the block types, names and
+# parameters, the wiring, the clocks and CODEGEN_VERSION.  The parameters of
+# a block are its public attributes and its initial state, a function is
+# hashed by its code, defaults and closure.  A value that can't be hashed
+# stably, such as an object whose repr holds its address, changes the
+# fingerprint every time, so the code is regenerated rather than reused.
+#
+# ------------------------------------------------------------------------- #
+
+
+def _hash_value(h: Any, value: Any, depth: int = 0) -> None:
+    if value is None or isinstance(value, (bool, int, float, complex, str, bytes)):
+        h.update(repr(value).encode("utf-8"))
+    elif isinstance(value, np.ndarray):
+        h.update(f"array({value.dtype}, {value.shape})".encode("utf-8"))
+        h.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, (list, tuple)) and depth < 8:
+        h.update(f"{type(value).__name__}({len(value)})".encode("utf-8"))
+        for item in value:
+            _hash_value(h, item, depth + 1)
+    elif isinstance(value, dict) and depth < 8:
+        h.update(f"dict({len(value)})".encode("utf-8"))
+        for key in sorted(value, key=repr):
+            _hash_value(h, key, depth + 1)
+            _hash_value(h, value[key], depth + 1)
+    elif isinstance(value, FunctionType) and depth < 8:
+        h.update(f"function {value.__module__}.{value.__qualname__}".encode("utf-8"))
+        h.update(marshal.dumps(value.__code__))
+        _hash_value(h, value.__defaults__, depth + 1)
+        _hash_value(
+            h, [cell.cell_contents for cell in value.__closure__ or ()], depth + 1
+        )
+    else:
+        h.update(f"{type(value).__qualname__} {value!r}".encode("utf-8"))
+
+
+def diagram_fingerprint(bd: BlockDiagram) -> str:
+    """
+    Return the fingerprint of the module generated for a block diagram
+
+    :param bd: compiled block diagram
+    :type bd: BlockDiagram
+    :return: fingerprint
+    :rtype: str
+
+    The fingerprint is a hash of the block types, names and parameters, the
+    wiring, the clocks and the version of the code generator.  It is found
+    without generating the module, so a cached module can be reused without
+    evaluating the diagram.
+
+    .. note:: A callback whose result depends on data outside the diagram is
+        not covered, the emitters specialize on the signal types it gives when
+        the module is generated.
+    """
+    h = hashlib.sha256(f"{CODEGEN_VERSION}\n{bd.name!r}\n".encode("utf-8"))
+    index = {b: i for i, b in enumerate(bd.blocklist)}
+    for b in bd.blocklist:
+        cls = type(b)
+        h.update(f"\nblock {cls.__module__}.{cls.__qualname__} {b.name!r}".encode())
+        for wire in b._input_wires:
+            if wire is not None:
+                h.update(f" <{index[wire.start.block]}.{wire.start.port}".encode())
+        clock = b._clock.name if b._clock is not None else None
+        parameters = {
+            "_x0": getattr(b, "_x0", None),
+            "_nstates": b._nstates,
+            "_ndstates": b._ndstates,
+            "_clock": clock,
+            **{k: v for k, v in vars(b).items() if not k.startswith("_")},
+        }
+        _hash_value(h, parameters)
+    for clock in bd.clocklist:
+        blocks = [index[b] for b in clock.blocklist]
+        h.update(
+            f"\nclock {clock.name!r} {clock.T!r} {clock.offset!r} {blocks}".encode()
+        )
+    return h.hexdigest()
+
+
+def fingerprint(source: str) -> str:
+    """
+    Return the fingerprint of generated source code
+
+    :param source: source code returned by :func:`generate`
+    :type source: str
+    :return: fingerprint
+    :rtype: str
+    """
+    first = source.split("\n", 1)[0]
+    assert first.startswith("# fingerprint: "), "not a generated model"
+    return first[len("# fingerprint: ") :]
+
+
+def cache_dir() -> Path:
+    """
+    Return the directory for cached generated models
+
+    :return: cache directory
+    :rtype: Path
+
+    This is ``$XDG_CACHE_HOME/bdsim/codegen`` which defaults to
+    ``~/.cache/bdsim/codegen``.
+    """
+    root = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(root) / "bdsim" / "codegen"
+
+
+def write(bd: BlockDiagram, path: str | Path | None = None) -> Path:
+    """
+    Write the generated module for a block diagram
+
+    :param bd: compiled block diagram
+    :type bd: BlockDiagram
+    :param path: file to write, defaults to a file in :func:`cache_dir`
+    :type path: str or Path, optional
+    :return: path of the module
+    :rtype: Path
+
+    If the file already holds a module with the fingerprint of the diagram,
+    see :func:`diagram_fingerprint`, it is reused and the module is not
+    generated.
+    """
+    fp = diagram_fingerprint(bd)
+    if path is None:
+        path = cache_dir() / f"bdmodel_{fp[:20]}.py"
+    path = Path(path)
+
+    if path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            if f.readline().strip() == f"# fingerprint: {fp}":
+                return path
+
+    source = generate(bd)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write atomically so a concurrent reader never sees a partial module
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(source)
+    os.replace(tmp, path)
+    return path
+
+
+def load(bd: BlockDiagram, path: str | Path) -> ModuleType:
+    """
+    Load a generated module and bind it to a block diagram
+
+    :param bd: compiled block diagram the module was generated from
+    :type bd: BlockDiagram
+    :param path: path of the generated module
+    :type path: str or Path
+    :return: the loaded module
+    :rtype: module
+    """
+    path = Path(path)
+    spec = importlib.util.spec_from_file_location(f"bdmodel_{path.stem}", path)
+    assert spec is not None and spec.loader is not None
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if tuple(b.name for b in bd.blocklist) != module.BLOCKS:
+        raise ValueError(f"generated model {path} does not match the block diagram")
+    module.bind(bd.blocklist)
+    return module
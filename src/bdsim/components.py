@@ -472,6 +472,8 @@ class Runner:
     def __init__(self) -> None:
         self._context_local = threading.local()
         self.options: OptionsBase | None = None
+        # context of the most recent run, for checkpoints taken after it ends
+        self._last_context: SimulationContext | None = None
 
     def _get_context(self) -> SimulationContext | None:
         return getattr(self._context_local, "current", None)
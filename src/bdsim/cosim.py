@@ -0,0 +1,528 @@
+"""Co-simulation of several block diagrams, each with its own solver."""
+
+from __future__ import annotations
+
+import multiprocessing
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from bdsim.components import BDStruct
+
+if TYPE_CHECKING:
+    from multiprocessing.connection import Connection
+
+    from bdsim.blockdiagram import BlockDiagram
+    from bdsim.run_sim import BDSim
+
+__all__ = ["CoSimulation", "Partition"]
+
+# ------------------------------------------------------------------------- #
+#
+# Each partition is a compiled block diagram with an INPORT and/or OUTPORT
+# block, run by its own BDSim.run generator with its own solver options.  The
+# master advances the partitions from one macro step boundary to the next,
+#
+#     t_k = min(k * step, T)
+#
+# and each partition declares an event at every boundary, so its integration
+# intervals end there and its generator is resumed until the event has fired.
+# The event evaluates the block diagram, without sinks, since one without
+# continuous states is otherwise only evaluated at clock ticks, and the
+# outputs at t_k are then the inputs of the OUTPORT block.
+#
+# Over a macro step the INPORT outputs are c + d (t - t_k), where c and d
+# are computed from the outputs y of the connected partitions
+#
+#   jacobi        all partitions are advanced from the outputs at t_k, and
+#                 can run in parallel processes
+#   gauss-seidel  partitions are advanced in the order they were added, an
+#                 input from a partition that has already been advanced uses
+#                 its output at t_k+1
+#
+#   extrapolation   input from y(t_k)             input from y(t_k+1)
+#   0               c = y(t_k), d = 0             c = y(t_k+1), d = 0
+#   1               line through y(t_k-1), y(t_k) line through y(t_k), y(t_k+1)
+#
+# In parallel each partition is advanced by a worker process, forked so that
+# it has a copy of the block diagram, which sends back the outputs at each
+# boundary and the results at the end.
+#
+# The initial outputs are found by evaluating the partitions at t = 0, once
+# for each partition so that the values propagate through direct feedthrough.
+#
+# ------------------------------------------------------------------------- #
+
+COUPLINGS = ("jacobi", "gauss-seidel")
+
+
+class Partition:
+    """
+    Block diagram of a co-simulation
+
+    :param bd: compiled block diagram
+    :type bd: BlockDiagram
+    :param name: name of the partition
+    :type name: str
+    :param runargs: arguments of :meth:`BDSim.run`
+    :type runargs: dict
+    :raises ValueError: the block diagram is not compiled, or has more than one
+        INPORT or OUTPORT block
+
+    Created by :meth:`CoSimulation.add`.  The inputs of the partition are the
+    outputs of its INPORT block and its outputs are the inputs of its OUTPORT
+    block.  Indexing a partition gives a port for :meth:`CoSimulation.connect`.
+    """
+
+    def __init__(self, bd: BlockDiagram, name: str, runargs: dict[str, Any]) -> None:
+        if not bd.compiled:
+            raise ValueError(f"block diagram {name!r} must be compiled")
+        self.bd = bd
+        self.name = name
+        self.runargs = runargs
+
+        ports = {}
+        for kind in ("inport", "outport"):
+            blocks = [b for b in bd.blocklist if b.type == kind]
+            if len(blocks) > 1:
+                raise ValueError(f"block diagram {name!r} has more than one {kind}")
+            ports[kind] = blocks[0] if blocks else None
+        self.inport = ports["inport"]
+        self.outport = ports["outport"]
+        self.nin = 0 if self.inport is None else self.inport.nout
+        self.nout = 0 if self.outport is None else self.outport.nin
+
+        self.stopped = False
+        self._run: Any = None
+        self._simstate: Any = None
+        self._result: BDStruct | None = None
+        self._step = 0.0
+        self._T = 0.0
+        self._k = 0
+        self._reached = 0.0
+        self._conn: Connection | None = None
+        self._process: Any = None
+
+    def __repr__(self) -> str:
+        return f"Partition({self.name!r}, nin={self.nin}, nout={self.nout})"
+
+    def __getitem__(self, port: int) -> tuple[Partition, int]:
+        return self, port
+
+    def _signal(self, t: float, c: list[Any], d: list[Any]) -> None:
+        # INPORT outputs over the macro step starting at t
+        if self.inport is not None:
+            self.inport.signal = lambda tau: [
+                ci + di * (tau - t) for ci, di in zip(c, d)
+            ]
+
+    def outputs(self) -> list[Any]:
+        """
+        Output values
+
+        :return: inputs of the OUTPORT block at the last evaluation
+        :rtype: list
+        """
+        if self.outport is None:
+            return []
+        return [
+            np.array(v) if isinstance(v, np.ndarray) else v
+            for v in self.outport.inport_values
+        ]
+
+    def evaluate(self, inputs: list[Any]) -> list[Any]:
+        """
+        Evaluate the partition at time zero
+
+        :param inputs: input values
+        :type inputs: list
+        :return: output values
+        :rtype: list
+        """
+        self._signal(0.0, inputs, [0] * self.nin)
+        self.bd.evaluate(self.bd.initial_state_map(), 0.0, sinks=False)
+        return self.outputs()
+
+    def start(self, sim: BDSim, T: float, step: float) -> None:
+        """
+        Start the simulation of the partition
+
+        :param sim: simulator
+        :type sim: BDSim
+        :param T: simulation horizon
+        :type T: float
+        :param step: macro step
+        :type step: float
+        """
+        self._step = step
+        self._T = T
+        self._k = 0
+        self._reached = 0.0
+        self.stopped = False
+        self._result = None
+        self._run = sim._start(self.bd, dict(T=T, **self.runargs))
+        self._simstate = next(self._run)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        self._k += 1
+        t = min(self._k * self._step, self._T)
+        self._simstate.declare_event(self._boundary, t)
+
+    def _boundary(self, t: float, simstate: Any) -> None:
+        # event at a macro step boundary, evaluate the outputs
+        x = simstate.x if simstate.x is not None else np.array([])
+        self.bd.evaluate(self.bd.state_map(x, simstate), t, sinks=False)
+        self._reached = t
+        if t < self._T:
+            self._schedule()
+
+    def advance(self, t1: float, t: float, c: list[Any], d: list[Any]) -> list[Any]:
+        """
+        Advance the simulation to the next macro step boundary
+
+        :param t1: time of the boundary
+        :type t1: float
+        :param t: start time of the macro step
+        :type t: float
+        :param c: input values at ``t``
+        :type c: list
+        :param d: rate of change of the inputs
+        :type d: list
+        :return: output values at ``t1``
+        :rtype: list
+
+        If the simulation of the partition stops early :attr:`stopped` is
+        set.
+        """
+        self._signal(t, c, d)
+        try:
+            while self._reached < t1 and not self.stopped:
+                next(self._run)
+        except StopIteration as stop:
+            self._result = stop.value
+            self.stopped = True
+        return self.outputs()
+
+    def finish(self, t: float | None = None) -> BDStruct:
+        """
+        Finish the simulation of the partition
+
+        :param t: stop the simulation at this time, defaults to None
+        :type t: float, optional
+        :return: simulation results
+        :rtype: BDStruct
+
+        If ``t`` is given the simulation is stopped there rather than run to
+        the horizon, for example because another partition stopped.
+        """
+        if self._result is None:
+            if t is not None:
+                self._simstate.declare_event(self._halt, t)
+            try:
+                while True:
+                    next(self._run)
+            except StopIteration as stop:
+                self._result = stop.value
+        return self._result
+
+    def _halt(self, t: float, simstate: Any) -> None:
+        simstate.stop = f"co-simulation at t={t:g}"
+
+
+def _worker(
+    partition: Partition, conn: Connection, sim: BDSim, T: float, step: float
+) -> None:
+    # advance a partition in a worker process, as requested by the master
+    try:
+        partition.start(sim, T, step)
+        while True:
+            request = conn.recv()
+            if request[0] == "advance":
+                outputs = partition.advance(*request[1:])
+                conn.send((True, (outputs, partition.stopped)))
+            else:
+                conn.send((True, partition.finish(*request[1:])))
+                return
+    except Exception as err:
+        conn.send((False, err))
+
+
+class CoSimulation:
+    """
+    Co-simulation of block diagrams
+
+    :param sim: simulator that runs each block diagram
+    :type sim: BDSim
+    :param step: macro step, the interval at which signals are exchanged
+    :type step: float
+    :param coupling: "jacobi" [default] or "gauss-seidel"
+    :type coupling: str, optional
+    :param extrapolation: order of input extrapolation, 0 [default] or 1
+    :type extrapolation: int, optional
+    :param parallel: advance each block diagram in its own process, defaults
+        to False
+    :type parallel: bool, optional
+    :raises ValueError: bad step, coupling or extrapolation, or parallel
+        Gauss-Seidel coupling
+
+    Several compiled block diagrams, the partitions, are simulated together.
+    Each is integrated by :meth:`BDSim.run` with its own solver and options,
+    so a stiff fast subsystem does not force small steps on a slow one.  The
+    partitions exchange signals every ``step`` seconds of simulation time.
+
+    The inputs of a partition are the outputs of its INPORT block, and its
+    outputs are the inputs of its OUTPORT block, as for a subsystem.  Between
+    exchanges each input is held, or extrapolated linearly if
+    ``extrapolation`` is 1.  With Jacobi coupling all partitions advance
+    from the same exchanged values, and with ``parallel`` each partition is
+    advanced by its own process.  With Gauss-Seidel coupling the partitions
+    advance in the order they were added, and use the new outputs of those
+    that have already advanced.
+
+    Example::
+
+        sim = bdsim.BDSim(graphics=False)
+
+        elec = sim.blockdiagram("electrical")
+        ...  # uses elec.INPORT(1) and elec.OUTPORT(1)
+        thermal = sim.blockdiagram("thermal")
+        ...
+
+        cosim = bdsim.CoSimulation(sim, step=1e-3, extrapolation=1)
+        e = cosim.add(elec, solver="Radau", solver_args=dict(rtol=1e-8))
+        h = cosim.add(thermal, solver="RK45")
+        cosim.connect(e[0], h[0])
+        cosim.connect(h[0], e[0])
+        out = cosim.run(T=10)
+        out.electrical.t
+
+    .. note:: Parallel partitions need the ``fork`` start method of
+        :mod:`multiprocessing`, which is not available on Windows.
+
+    :seealso: :meth:`add` :meth:`connect` :meth:`run`
+    """
+
+    def __init__(
+        self,
+        sim: BDSim,
+        step: float,
+        coupling: str = "jacobi",
+        extrapolation: int = 0,
+        parallel: bool = False,
+    ) -> None:
+        if step <= 0:
+            raise ValueError("step must be > 0")
+        if coupling not in COUPLINGS:
+            raise ValueError(
+                f"unknown coupling {coupling!r}, must be one of " + ", ".join(COUPLINGS)
+            )
+        if extrapolation not in (0, 1):
+            raise ValueError("extrapolation must be 0 or 1")
+        if parallel and coupling != "jacobi":
+            raise ValueError("parallel partitions need jacobi coupling")
+        self.sim = sim
+        self.step = float(step)
+        self.coupling = coupling
+        self.extrapolation = extrapolation
+        self.parallel = parallel
+
+        self.partitions: list[Partition] = []
+        # source of each input, (partition, port) -> (partition, port)
+        self.wires: dict[tuple[Partition, int], tuple[Partition, int]] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"CoSimulation(step={self.step}, coupling={self.coupling}, "
+            f"partitions={[p.name for p in self.partitions]})"
+        )
+
+    def add(
+        self, bd: BlockDiagram, name: str | None = None, **runargs: Any
+    ) -> Partition:
+        """
+        Add a block diagram
+
+        :param bd: compiled block diagram
+        :type bd: BlockDiagram
+        :param name: name of the partition, defaults to the name of ``bd``
+        :type name: str, optional
+        :param runargs: options of :meth:`BDSim.run` for this block diagram,
+            such as ``solver``, ``solver_args``, ``max_step``, ``dt`` or
+            ``watch``, but not ``T``
+        :raises ValueError: the name is in use, or see :class:`Partition`
+        :return: the partition
+        :rtype: Partition
+        """
+        if name is None:
+            name = bd.name
+        if any(p.name == name for p in self.partitions):
+            raise ValueError(f"partition {name!r} already exists")
+        partition = Partition(bd, name, runargs)
+        self.partitions.append(partition)
+        return partition
+
+    def connect(self, start: tuple[Partition, int], end: tuple[Partition, int]) -> None:
+        """
+        Connect an output of a partition to an input
+
+        :param start: output port, such as ``p[0]``
+        :type start: tuple(Partition, int)
+        :param end: input port, such as ``q[1]``
+        :type end: tuple(Partition, int)
+        :raises ValueError: no such port, or the input is already connected
+        """
+        for (partition, port), n, kind in ((start, 1, "output"), (end, 0, "input")):
+            if not 0 <= port < (partition.nout if n else partition.nin):
+                raise ValueError(f"partition {partition.name!r} has no {kind} {port}")
+        if end in self.wires:
+            raise ValueError(f"input {end[1]} of {end[0].name!r} is already connected")
+        self.wires[end] = start
+
+    def run(self, T: float = 5.0) -> BDStruct:
+        """
+        Run the co-simulation
+
+        :param T: simulation horizon, defaults to 5
+        :type T: float, optional
+        :raises ValueError: an input is not connected
+        :return: results
+        :rtype: BDStruct
+
+        The results have the times of the macro step boundaries ``t``, and
+        the results of each partition, as returned by :meth:`BDSim.run`, by
+        the name of the partition.  If the simulation of a partition stops
+        early the others are stopped at the same boundary.
+        """
+        for p in self.partitions:
+            for port in range(p.nin):
+                if (p, port) not in self.wires:
+                    raise ValueError(f"input {port} of {p.name!r} is not connected")
+
+        y = {p: [0.0] * p.nout for p in self.partitions}
+        for _ in self.partitions:
+            for p in self.partitions:
+                y[p] = p.evaluate(self._inputs(p, y))
+        yprev = y
+
+        self._start(T)
+        try:
+            tlist = [0.0]
+            k = 0
+            stopped = False
+            while tlist[-1] < T and not stopped:
+                k += 1
+                t, t1 = tlist[-1], min(k * self.step, T)
+                ynew: dict[Partition, list[Any]] = {}
+                if self.coupling == "jacobi":
+                    for p in self.partitions:
+                        c, d = self._extrapolate(p, t, t1, y, yprev, ynew)
+                        self._advance(p, t1, t, c, d)
+                    for p in self.partitions:
+                        ynew[p] = self._outputs(p)
+                else:
+                    for p in self.partitions:
+                        c, d = self._extrapolate(p, t, t1, y, yprev, ynew)
+                        self._advance(p, t1, t, c, d)
+                        ynew[p] = self._outputs(p)
+                yprev, y = y, ynew
+                tlist.append(t1)
+                stopped = any(p.stopped for p in self.partitions)
+
+            out = BDStruct(name="cosimulation")
+            out["t"] = np.array(tlist)
+            for p in self.partitions:
+                out[p.name] = self._finish(p, tlist[-1] if stopped else None)
+            return out
+        finally:
+            self._stop()
+
+    def _inputs(self, p: Partition, y: dict[Partition, list[Any]]) -> list[Any]:
+        return [
+            y[source][port]
+            for source, port in (self.wires[(p, i)] for i in range(p.nin))
+        ]
+
+    def _extrapolate(
+        self,
+        p: Partition,
+        t: float,
+        t1: float,
+        y: dict[Partition, list[Any]],
+        yprev: dict[Partition, list[Any]],
+        ynew: dict[Partition, list[Any]],
+    ) -> tuple[list[Any], list[Any]]:
+        # inputs of p over the macro step [t, t1] as c + d (tau - t)
+        c, d = [], []
+        for i in range(p.nin):
+            source, port = self.wires[(p, i)]
+            if source in ynew:
+                a, b = y[source][port], ynew[source][port]
+                c.append(a if self.extrapolation else b)
+                d.append((b - a) / (t1 - t) if self.extrapolation else 0)
+            else:
+                a, b = yprev[source][port], y[source][port]
+                c.append(b)
+                d.append((b - a) / self.step if self.extrapolation else 0)
+        return c, d
+
+    def _start(self, T: float) -> None:
+        if not self.parallel:
+            for p in self.partitions:
+                p.start(self.sim, T, self.step)
+            return
+        if "fork" not in multiprocessing.get_all_start_methods():
+            raise RuntimeError("parallel partitions need the fork start method")
+        context = multiprocessing.get_context("fork")
+        for p in self.partitions:
+            p._conn, conn = context.Pipe()
+            p._process = context.Process(
+                target=_worker,
+                args=(p, conn, self.sim, T, self.step),
+                name=f"cosim({p.name})",
+                daemon=True,
+            )
+            p._process.start()
+
+    def _request(self, p: Partition, *request: Any) -> None:
+        assert p._conn is not None
+        p._conn.send(request)
+
+    def _reply(self, p: Partition) -> Any:
+        assert p._conn is not None
+        ok, value = p._conn.recv()
+        if not ok:
+            raise value
+        return value
+
+    def _advance(self, p: Partition, t1: float, t: float, c: list, d: list) -> None:
+        if self.parallel:
+            self._request(p, "advance", t1, t, c, d)
+        else:
+            p.advance(t1, t, c, d)
+
+    def _outputs(self, p: Partition) -> list[Any]:
+        if self.parallel:
+            outputs, p.stopped = self._reply(p)
+            return outputs
+        return p.outputs()
+
+    def _finish(self, p: Partition, t: float | None) -> BDStruct:
+        if self.parallel:
+            self._request(p, "finish", t)
+            return self._reply(p)
+        return p.finish(t)
+
+    def _stop(self) -> None:
+        for p in self.partitions:
+            if p._process is not None:
+                p._process.join(1)
+                if p._process.is_alive():
+                    p._process.terminate()
+                p._process = None
+            if p._conn is not None:
+                p._conn.close()
+                p._conn = None
+            if p._run is not None:
+                p._run.close()
+                p._run = None
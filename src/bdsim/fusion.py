@@ -0,0 +1,167 @@
+"""Compile-time fusion of stateless function-block chains into single callables."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+
+if TYPE_CHECKING:
+    from bdsim.block import Block, PortValueSlot
+    from bdsim.blockdiagram import BlockDiagram
+
+# ------------------------------------------------------------------------- #
+#
+# A fused chain is a set of fusible function blocks where every member, except
+# the last one (the root), sends all of its outputs to exactly one other member.
+# The chain is executed at the root's position in the schedule by a generated
+# function in which intermediate outputs are Python locals: they are never
+# validated, checked for finiteness or published to output slots.  Only the
+# root's output goes through the normal evaluate path.
+#
+# Linear chains are the common case, but fan-in is allowed, eg. two GAIN blocks
+# feeding one SUM block form a single fused chain of three blocks.
+#
+# ------------------------------------------------------------------------- #
+
+
+class FusedChain:
+    """
+    Fused execution of a chain of stateless function blocks
+
+    :param blocks: member blocks in execution order, the last is the root
+    :type blocks: list of Block
+
+    Calling the instance with the simulation time evaluates every member block
+    and returns the output list of the root block.  Inputs that come from
+    outside the chain are read from the bound input slots, inputs that come from
+    inside the chain are read from locals of the generated function.
+
+    Exceptions raised by a member block are reported against that block, as for
+    :meth:`Block.output_safe`.
+    """
+
+    __slots__ = ("blocks", "slots", "source", "_fn")
+
+    def __init__(self, blocks: list[Block]) -> None:
+        self.blocks: tuple[Block, ...] = tuple(blocks)
+        self.source, slots = _generate(self.blocks)
+        self.slots: tuple[PortValueSlot, ...] = tuple(slots)
+        self._fn: Callable[..., list[Any]] = _compile(self.source)
+
+    def __call__(self, t: float) -> list[Any]:
+        return self._fn(t, self.blocks, self.slots)
+
+    def __repr__(self) -> str:
+        return "FusedChain(" + " -> ".join(str(b.name) for b in self.blocks) + ")"
+
+    @property
+    def root(self) -> Block:
+        """The block whose output is published by the chain"""
+        return self.blocks[-1]
+
+    def __deepcopy__(self, memo: dict[int, Any]) -> FusedChain:
+        from copy import deepcopy
+
+        # the generated code only refers to its arguments, so it can be shared
+        result = FusedChain.__new__(FusedChain)
+        memo[id(self)] = result
+        result.blocks = deepcopy(self.blocks, memo)
+        result.slots = deepcopy(self.slots, memo)
+        result.source = self.source
+        result._fn = self._fn
+        return result
+
+
+def _generate(blocks: tuple[Block, ...]) -> tuple[str, list[PortValueSlot]]:
+    # generate Python source for the fused function
+    index = {b: i for i, b in enumerate(blocks)}
+    slots: list[PortValueSlot] = []
+
+    lines = [
+        "def _fused(t, B, S):",
+        "    " + ", ".join(f"b{i}" for i in range(len(blocks))) + ", = B",
+    ]
+    body = []
+    for i, b in enumerate(blocks):
+        args = []
+        for port, wire in enumerate(b._input_wires):
+            assert wire is not None, f"block {b.name} has an unconnected input"
+            source = wire.start.block
+            if source in index:
+                # value comes from an earlier member of the chain
+                args.append(f"y{index[source]}[{wire.start.port}]")
+            else:
+                slot = b._inport_slots[port]
+                assert slot is not None, f"block {b.name} input slots not bound"
+                args.append(f"s{len(slots)}.value")
+                slots.append(slot)
+        body += [
+            f"    u = [{', '.join(args)}]",
+            "    try:",
+            f"        y{i} = b{i}.output(t, u, None)",
+            "    except Exception as err:",
+            f"        b{i}._raise_runtime_error('output', err, t=t, inputs=u, state=None)",
+        ]
+    if slots:
+        lines.append("    " + ", ".join(f"s{i}" for i in range(len(slots))) + ", = S")
+    lines += body
+    lines.append(f"    return y{len(blocks) - 1}")
+    return "\n".join(lines) + "\n", slots
+
+
+def _compile(source: str) -> Callable[..., list[Any]]:
+    namespace: dict[str, Any] = {}
+    exec(compile(source, "<bdsim-fused-chain>", "exec"), namespace)
+    return namespace["_fused"]
+
+
+def _successor(block: Block, watched: set[Block]) -> Block | None:
+    # the single fusible block that consumes every output of this block, if any
+    if not _isfusible(block) or block in watched or block.nout == 0:
+        return None
+    consumers = {w.end.block for wires in block._output_wires for w in wires}
+    if len(consumers) != 1:
+        return None
+    consumer = consumers.pop()
+    if not _isfusible(consumer):
+        return None
+    return consumer
+
+
+def _isfusible(block: Block) -> bool:
+    return block._fusible and block.blockclass == "function" and block.nstates == 0
+
+
+def find_fused_chains(
+    bd: BlockDiagram, watched: Iterable[Block] = ()
+) -> list[FusedChain]:
+    """
+    Find the maximal fusible chains in a compiled block diagram
+
+    :param bd: compiled block diagram
+    :type bd: BlockDiagram
+    :param watched: blocks whose outputs must remain published, defaults to ()
+    :type watched: iterable of Block
+    :return: fused chains, each of two or more blocks
+    :rtype: list of FusedChain
+
+    Watched blocks can be members of a chain only as its root, since intermediate
+    values are not published.
+    """
+    watched = set(watched)
+    successor = {b: _successor(b, watched) for b in bd.blocklist}
+
+    def members(root: Block) -> list[Block]:
+        chain: list[Block] = []
+        for source in dict.fromkeys(root.sources):
+            if successor.get(source) is root:
+                chain.extend(members(source))
+        chain.append(root)
+        return chain
+
+    consumers = set(successor.values())
+    chains = []
+    for group in bd.plan:
+        for b in group:
+            if successor[b] is None and b in consumers:
+                chains.append(FusedChain(members(b)))
+    return chains
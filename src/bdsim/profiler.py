@@ -0,0 +1,250 @@
+"""Per-block and per-phase profiling of a simulation run."""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+from ansitable import ANSITable, Column  # type: ignore[import-not-found]
+
+from bdsim.components import BDStruct
+
+if TYPE_CHECKING:
+    from bdsim.blockdiagram import BlockDiagram
+    from bdsim.components import SimulationState
+
+# ------------------------------------------------------------------------- #
+#
+# The profiler times a run by shadowing methods with timed wrappers stored as
+# instance attributes, so a run without profiling executes exactly the same
+# code as before.  The wrapped methods are:
+#
+#   - the block methods output, deriv, next and step, through the *_safe
+#     methods that the engine calls
+#   - the engine phases, the BlockDiagram methods evaluate, state_map, deriv,
+#     next and step (graphics) and the event probe of the simulation state
+#
+# The runner also times the solve_ivp call and the replay of accepted points
+# for each interval, see Profiler.wrap and Profiler.enter/exit.
+#
+# Timers nest, the self time of an entry is its total time less the time of
+# the entries called from it.  For example the self time of solve_ivp is the
+# time spent in the integrator itself, not evaluating the block diagram.
+#
+# ------------------------------------------------------------------------- #
+
+# block methods that are timed, safe wrapper name -> reported method name
+_BLOCK_METHODS = {
+    "output_safe": "output",
+    "output_inplace_safe": "output",
+    "deriv_safe": "deriv",
+    "next_safe": "next",
+    "step_safe": "step",
+}
+
+# engine phases that are timed, BlockDiagram method name -> phase name
+_DIAGRAM_METHODS = {
+    "evaluate": "evaluate",
+    "state_map": "state_map",
+    "deriv": "deriv",
+    "next": "next",
+    "step": "graphics",
+}
+
+_ENGINE = "bdsim"
+
+
+class Profiler:
+    """
+    Wall time and call counts for the blocks and engine phases of a run
+
+    Created by :meth:`BDSim.run` when profiling is enabled.  Each entry is
+    keyed by a name, the block name or ``"bdsim"`` for an engine phase, and a
+    method or phase name.
+
+    :seealso: :meth:`result` :func:`report_profile`
+    """
+
+    def __init__(self) -> None:
+        # (name, type, method) -> [calls, total time, self time]
+        self.entries: dict[tuple[str, str, str], list] = {}
+        # child time accumulated by each active timer
+        self._stack: list[float] = []
+        self._patched: list[tuple[Any, str]] = []
+
+    def __repr__(self) -> str:
+        return f"Profiler({len(self.entries)} entries)"
+
+    def _entry(self, key: tuple[str, str, str]) -> list:
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = [0, 0.0, 0.0]
+        return entry
+
+    def enter(self) -> None:
+        """Start a timer for a phase that is not a function call, see :meth:`exit`"""
+        self._stack.append(0.0)
+        self._stack.append(time.perf_counter())
+
+    def exit(self, phase: str) -> None:
+        """Stop the timer started by :meth:`enter` and charge it to ``phase``"""
+        elapsed = time.perf_counter() - self._stack.pop()
+        self._charge(self._entry((_ENGINE, "engine", phase)), elapsed)
+
+    def _charge(self, entry: list, elapsed: float) -> None:
+        child = self._stack.pop()
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += elapsed - child
+        if self._stack:
+            self._stack[-2] += elapsed
+
+    def wrap(
+        self, func: Callable[..., Any], name: str, method: str, type: str = "engine"
+    ) -> Callable[..., Any]:
+        """
+        Timed version of a function
+
+        :param func: function to time
+        :type func: callable
+        :param name: entry name
+        :type name: str
+        :param method: method or phase name
+        :type method: str
+        :param type: block type, defaults to "engine"
+        :type type: str, optional
+        :return: function that charges its calls to the entry
+        :rtype: callable
+        """
+        entry = self._entry((name, type, method))
+        stack = self._stack
+        perf_counter = time.perf_counter
+
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            stack.append(0.0)
+            stack.append(perf_counter())
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = perf_counter() - stack.pop()
+                self._charge(entry, elapsed)
+
+        return timed
+
+    def _patch(self, obj: Any, attr: str, timed: Callable[..., Any]) -> None:
+        setattr(obj, attr, timed)
+        self._patched.append((obj, attr))
+
+    def instrument(self, bd: BlockDiagram, simstate: SimulationState) -> None:
+        """
+        Time the blocks and engine phases of a block diagram
+
+        :param bd: block diagram
+        :type bd: BlockDiagram
+        :param simstate: simulation state
+        :type simstate: SimulationState
+
+        Fused chains call their member blocks directly, so they should be
+        disabled to attribute time to every block.
+        """
+        for b in bd.blocklist:
+            for attr, method in _BLOCK_METHODS.items():
+                if hasattr(b, attr):
+                    timed = self.wrap(getattr(b, attr), b.name, method, b.type)
+                    self._patch(b, attr, timed)
+        for attr, phase in _DIAGRAM_METHODS.items():
+            self._patch(bd, attr, self.wrap(getattr(bd, attr), _ENGINE, phase))
+        if hasattr(simstate, "ensure_event_probe_evaluated"):
+            probe = simstate.ensure_event_probe_evaluated  # type: ignore[attr-defined]
+            self._patch(
+                simstate,
+                "ensure_event_probe_evaluated",
+                self.wrap(probe, _ENGINE, "event_probe"),
+            )
+
+    def remove(self) -> None:
+        """Remove the timed wrappers added by :meth:`instrument`"""
+        for obj, attr in self._patched:
+            obj.__dict__.pop(attr, None)
+        self._patched = []
+
+    def result(self, sortby: str = "self") -> BDStruct:
+        """
+        Profile as a results struct
+
+        :param sortby: sort entries in decreasing order of "self" time
+            (default), "total" time or "calls"
+        :type sortby: str, optional
+        :return: profile
+        :rtype: BDStruct
+
+        The struct has equal length columns ``name``, ``type``, ``method``,
+        ``calls``, ``total`` and ``self``, one row per entry that was called.
+        Times are in seconds.
+        """
+        column = {"calls": 0, "total": 1, "self": 2}[sortby]
+        rows = sorted(
+            ((key, value) for key, value in self.entries.items() if value[0] > 0),
+            key=lambda item: item[1][column],
+            reverse=True,
+        )
+        profile = BDStruct(name="profile")
+        profile["name"] = [key[0] for key, _ in rows]
+        profile["type"] = [key[1] for key, _ in rows]
+        profile["method"] = [key[2] for key, _ in rows]
+        profile["calls"] = np.array([value[0] for _, value in rows], dtype=int)
+        profile["total"] = np.array([value[1] for _, value in rows])
+        profile["self"] = np.array([value[2] for _, value in rows])
+        return profile
+
+
+def report_profile(
+    profile: BDStruct, sortby: str = "self", limit: int | None = None, **kwargs: Any
+) -> None:
+    """
+    Print a profile
+
+    :param profile: profile from :meth:`Profiler.result`, ``out.profile``
+    :type profile: BDStruct
+    :param sortby: sort rows in decreasing order of "self" time (default),
+        "total" time or "calls"
+    :type sortby: str, optional
+    :param limit: maximum number of rows, defaults to all
+    :type limit: int, optional
+    :param kwargs: options passed to :meth:`ansitable.table.ANSIMatrix.print`
+    :type kwargs: dict
+
+    Print a table with one row per block method or engine phase, the number of
+    calls, the total and self time, and the self time as a percentage of the
+    total self time of the run.
+    """
+    table = ANSITable(
+        Column("name", headalign="^", colalign="<"),
+        Column("type", headalign="^", colalign="<"),
+        Column("method", headalign="^", colalign="<"),
+        Column("calls", headalign="^", colalign=">"),
+        Column("total (ms)", headalign="^", colalign=">", fmt="{:.3f}"),
+        Column("self (ms)", headalign="^", colalign=">", fmt="{:.3f}"),
+        Column("self %", headalign="^", colalign=">", fmt="{:.1f}"),
+        Column("us/call", headalign="^", colalign=">", fmt="{:.2f}"),
+        border="thin",
+    )
+    values = np.asarray(profile[sortby])
+    order = np.argsort(-values, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+    total_self = max(float(np.sum(profile["self"])), 1e-12)
+    for i in order:
+        calls = int(profile["calls"][i])
+        table.row(
+            profile["name"][i],
+            profile["type"][i],
+            profile["method"][i],
+            calls,
+            profile["total"][i] * 1e3,
+            profile["self"][i] * 1e3,
+            profile["self"][i] / total_self * 100,
+            profile["total"][i] / max(calls, 1) * 1e6,
+        )
+    table.print(**kwargs)
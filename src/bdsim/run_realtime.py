@@ -0,0 +1,334 @@
+"""Soft real-time execution of a block diagram, paced by the wall clock."""
+
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+import numpy as np
+
+from bdsim.components import BDStruct
+from bdsim.run_sim import BDSim
+
+if TYPE_CHECKING:
+    from bdsim.blockdiagram import BlockDiagram
+    from bdsim.components import SimulationState
+
+__all__ = ["BDSimRealtime", "Pacer"]
+
+# ------------------------------------------------------------------------- #
+#
+# The simulation engine is unchanged, the pacer wraps the interval handler of
+# BDSim.run.  When the handler has advanced the simulation to the end of an
+# interval, at simulation time t, the pacer sleeps until the deadline of t
+#
+#     deadline(t) = origin + (t - t0) / speed
+#
+# and the engine then dispatches the clock ticks and events due at t.  Clock
+# ticks are interval boundaries, so they are released on time, and for
+# diagrams with continuous states the pacer schedules itself as an event
+# every ``period`` of simulation time, so integration is paced in steps.
+#
+# Waiting is a sleep until shortly before the deadline and then a spin on
+# time.perf_counter(), a monotonic high-resolution clock.
+#
+# For every boundary the pacer records
+#
+#   latency   wall time from the deadline to the release of the boundary,
+#             small when on time, the overrun when late
+#   compute   wall time of the interval, from the previous release until the
+#             handler returned
+#   miss      the handler returned after the deadline, plus tolerance
+#
+# A miss is handled according to the overrun policy
+#
+#   skip      the missed deadlines are dropped, the schedule restarts from
+#             the time the interval finished and the simulation falls
+#             behind the wall clock by the overrun, recorded as slip
+#   catchup   the schedule is kept and the following intervals run without
+#             waiting until the simulation is back on time
+#   stop      the simulation is stopped at the end of the interval
+#
+# ------------------------------------------------------------------------- #
+
+OVERRUN_POLICIES = ("skip", "catchup", "stop")
+
+
+class Pacer:
+    """
+    Pace a simulation run against the wall clock
+
+    :param speed: simulation seconds per wall clock second, defaults to 1
+    :type speed: float, optional
+    :param period: pacing period for continuous states, in simulation seconds,
+        defaults to 0.01.  If None integration is paced only at clock ticks
+        and scheduled events.
+    :type period: float, optional
+    :param overrun: deadline miss policy, "skip" (default), "catchup" or "stop"
+    :type overrun: str, optional
+    :param tolerance: lateness that is not a deadline miss, in seconds,
+        defaults to 0
+    :type tolerance: float, optional
+    :param spin: time before a deadline to stop sleeping and spin, in seconds,
+        defaults to 0.001
+    :type spin: float, optional
+    :param clock: monotonic clock in seconds, defaults to ``time.perf_counter``
+    :type clock: callable, optional
+    :raises ValueError: unknown overrun policy or non-positive speed or period
+
+    Created by :class:`BDSimRealtime` for each run and held by the simulation
+    state as ``simstate.pacer``.
+
+    :seealso: :meth:`result`
+    """
+
+    name = "realtime"
+
+    def __init__(
+        self,
+        speed: float = 1.0,
+        period: float | None = 0.01,
+        overrun: str = "skip",
+        tolerance: float = 0.0,
+        spin: float = 1e-3,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(
+                f"unknown overrun policy {overrun!r}, must be one of "
+                + ", ".join(OVERRUN_POLICIES)
+            )
+        if speed <= 0:
+            raise ValueError("speed must be > 0")
+        if period is not None and period <= 0:
+            raise ValueError("period must be > 0")
+        self.speed = float(speed)
+        self.period = period
+        self.overrun = overrun
+        self.tolerance = float(tolerance)
+        self.spin = float(spin)
+        self.clock = clock
+
+        self.t: list[float] = []
+        self.latency: list[float] = []
+        self.compute: list[float] = []
+        self.miss: list[bool] = []
+        self.slip = 0.0
+        self._origin = 0.0
+        self._t0 = 0.0
+        self._tf = 0.0
+        self._release = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"Pacer(speed={self.speed}, period={self.period}, "
+            f"overrun={self.overrun}, ticks={len(self.t)}, misses={sum(self.miss)})"
+        )
+
+    def __str__(self) -> str:
+        return self.name
+
+    def deadline(self, t: float) -> float:
+        """
+        Wall clock deadline of a simulation time
+
+        :param t: simulation time
+        :type t: float
+        :return: wall time of ``clock``
+        :rtype: float
+        """
+        return self._origin + (t - self._t0) / self.speed
+
+    def start(self, bd: BlockDiagram, simstate: SimulationState, t0: float) -> None:
+        """
+        Start pacing the run
+
+        :param bd: block diagram being simulated
+        :type bd: BlockDiagram
+        :param simstate: simulation state of the run
+        :type simstate: SimulationState
+        :param t0: simulation time at the start of the run
+        :type t0: float
+
+        The simulation time ``t0`` is due now.
+        """
+        self._t0 = t0
+        self._tf = simstate.tf
+        self._origin = self._release = self.clock()
+        if self.period is not None and bd.nstates > 0:
+            self._schedule(t0, simstate)
+
+    def _schedule(self, t: float, simstate: SimulationState) -> None:
+        tnext = t + self.period
+        if tnext < self._tf:
+            simstate.declare_event(self, tnext)
+
+    def __call__(self, t: float, simstate: SimulationState) -> None:
+        # periodic event that bounds the integration intervals
+        self._schedule(t, simstate)
+
+    def wait(self, t: float, simstate: SimulationState) -> None:
+        """
+        Wait until simulation time is due
+
+        :param t: simulation time that has been reached
+        :type t: float
+        :param simstate: simulation state of the run
+        :type simstate: SimulationState
+
+        Sleep until the deadline of ``t``, record the latency and compute time
+        and apply the overrun policy if the deadline was missed.
+        """
+        finished = self.clock()
+        deadline = self.deadline(t)
+        late = finished - deadline
+        miss = late > self.tolerance
+        if miss and self.overrun == "skip":
+            self._origin += late
+            self.slip += late
+            deadline = finished
+        elif not miss:
+            self._sleep_until(deadline)
+        released = self.clock()
+
+        self.t.append(t)
+        self.latency.append(released - deadline if not miss else late)
+        self.compute.append(finished - self._release)
+        self.miss.append(miss)
+        self._release = released
+
+        if miss and self.overrun == "stop" and simstate.stop is None:
+            simstate.stop = self
+
+    def _sleep_until(self, deadline: float) -> None:
+        remaining = deadline - self.clock()
+        if remaining > self.spin:
+            time.sleep(remaining - self.spin)
+        while self.clock() < deadline:
+            pass
+
+    def wrap(self, handler: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Pace an interval handler
+
+        :param handler: interval handler of :meth:`BDSim.run`
+        :type handler: callable
+        :return: handler that waits for the end of the interval to be due
+        :rtype: callable
+        """
+
+        def paced(bd: Any, t0: float, t1: float, x: Any, simstate: Any) -> Any:
+            result = handler(bd, t0, t1, x, simstate)
+            if result is not None:
+                self.wait(result[1], simstate)
+            return result
+
+        return paced
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Statistics for the whole run
+
+        :return: statistics
+        :rtype: dict
+
+        The dict has the keys ``ticks``, ``misses``, ``mean_latency``,
+        ``max_latency``, ``jitter``, the standard deviation of the latency of
+        boundaries released on time, ``max_compute`` and ``slip``.  Times are
+        in seconds and NaN if there are no boundaries.
+        """
+        latency = np.array(self.latency)
+        ontime = latency[~np.array(self.miss, dtype=bool)]
+
+        def stat(f: Callable[[np.ndarray], Any], x: np.ndarray) -> float:
+            return float(f(x)) if len(x) > 0 else np.nan
+
+        return {
+            "ticks": len(self.t),
+            "misses": int(sum(self.miss)),
+            "mean_latency": stat(np.mean, latency),
+            "max_latency": stat(np.max, latency),
+            "jitter": stat(np.std, ontime),
+            "max_compute": stat(np.max, np.array(self.compute)),
+            "slip": self.slip,
+        }
+
+    def result(self) -> BDStruct:
+        """
+        Real-time statistics as a results struct
+
+        :return: real-time statistics
+        :rtype: BDStruct
+
+        The struct has equal length columns ``t``, ``latency``, ``compute`` and
+        ``miss``, one row per paced boundary, the keys of :meth:`summary`, and
+        ``speed`` and ``overrun``.
+        """
+        out = BDStruct(name="realtime")
+        out["t"] = np.array(self.t)
+        out["latency"] = np.array(self.latency)
+        out["compute"] = np.array(self.compute)
+        out["miss"] = np.array(self.miss, dtype=bool)
+        for key, value in self.summary().items():
+            out[key] = value
+        out["speed"] = self.speed
+        out["overrun"] = self.overrun
+        return out
+
+
+class BDSimRealtime(BDSim):
+    """
+    Simulation runner paced by the wall clock
+
+    :param speed: simulation seconds per wall clock second, defaults to 1
+    :type speed: float, optional
+    :param period: pacing period for continuous states, in simulation seconds,
+        defaults to 0.01
+    :type period: float, optional
+    :param overrun: deadline miss policy, "skip" (default), "catchup" or "stop"
+    :type overrun: str, optional
+    :param tolerance: lateness that is not a deadline miss, in seconds,
+        defaults to 0
+    :type tolerance: float, optional
+    :param kwargs: options passed to :class:`BDSim`
+    :raises ValueError: unknown overrun policy or non-positive speed or period
+
+    A soft real-time runner, :meth:`run` simulates the block diagram no faster
+    than the wall clock, each clock tick and every ``period`` of continuous
+    integration is released at its deadline.  The results have the same
+    content as for :class:`BDSim`, and ``out[".realtime"]`` holds the latency,
+    compute time and deadline misses of every paced boundary, see
+    :meth:`Pacer.result`.
+
+    Example::
+
+        sim = bdsim.BDSimRealtime(overrun="stop")
+        bd = sim.blockdiagram()
+        ...
+        out = sim.run(bd, T=10)
+        print(out[".realtime"].misses)
+    """
+
+    def __init__(
+        self,
+        speed: float = 1.0,
+        period: float | None = 0.01,
+        overrun: str = "skip",
+        tolerance: float = 0.0,
+        **kwargs: Any,
+    ) -> None:
+        # check the arguments before the block library is loaded
+        Pacer(speed=speed, period=period, overrun=overrun)
+        super().__init__(**kwargs)
+        self.speed = speed
+        self.period = period
+        self.overrun = overrun
+        self.tolerance = tolerance
+
+    def _make_pacer(self) -> Pacer:
+        return Pacer(
+            speed=self.speed,
+            period=self.period,
+            overrun=self.overrun,
+            tolerance=self.tolerance,
+        )
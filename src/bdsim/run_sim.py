@@ -3,11 +3,13 @@
 from __future__ import annotations
 
 import ast
+import asyncio
 from concurrent.futures import Future, ThreadPoolExecutor
 from collections import Counter, namedtuple
 from dataclasses import dataclass, field
 import io
 import inspect
+import multiprocessing
 import os
 from pathlib import Path
 import shutil
@@ -20,13 +22,21 @@ import time
 import traceback
 import traceback as tb
 import warnings
-from typing import Any, Callable, NoReturn, Sequence
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Generator,
+    NoReturn,
+    Sequence,
+)
 
 import matplotlib
 
 import matplotlib.pyplot as plt
 import numpy as np
 import scipy.integrate as integrate
+from scipy.optimize import OptimizeResult
 import spatialmath.base as smb  # type: ignore[import-not-found]
 from colored import attr, fg
 
@@ -34,6 +44,7 @@ from bdsim.components import (
     BDStruct,
     Block,
     Clock,
+    ClockState,
     OptionsBase,
     Plug,
     Runner,
@@ -49,6 +60,11 @@ from bdsim.exceptions import (
     SimulationContextError,
 )
 from bdsim.blockdiagram import BlockDiagram
+from bdsim.checkpoint import Checkpoint
+from bdsim.exact import ExactPropagator
+from bdsim.profiler import Profiler, report_profile
+from bdsim.telemetry import SolverTelemetry
+from bdsim.trace import Tracer
 from bdsim.run_context import SimulationContext, SimulationJob
 from bdsim.display import DisplayManager
 from bdsim.notebook_patches import (
@@ -183,6 +199,155 @@ def _store_watch_output(
     out[".ywatch"] = ywatch
 
 
+def _store_stats(out: BDStruct, simstate: BDSimState) -> None:
+    """Save the integration statistics of a run into ``out[".stats"]``.
+
+    :param out: results struct being built for :meth:`BDSim.run`
+    :type out: BDStruct
+    :param simstate: per-run simulation state
+    :type simstate: BDSimState
+    """
+    stats = BDStruct(name="stats")
+    stats["integration_time_points"] = len(simstate.tlist)
+    stats["evaluations"] = simstate.count
+    stats["run_interval_calls"] = simstate.stats.run_interval_calls
+    stats["ydot_calls"] = simstate.stats.ydot_calls
+    stats["integrator_wall_time"] = simstate.stats.integrator_wall_time
+    stats["events_detected_total"] = simstate.stats.events_detected_total
+    stats["events_detected_by_source"] = dict(
+        simstate.stats.events_detected_by_source
+    )
+    for key, value in simstate.stats.solver.summary().items():
+        stats[key] = value
+    out[".stats"] = stats
+
+
+def _drain(run: Generator[Any, None, BDStruct]) -> BDStruct:
+    """Run a simulation generator to completion.
+
+    :param run: generator from :meth:`BDSim._run`
+    :type run: generator
+    :return: simulation results
+    :rtype: BDStruct
+    """
+    while True:
+        try:
+            next(run)
+        except StopIteration as stop:
+            return stop.value
+
+
+def _end_state(simstate: BDSimState) -> BDSimState:
+    # the state at the end of a run that checkpoint() and the profile report
+    # need, without the logs of the run
+    end = BDSimState()
+    end.t = simstate.t
+    end.x = simstate.x
+    end.eventq = simstate.eventq
+    for clock, clock_state in simstate.clock_states.items():
+        end.clock_states[clock] = ClockState(clock_state.state)
+        end.clock_states[clock].tick = clock_state.tick
+    end.profiler = simstate.profiler
+    return end
+
+
+def _restart_reason(sources: list[Any]) -> str:
+    """Reason an interval ended at a scheduled boundary.
+
+    :param sources: event sources due at the boundary
+    :type sources: list
+    :return: "clock" for a clock tick, "end" for the end of the run, otherwise
+        "event"
+    :rtype: str
+    """
+    if any(isinstance(source, Clock) for source in sources):
+        return "clock"
+    if any(source is None for source in sources) or not sources:
+        return "end"
+    return "event"
+
+
+# ------------------------------------------------------------------------- #
+#
+# Parts of the continuous dynamics that do not interact, see
+# BlockDiagram.continuous_components, can be integrated separately over each
+# interval.  A part evaluates only the blocks that compute the inputs of its
+# continuous blocks and the solver chooses its steps for that part alone.
+# Linear parts driven by held signals are solved exactly, see bdsim.exact,
+# and take no steps.
+# Each part is solved with dense output so that the results can be merged at
+# the union of the times of the parts, the replay then evaluates the whole
+# diagram at those times as usual.
+#
+# In parallel the parts are integrated by a pool of worker processes, forked
+# at the start of the run so that each has a copy of the block diagram.  The
+# states of the clocked blocks are sent with every interval, the workers do
+# not see any other change made by the main process.
+#
+# ------------------------------------------------------------------------- #
+
+# block diagram and simulation state of a worker process
+_component_context: tuple[Any, BDSimState] | None = None
+
+
+def _component_rhs(
+    bd: Any, simstate: BDSimState, blocks: list[Block], plan: list, index: np.ndarray
+) -> Callable:
+    # state derivative of a component of the continuous dynamics
+    x = np.zeros((bd.nstates,))
+
+    def ydot(t: float, y: np.ndarray) -> np.ndarray:
+        simstate.t = t
+        simstate.solving = True
+        simstate.count += 1
+        simstate.stats.ydot_calls += 1
+        # the states of the other components are not read by this plan
+        x[index] = y
+        bd.evaluate(
+            bd.state_map(x, simstate), t, sinks=False, inplace=True, plan=plan
+        )
+        return bd.deriv(t, blocks=blocks)
+
+    if simstate.instrumented:
+        rhs = ydot
+
+        def ydot(t: float, y: np.ndarray) -> np.ndarray:  # type: ignore[no-redef]
+            eval_start = time.time()
+            yd = rhs(t, y)
+            simstate.bdtime += time.time() - eval_start
+            return yd
+
+    return ydot
+
+
+def _component_init(bd: Any, simstate: BDSimState) -> None:
+    global _component_context
+    _component_context = (bd, simstate)
+
+
+def _component_solve(
+    k: int,
+    interval: tuple[float, float],
+    x0: np.ndarray,
+    clock_states: list[np.ndarray],
+    ivp_args: dict[str, Any],
+) -> tuple[Any, list[float], int | None]:
+    # integrate component k in a worker process, returns the result and the
+    # steps taken
+    assert _component_context is not None
+    bd, simstate = _component_context
+    simstate.clock_states = {
+        clock: ClockState(state) for clock, state in zip(bd.clocklist, clock_states)
+    }
+    blocks, plan, index, _ = simstate.components[k]
+    telemetry = SolverTelemetry()
+    ivp_args = dict(ivp_args, method=telemetry.method(ivp_args["method"]))
+    result = integrate.solve_ivp(
+        _component_rhs(bd, simstate, blocks, plan, index), interval, x0, **ivp_args
+    )
+    return result, telemetry._steps, telemetry._rejected
+
+
 class _LazyBlockClass:
     """Proxy object that resolves a block class on first use."""
 
@@ -256,6 +421,18 @@ class RunIntervalStats:
     integrator_wall_time: float = 0.0
     events_detected_total: int = 0
     events_detected_by_source: Counter[str] = field(default_factory=Counter)
+    solver: SolverTelemetry = field(default_factory=SolverTelemetry)
+
+
+@dataclass
+class Sample:
+    """One logged sample of a simulation run, see :meth:`BDSim.stream`."""
+
+    t: float
+    #: continuous state, None if the diagram has no continuous states
+    x: np.ndarray | None
+    #: values of the watched signals, in the order of ``watch``
+    y: tuple[Any, ...]
 
 
 class BDSimState(SimulationState):
@@ -313,6 +490,13 @@ class BDSimState(SimulationState):
         Horizontal figure offset in pixels.
     crossing_detectors
         Registered solve_ivp zero-crossing detectors and owning blocks.
+    sample_hooks
+        Functions called with the time of every logged sample.
+    sample_events
+        Event sources at which the block diagram is evaluated and sampled,
+        see :meth:`declare_sample_event`.
+    end_hooks
+        Functions called when the run ends.
     _event_probe_t
         Last event-probe time cached for shared detector evaluation.
     _event_probe_y
@@ -321,8 +505,37 @@ class BDSimState(SimulationState):
         Active interval start bound for valid event probes.
     _event_probe_interval_end
         Active interval end bound for valid event probes.
+    _event_probe_plan
+        Part of the execution plan that feeds the crossing detectors.
     stats
         RunIntervalStats counters for interval/solver diagnostics.
+    model
+        Generated model used to compute the state derivative, or None.
+    profiler
+        Profiler that times blocks and engine phases, or None.
+    tracer
+        Tracer that records a timeline of the run, or None.
+    pacer
+        Pacer that keeps the run in step with the wall clock, or None, see
+        :class:`~bdsim.run_realtime.BDSimRealtime`.
+    seed
+        SeedSequence from which random blocks derive their streams, or None.
+    components
+        Parts of the continuous dynamics that are integrated separately, each
+        a tuple of its blocks, the part of the execution plan that computes
+        their inputs, the indices of their states and the propagator of a part
+        that is solved exactly, or None, see the ``partition`` and ``exact``
+        options of :meth:`BDSim.run`.  Empty if the dynamics are integrated as
+        a whole.
+    component_pool
+        Pool of worker processes that integrate the components, or None.
+    instrumented
+        True if the instrumented evaluation path is used, see
+        :meth:`BlockDiagram.instrument`.  Otherwise the state derivative
+        evaluations are not timed.
+    solving
+        True while the solver evaluates the state derivative, ``t`` is then a
+        trial time and ``x`` is not the state at that time.
     """
 
     def __init__(self) -> None:
@@ -353,6 +566,9 @@ class BDSimState(SimulationState):
         # Crossing detectors: zero-crossing detection callbacks for solve_ivp.
         # Distinct from scheduled_events (discrete-time), these are continuous root-finding.
         self.crossing_detectors: list[tuple[Callable[[float, Any], float], Block]] = []
+        self.sample_hooks: list[Callable[[float], None]] = []
+        self.sample_events: set[Callable[[float, Any], None]] = set()
+        self.end_hooks: list[Callable[[], None]] = []
         # Per-probe cache for solve_ivp event detector group evaluation.
         #
         # solve_ivp may call multiple event detector callables sequentially for the
@@ -362,7 +578,19 @@ class BDSimState(SimulationState):
         self._event_probe_y: np.ndarray | None = None
         self._event_probe_interval_start: float | None = None
         self._event_probe_interval_end: float | None = None
+        self._event_probe_plan: list | None = None
         self.stats = RunIntervalStats()
+        self.model: Any = None
+        self.profiler: Profiler | None = None
+        self.tracer: Tracer | None = None
+        self.pacer: Any = None
+        self.seed: np.random.SeedSequence | None = None
+        self.components: list[
+            tuple[list[Block], list, np.ndarray, ExactPropagator | None]
+        ] = []
+        self.component_pool: Any = None
+        self.instrumented: bool = True
+        self.solving: bool = False
 
     def __repr__(self) -> str:
         s = f"BDSimState(t={self.bdtime:.3f}, count={self.count}"
@@ -384,6 +612,38 @@ class BDSimState(SimulationState):
         Distinct from scheduled discrete events; these are detected during integration.
         """
         self.crossing_detectors.append((detector, block))
+        self._event_probe_plan = None
+
+    def declare_sample_hook(self, hook: Callable[[float], None]) -> None:
+        """Register a function called with the time of every logged sample.
+
+        The hook is called after the block diagram has been evaluated at that
+        time, when every block input is valid, for example to record the input
+        history of a delay.
+        """
+        self.sample_hooks.append(hook)
+
+    def declare_sample_event(
+        self, source: Callable[[float, Any], None], t: float
+    ) -> None:
+        """Schedule an event at which the block diagram is sampled.
+
+        As for :meth:`declare_event` ``source(t, simstate)`` is called at time
+        ``t``, and the block diagram is evaluated and the sample logged there.
+        A diagram without continuous states is otherwise only evaluated at
+        clock ticks.
+        """
+        self.sample_events.add(source)
+        self.declare_event(source, t)
+
+    def declare_end_hook(self, hook: Callable[[], None]) -> None:
+        """Register a function called when the run ends.
+
+        The hook is called with no arguments whether the run finished, was
+        stopped or raised an exception, for example to flush and close a
+        file.
+        """
+        self.end_hooks.append(hook)
 
     def reset_event_probe_cache(self) -> None:
         """Invalidate cached solve_ivp event-probe evaluation state."""
@@ -407,6 +667,10 @@ class BDSimState(SimulationState):
         inputs. This helper guarantees that for a given probe `(t, y)` the
         network is propagated at most once, regardless of how many detectors
         are invoked.
+
+        Only the blocks that feed the crossing detector blocks are evaluated,
+        and not even those if the probe matches the last evaluation recorded by
+        :meth:`mark_event_probe_evaluated`.
         """
         t0 = self._event_probe_interval_start
         t1 = self._event_probe_interval_end
@@ -423,9 +687,21 @@ class BDSimState(SimulationState):
             and np.array_equal(y_arr, self._event_probe_y)
         ):
             return
-        bd.evaluate(bd.state_map(y, self), t, sinks=False)
+        if self._event_probe_plan is None:
+            self._event_probe_plan = bd.cone_plan(
+                [block for _, block in self.crossing_detectors]
+            )
+        bd.evaluate(bd.state_map(y, self), t, sinks=False, plan=self._event_probe_plan)
+        self.mark_event_probe_evaluated(t, y_arr)
+
+    def mark_event_probe_evaluated(self, t: float, y: Any) -> None:
+        """Record that the diagram inputs are up to date for the state `(t, y)`.
+
+        Called after a full evaluation, such as for the state derivative, so
+        that an event probe at the same point does not evaluate again.
+        """
         self._event_probe_t = t
-        self._event_probe_y = np.array(y_arr, copy=True)
+        self._event_probe_y = np.array(y, copy=True)
 
 
 class BDSim(Runner):
@@ -578,7 +854,9 @@ class BDSim(Runner):
         ``--movies [DIR]``, ``-m [DIR]``    movies          None     record all graphics blocks to MP4 files in DIR (default: .), sampled at ``animation_rate``
         ``--no-movies``                     movies          None     disable automatic movie recording
         ``--blocks``                        blocks          False    display block list at startup
-        ``--debug F``, ``-d F``             debug           ``''``   debug flags: p/ropagate, s/tate, d/eriv, i/nteractive, g/raphics-diagnostics
+        ``--debug F``, ``-d F``             debug           ``''``   debug flags: p/ropagate, s/tate, d/eriv, i/nteractive, g/raphics-diagnostics, o/de-solver
+        ``--profile``                       profile         False    time every block and engine phase, see :meth:`run`
+        ``--trace FILE``                    trace           None     write a Chrome/Perfetto trace of the run to FILE
         ``--animation-rate R``              animation_rate  20.0     target update rate for animation/debugger (Hz)
         ``--simtime T[,dt]``, ``-S``        simtime         None     simulation time as T or T,dt
         ``--dt DT``                         dt              None     output sample interval (build solve_ivp t_eval)
@@ -999,6 +1277,9 @@ class BDSim(Runner):
             out = b.outport_value(p.port)
             simstate.plist[i].append(out)
 
+        for hook in simstate.sample_hooks:
+            hook(t)
+
         movies_enabled = getattr(simstate.options, "movies", None) is not None
         run_animation = bool(getattr(simstate.options, "animation", False)) or bool(
             movies_enabled
@@ -1042,6 +1323,13 @@ class BDSim(Runner):
         minstepsize: float = 1e-12,
         watch: Any = None,
         threaded: bool = False,
+        codegen: bool | str | None = None,
+        resume: Checkpoint | None = None,
+        profile: bool | None = None,
+        trace: str | None = None,
+        seed: Any = None,
+        partition: bool | str = False,
+        exact: bool = True,
     ) -> BDStruct:
         """Run a compiled block diagram.
 
@@ -1068,10 +1356,33 @@ class BDSim(Runner):
         :type watch: list, optional
         :param threaded: run in a worker thread (disables graphics), default False
         :type threaded: bool, optional
+        :param codegen: integrate using a generated model, True or the path of the
+            module to write, see :meth:`BlockDiagram.codegen`, default None
+        :type codegen: bool or str, optional
+        :param resume: continue the simulation from this checkpoint, see
+            :meth:`checkpoint`, default None
+        :type resume: Checkpoint, optional
+        :param profile: time every block and engine phase, defaults to the
+            ``--profile`` option
+        :type profile: bool, optional
+        :param trace: write a timeline of the run to this file, defaults to the
+            ``--trace`` option
+        :type trace: str, optional
+        :param seed: seed of the random blocks, an int, sequence of ints or
+            ``numpy.random.SeedSequence``, default None
+        :type seed: int or SeedSequence, optional
+        :param partition: integrate the independent parts of the continuous
+            dynamics separately, in worker processes if ``"parallel"``,
+            default False
+        :type partition: bool or str, optional
+        :param exact: solve linear parts of the dynamics driven by sampled
+            signals exactly, default True
+        :type exact: bool, optional
         :return: simulation results container
         :rtype: BDStruct
 
-        The system is simulated from time 0 to ``T``.
+        The system is simulated from time 0 to ``T``, or from the checkpoint
+        time to ``T`` if ``resume`` is given.
 
         The integration backend is always ``scipy.integrate.solve_ivp``.  The
         ``solver`` argument selects the method (e.g. ``RK45``, ``DOP853``,
@@ -1097,9 +1408,17 @@ class BDSim(Runner):
         - ``ynames`` — list of names of the watched ports, same order as
           ``watch``
         - ``.stats`` — :class:`BDStruct` with integration statistics:
-          ``integration_time_points``, ``run_interval_calls``,
+          ``integration_time_points``, ``evaluations``, ``run_interval_calls``,
           ``ydot_calls``, ``integrator_wall_time``,
-          ``events_detected_total``, ``events_detected_by_source``
+          ``events_detected_total``, ``events_detected_by_source``, and the
+          solver statistics ``nfev``, ``njev``, ``nlu``, ``accepted_steps``,
+          ``rejected_steps``, ``min_step``, ``median_step``, ``max_step`` and
+          ``restarts_by_reason``, see :meth:`SolverTelemetry.summary`
+        - ``.profile`` — :class:`BDStruct` with the profile if ``profile`` is
+          True, see :meth:`Profiler.result`
+        - ``.realtime`` — :class:`BDStruct` with the deadline statistics if the
+          runner is a :class:`~bdsim.run_realtime.BDSimRealtime`, see
+          :meth:`Pacer.result`
 
         The ``watch`` argument is a list of one or more signals whose value
         during simulation will be recorded.  Each element can be:
@@ -1115,6 +1434,62 @@ class BDSim(Runner):
         - ``'d'`` — trace state derivative
         - ``'i'`` — interactive step-by-step debugger
         - ``'g'`` — graphics/window diagnostics (figure creation, tiling, notebook display handles)
+        - ``'o'`` — ODE solver statistics and step sizes for each interval
+
+        If ``codegen`` is given the state derivative requested by the
+        integrator is computed by the module generated by
+        :meth:`BlockDiagram.codegen`, rather than by evaluating the block
+        diagram.  The diagram is still evaluated at every recorded time point,
+        so sinks, watched signals and events behave as before.
+
+        If ``resume`` is given, the continuous and discrete states, pending
+        events and block internal state are restored from the checkpoint,
+        which must be of ``bd``, and the results start at the checkpoint time.
+        The checkpoint itself is not changed.
+
+        If ``profile`` is True the wall time and number of calls of every
+        block method and engine phase are recorded, fused chains are disabled
+        so that every block is timed.  Print the profile with
+        ``sim.report(bd, type="profile")``.
+
+        If ``trace`` is given a timeline of the run is written to that file in
+        Chrome trace-event JSON format, which can be viewed by Perfetto or
+        ``chrome://tracing``.  It has a span for every interval, integration,
+        graphics update and sampled state derivative evaluation, and events
+        for clock ticks, zero crossings and stop requests, see
+        :class:`~bdsim.trace.Tracer`.
+
+        Random blocks, such as :class:`~bdsim.blocks.sources.WhiteNoise`,
+        without a seed of their own derive independent streams from ``seed``
+        and the block name.  For Monte Carlo runs spawn one seed per worker::
+
+            seeds = np.random.SeedSequence(42).spawn(8)
+            out = sim.run(bd, T=10, seed=seeds[worker])
+
+        If ``partition`` is True each of the parts of the continuous dynamics
+        found by :meth:`BlockDiagram.continuous_components`, for example
+        several plants that do not interact, is integrated with its own steps
+        so that a fast part does not force small steps on the others.  If it
+        is ``"parallel"`` each part is integrated by a worker process, forked
+        at the start of the run, which only sees the time, the continuous
+        states and the states of clocked blocks.  If a part depends on a block
+        with other memory, such as a DELAY, or on a source whose output is not
+        a function of time only, such as an INPORT, the parts are integrated
+        serially with a warning.  The results are merged, at the union of the
+        times of the parts, into the usual ``x`` and ``xnames``.  A diagram with zero-crossing detectors, or run with
+        ``codegen``, is integrated as a whole.
+
+        Parts of the continuous dynamics that are linear and driven only by
+        sampled or constant signals, such as the plant of a sampled-data
+        control loop, are found by :meth:`BlockDiagram.compile`, see
+        :meth:`BlockDiagram.sampled_linear`.  Unless ``exact`` is False they
+        are not integrated, their solution between clock ticks is computed
+        from a matrix exponential, and output points are spaced by ``dt``, or
+        at most ``max_step`` apart.  As for ``partition``, this does not apply
+        to a diagram with zero-crossing detectors or run with ``codegen``.
+
+        To run on an asyncio event loop, interleaved with other tasks, see
+        :meth:`run_async` and :meth:`stream`.
 
         .. note::
             Simulation stops if the step size falls below ``minstepsize``,
@@ -1122,6 +1497,60 @@ class BDSim(Runner):
             stiff or discontinuous system.
         """
 
+        return _drain(
+            self._run(
+                bd,
+                T=T,
+                dt=dt,
+                max_step=max_step,
+                solver=solver,
+                solver_args=solver_args,
+                debug=debug,
+                block=block,
+                checkfinite=checkfinite,
+                minstepsize=minstepsize,
+                watch=watch,
+                threaded=threaded,
+                codegen=codegen,
+                resume=resume,
+                profile=profile,
+                trace=trace,
+                seed=seed,
+                partition=partition,
+                exact=exact,
+            )
+        )
+
+    def _run(
+        self,
+        bd: Any,
+        *,
+        T: float,
+        dt: float | None,
+        max_step: float | None,
+        solver: str,
+        solver_args: dict[str, Any] | None,
+        debug: str,
+        block: bool | None,
+        checkfinite: bool,
+        minstepsize: float,
+        watch: Any,
+        threaded: bool,
+        codegen: bool | str | None,
+        resume: Checkpoint | None,
+        profile: bool | None,
+        trace: str | None,
+        seed: Any,
+        partition: bool | str,
+        exact: bool,
+    ) -> Generator[BDSimState, None, BDStruct]:
+        # The body of run(), a generator that yields the simulation state
+        # before each interval and returns the results.  It takes the
+        # parameters of run() by keyword and without defaults, so they can't
+        # get out of step.  The context of the
+        # run is only current while the generator runs, so that runs driven
+        # by run_async() or stream() can be interleaved on one thread.
+
         assert bd.compiled, "Network has not been compiled"
 
         if solver_args is None:
@@ -1151,6 +1580,16 @@ class BDSim(Runner):
 
         # Resolve run horizon from arguments/options once for this run.
         tf = T
+        t_start = 0.0
+        if resume is not None:
+            if resume.bd is not bd:
+                raise ValueError("checkpoint is not of this block diagram")
+            t_start = resume.t
+            if tf <= t_start:
+                raise ValueError(
+                    f"simulation horizon T={tf} is not after the checkpoint "
+                    f"time {t_start}"
+                )
 
         simstate = BDSimState()
         simstate.T = tf
@@ -1168,7 +1607,7 @@ class BDSim(Runner):
             raise ValueError("dt must be > 0")
 
         if max_step is None and "max_step" not in solver_args:
-            max_step = tf / 100
+            max_step = (tf - t_start) / 100
         simstate.dt = dt
         simstate.max_step = max_step
         simstate.count = 0
@@ -1181,6 +1620,18 @@ class BDSim(Runner):
         simstate.checkfinite = checkfinite
         simstate.options = run_options
         simstate.t_stop = None
+        if profile is None:
+            profile = bool(getattr(run_options, "profile", False))
+        if profile:
+            simstate.profiler = Profiler()
+        if trace is None:
+            trace = getattr(run_options, "trace", None)
+        if trace is not None:
+            simstate.tracer = Tracer(trace)
+        simstate.pacer = self._make_pacer()
+        if seed is not None and not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        simstate.seed = seed
 
         # Detect active matplotlib backend and mark notebook frontends so
         # notebook-specific display and ArmPlot patch paths are enabled.
@@ -1201,8 +1652,12 @@ class BDSim(Runner):
         )
         previous_context: SimulationContext | None = self._get_context()
         self._set_context(context)
+        self._last_context = context
 
+        failed = False
         try:
+            yield from self._pause(simstate, context, previous_context)
+
             if debug:
                 # append debug flags
                 if debug not in simstate.options.debug:
@@ -1289,7 +1744,26 @@ class BDSim(Runner):
             simstate.watchlist = watchlist
             simstate.watchnamelist = watchnamelist
 
-            x0 = bd.getstate0()
+            # watched blocks must publish their outputs, and debugging needs
+            # every block output, so exclude them from fused chains
+            bd.fuse_chains(
+                watched=[p.block for p in watchlist],
+                enable=bd._fuse and not simstate.hasdebug() and not profile,
+            )
+            # debugging and profiling need the instrumented evaluation path
+            simstate.instrumented = simstate.hasdebug() or bool(profile)
+            bd.instrument(simstate.instrumented)
+            if simstate.profiler is not None:
+                simstate.profiler.instrument(bd, simstate)
+
+            if codegen:
+                simstate.model = bd.codegen(None if codegen is True else codegen)
+            elif (partition and len(bd.components) > 1) or (exact and bd.exact):
+                self._partition(bd, simstate, partition, exact)
+
+            x0 = bd.getstate0() if resume is None else np.array(resume.x)
+            simstate.x = x0
+            simstate.t = t_start
 
             if not simstate.options.quiet:
                 print(fg("yellow"))
@@ -1346,12 +1820,21 @@ class BDSim(Runner):
                 b._graphics_start_in_progress_run_id = None
                 b._tile_subplotspec = None
 
+            # clocks schedule their next tick when started
+            if resume is not None:
+                resume.restore_clocks(simstate)
+
             # tell all blocks we're starting a BlockDiagram
             bd.start(simstate)
 
+            if resume is not None:
+                resume.restore_blocks(simstate)
+
             simstate.display_manager = DisplayManager.create(
                 notebook_backend=bool(getattr(simstate, "notebook_backend", False)),
             )
+            if simstate.tracer is not None:
+                simstate.tracer.instrument(bd, simstate)
 
             # initialize list of time and states
             simstate.tlist = []
@@ -1366,14 +1849,14 @@ class BDSim(Runner):
             # For pure discrete systems, evaluate at t=0 to capture initial conditions
             # (needed for STOP blocks and other immediate triggers that must fire at t=0).
             if bd.nstates == 0:
-                simstate.t = 0.0
+                simstate.t = t_start
                 simstate.count += 1
                 eval_start = time.time()
-                bd.evaluate(bd.state_map(np.array([]), simstate), 0.0)
+                bd.evaluate(bd.state_map(np.array([]), simstate), t_start)
                 eval_end = time.time()
                 simstate.bdtime += eval_end - eval_start
                 self._record_sample_and_service_hooks(
-                    bd, simstate, 0.0, None, stop_short_circuit=False
+                    bd, simstate, t_start, None, stop_short_circuit=False
                 )
                 if simstate.stop is not None:
                     # Stop triggered at t=0, early exit from run loop
@@ -1415,23 +1898,12 @@ class BDSim(Runner):
                         if legacy_name != name and legacy_name not in out:
                             out.add(legacy_name, clockdata)
                     _store_watch_output(out, watchlist, watchnamelist, simstate.plist)
-                    stats = BDStruct(name="stats")
-                    stats["integration_time_points"] = len(simstate.tlist)
-                    stats["run_interval_calls"] = simstate.stats.run_interval_calls
-                    stats["ydot_calls"] = simstate.stats.ydot_calls
-                    stats["integrator_wall_time"] = simstate.stats.integrator_wall_time
-                    stats["events_detected_total"] = (
-                        simstate.stats.events_detected_total
-                    )
-                    stats["events_detected_by_source"] = dict(
-                        simstate.stats.events_detected_by_source
-                    )
-                    out[".stats"] = stats
+                    _store_stats(out, simstate)
                     return out
 
             # Unified interval loop for both scheduled and crossing events.
             simstate.declare_event(None, tf)  # terminal boundary marker
-            t0 = 0.0
+            t0 = t_start
             simstate.eventq.pop_until(t0)
             x = x0
             nintervals = 0
@@ -1440,6 +1912,15 @@ class BDSim(Runner):
             interval_handler = (
                 self._interval_hybrid if bd.nstates > 0 else self._interval_discrete
             )
+            if simstate.tracer is not None:
+                interval_handler = simstate.tracer.wrap(
+                    interval_handler,
+                    interval_handler.__name__.lstrip("_"),
+                    "engine",
+                    args=lambda bd, t0, t1, *_: {"t0": t0, "t1": t1},
+                )
+            if simstate.pacer is not None:
+                interval_handler = simstate.pacer.wrap(interval_handler)
 
             # Option A: schedule animation frame events as callables in the eventq.
             # Each callback pumps the matplotlib event loop then re-schedules itself.
@@ -1510,18 +1991,20 @@ class BDSim(Runner):
 
                 # Schedule frame callbacks for all animated runs; notebook mode
                 # relies on these callbacks to refresh inline figure output.
-                simstate.declare_event(_anim_frame, interactive_dt)
+                simstate.declare_event(
+                    _anim_frame, (round(t0 / interactive_dt) + 1) * interactive_dt
+                )
 
             # Mirror the discrete-only t=0 pre-pass so hybrid diagrams capture
             # the IC sample (the per-interval dedup skips result.t[0]=0).
             if bd.nstates > 0:
-                simstate.t = 0.0
+                simstate.t = t_start
                 simstate.count += 1
                 eval_start = time.time()
-                bd.evaluate(bd.state_map(x0, simstate), 0.0, sinks=False)
+                bd.evaluate(bd.state_map(x0, simstate), t_start, sinks=False)
                 simstate.bdtime += time.time() - eval_start
                 self._record_sample_and_service_hooks(
-                    bd, simstate, 0.0, x0, stop_short_circuit=False,
+                    bd, simstate, t_start, x0, stop_short_circuit=False,
                 )
                 # refresh() (present + grab_frame) only fires from _anim_frame
                 # at t=interactive_dt — call it once so the IC reaches the live
@@ -1537,9 +2020,14 @@ class BDSim(Runner):
                     # which already hold just the t=0 sample, so this mirrors
                     # the nstates==0 early-exit above without duplicating its
                     # output-struct-building code.
-                    tf = 0.0
+                    tf = t_start
+
+            if simstate.pacer is not None:
+                simstate.pacer.start(bd, simstate, t0)
 
             while t0 < tf - event_tol:
+                yield from self._pause(simstate, context, previous_context)
+
                 # Next scheduled boundary (clock tick, explicit event, or terminal marker).
                 tnext, sources = simstate.eventq.pop(dt=1e-6)
                 if tnext is None:
@@ -1569,15 +2057,18 @@ class BDSim(Runner):
                     t0 = t1
                     continue
 
-                # Pure-discrete diagrams should only evaluate at actual clock ticks
-                # (and terminal boundary). Other scheduled callables such as
-                # animation/debug hooks must not trigger sampled-block output().
+                # Pure-discrete diagrams should only evaluate at actual clock ticks,
+                # sample events and the terminal boundary. Other scheduled callables
+                # such as animation/debug hooks must not trigger sampled-block output().
                 if bd.nstates == 0:
                     has_clock_source = any(
                         isinstance(source, Clock) for source in sources
                     )
                     has_terminal_marker = any(source is None for source in sources)
-                    if not has_clock_source and not has_terminal_marker:
+                    has_sample_event = any(
+                        source in simstate.sample_events for source in sources
+                    )
+                    if not (has_clock_source or has_terminal_marker or has_sample_event):
                         for source in sources:
                             if callable(source):
                                 source(t1, simstate)
@@ -1591,13 +2082,24 @@ class BDSim(Runner):
                 if interval_result is None:
                     break
                 x, treached = interval_result
+                simstate.x, simstate.t = x, treached
+                simstate.solving = False
                 simstate.stats.run_interval_calls += 1
                 nintervals += 1
 
+                reached_boundary = treached >= t1 - event_tol
+                if bd.nstates > 0:
+                    if simstate.stop is not None:
+                        reason = "stop"
+                    elif reached_boundary:
+                        reason = _restart_reason(sources)
+                    else:
+                        reason = "crossing"
+                    simstate.stats.solver.restart(reason)
+
                 if simstate.stop is not None:
                     break
 
-                reached_boundary = treached >= t1 - event_tol
                 if reached_boundary:
                     clock_sources = [s for s in sources if isinstance(s, Clock)]
                     callable_sources = [
@@ -1628,12 +2130,21 @@ class BDSim(Runner):
                         simstate.declare_event(source, float(tnext))
 
             # finished integration
+            if simstate.tracer is not None and simstate.stop is not None:
+                stopper = getattr(simstate.stop, "name", str(simstate.stop))
+                simstate.tracer.instant(
+                    "stop", "engine", {"block": stopper, "t": simstate.t}
+                )
 
             context.progress.end()  # cleanup the progress bar
 
             # print some info about the integration
             if not simstate.options.quiet:
-                mean_eval_ms = simstate.bdtime / max(simstate.count, 1) * 1000.0
+                # ydot calls are only timed on the instrumented path
+                ntimed = simstate.count
+                if not simstate.instrumented:
+                    ntimed -= simstate.stats.ydot_calls
+                mean_eval_ms = simstate.bdtime / max(ntimed, 1) * 1000.0
                 print(fg("yellow"))
                 print("<<< Simulation complete")
                 print(f"  block diagram evaluations: {simstate.count}")
@@ -1643,7 +2154,9 @@ class BDSim(Runner):
                 )
                 print(
                     f"  bd.evaluate() mean time:   {mean_eval_ms*1000:.1f} us/call"
-                    f"  (total {simstate.bdtime * 1000:.1f} ms)"
+                    f"  (total {simstate.bdtime * 1000:.1f} ms"
+                    + ("" if simstate.instrumented else ", excluding ydot calls")
+                    + ")"
                 )
                 run_wall_time = time.time() - run_start_time
                 print(
@@ -1663,6 +2176,21 @@ class BDSim(Runner):
                         f" {simstate.stats.integrator_wall_time:.3f} s"
                         "  (solve_ivp only; excludes post-integration replay)"
                     )
+                    solver = simstate.stats.solver.summary()
+                    # not known for the implicit solvers
+                    rejected = solver["rejected_steps"]
+                    print(
+                        f"  solver steps:              {solver['accepted_steps']}"
+                        f"  (rejected {'n/a' if rejected is None else rejected},"
+                        f" nfev {solver['nfev']}, h min/median/max"
+                        f" {solver['min_step']:.3g}/{solver['median_step']:.3g}"
+                        f"/{solver['max_step']:.3g})"
+                    )
+                    restarts = ", ".join(
+                        f"{reason} {n}"
+                        for reason, n in solver["restarts_by_reason"].items()
+                    )
+                    print(f"  solver restarts:           {restarts}")
                     # Zero-crossing events are detected by solve_ivp root-finding,
                     # distinct from the scheduled (clock/discrete) event boundaries above.
                     n_crossing = simstate.stats.events_detected_total
@@ -1673,6 +2201,15 @@ class BDSim(Runner):
                             cnt,
                         ) in simstate.stats.events_detected_by_source.items():
                             print(f"    {src}: {cnt}")
+                if simstate.pacer is not None:
+                    realtime = simstate.pacer.summary()
+                    print(
+                        f"  deadline misses:           {realtime['misses']}"
+                        f" of {realtime['ticks']}  (latency max"
+                        f" {realtime['max_latency'] * 1e3:.3f} ms, jitter"
+                        f" {realtime['jitter'] * 1e3:.3f} ms,"
+                        f" slip {realtime['slip'] * 1e3:.3f} ms)"
+                    )
                 print(attr(0))
 
             # save buffered data in a Struct
@@ -1694,17 +2231,15 @@ class BDSim(Runner):
                 out.add(name, clockdata)
 
             _store_watch_output(out, watchlist, watchnamelist, simstate.plist)
+            _store_stats(out, simstate)
 
-            stats = BDStruct(name="stats")
-            stats["integration_time_points"] = len(simstate.tlist)
-            stats["run_interval_calls"] = simstate.stats.run_interval_calls
-            stats["ydot_calls"] = simstate.stats.ydot_calls
-            stats["integrator_wall_time"] = simstate.stats.integrator_wall_time
-            stats["events_detected_total"] = simstate.stats.events_detected_total
-            stats["events_detected_by_source"] = dict(
-                simstate.stats.events_detected_by_source
-            )
-            out[".stats"] = stats
+            if simstate.pacer is not None:
+                out[".realtime"] = simstate.pacer.result()
+
+            if simstate.profiler is not None:
+                out[".profile"] = simstate.profiler.result()
+                if not simstate.options.quiet:
+                    report_profile(out[".profile"], limit=20)
 
             # command line output options:
             #  -o/--out [FILE] writes pickle (default filename: bd.out)
@@ -1749,8 +2284,143 @@ class BDSim(Runner):
                     except Exception:
                         pass
             return out
+        except BaseException:
+            failed = True
+            raise
         finally:
+            # every hook is called and the engine is cleaned up even if one
+            # fails, the first error is then raised unless the run has failed
+            errors: list[Exception] = []
+            for hook in simstate.end_hooks:
+                try:
+                    hook()
+                except Exception as error:
+                    errors.append(error)
+            if simstate.profiler is not None:
+                simstate.profiler.remove()
+            if simstate.tracer is not None:
+                simstate.tracer.remove()
+                try:
+                    simstate.tracer.write()
+                except Exception as error:
+                    errors.append(error)
+            # the lean path is selected for this run only
+            bd.instrument(True)
             self._set_context(previous_context)
+            # keep only the end state, not the logs of the run
+            self._last_context = SimulationContext(
+                bd, _end_state(simstate), run_options
+            )
+            if errors:
+                if not failed:
+                    raise errors[0]
+                for error in errors:
+                    warnings.warn(f"error at the end of the run: {error!r}")
+
+    def _pause(
+        self,
+        simstate: BDSimState,
+        context: SimulationContext,
+        previous_context: SimulationContext | None,
+    ) -> Generator[BDSimState, None, None]:
+        # yield from the run generator, without its context being current
+        self._set_context(previous_context)
+        yield simstate
+        self._set_context(context)
+
+    def _start(self, bd: Any, kwargs: dict[str, Any]) -> Generator[Any, None, Any]:
+        # run generator for the arguments of run()
+        args = inspect.signature(BDSim.run).bind(self, bd, **kwargs)
+        args.apply_defaults()
+        del args.arguments["self"], args.arguments["bd"]
+        return self._run(bd, **args.arguments)
+
+    async def run_async(self, bd: Any, **kwargs: Any) -> BDStruct:
+        """
+        Run a compiled block diagram as a coroutine
+
+        :param bd: block diagram to simulate
+        :type bd: BlockDiagram
+        :param kwargs: arguments of :meth:`run`
+        :return: simulation results container
+        :rtype: BDStruct
+
+        The simulation runs on the event loop and gives way to other tasks
+        between intervals, so many runs can share one loop without a thread
+        per run.  Cancelling the task stops the simulation at the next
+        interval boundary, blocks and instrumentation are cleaned up as for
+        a run that raises.
+
+        Example::
+
+            out = await sim.run_async(bd, T=10)
+
+        .. note:: Graphics and ``hold`` block the event loop and should be
+            disabled.  The intervals are bounded by clock ticks and events,
+            a continuous system with neither is integrated in one interval.
+
+        :seealso: :meth:`run`, :meth:`stream`
+        """
+        run = self._start(bd, kwargs)
+        try:
+            while True:
+                try:
+                    next(run)
+                except StopIteration as stop:
+                    return stop.value
+                await asyncio.sleep(0)
+        finally:
+            run.close()
+
+    async def stream(self, bd: Any, **kwargs: Any) -> AsyncIterator[Sample]:
+        """
+        Stream the samples of a simulation run
+
+        :param bd: block diagram to simulate
+        :type bd: BlockDiagram
+        :param kwargs: arguments of :meth:`run`
+        :return: logged samples, in time order
+        :rtype: async iterator of :class:`Sample`
+
+        As for :meth:`run_async` the simulation runs on the event loop, the
+        samples logged during an interval are yielded when it completes.
+        Each :class:`Sample` has the time ``t``, the continuous state ``x``
+        and the values ``y`` of the signals given by ``watch``.  Leaving the
+        loop early, or cancelling the task, stops the simulation.
+
+        Example::
+
+            async for sample in sim.stream(bd, T=10, watch=[plant]):
+                print(sample.t, sample.y[0])
+
+        :seealso: :meth:`run_async`
+        """
+        run = self._start(bd, kwargs)
+        try:
+            simstate = next(run)
+            n = 0
+            while True:
+                try:
+                    next(run)
+                    done = False
+                except StopIteration:
+                    done = True
+                for i in range(n, len(simstate.tlist)):
+                    yield Sample(
+                        t=simstate.tlist[i],
+                        x=simstate.xlist[i] if simstate.xlist else None,
+                        y=tuple(values[i] for values in simstate.plist),
+                    )
+                n = len(simstate.tlist)
+                if done:
+                    return
+                await asyncio.sleep(0)
+        finally:
+            run.close()
+
+    def _make_pacer(self) -> Any:
+        # the offline runner is not paced, see BDSimRealtime
+        return None
 
     def submit(self, bd: Any, **kwargs: Any) -> SimulationJob:
         if BDSim._executor is None:
@@ -1759,6 +2429,39 @@ class BDSim(Runner):
         future: Future[BDStruct] = BDSim._executor.submit(self.run, bd, **kwargs)
         return SimulationJob(future)
 
+    def checkpoint(self) -> Checkpoint:
+        """
+        Capture the state of a simulation
+
+        :raises SimulationContextError: no simulation has been run
+        :return: simulation state
+        :rtype: Checkpoint
+
+        Called during a simulation, for example from an event callback or by a
+        block when a sample is logged, the current state is captured.  It can't
+        be called while the solver evaluates the state derivative, when the
+        time and state are only trial values.  Otherwise the state at the end of the most
+        recent simulation is captured.  The simulation can be continued from
+        the checkpoint by :meth:`run`, for example a warm-up transient can be
+        simulated once and shared by many runs::
+
+            sim.run(bd, T=10)
+            warm = sim.checkpoint()
+            for K in (1, 2, 5):
+                bd.blocknames["gain"].K = K
+                out = sim.run(bd, T=20, resume=warm)
+
+        :seealso: :meth:`Checkpoint.fork`
+        """
+        context = self._get_context() or self._last_context
+        if context is None:
+            raise SimulationContextError("no simulation to checkpoint")
+        if getattr(context.simstate, "solving", False):
+            raise SimulationContextError(
+                "can't checkpoint while the solver evaluates the state derivative"
+            )
+        return Checkpoint(context.bd, context.simstate)
+
     def done(self, bd: Any, block: bool = False) -> None:
         context = self._require_context()
         if context.options.hold:
@@ -1854,6 +2557,118 @@ class BDSim(Runner):
                 f" {new_value}"
             )
 
+    def _partition(
+        self, bd: Any, simstate: BDSimState, partition: bool | str, exact: bool
+    ) -> None:
+        # integrate the components of the continuous dynamics separately, or
+        # just those that are solved exactly
+        exact_parts = bd.exact if exact else []
+        parts = [c for c in bd.components if not any(c is e for e in exact_parts)]
+        if not partition and parts:
+            members = {b for c in parts for b in c}
+            parts = [[b for b in bd.blocklist if b in members]]
+
+        start = {}
+        offset = 0
+        for b in bd.blocklist:
+            if b.blockclass == "continuous":
+                start[b] = offset
+                offset += b.nstates
+        for k, blocks in enumerate(exact_parts + parts):
+            index = np.concatenate(
+                [np.arange(start[b], start[b] + b.nstates) for b in blocks]
+            )
+            plan = bd.cone_plan(blocks)
+            propagator = None
+            if k < len(exact_parts):
+                rhs = _component_rhs(bd, simstate, blocks, plan, index)
+                propagator = ExactPropagator(rhs, len(index))
+            simstate.components.append((blocks, plan, index, propagator))
+
+        if partition == "parallel" and parts:
+            # a worker only sees the continuous and clock states, any other
+            # block memory, such as the input history of a delay, goes stale
+            # and so does a source driven from outside, such as an INPORT
+            stale = [
+                b
+                for _, plan, _, propagator in simstate.components
+                if propagator is None
+                for b, _ in plan
+                if (b.hasmemory and not b.isclocked and b.blockclass != "continuous")
+                or (b.nin == 0 and not b.istimefunction)
+            ]
+            if stale:
+                warnings.warn(
+                    "the continuous dynamics are integrated serially, the output of"
+                    f" block {stale[0].name} can't be shared with worker processes"
+                )
+                return
+            if "fork" not in multiprocessing.get_all_start_methods():
+                raise RuntimeError("parallel integration needs the fork start method")
+            pool = multiprocessing.get_context("fork").Pool(
+                len(parts),
+                initializer=_component_init,
+                initargs=(bd, simstate),
+            )
+            simstate.component_pool = pool
+            simstate.declare_end_hook(pool.terminate)
+
+    def _solve_components(
+        self,
+        solve_ivp: Callable,
+        t0: float,
+        t1: float,
+        x0: np.ndarray,
+        ivp_args: dict[str, Any],
+        method: Any,
+        bd: Any,
+        simstate: BDSimState,
+    ) -> Any:
+        # integrate each component over the interval and merge the results
+        ivp_args = dict(ivp_args, dense_output=True)
+        pool = simstate.component_pool
+        results = []
+        tasks = {}
+        if pool is not None:
+            clock_states = [simstate.clock_states[c].state for c in bd.clocklist]
+            args = dict(ivp_args, method=method)
+            for k, (_, _, index, propagator) in enumerate(simstate.components):
+                if propagator is None:
+                    tasks[k] = pool.apply_async(
+                        _component_solve, (k, (t0, t1), x0[index], clock_states, args)
+                    )
+        for k, (blocks, plan, index, propagator) in enumerate(simstate.components):
+            if propagator is not None:
+                result = propagator.solve((t0, t1), x0[index], **ivp_args)
+            elif k in tasks:
+                result, steps, rejected = tasks[k].get()
+                simstate.stats.solver.add_steps(steps, rejected)
+                simstate.stats.ydot_calls += int(result.nfev)
+            else:
+                ydot = _component_rhs(bd, simstate, blocks, plan, index)
+                result = solve_ivp(ydot, (t0, t1), x0[index], **ivp_args)
+            results.append(result)
+
+        merged = OptimizeResult(
+            status=0,
+            success=True,
+            message="",
+            nfev=sum(r.nfev for r in results),
+            njev=sum(r.njev for r in results),
+            nlu=sum(r.nlu for r in results),
+            t_events=None,
+            y_events=None,
+        )
+        for r in results:
+            if not r.success:
+                merged.update(status=r.status, success=False, message=r.message)
+                return merged
+        merged.t = np.unique(np.concatenate([r.t for r in results]))
+        merged.y = np.zeros((len(x0), len(merged.t)))
+        for r, (_, _, index, _) in zip(results, simstate.components):
+            merged.y[index] = r.sol(merged.t)
+        return merged
+
     def _interval_hybrid(
         self, bd: Any, t0: float, t1: float, x0: np.ndarray, simstate: BDSimState
     ) -> tuple[np.ndarray, float]:
@@ -1881,19 +2696,39 @@ class BDSim(Runner):
         # bounded by the most recent and upcoming scheduled event boundaries.
         simstate.begin_event_probe_interval(float(t0), float(t1))
 
+        # discrete states are constant over the interval
+        model = simstate.model
+        clock_states = [simstate.clock_states[c].state for c in bd.clocklist]
+        probes = len(simstate.crossing_detectors) > 0
+
         def ydot(t: float, y: np.ndarray) -> np.ndarray:
             # Every call represents one RHS evaluation requested by the
             # integration algorithm at an internal time/state pair.
             simstate.t = t
+            simstate.solving = True
             simstate.count += 1
             simstate.stats.ydot_calls += 1
-            eval_start = time.time()
-            bd.evaluate(bd.state_map(y, simstate), t, sinks=False)
+            if model is not None:
+                return model.f(t, y, clock_states)
+            # outputs are discarded once the derivative is computed, so
+            # blocks may reuse their output arrays
+            bd.evaluate(bd.state_map(y, simstate), t, sinks=False, inplace=True)
             yd = bd.deriv(t)
-            eval_end = time.time()
-            simstate.bdtime += eval_end - eval_start
+            if probes:
+                # solve_ivp probes the event functions at the end of each
+                # step, usually the point of the last derivative evaluation
+                simstate.mark_event_probe_evaluated(t, y)
             return yd
 
+        if simstate.instrumented:
+            rhs = ydot
+
+            def ydot(t: float, y: np.ndarray) -> np.ndarray:  # type: ignore[no-redef]
+                eval_start = time.time()
+                yd = rhs(t, y)
+                simstate.bdtime += time.time() - eval_start
+                return yd
+
         # Build solve_ivp kwargs from user-provided solver_args, then normalize
         # to bdsim conventions.
         ivp_args = dict(simstate.solver_args)
@@ -1926,6 +2761,8 @@ class BDSim(Runner):
             ivp_args.setdefault("method", str(option_method))
         else:
             ivp_args.setdefault("method", self._solve_ivp_method(simstate))
+        method = ivp_args["method"]
+        ivp_args["method"] = simstate.stats.solver.method(method)
 
         if len(simstate.crossing_detectors) > 0:
             # Crossing detectors: zero-crossing callbacks registered in start().
@@ -1951,8 +2788,29 @@ class BDSim(Runner):
         # - Therefore this RHS callback is intentionally non-vectorized and
         #   should be used with solve_ivp's default vectorized=False behavior.
         # ---------------------------------------------------------------------
+        profiler = simstate.profiler
+        tracer = simstate.tracer
+        solve_ivp = integrate.solve_ivp
+        if profiler is not None:
+            solve_ivp = profiler.wrap(solve_ivp, "bdsim", "solve_ivp")
+        if tracer is not None:
+            solve_ivp = tracer.wrap(
+                solve_ivp, "solve_ivp", "solver", args=lambda *_: {"t0": t0, "t1": t1}
+            )
+            ydot = tracer.wrap(
+                ydot,
+                "ydot",
+                "rhs",
+                args=lambda t, y: {"t": t},
+                every=tracer.rhs_every,
+            )
         ivp_start = time.time()
-        result = integrate.solve_ivp(ydot, (t0, t1), x0, **ivp_args)
+        if simstate.components and not probes:
+            result = self._solve_components(
+                solve_ivp, t0, t1, x0, ivp_args, method, bd, simstate
+            )
+        else:
+            result = solve_ivp(ydot, (t0, t1), x0, **ivp_args)
         simstate.stats.integrator_wall_time += time.time() - ivp_start
 
         # check for integration failure
@@ -1964,6 +2822,24 @@ class BDSim(Runner):
                 message=str(result.message),
             )
 
+        interval_stats = simstate.stats.solver.record(result)
+        if simstate.isdebug("o"):
+            self.DEBUG(
+                "ode",
+                "[{:.4g}, {:.4g}] nfev={} njev={} nlu={} steps={}/{} "
+                "h=[{:.3g}, {:.3g}, {:.3g}]",
+                t0,
+                t1,
+                interval_stats["nfev"],
+                interval_stats["njev"],
+                interval_stats["nlu"],
+                interval_stats["accepted"],
+                interval_stats["rejected"],
+                interval_stats["min_step"],
+                interval_stats["median_step"],
+                interval_stats["max_step"],
+            )
+
         # remove time overlap between integration segments
         #
         #   solve_ivp commonly echoes the interval start in result.t.
@@ -1985,10 +2861,14 @@ class BDSim(Runner):
         #  state and  that events are dispatched at the correct times with the
         #  correct state, even if the solver took large steps or if events were
         #  detected between solver steps.
+        if profiler is not None:
+            profiler.enter()
         for k in range(start_index, len(result.t)):
             t = float(result.t[k])
             y = result.y[:, k]
-            simstate.t = t
+            # the state at a sample, for a checkpoint taken by a block or hook
+            simstate.x, simstate.t = y, t
+            simstate.solving = False
 
             simstate.count += 1
             eval_start = time.time()
@@ -2006,6 +2886,8 @@ class BDSim(Runner):
             )
             if should_break:
                 break
+        if profiler is not None:
+            profiler.exit("replay")
 
         # Handle detected zero-crossings from continuous root-finding.
         # solve_ivp returns crossing_times and crossing_states for each registered detector.
@@ -2023,10 +2905,19 @@ class BDSim(Runner):
             for j, t_crossing in enumerate(crossing_times):
                 crossing_handled = True
                 y_crossing = state_list[j] if j < len(state_list) else None
+                if y_crossing is not None:
+                    simstate.x, simstate.t = y_crossing, float(t_crossing)
+                    simstate.solving = False
                 crossing_state_map = bd.state_map(y_crossing, simstate)
                 bd.evaluate(crossing_state_map, float(t_crossing), sinks=False)
                 simstate.stats.events_detected_total += 1
                 simstate.stats.events_detected_by_source[source_name] += 1
+                if tracer is not None:
+                    tracer.instant(
+                        "crossing",
+                        "event",
+                        {"block": source_name, "t": float(t_crossing)},
+                    )
                 self._dispatch_crossing_event(
                     block,
                     float(t_crossing),
@@ -2812,7 +3703,8 @@ class BDSim(Runner):
 
         :param bd: the block diagram to be reported
         :type bd: :class:`BlockDiagram`
-        :param type: report type, one of: "summary" (default), "lists", "schedule"
+        :param type: report type, one of: "summary" (default), "lists",
+            "schedule", "profile"
         :type type: str, optional
         :param style: table style, one of: ansi (default), markdown, latex
         :type style: str
@@ -2820,7 +3712,11 @@ class BDSim(Runner):
         Single method wrapper for various block diagram reports.  Obeys the ``-q``
         option to suppress all reports at runtime.
 
-        :seealso: :meth:`BlockDiagram.report_summary` :meth:`BlockDiagram.report_lists` :meth:`BlockDiagram.report_schedule`
+        The "profile" report is of the most recent run of ``bd`` with profiling
+        enabled, see :meth:`run`.  Rows are sorted by self time unless the
+        ``sortby`` option is given.
+
+        :seealso: :meth:`BlockDiagram.report_summary` :meth:`BlockDiagram.report_lists` :meth:`BlockDiagram.report_schedule` :func:`report_profile`
         """
         context: SimulationContext | None = self._get_context()
         assert self.options is not None
@@ -2834,6 +3730,11 @@ class BDSim(Runner):
             bd.report_summary(**kwargs)
         elif type == "schedule":
             bd.report_schedule(**kwargs)
+        elif type == "profile":
+            last = self._last_context
+            if last is None or last.bd is not bd or last.simstate.profiler is None:
+                raise ValueError("no profile, run the block diagram with profile=True")
+            report_profile(last.simstate.profiler.result(), **kwargs)
 
 
 class Options(OptionsBase):
@@ -2881,6 +3782,8 @@ class Options(OptionsBase):
             "blocks": False,
             "outfile": None,
             "jsonfile": None,
+            "profile": False,
+            "trace": None,
             "quiet": False,
             "setparam": [],
             "setglob": [],
@@ -3134,6 +4037,21 @@ class Options(OptionsBase):
                 default=effective_defaults["quiet"],
                 help="suppress reports and progress bar",
             )
+            sim.add_argument(
+                "--profile",
+                action="store_const",
+                const=True,
+                default=effective_defaults["profile"],
+                dest="profile",
+                help="time every block and report the most expensive",
+            )
+            sim.add_argument(
+                "--trace",
+                type=str,
+                default=effective_defaults["trace"],
+                metavar="FILE",
+                help="write a Chrome/Perfetto trace of the run to FILE",
+            )
             sim.add_argument(
                 "--no-progress",
                 action="store_const",
@@ -3150,7 +4068,7 @@ class Options(OptionsBase):
                 metavar="[psd]",
                 help=(
                     "debug flags: p/ropagate, s/tate, d/eriv, i/nteractive, "
-                    "g/raphics-diagnostics"
+                    "g/raphics-diagnostics, o/de-solver"
                 ),
             )
 
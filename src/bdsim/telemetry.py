@@ -0,0 +1,193 @@
+"""Solver statistics and step-size telemetry of a simulation run."""
+
+from __future__ import annotations
+
+import inspect
+from collections import Counter
+from typing import Any
+
+import numpy as np
+import scipy.integrate as integrate
+
+# ------------------------------------------------------------------------- #
+#
+# solve_ivp reports the number of function, Jacobian and LU evaluations of a
+# call, but not the steps it took.  To see them the solver class is replaced
+# by a subclass whose step() method records the size of every accepted step,
+# the subclass is created once per run and per solver class.
+#
+# Rejected steps are not reported by SciPy.  For the explicit Runge-Kutta
+# solvers every attempted step costs n_stages function evaluations, so the
+# number of attempts is known from the evaluations within step().  The
+# implicit solvers, Radau, BDF and LSODA, retry inside step() with a variable
+# number of evaluations and their rejected steps are reported as None.
+#
+# Every interval ends in a restart of the solver, the reason is recorded:
+#
+#   clock      a clock tick
+#   event      a scheduled event, for example an animation frame
+#   crossing   a zero crossing detected by the solver
+#   stop       a stop requested part-way through the interval, for example by
+#              a STOP block
+#   end        the end of the simulation
+#
+# ------------------------------------------------------------------------- #
+
+
+class SolverTelemetry:
+    """
+    Solver statistics accumulated over the intervals of a run
+
+    Held by the simulation state as ``simstate.stats.solver``, the runner
+    calls :meth:`method` before and :meth:`record` after each ``solve_ivp``
+    call, and :meth:`restart` at the end of each interval.
+
+    :seealso: :meth:`summary`
+    """
+
+    def __init__(self) -> None:
+        self.nfev = 0
+        self.njev = 0
+        self.nlu = 0
+        self.accepted_steps = 0
+        self.rejected_steps: int | None = None
+        self.restarts: Counter[str] = Counter()
+        self.steps: list[float] = []
+        # telemetry of the current interval, filled in by the solver subclass
+        self._steps: list[float] = []
+        self._rejected: int | None = None
+        self._solvers: dict[Any, Any] = {}
+
+    def __repr__(self) -> str:
+        return (
+            f"SolverTelemetry(nfev={self.nfev}, accepted={self.accepted_steps}, "
+            f"rejected={self.rejected_steps})"
+        )
+
+    def method(self, method: Any) -> Any:
+        """
+        Solver that records its steps
+
+        :param method: solver name, eg. ``"RK45"``, or ``OdeSolver`` subclass
+        :type method: str or class
+        :return: solver to pass as the ``method`` argument of ``solve_ivp``
+        :rtype: class or str
+
+        An unknown solver is returned unchanged, ``solve_ivp`` reports the
+        error, and its steps are not recorded.
+        """
+        solver = self._solvers.get(method)
+        if solver is not None:
+            return solver
+
+        base = getattr(integrate, method, None) if isinstance(method, str) else method
+        if not (inspect.isclass(base) and issubclass(base, integrate.OdeSolver)):
+            return method
+
+        telemetry = self
+        n_stages = getattr(base, "n_stages", None)
+
+        def step(solver: Any) -> str | None:
+            t, nfev = solver.t, solver.nfev
+            message = base.step(solver)
+            if solver.status != "failed":
+                telemetry._steps.append(abs(solver.t - t))
+                if n_stages is not None:
+                    attempts = (solver.nfev - nfev) // n_stages
+                    telemetry._rejected = (telemetry._rejected or 0) + attempts - 1
+            return message
+
+        solver = type(base.__name__, (base,), {"step": step})
+        self._solvers[method] = solver
+        return solver
+
+    def record(self, result: Any) -> dict[str, Any]:
+        """
+        Accumulate the statistics of one ``solve_ivp`` call
+
+        :param result: result of ``solve_ivp``
+        :type result: OdeResult
+        :return: statistics of the call
+        :rtype: dict
+
+        The dict has the keys ``nfev``, ``njev``, ``nlu``, ``accepted``,
+        ``rejected``, ``min_step``, ``median_step`` and ``max_step``.
+        """
+        steps, self._steps = self._steps, []
+        rejected, self._rejected = self._rejected, None
+
+        self.nfev += int(result.nfev)
+        self.njev += int(result.njev)
+        self.nlu += int(result.nlu)
+        self.accepted_steps += len(steps)
+        if rejected is not None:
+            self.rejected_steps = (self.rejected_steps or 0) + rejected
+        self.steps.extend(steps)
+
+        interval = {
+            "nfev": int(result.nfev),
+            "njev": int(result.njev),
+            "nlu": int(result.nlu),
+            "accepted": len(steps),
+            "rejected": rejected,
+        }
+        interval.update(_step_sizes(steps))
+        return interval
+
+    def add_steps(self, steps: list[float], rejected: int | None) -> None:
+        """
+        Add steps taken in the current interval by another solver
+
+        :param steps: size of each accepted step
+        :type steps: list of float
+        :param rejected: number of rejected steps, or None if not known
+        :type rejected: int or None
+
+        For a solver that ran in a worker process, its steps are then included
+        by the next :meth:`record`.
+        """
+        self._steps.extend(steps)
+        if rejected is not None:
+            self._rejected = (self._rejected or 0) + rejected
+
+    def restart(self, reason: str) -> None:
+        """
+        Record the reason the solver was restarted
+
+        :param reason: "clock", "event", "crossing", "stop" or "end"
+        :type reason: str
+        """
+        self.restarts[reason] += 1
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Statistics for the whole run
+
+        :return: statistics
+        :rtype: dict
+
+        The dict has the keys ``nfev``, ``njev``, ``nlu``, ``accepted_steps``,
+        ``rejected_steps``, ``min_step``, ``median_step``, ``max_step`` and
+        ``restarts_by_reason``.  Step sizes are NaN if no step was taken.
+        """
+        summary = {
+            "nfev": self.nfev,
+            "njev": self.njev,
+            "nlu": self.nlu,
+            "accepted_steps": self.accepted_steps,
+            "rejected_steps": self.rejected_steps,
+        }
+        summary.update(_step_sizes(self.steps))
+        summary["restarts_by_reason"] = dict(self.restarts)
+        return summary
+
+
+def _step_sizes(steps: list[float]) -> dict[str, float]:
+    if not steps:
+        return {"min_step": np.nan, "median_step": np.nan, "max_step": np.nan}
+    h = np.array(steps)
+    return {
+        "min_step": float(h.min()),
+        "median_step": float(np.median(h)),
+        "max_step": float(h.max()),
+    }
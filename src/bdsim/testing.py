@@ -0,0 +1,484 @@
+"""Random block diagrams for scalability and stress testing."""
+
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+# ------------------------------------------------------------------------- #
+#
+# A random diagram is generated as a DiagramSpec, a description of its blocks
+# and wires, which can be built into a BlockDiagram or saved as a .bd file.
+#
+# The diagram is valid by construction:
+#
+#   - sources, continuous blocks and zero-order holds are created first, their
+#     outputs don't depend directly on their inputs so they can be driven by
+#     any signal, including feedback, without an algebraic loop
+#   - function blocks are arranged in layers, each driven by the sources and
+#     state blocks and by the layers before it, the depth is the number of
+#     layers.  A subsystem is a function block in a layer
+#   - the inputs of the state blocks and holds are driven from the layers
+#   - outputs that are not used drive a NULL block
+#
+# and the simulation is stable.  Every block is non-expansive, its output is
+# no larger than its inputs: gains are less than one in magnitude, a sum of m
+# signals is followed by a gain of 1/m, first-order lags and leaky
+# integrators have unit or smaller DC gain.  Every feedback loop passes
+# through a gain, so the loop gain is less than one.
+#
+# ------------------------------------------------------------------------- #
+
+
+@dataclass
+class BlockSpec:
+    """Description of a block in a :class:`DiagramSpec`"""
+
+    type: str
+    name: str
+    params: dict[str, Any]
+    nin: int
+    nout: int
+    layer: int = 0
+    clock: int | None = None
+    subsystem: str | None = None
+
+
+@dataclass
+class DiagramSpec:
+    """
+    Description of a block diagram
+
+    :param name: diagram name
+    :type name: str
+
+    Blocks are instances of :class:`BlockSpec`, wires are tuples of the start
+    block index and port and the end block index and port.  Clocks are
+    tuples of period and offset, referenced by index from the ``clock``
+    attribute of a block.  Subsystem definitions are referenced by name from
+    the ``subsystem`` attribute of a block.
+
+    :seealso: :func:`random_spec` :meth:`build` :meth:`save`
+    """
+
+    name: str = "main"
+    blocks: list[BlockSpec] = field(default_factory=list)
+    wires: list[tuple[int, int, int, int]] = field(default_factory=list)
+    clocks: list[tuple[float, float]] = field(default_factory=list)
+    subsystems: dict[str, DiagramSpec] = field(default_factory=dict)
+
+    def __repr__(self) -> str:
+        return (
+            f"DiagramSpec({self.name}, {len(self.blocks)} blocks, "
+            f"{len(self.clocks)} clocks, {len(self.subsystems)} subsystems)"
+        )
+
+    def add(self, type: str, nin: int = 1, nout: int = 1, **params: Any) -> int:
+        """
+        Add a block
+
+        :param type: block type, eg. ``"GAIN"``
+        :type type: str
+        :param nin: number of inputs, defaults to 1
+        :type nin: int, optional
+        :param nout: number of outputs, defaults to 1
+        :type nout: int, optional
+        :param params: block parameters
+        :return: block index
+        :rtype: int
+        """
+        count = sum(block.type == type for block in self.blocks)
+        self.blocks.append(BlockSpec(type, f"{type.lower()}{count}", params, nin, nout))
+        return len(self.blocks) - 1
+
+    def connect(self, start: tuple[int, int], end: tuple[int, int]) -> None:
+        """
+        Add a wire
+
+        :param start: start block index and output port
+        :type start: tuple(int, int)
+        :param end: end block index and input port
+        :type end: tuple(int, int)
+        """
+        self.wires.append((*start, *end))
+
+    @property
+    def nblocks(self) -> int:
+        """Number of blocks, including those in subsystems"""
+        return sum(
+            self.subsystems[block.subsystem].nblocks if block.subsystem else 1
+            for block in self.blocks
+        )
+
+    def build(self, bd: Any) -> Any:
+        """
+        Create the blocks and wires in a block diagram
+
+        :param bd: empty block diagram
+        :type bd: BlockDiagram
+        :return: the block diagram
+        :rtype: BlockDiagram
+
+        The block diagram is not compiled.
+        """
+        clocks = [bd.clock(period, offset=offset) for period, offset in self.clocks]
+        blocks = []
+        for spec in self.blocks:
+            params = dict(spec.params)
+            if spec.clock is not None:
+                params["clock"] = clocks[spec.clock]
+            if spec.subsystem is not None:
+                subsystem = self.subsystems[spec.subsystem]
+                params["subsys"] = subsystem.build(
+                    bd.runtime.blockdiagram(name=subsystem.name)
+                )
+            blocks.append(getattr(bd, spec.type)(name=spec.name, **params))
+        for start, start_port, end, end_port in self.wires:
+            bd.connect(blocks[start][start_port], blocks[end][end_port])
+        return bd
+
+    def save(self, filename: str | Path) -> list[Path]:
+        """
+        Save as a ``.bd`` file
+
+        :param filename: name of the file
+        :type filename: str or Path
+        :return: names of the files written
+        :rtype: list of Path
+
+        The file can be loaded with :func:`bdload`.  Each subsystem definition
+        is saved to its own file, in the same folder and named after the file
+        and the subsystem, eg. ``model-sub0.bd``.
+        """
+        path = Path(filename)
+        written = []
+        subsystem_files = {}
+        for name, subsystem in self.subsystems.items():
+            subsystem_path = path.with_name(f"{path.stem}-{name}.bd")
+            written.extend(subsystem.save(subsystem_path))
+            subsystem_files[name] = subsystem_path.name
+
+        ids = iter(range(1, 1 << 62))
+        inputs: list[list[int]] = []
+        outputs: list[list[int]] = []
+        blocks = []
+        rows: dict[int, int] = {}
+        for spec in self.blocks:
+            parameters: list[list[Any]] = [
+                [key, value] for key, value in spec.params.items()
+            ]
+            if spec.clock is not None:
+                period, offset = self.clocks[spec.clock]
+                clock = f"=clock({period!r}, offset={offset!r})"
+                parameters.insert(0, ["clock", clock])
+            if spec.subsystem is not None:
+                parameters.insert(0, ["subsys", subsystem_files[spec.subsystem]])
+            inputs.append([next(ids) for _ in range(spec.nin)])
+            outputs.append([next(ids) for _ in range(spec.nout)])
+            row = rows[spec.layer] = rows.get(spec.layer, -1) + 1
+            blocks.append(
+                {
+                    "id": next(ids),
+                    "block_type": spec.type,
+                    "title": spec.name,
+                    "pos_x": 200.0 * spec.layer,
+                    "pos_y": 150.0 * row,
+                    "width": 100,
+                    "height": 100,
+                    "flipped": False,
+                    "inputsNum": spec.nin,
+                    "outputsNum": spec.nout,
+                    "inputs": _sockets(inputs[-1], 1),
+                    "outputs": _sockets(outputs[-1], 2),
+                    "parameters": parameters,
+                }
+            )
+        wires = [
+            {
+                "id": next(ids),
+                "start_socket": outputs[start][start_port],
+                "end_socket": inputs[end][end_port],
+                "wire_type": 3,
+                "custom_routing": False,
+                "wire_coordinates": [],
+            }
+            for start, start_port, end, end_port in self.wires
+        ]
+        model = {
+            "id": next(ids),
+            "created_by": "bdsim.testing",
+            "creation_time": int(time.time()),
+            "scene_width": 200.0 * (max(rows) + 2),
+            "scene_height": 150.0 * (max(rows.values()) + 2),
+            "blocks": blocks,
+            "wires": wires,
+            "labels": [],
+            "grouping_boxes": [],
+        }
+        with open(path, "w") as f:
+            json.dump(model, f, indent=4)
+        written.append(path)
+        return written
+
+
+def _sockets(ids: list[int], socket_type: int) -> list[dict[str, Any]]:
+    return [
+        {
+            "id": id,
+            "index": index,
+            "multi_wire": True,
+            "position": 1 if socket_type == 1 else 3,
+            "socket_type": socket_type,
+        }
+        for index, id in enumerate(ids)
+    ]
+
+
+class _Generator:
+    def __init__(self, rng: np.random.Generator) -> None:
+        self.rng = rng
+        self.nsubsystems = 0
+
+    def gain(self, spec: DiagramSpec, scale: float = 0.9) -> int:
+        K = float(self.rng.uniform(0.2, 1) * self.rng.choice([-1, 1]) * scale)
+        return spec.add("GAIN", K=round(K, 4))
+
+    def state_block(self, spec: DiagramSpec) -> tuple[int, int, int]:
+        # returns input block, output block and number of states
+        if self.rng.random() < 0.5:
+            order = int(self.rng.integers(1, 3))
+            a = [float(self.rng.uniform(0.5, 5)) for _ in range(order)]
+            D = np.poly([-root for root in a])
+            N = float(D[-1] * self.rng.uniform(0.2, 1))
+            block = spec.add(
+                "LTI_SISO", N=round(N, 4), D=[round(float(d), 4) for d in D]
+            )
+            return block, block, order
+        # leaky integrator x' = a (u - x)
+        sum = spec.add("SUM", nin=2, signs="+-")
+        integ = spec.add(
+            "INTEGRATOR", x0=0.0, gain=round(float(self.rng.uniform(0.5, 5)), 4)
+        )
+        spec.connect((sum, 0), (integ, 0))
+        spec.connect((integ, 0), (sum, 1))
+        return sum, integ, 1
+
+    def diagram(
+        self,
+        name: str,
+        blocks: int,
+        depth: int,
+        clocks: int,
+        states: int,
+        subsystems: int,
+        nesting: int,
+        ports: bool = False,
+    ) -> DiagramSpec:
+        rng = self.rng
+        spec = DiagramSpec(name)
+        depth = max(depth, 1)
+
+        # signals that drive the function layers: sources, states, holds
+        signals: list[tuple[int, int]] = []
+        if ports:
+            signals.append((spec.add("INPORT", nin=0, nout=1), 0))
+        else:
+            for _ in range(max(1, blocks // 20)):
+                if rng.random() < 0.5:
+                    value = round(float(rng.uniform(-1, 1)), 4)
+                    source = spec.add("CONSTANT", nin=0, value=value)
+                else:
+                    source = spec.add(
+                        "STEP",
+                        nin=0,
+                        T=round(float(rng.uniform(0, 2)), 4),
+                        on=round(float(rng.uniform(-1, 1)), 4),
+                    )
+                signals.append((source, 0))
+
+        # each subsystem definition has its share of the blocks and states
+        if nesting == 0:
+            subsystems = 0
+        share = 1 / (subsystems + 1)
+        definitions = []
+        for _ in range(subsystems):
+            sub_name = f"sub{self.nsubsystems}"
+            self.nsubsystems += 1
+            definition = self.diagram(
+                sub_name,
+                blocks=max(int(blocks * share), 4),
+                depth=max(depth // 2, 1),
+                clocks=0,
+                states=int(states * share),
+                subsystems=subsystems // 2,
+                nesting=nesting - 1,
+                ports=True,
+            )
+            spec.subsystems[sub_name] = definition
+            definitions.append(definition)
+        blocks -= sum(definition.nblocks for definition in definitions)
+        states -= sum(int(states * share) for _ in definitions)
+
+        driven = []  # inputs to be driven from the layers
+        nstates = 0
+        while nstates < states:
+            input, output, n = self.state_block(spec)
+            nstates += n
+            signals.append((output, 0))
+            driven.append((input, 0))
+
+        if clocks > 0:
+            for i in range(clocks):
+                period = round(float(rng.uniform(0.05, 0.5)), 4)
+                spec.clocks.append((period, 0.0))
+            for i in range(max(clocks, blocks // 20)):
+                zoh = spec.add("ZOH", x0=0.0)
+                spec.blocks[zoh].clock = i % clocks
+                signals.append((zoh, 0))
+                driven.append((zoh, 0))
+
+        # function layers, with the subsystems placed at random
+        remaining = max(blocks - len(spec.blocks), depth)
+        per_layer = [remaining // depth + (i < remaining % depth) for i in range(depth)]
+        subsystem_layers = rng.integers(0, depth, size=len(definitions))
+        used: set[tuple[int, int]] = set()
+        layer_signals: list[tuple[int, int]] = []
+        for layer, n in enumerate(per_layer, start=1):
+            first = len(spec.blocks)
+            new_signals = []
+            for i in np.flatnonzero(subsystem_layers == layer - 1):
+                block = spec.add("SUBSYSTEM")
+                spec.blocks[block].subsystem = definitions[i].name
+                source = signals[int(rng.integers(len(signals)))]
+                spec.connect(source, (block, 0))
+                used.add(source)
+                new_signals.append((block, 0))
+            while n > 0:
+                m = min(int(rng.integers(1, 4)), len(signals))
+                if m == 1:
+                    block = output = self.gain(spec)
+                    n -= 1
+                else:
+                    signs = "".join(rng.choice(["+", "-"], size=m))
+                    block = spec.add("SUM", nin=m, signs=signs)
+                    output = self.gain(spec, scale=0.9 / m)
+                    spec.connect((block, 0), (output, 0))
+                    n -= 2
+                for i, k in enumerate(rng.choice(len(signals), size=m, replace=False)):
+                    spec.connect(signals[k], (block, i))
+                    used.add(signals[k])
+                new_signals.append((output, 0))
+            for block in spec.blocks[first:]:
+                block.layer = layer
+            signals.extend(new_signals)
+            layer_signals = new_signals
+
+        # drive the state blocks and holds from the gains of the layers
+        gains = [
+            (i, 0) for i, block in enumerate(spec.blocks) if block.type == "GAIN"
+        ]
+        for input in driven:
+            if gains:
+                source = gains[int(rng.integers(len(gains)))]
+            else:
+                source = signals[0]
+            spec.connect(source, input)
+            used.add(source)
+
+        if ports:
+            output = layer_signals[-1]
+            outport = spec.add("OUTPORT", nin=1, nout=0)
+            spec.blocks[outport].layer = depth + 1
+            spec.connect(output, (outport, 0))
+            used.add(output)
+
+        # sink for the unused outputs
+        unused = [
+            (i, port)
+            for i, block in enumerate(spec.blocks)
+            for port in range(block.nout)
+            if (i, port) not in used
+        ]
+        if unused:
+            null = spec.add("NULL", nin=len(unused), nout=0)
+            spec.blocks[null].params["nin"] = len(unused)  # variable input count
+            spec.blocks[null].layer = depth + 1
+            for port, source in enumerate(unused):
+                spec.connect(source, (null, port))
+        return spec
+
+
+def random_spec(
+    blocks: int = 50,
+    depth: int = 4,
+    clocks: int = 0,
+    states: int = 4,
+    subsystems: int = 0,
+    nesting: int = 1,
+    seed: int | None = None,
+) -> DiagramSpec:
+    """
+    Random block diagram description
+
+    :param blocks: approximate number of blocks, defaults to 50
+    :type blocks: int, optional
+    :param depth: number of layers of function blocks, defaults to 4
+    :type depth: int, optional
+    :param clocks: number of clocks, defaults to 0
+    :type clocks: int, optional
+    :param states: minimum number of continuous states, defaults to 4
+    :type states: int, optional
+    :param subsystems: number of subsystem instances in the diagram, defaults
+        to 0
+    :type subsystems: int, optional
+    :param nesting: maximum depth of subsystems within subsystems, defaults
+        to 1
+    :type nesting: int, optional
+    :param seed: seed of the random number generator, defaults to None
+    :type seed: int, optional
+    :return: diagram description
+    :rtype: DiagramSpec
+
+    The diagram uses the blocks ``CONSTANT``, ``STEP``, ``GAIN``, ``SUM``,
+    ``LTI_SISO``, ``INTEGRATOR``, ``ZOH``, ``SUBSYSTEM``, ``INPORT``,
+    ``OUTPORT`` and ``NULL``, it has no algebraic loops and its simulation is
+    stable.  Each subsystem definition is a smaller random diagram, with its
+    share of the blocks and states, used by one subsystem block.  Clocks are
+    only used in the top-level diagram.
+
+    The same seed gives the same diagram.
+
+    :seealso: :func:`random_diagram` :meth:`DiagramSpec.save`
+    """
+    generator = _Generator(np.random.default_rng(seed))
+    return generator.diagram(
+        "main", blocks, depth, clocks, states, subsystems, max(nesting, 0)
+    )
+
+
+def random_diagram(sim: Any, seed: int | None = None, **kwargs: Any) -> Any:
+    """
+    Random block diagram
+
+    :param sim: simulator
+    :type sim: BDSim
+    :param seed: seed of the random number generator, defaults to None
+    :type seed: int, optional
+    :param kwargs: options passed to :func:`random_spec`
+    :return: block diagram, not compiled
+    :rtype: BlockDiagram
+
+    Example::
+
+        from bdsim.testing import random_diagram
+
+        bd = random_diagram(sim, blocks=1000, depth=10, clocks=3, seed=0)
+        bd.compile()
+        sim.run(bd, T=5)
+    """
+    return random_spec(seed=seed, **kwargs).build(sim.blockdiagram())
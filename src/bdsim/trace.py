@@ -0,0 +1,207 @@
+"""Timeline trace of a simulation run in Chrome trace-event format."""
+
+from __future__ import annotations
+
+import json
+import time
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from bdsim.blockdiagram import BlockDiagram
+    from bdsim.components import SimulationState
+
+# ------------------------------------------------------------------------- #
+#
+# The trace is a JSON file in the trace-event format read by Perfetto
+# (https://ui.perfetto.dev) and chrome://tracing.  Wall time is the timeline,
+# simulation time is given in the arguments of each event:
+#
+#   spans     interval    one per call of the interval handler, t0 and t1
+#             solve_ivp   one per integration of an interval
+#             ydot        every rhs_every'th state derivative evaluation, t
+#             graphics    graphics update of the block diagram and display
+#                         refresh, t
+#   instants  tick        clock tick, clock name and t
+#             crossing    zero-crossing detected, block name and t
+#             stop        simulation stopped, block name and t
+#
+# As for the profiler, events are recorded by wrappers that are installed for
+# the run only, so a run without tracing executes unchanged code.
+#
+# ------------------------------------------------------------------------- #
+
+
+class Tracer:
+    """
+    Record a timeline of a simulation run
+
+    :param filename: name of the trace file to write
+    :type filename: str
+    :param rhs_every: record one state derivative evaluation in this many,
+        defaults to 10
+    :type rhs_every: int, optional
+
+    Created by :meth:`BDSim.run` when tracing is enabled, the file is written
+    by :meth:`write` at the end of the run.
+    """
+
+    def __init__(self, filename: str, rhs_every: int = 10) -> None:
+        self.filename = filename
+        self.rhs_every = max(int(rhs_every), 1)
+        self.events: list[dict[str, Any]] = []
+        self._calls: dict[str, int] = {}
+        self._origin = time.perf_counter()
+        self._patched: list[tuple[Any, str]] = []
+
+    def __repr__(self) -> str:
+        return f"Tracer({self.filename}, {len(self.events)} events)"
+
+    def now(self) -> float:
+        """Wall time since the trace started, in microseconds"""
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def span(
+        self, name: str, cat: str, start: float, args: dict[str, Any] | None = None
+    ) -> None:
+        """
+        Record a span that started at ``start`` and ends now
+
+        :param name: span name
+        :type name: str
+        :param cat: category
+        :type cat: str
+        :param start: start time from :meth:`now`
+        :type start: float
+        :param args: arguments shown with the span, defaults to None
+        :type args: dict, optional
+        """
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": start,
+                "dur": self.now() - start,
+                "pid": 1,
+                "tid": 1,
+                "args": args or {},
+            }
+        )
+
+    def instant(self, name: str, cat: str, args: dict[str, Any] | None = None) -> None:
+        """
+        Record an instant event now
+
+        :param name: event name
+        :type name: str
+        :param cat: category
+        :type cat: str
+        :param args: arguments shown with the event, defaults to None
+        :type args: dict, optional
+        """
+        self.events.append(
+            {
+                "name": name,
+                "cat": cat,
+                "ph": "i",
+                "s": "p",
+                "ts": self.now(),
+                "pid": 1,
+                "tid": 1,
+                "args": args or {},
+            }
+        )
+
+    def wrap(
+        self,
+        func: Callable[..., Any],
+        name: str,
+        cat: str,
+        args: Callable[..., dict[str, Any]] | None = None,
+        every: int = 1,
+    ) -> Callable[..., Any]:
+        """
+        Traced version of a function
+
+        :param func: function to trace
+        :type func: callable
+        :param name: span name
+        :type name: str
+        :param cat: category
+        :type cat: str
+        :param args: function of the call arguments that returns the span
+            arguments, defaults to None
+        :type args: callable, optional
+        :param every: record one call in this many, defaults to 1
+        :type every: int, optional
+        :return: function that records a span for its calls
+        :rtype: callable
+
+        Calls are counted by span name, so sampling continues across the
+        functions wrapped for each interval.
+        """
+        calls = self._calls
+        calls.setdefault(name, 0)
+
+        def traced(*fargs: Any, **fkwargs: Any) -> Any:
+            calls[name] += 1
+            if calls[name] % every:
+                return func(*fargs, **fkwargs)
+            start = self.now()
+            try:
+                return func(*fargs, **fkwargs)
+            finally:
+                self.span(name, cat, start, args(*fargs) if args else None)
+
+        return traced
+
+    def _patch(self, obj: Any, attr: str, traced: Callable[..., Any]) -> None:
+        setattr(obj, attr, traced)
+        self._patched.append((obj, attr))
+
+    def instrument(self, bd: BlockDiagram, simstate: SimulationState) -> None:
+        """
+        Trace the clock ticks and graphics of a block diagram
+
+        :param bd: block diagram
+        :type bd: BlockDiagram
+        :param simstate: simulation state
+        :type simstate: SimulationState
+        """
+        for clock in bd.clocklist:
+
+            def savestate(
+                t: float, *args: Any, _clock: Any = clock, **kwargs: Any
+            ) -> None:
+                self.instant("tick", "clock", {"clock": _clock.name, "t": t})
+                type(_clock).savestate(_clock, t, *args, **kwargs)
+
+            self._patch(clock, "savestate", savestate)
+
+        self._patch(
+            bd,
+            "step",
+            self.wrap(bd.step, "graphics", "graphics", args=lambda t, *_: {"t": t}),
+        )
+        display_manager = getattr(simstate, "display_manager", None)
+        if display_manager is not None:
+            self._patch(
+                display_manager,
+                "refresh",
+                self.wrap(display_manager.refresh, "refresh", "graphics"),
+            )
+
+    def remove(self) -> None:
+        """Remove the wrappers added by :meth:`instrument`"""
+        for obj, attr in self._patched:
+            obj.__dict__.pop(attr, None)
+        self._patched = []
+
+    def write(self) -> None:
+        """Write the trace file"""
+        with open(self.filename, "w") as f:
+            json.dump(
+                {"traceEvents": self.events, "displayTimeUnit": "ms"},
+                f,
+                default=float,
+            )
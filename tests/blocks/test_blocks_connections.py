@@ -23,6 +23,19 @@ class ConnectionsTest(unittest.TestCase):
         block = Mux(2)
         nt.assert_array_equal(block.test_output(1, np.r_[2, 3])[0], np.r_[1, 2, 3])
 
+    def test_mux_inplace(self):
+        buf = np.zeros((3,))
+        block = Mux(2)
+        out = block.output_inplace(0, [1.5, np.r_[2.0, 3]], None, [buf])
+        self.assertIs(out[0], buf)
+        nt.assert_array_equal(buf, np.r_[1.5, 2, 3])
+
+        # width or dtype differ from the buffer, fall back to output
+        out = block.output_inplace(0, [1.5, np.r_[2.0, 3, 4]], None, [buf])
+        nt.assert_array_equal(out[0], np.r_[1.5, 2, 3, 4])
+        out = block.output_inplace(0, [1.5, 2.5], None, [np.zeros((2,), dtype=int)])
+        nt.assert_array_equal(out[0], np.r_[1.5, 2.5])
+
     def test_demux(self):
         block = DeMux(2)
         self.assertEqual(block.test_output(np.r_[1, 2])[0], 1)
@@ -48,6 +48,37 @@ import numpy.testing as nt
 
 
 class TransferTest(unittest.TestCase):
+    def test_LTI_SS_inplace(self):
+        A = np.eye(2)
+        B = np.array([[1.0], [2.0]])
+        C = np.array([[1.0, 2.0], [3.0, 4.0]])
+        block = LTI_SS(A=A, B=B, C=C)
+        x = np.r_[1.0, -1.0]
+        buf = np.zeros((2,))
+        out = block.output_inplace(0, [0.5], x, [buf])
+        self.assertIs(out[0], buf)
+        nt.assert_array_almost_equal(buf, C @ x)
+        nt.assert_array_almost_equal(block.output(0, [0.5], x)[0], C @ x)
+
+        # scalar output has no buffer
+        block = LTI_SS(A=A, B=B, C=np.array([1.0, 2.0]))
+        out = block.output_inplace(0, [0.5], x, [None])
+        self.assertIsInstance(out[0], float)
+        self.assertAlmostEqual(out[0], -1.0)
+
+    def test_LTI_SS_array(self):
+        A = np.array([[1, 2], [3, 4]])
+        B = np.array([5, 6])
+        C = np.array([7, 8])
+        block = LTI_SS(A=A, B=B, C=C, D=np.array([0.5]))
+        X = np.array([[10.0, 11.0], [1.0, 2.0], [0.0, -1.0]])
+        U = [np.r_[-2.0, 0.0, 3.0]]
+        Y = block.output_array(0, U, X)
+        Xd = block.deriv_array(0, U, X)
+        for i in range(3):
+            self.assertAlmostEqual(Y[0][i], block.output(0, [U[0][i]], X[i])[0])
+            nt.assert_array_almost_equal(Xd[i], block.deriv(0, [U[0][i]], X[i]))
+
     def test_LTI_SS(self):
         A = np.array([[1, 2], [3, 4]])
         B = np.array([5, 6])
@@ -125,6 +156,18 @@ class TransferTest(unittest.TestCase):
         u = -2
         nt.assert_equal(block.test_deriv(u, x=x), 0)
 
+    def test_integrator_array(self):
+        block = Integrator(x0=[0, 0], gain=2, max=[1, 1])
+        X = np.array([[0.0, 2.0], [0.5, 0.5]])
+        U = [np.array([[1.0, 1.0], [-1.0, 3.0]])]
+        nt.assert_array_equal(block.output_array(0, U, X)[0], X)
+        nt.assert_array_equal(block.deriv_array(0, U, X), [[2, 0], [-2, 6]])
+        # the input is not modified
+        nt.assert_array_equal(U[0], [[1, 1], [-1, 3]])
+
+        block = Integrator()
+        nt.assert_array_equal(block.output_array(0, [None], X[:, :1])[0], [0, 0.5])
+
     def test_integrator_vec(self):
         block = Integrator(x0=[5, 6])  # state is vector
         self.assertEqual(block.nstates, 2)
@@ -373,6 +416,89 @@ class ContinuousSim(unittest.TestCase):
         nt.assert_almost_equal(out.y[0, 2], 0)
         nt.assert_almost_equal(out.y[-1, 2], 44, decimal=1)
 
+    def _delay_bd(self, **kwargs):
+        bd = self.sim.blockdiagram()
+        signal = bd.WAVEFORM("sine", freq=1)
+        delay = bd.DELAY(0.2, **kwargs)
+        integrator = bd.INTEGRATOR()
+        bd.connect(signal, delay)
+        bd.connect(delay, integrator)
+        bd.connect(integrator, bd.NULL())
+        bd.compile()
+        return bd, delay
+
+    def test_delay(self):
+        bd, delay = self._delay_bd()
+        out = self.sim.run(bd, T=2, watch=[delay])
+        expected = np.where(out.t >= 0.2, np.sin(2 * np.pi * (out.t - 0.2)), 0)
+        nt.assert_allclose(out.y[:, 0], expected, atol=5e-3)
+        expected = np.where(
+            out.t >= 0.2, (1 - np.cos(2 * np.pi * (out.t - 0.2))) / (2 * np.pi), 0
+        )
+        nt.assert_allclose(out.x[:, 0], expected, atol=1e-3)
+        # integration is broken once per delay time
+        self.assertEqual(out.stats.restarts_by_reason, {"event": 9, "end": 1})
+
+    def test_delay_capacity(self):
+        bd, delay = self._delay_bd(capacity=10)
+        with self.assertRaises(RuntimeError):
+            self.sim.run(bd, T=2)
+
+        # the ring buffer wraps around many times
+        bd, delay = self._delay_bd(capacity=50)
+        out = self.sim.run(bd, T=2, watch=[delay])
+        expected = np.where(out.t >= 0.2, np.sin(2 * np.pi * (out.t - 0.2)), 0)
+        nt.assert_allclose(out.y[:, 0], expected, atol=5e-3)
+
+    def test_delay_loop(self):
+        # feedback through the delay is not an algebraic loop
+        bd = self.sim.blockdiagram()
+        sum = bd.SUM("++")
+        delay = bd.DELAY(0.1, y0=[0, 0])
+        bd.connect(bd.CONSTANT([1, 2]), sum[0])
+        bd.connect(sum, delay)
+        bd.connect(delay, sum[1])
+        integrator = bd.INTEGRATOR(x0=[0, 0])
+        bd.connect(sum, integrator)
+        bd.connect(integrator, bd.NULL())
+        bd.compile()
+        out = self.sim.run(bd, T=1.05, watch=[delay])
+        nt.assert_array_almost_equal(out.y[0], [0, 0])
+        nt.assert_array_almost_equal(out.y[-1], [10, 20], decimal=1)
+
+    def test_delay_no_states(self):
+        # without continuous states the diagram is sampled every delay time
+        bd = self.sim.blockdiagram()
+        signal = bd.WAVEFORM("sine", freq=1)
+        delay = bd.DELAY(0.2)
+        bd.connect(signal, delay)
+        bd.connect(delay, bd.NULL())
+        bd.compile()
+        out = self.sim.run(bd, T=2, watch=[delay])
+        nt.assert_array_almost_equal(out.t, np.arange(11) * 0.2)
+        expected = np.where(out.t >= 0.2, np.sin(2 * np.pi * (out.t - 0.2)), 0)
+        nt.assert_allclose(out.y[:, 0], expected, atol=1e-9)
+
+        # a loop of function blocks through the delay
+        bd = self.sim.blockdiagram()
+        delay = bd.DELAY(0.1, y0=1)
+        inc = bd.FUNCTION(lambda x: x + 1)
+        bd.connect(delay, inc)
+        bd.connect(inc, delay, bd.NULL())
+        bd.compile()
+        out = self.sim.run(bd, T=1, watch=[inc])
+        nt.assert_array_almost_equal(out.y[:, 0], np.arange(2, 13))
+
+    def test_delay_resume(self):
+        bd, delay = self._delay_bd()
+        expected = self.sim.run(bd, T=2)
+        self.sim.run(bd, T=1)
+        out = self.sim.run(bd, T=2, resume=self.sim.checkpoint())
+        nt.assert_allclose(out.x[-1], expected.x[-1], atol=1e-3)
+        with self.assertRaises(ValueError):
+            bdsim.blocks.continuous.Delay(0)
+
+
 
 class Tf2SsTest(unittest.TestCase):
     @classmethod
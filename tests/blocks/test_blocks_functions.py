@@ -52,6 +52,24 @@ class FunctionBlockTest(unittest.TestCase):
         out = block.test_output(np.array([[5, 6], [7, 8]]))
         nt.assert_array_almost_equal(out[0], np.array([[23, 34], [31, 46]]))
 
+    def test_gain_inplace(self):
+        buf = np.zeros((3,))
+        block = Gain(2)
+        out = block.output_inplace(0, [np.r_[1.0, 2, 3]], None, [buf])
+        self.assertIs(out[0], buf)
+        nt.assert_array_almost_equal(buf, np.r_[2, 4, 6])
+
+        block = Gain(np.array([[1, 2], [3, 4], [5, 6]]), premul=True)
+        out = block.output_inplace(0, [np.r_[1.0, 2]], None, [buf])
+        self.assertIs(out[0], buf)
+        nt.assert_array_almost_equal(buf, np.r_[5, 11, 17])
+
+        # scalar input, and a buffer that does not match, fall back to output
+        self.assertEqual(Gain(2).output_inplace(0, [3], None, [None]), [6])
+        out = Gain(2).output_inplace(0, [np.r_[1.0, 2]], None, [buf])
+        self.assertIsNot(out[0], buf)
+        nt.assert_array_almost_equal(out[0], np.r_[2, 4])
+
     def test_pow(self):
 
         block = Pow(3)
@@ -230,6 +248,44 @@ class FunctionBlockTest(unittest.TestCase):
         # self.assertEqual(block.test_output(7.5)[0], 0.)
         # self.assertEqual(block.test_output(10)[0], 0)
 
+    def test_lut(self):
+        x = np.linspace(0, 4, 5)
+        y = np.array([0.0, 1, 3, 7])
+        X, Y = np.meshgrid(x, y, indexing="ij")
+        table = X * Y + 2 * X - Y
+        exact = scipy.interpolate.RegularGridInterpolator((x, y), table)
+
+        block = LUT(table, [x, y])
+        self.assertEqual(block.nin, 2)
+        self.assertEqual(block._uniform[0], (0, 1))
+        self.assertIsNone(block._uniform[1])
+        for u in [(0, 0), (1.5, 2.5), (4, 7), (0.25, 6.9), (3.3, 0.1), (2, 1)]:
+            self.assertAlmostEqual(block.test_output(*u)[0], float(exact(u)))
+
+        # clamped or extrapolated outside the grid
+        self.assertAlmostEqual(block.test_output(-1, 8)[0], float(exact((0, 7))))
+        block = LUT(table, [x, y], extrapolate=True)
+        self.assertAlmostEqual(block.test_output(5, 8)[0], 5 * 8 + 10 - 8)
+
+        # vector valued table and batched lookup
+        block = LUT(np.stack((table, -table), axis=-1), [x, y])
+        nt.assert_almost_equal(
+            block.test_output(1.5, 2.5)[0], [1, -1] * exact((1.5, 2.5))
+        )
+        pts = np.random.default_rng(0).uniform([0, 0], [4, 7], (20, 2))
+        Y = block.lookup(pts[:, 0], pts[:, 1])
+        self.assertEqual(Y.shape, (20, 2))
+        nt.assert_almost_equal(Y[:, 0], exact(pts))
+        nt.assert_almost_equal(
+            LUT(table, [x, y]).lookup(pts[:, 0], 2.0),
+            exact(np.c_[pts[:, 0], np.full(20, 2.0)]),
+        )
+
+        block = LUT([[0, 1], [2, 3]], [[0, 1], [0, 1]])
+        self.assertAlmostEqual(block.test_output(0.5, 0.5)[0], 1.5)
+        self.assertRaises(ValueError, LUT, table, [y, x])
+        self.assertRaises(ValueError, LUT, [1, 0, 2], [[0, 2, 1]])
+
 
 # ---------------------------------------------------------------------------------------#
 if __name__ == "__main__":
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+import itertools
+import socket
+import tempfile
+import os
+import threading
+import time
+
+import numpy as np
+
+from bdsim.blocks.network import *
+from bdsim.channel import SharedChannel
+
+import unittest
+import numpy.testing as nt
+
+
+def wait_for(condition, timeout=5.0):
+    t = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > t:
+            raise TimeoutError
+        time.sleep(0.01)
+
+
+_names = itertools.count()
+
+
+def channel_name():
+    return f"bdsim_test_{os.getpid()}_{next(_names)}"
+
+
+def free_port(kind=socket.SOCK_DGRAM):
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class NetworkBlockTest(unittest.TestCase):
+    def test_constructor(self):
+        block = SocketSource("udp://127.0.0.1:0", dtype=[("a", "<f8"), ("b", "<f4")])
+        self.assertEqual(block.nout, 2)
+        self.assertEqual(SocketSink("tcp://127.0.0.1:1").nin, 1)
+        self.assertRaises(ValueError, SocketSource, "http://localhost:80")
+        self.assertRaises(ValueError, SocketSource, "udp://:0", mode="fifo")
+        self.assertRaises(ValueError, SocketSource, "udp://:0", mode="queue")
+
+    def test_udp_source(self):
+        dtype = np.dtype([("a", "<f8"), ("b", "<i4", (2,))])
+        block = SocketSource("udp://127.0.0.1:0", dtype=dtype, initial=(1, [2, 3]))
+        block.test_start()
+        try:
+            self.assertEqual(block.test_output()[0], 1)
+            nt.assert_equal(block.test_output()[1], [2, 3])
+
+            packet = np.zeros((), dtype)
+            packet[()] = (4.5, [6, 7])
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+                sock.sendto(packet.tobytes(), block.address)
+                sock.sendto(b"short", block.address)
+                wait_for(lambda: block.received == 1 and block.dropped == 1)
+            a, b = block.test_output()
+            self.assertEqual(a, 4.5)
+            nt.assert_equal(b, [6, 7])
+        finally:
+            block.close()
+
+    def test_tcp_sink(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server:
+            server.bind(("127.0.0.1", 0))
+            server.listen(1)
+            port = server.getsockname()[1]
+
+            block = SocketSink(f"tcp://127.0.0.1:{port}", dtype=">f8")
+            block.test_start()
+            for t, value in enumerate((1.5, 2.5, 3.5)):
+                block.record(t, [value])
+            conn, _ = server.accept()
+            block.close()
+            with conn:
+                data = b""
+                while len(data) < 24:
+                    data += conn.recv(24)
+        nt.assert_equal(np.frombuffer(data, ">f8"), [1.5, 2.5, 3.5])
+        self.assertEqual(block.sent, 3)
+
+    @unittest.skipUnless(hasattr(socket, "AF_UNIX"), "no Unix-domain sockets")
+    def test_unix(self):
+        with tempfile.TemporaryDirectory() as folder:
+            url = "unix://" + os.path.join(folder, "bdsim.sock")
+            source = SocketSource(url, dtype="<f4", mode="latest")
+            sink = SocketSink(url, dtype="<f4", mode="latest")
+            source.test_start()
+            sink.test_start()
+            try:
+                sink.record(0.0, [2.0])
+                wait_for(lambda: source.received == 1)
+                self.assertEqual(source.test_output()[0], 2.0)
+            finally:
+                sink.close()
+                source.close()
+
+    def test_simulation(self):
+        import bdsim
+
+        sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+        url = f"udp://127.0.0.1:{free_port()}"
+        bd = sim.blockdiagram()
+        clock = bd.clock(0.1)
+        tx = bd.SOCKETSINK(url, clock=clock)
+        rx = bd.SOCKETSOURCE(url, mode="queue", clock=clock, initial=-1)
+        bd.connect(bd.TIME(), tx)
+        bd.connect(rx, bd.NULL())
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        out = sim.run(bd, T=1, watch=[rx])
+
+        self.assertEqual(tx.sent, 11)
+        self.assertGreater(rx.received, 0)
+        # a packet is only seen after it was sent
+        self.assertTrue(np.all(out.y[:, 0] < out.t + 1e-9))
+        self.assertIsNone(tx._thread)
+        self.assertIsNone(rx._thread)
+
+        # a tick shorter than the graphics update interval
+        bd = sim.blockdiagram()
+        clock = bd.clock(0.01)
+        tx = bd.SOCKETSINK(url, clock=clock)
+        bd.connect(bd.TIME(), tx)
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        sim.run(bd, T=10)
+        self.assertEqual(tx.sent + tx.dropped, 1001)
+
+    def test_shm_constructor(self):
+        block = ShmSource("u", dtype=[("a", "<f8"), ("b", "<f4", (3,))])
+        self.assertEqual(block.nout, 2)
+        self.assertEqual(ShmSink("y", dtype=("<f8", (3,))).nin, 1)
+        self.assertRaises(ValueError, ShmSource, "u", lockstep=True)
+        self.assertRaises(ValueError, ShmSink, "y", lockstep=True)
+
+    def test_shm(self):
+        dtype = np.dtype([("a", "<f8"), ("b", "<i4", (2,))])
+        name = channel_name()
+        source = ShmSource(name, dtype=dtype, initial=(1, [2, 3]))
+        source.test_start()
+        try:
+            self.assertEqual(source.test_output()[0], 1)
+            with SharedChannel(name, dtype) as peer:
+                peer.write((4.5, [6, 7]))
+            a, b = source.test_output()
+            self.assertEqual(a, 4.5)
+            nt.assert_equal(b, [6, 7])
+            self.assertEqual(source.received, 1)
+
+            sink = ShmSink(name, dtype="<f8", create=False)
+            self.assertRaises(ValueError, sink.test_start)
+        finally:
+            source.close()
+
+        sink = ShmSink(name, dtype=("<f8", (3,)))
+        sink.test_start()
+        try:
+            with SharedChannel(name) as peer:
+                sink.record(0.0, [[1, 2, 3]])
+                n, record = peer.read()
+                self.assertEqual(n, 1)
+                nt.assert_equal(record["value"], [1, 2, 3])
+        finally:
+            sink.close()
+        self.assertRaises(FileNotFoundError, SharedChannel, name)
+
+    def test_shm_lockstep(self):
+        self._lockstep(0.1, 1)
+        # a tick shorter than the graphics update interval
+        self._lockstep(0.001, 1)
+
+    def _lockstep(self, period, tf):
+        import bdsim
+
+        sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+        request, reply = channel_name(), channel_name()
+        n = round(tf / period)
+        bd = sim.blockdiagram()
+        clock = bd.clock(period)
+        tx = bd.SHMSINK(request, clock=clock, lockstep=True)
+        rx = bd.SHMSOURCE(reply, clock=clock, lockstep=True, initial=-1)
+        bd.connect(bd.TIME(), tx)
+        bd.connect(rx, bd.NULL())
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+
+        def peer():
+            # return the time of each request, in lockstep
+            with SharedChannel(request, timeout=5) as u, SharedChannel(
+                reply, timeout=5
+            ) as y:
+                k = 0
+                for _ in range(n):
+                    k, t = u.wait_read(k, timeout=5)
+                    y.wait_acked(timeout=5)
+                    y.write(t)
+
+        thread = threading.Thread(target=peer)
+        thread.start()
+        out = sim.run(bd, T=tf, watch=[rx])
+        thread.join()
+
+        self.assertEqual(tx.sent, n)
+        self.assertEqual(rx.received, n)
+        # the reply to each tick is output after the tick
+        k = out.t > period + 1e-9
+        y = out.y[:, 0]
+        nt.assert_almost_equal(y[k], np.floor(out.t[k] / period - 1e-6) * period)
+        nt.assert_equal(y[~k], -1)
+        self.assertIsNone(tx._channel)
+        self.assertIsNone(rx._channel)
+
+
+# ---------------------------------------------------------------------------------------#
+if __name__ == "__main__":
+
+    unittest.main()
@@ -36,6 +36,8 @@ from __future__ import annotations
 
 import numpy as np
 import math
+import os
+import tempfile
 
 
 import unittest
@@ -213,6 +215,60 @@ class SinkBlockTest(unittest.TestCase):
         with self.assertRaises(TypeError):
             Event("+", 3)
 
+    def test_tofile(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "log.npy")
+            block = ToFile(path, nin=2, names=["u", "y"], chunk=3, backlog=1)
+            block.test_start()
+            for k in range(10):
+                block.record(float(k), [k * 2, np.r_[k, -k]])
+            block.close()
+            block.close()
+
+            data = np.load(path)
+            self.assertEqual(data.dtype.names, ("t", "u", "y"))
+            self.assertEqual(data["y"].shape, (10, 2))
+            np.testing.assert_equal(data["t"], np.arange(10))
+            np.testing.assert_equal(data["u"], 2 * np.arange(10))
+            np.testing.assert_equal(data["y"][:, 1], -np.arange(10))
+            self.assertEqual(np.load(path, mmap_mode="r")["u"][9], 18)
+
+            self.assertRaises(ValueError, ToFile, path, nin=2, names=["u"])
+            block = ToFile(path)
+            block.test_start()
+            self.assertRaises(ValueError, block.record, 0.0, [{}])
+
+    def test_tofile_run(self):
+        from bdsim import BDSim
+
+        sim = BDSim(graphics=None, progress=False, banner=False, quiet=True)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "log.npy")
+            bd = sim.blockdiagram()
+            integ = bd.INTEGRATOR()
+            bd.connect(bd.CONSTANT(1), integ)
+            bd.connect(integ, bd.TOFILE(path, chunk=7))
+            bd.compile()
+            out = sim.run(bd, T=1, dt=0.01)
+
+            # every sample is recorded
+            data = np.load(path)
+            self.assertEqual(data.dtype.names, ("t", "integrator.0[0]"))
+            np.testing.assert_equal(data["t"], out.t)
+            np.testing.assert_almost_equal(data["integrator.0[0]"], out.t)
+
+            # and not only when graphics are updated
+            out = sim.run(bd, T=300)
+            np.testing.assert_equal(np.load(path)["t"], out.t)
+
+            # played back by FROMDATA
+            bd = sim.blockdiagram()
+            integ = bd.INTEGRATOR()
+            bd.connect(bd.FROMDATA(path), integ)
+            bd.compile()
+            out = sim.run(bd, T=1)
+            self.assertAlmostEqual(out.x[-1, 0], 0.5, places=4)
+
 
 # --------------------------------------------------------------------------------------#
 if __name__ == "__main__":
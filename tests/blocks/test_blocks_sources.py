@@ -33,12 +33,17 @@ Created on Thu May 21 06:39:29 2020
 """
 import numpy as np
 import math
+import os
+import tempfile
 
 from bdsim.blocks.sources import *
 
 import unittest
 import numpy.testing as nt
 
+import bdsim
+from bdsim.components import Clock
+
 
 class SourceBlockTest(unittest.TestCase):
     def test_constant(self):
@@ -220,6 +225,172 @@ class SourceBlockTest(unittest.TestCase):
         self.assertAlmostEqual(block.test_output(t=4)[0], 0)
         self.assertAlmostEqual(block.test_output(t=6)[0], 1)
 
+    def test_whitenoise(self):
+        block = WhiteNoise(std=2, mean=1, dt=0.1, seed=42, chunk=100)
+        y = [block.test_output(t=0.1 * k)[0] for k in range(1000)]
+        self.assertAlmostEqual(np.mean(y), 1, delta=0.2)
+        self.assertAlmostEqual(np.std(y), 2, delta=0.2)
+
+        # a function of time, independent of evaluation order
+        again = WhiteNoise(std=2, mean=1, dt=0.1, seed=42, chunk=100)
+        self.assertEqual(again.test_output(t=55.0)[0], block.test_output(t=55.0)[0])
+        self.assertEqual(again.test_output(t=1.0)[0], block.test_output(t=1.0)[0])
+
+        # interpolated between samples unless held
+        a, b = block.test_output(t=1.0)[0], block.test_output(t=1.1)[0]
+        self.assertAlmostEqual(block.test_output(t=1.025)[0], 0.75 * a + 0.25 * b)
+        block.hold = True
+        self.assertEqual(block.test_output(t=1.025)[0], a)
+
+        block = WhiteNoise(std=[1, 2, 3], seed=1)
+        self.assertEqual(block.test_output(t=0)[0].shape, (3,))
+        block = WhiteNoise(clock=Clock(0.5, offset=0.25), seed=1)
+        self.assertEqual((block.dt, block.hold), (0.5, True))
+        self.assertEqual(block.test_output(t=0.75)[0], block.test_output(t=1.2)[0])
+
+        self.assertRaises(ValueError, WhiteNoise, dt=0)
+
+    def test_bandlimitednoise(self):
+        block = BandLimitedNoise(power=0.1, dt=0.01, seed=3)
+        y = [block.test_output(t=0.01 * k)[0] for k in range(4000)]
+        self.assertAlmostEqual(np.var(y), 0.1 / 0.01, delta=1)
+        self.assertEqual(block.test_output(t=0.015)[0], y[1])
+
+    def test_randomwalk(self):
+        block = RandomWalk(std=2, x0=5, dt=0.5, seed=7, chunk=10)
+        y = np.array([block.test_output(t=0.5 * k)[0] for k in range(40)])
+        self.assertEqual(y[0], 5)
+        # increments have the scaled variance, continuous across chunks
+        inc = np.diff(y)
+        self.assertAlmostEqual(np.std(inc), 2 * math.sqrt(0.5), delta=0.5)
+
+        # random access to a later chunk gives the same walk
+        block = RandomWalk(std=2, x0=5, dt=0.5, seed=7, chunk=10)
+        self.assertEqual(block.test_output(t=19.5)[0], y[39])
+
+    def test_seed(self):
+        def noise(name, seed=None, runseed=None):
+            block = WhiteNoise(seed=seed, name=name)
+
+            class State:
+                pass
+
+            state = State()
+            state.seed = runseed
+            block.start(state)
+            return block.test_output(t=0)[0]
+
+        runseed = np.random.SeedSequence(5)
+        self.assertEqual(noise("a", runseed=runseed), noise("a", runseed=runseed))
+        self.assertNotEqual(noise("a", runseed=runseed), noise("b", runseed=runseed))
+        # spawned seeds of Monte Carlo workers are independent
+        w0, w1 = runseed.spawn(2)
+        self.assertNotEqual(noise("a", runseed=w0), noise("a", runseed=w1))
+        # a block's own seed wins
+        self.assertEqual(noise("a", 9, w0), noise("b", 9, w1))
+        self.assertNotEqual(noise("a"), noise("a"))
+
+    def test_fromdata(self):
+        t = np.arange(0, 10, 0.5)
+        block = FromData(np.column_stack((t, 2 * t)))
+        self.assertEqual(block.test_output(t=1.25)[0], 2.5)
+        self.assertEqual(block.test_output(t=9.0)[0], 18)
+        # back, forward and outside the recording
+        self.assertEqual(block.test_output(t=0.75)[0], 1.5)
+        self.assertEqual(block.test_output(t=-1)[0], 0)
+        self.assertEqual(block.test_output(t=20)[0], 19)
+        self.assertEqual(block.test_output(t=0.1)[0], 0.2)
+
+        block = FromData(np.c_[t, t, -t], t=t, kind="hold")
+        nt.assert_equal(block.test_output(t=1.25)[0], [1, 1, -1])
+        self.assertEqual(block.test_output(t=1.25)[0].shape, (3,))
+
+        self.assertRaises(ValueError, FromData, t)
+        self.assertRaises(ValueError, FromData, t, t=t[1:])
+        self.assertRaises(ValueError, FromData, np.c_[t, t], kind="cubic")
+
+    def test_fromdata_locate(self):
+        rng = np.random.default_rng(0)
+        t = np.sort(rng.uniform(0, 100, 1000))
+        block = FromData(t, t=t)
+        for tq in np.r_[np.sort(rng.uniform(-1, 101, 200)), rng.uniform(-1, 101, 200)]:
+            self.assertEqual(
+                block._locate(tq), np.searchsorted(t, tq, side="right") - 1
+            )
+
+    def test_fromdata_files(self):
+        t = np.linspace(0, 1, 11)
+        y = np.c_[t, t**2]
+        with tempfile.TemporaryDirectory() as folder:
+            npy = os.path.join(folder, "data.npy")
+            np.save(npy, np.c_[t, y])
+            npz = os.path.join(folder, "data.npz")
+            np.savez(npz, t=t, y=y, z=-t)
+            zipped = os.path.join(folder, "zipped.npz")
+            np.savez_compressed(zipped, t=t, y=y)
+
+            for block in (
+                FromData(npy),
+                FromData(npy, mmap=True),
+                FromData(npz, mmap=True),
+                FromData(zipped, mmap=True),
+            ):
+                nt.assert_almost_equal(block.test_output(t=0.5)[0], [0.5, 0.25])
+            self.assertIsInstance(FromData(npz, mmap=True).data, np.memmap)
+            block = FromData(npz, signal="z", mmap=True)
+            self.assertAlmostEqual(block.test_output(t=0.35)[0], -0.35)
+            del block
+
+
+class SourceSim(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(
+            graphics=None, progress=False, banner=False, sysargs=False, quiet=True
+        )
+
+    def _run(self, **kwargs):
+        bd = self.sim.blockdiagram()
+        noise = bd.RANDOMWALK(std=1, dt=0.05, chunk=16)
+        integ = bd.INTEGRATOR()
+        bd.connect(noise, integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        kwargs.setdefault("T", 2)
+        return self.sim.run(bd, **kwargs)
+
+    def test_run(self):
+        out1 = self._run(seed=11)
+        out2 = self._run(seed=11, max_step=0.01)
+        # same noise despite different steps
+        nt.assert_allclose(out1.x[-1], out2.x[-1], atol=1e-3)
+        self.assertNotEqual(out1.x[-1, 0], self._run(seed=12).x[-1, 0])
+
+    def test_resume(self):
+        full = self._run(seed=4)
+        self._run(seed=4, T=1)
+        warm = self.sim.checkpoint()
+        # the noise continues without the seed of the run
+        resumed = self.sim.run(warm.bd, T=2, resume=warm)
+        nt.assert_allclose(resumed.x[-1], full.x[-1], atol=1e-3)
+
+    def test_fromdata(self):
+        bd = self.sim.blockdiagram()
+        bd.connect(bd.TIME(), bd.INTEGRATOR())
+        bd.compile()
+        recorded = self.sim.run(bd, T=2, dt=0.1)
+
+        # integrate the recorded state, t^2/2, interpolated between samples
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.FROMDATA(recorded), integ)
+        bd.compile()
+        out = self.sim.run(bd, T=2)
+        x = recorded.x[:, 0]
+        expected = np.sum((x[1:] + x[:-1]) / 2 * np.diff(recorded.t))
+        self.assertAlmostEqual(out.x[-1, 0], expected, places=6)
+        self.assertGreaterEqual(out.stats.restarts_by_reason["event"], 19)
+
 
 # ---------------------------------------------------------------------------------------#
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for benchmarks/bench.py, the engine benchmark suite.
+"""
+
+import importlib.util
+import unittest
+from pathlib import Path
+from unittest import mock
+
+BENCH = Path(__file__).resolve().parents[1] / "benchmarks" / "bench.py"
+spec = importlib.util.spec_from_file_location("bench", BENCH)
+bench = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(bench)
+
+
+class BenchTest(unittest.TestCase):
+    def test_synthetic(self):
+        for build, blocks in (
+            (bench.chain(3), 4),
+            (bench.fanout(3), 5),
+            (bench.clocks(2), 6),
+            (bench.events(2), 9),
+            (bench.states(5), 3),
+        ):
+            case = build()
+            self.assertEqual(len(case.bd.blocklist), blocks)
+            self.assertGreater(case.compile_s, 0)
+
+    def test_measure(self):
+        results = bench.measure_case(bench.chain(3), repeat=1)
+        self.assertEqual(results["blocks"], 4)
+        self.assertEqual(results["states"], 1)
+        self.assertGreater(results["evaluations"], results["ydot_calls"])
+        for metric in bench.METRICS:
+            self.assertGreater(results[metric], 0)
+
+        results = bench.measure_case(bench.clocks(1), repeat=1)
+        self.assertEqual(results["clocks"], 1)
+
+    def test_measure_ydot(self):
+        # the lean path installed by the run is timed, not the instrumented
+        # path the run restores at the end
+        case = bench.chain(3)()
+        out = case.sim.run(case.bd, *case.args, **case.kwargs)
+        bd = case.bd
+        with mock.patch.object(bd, "_evaluate_lean", wraps=bd._evaluate_lean) as lean:
+            self.assertGreater(bench.measure_ydot(case, out, duration=0.01), 0)
+        self.assertGreater(lean.call_count, 0)
+        self.assertNotIn("evaluate", bd.__dict__)
+
+    def test_example(self):
+        case = bench.example("pid")()
+        self.assertTrue(case.bd.compiled)
+        self.assertEqual(case.args, (10,))
+        self.assertFalse(case.sim.options.graphics)
+
+    def test_compare(self):
+        baseline = {
+            "import_s": 1.0,
+            "cases": {
+                "a": {"run_s": 1.0, "evals_per_s": 100.0, "ydot_us": None},
+                "b": {"run_s": 1.0},
+            },
+        }
+        results = {
+            "import_s": 1.1,
+            "cases": {
+                "a": {"run_s": 1.5, "evals_per_s": 50.0, "ydot_us": 10.0},
+                "c": {"run_s": 9.0},
+            },
+        }
+        regressions = bench.compare(results, baseline, tolerance=0.2)
+        self.assertEqual(
+            [(case, metric) for case, metric, *_ in regressions],
+            [("a", "run_s"), ("a", "evals_per_s")],
+        )
+        self.assertEqual(bench.compare(results, baseline, tolerance=1.5), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1454,6 +1454,464 @@ class BlockValuesTest(SetUpMixin, unittest.TestCase):
 
 
 # ---------------------------------------------------------------------------
+class FuseChainsTest(SetUpMixin, unittest.TestCase):
+    """Fusion of stateless function-block chains."""
+
+    def _chain_bd(self, **kwargs):
+        """CONSTANT -> GAIN -> GAIN -> SUM(+-) <- CONSTANT, SUM -> CLIP -> NULL."""
+        bd = self.sim.blockdiagram()
+        c1 = bd.CONSTANT(2)
+        c2 = bd.CONSTANT(1)
+        g1 = bd.GAIN(3)
+        g2 = bd.GAIN(2)
+        s = bd.SUM("+-")
+        clip = bd.CLIP(min=-100, max=5)
+        null = bd.NULL()
+        bd.connect(c1, g1)
+        bd.connect(g1, g2)
+        bd.connect(g2, s[0])
+        bd.connect(c2, s[1])
+        bd.connect(s, clip)
+        bd.connect(clip, null)
+        bd.compile(verbose=False, **kwargs)
+        return bd, (g1, g2, s, clip), null
+
+    def test_chain_found(self):
+        bd, blocks, null = self._chain_bd()
+        self.assertEqual(len(bd.fused_chains), 1)
+        chain = bd.fused_chains[0]
+        self.assertEqual(chain.blocks, blocks)
+        self.assertIs(chain.root, blocks[-1])
+        self.assertIn("->", repr(chain))
+
+        # only the root of the chain is in the execution plan
+        executed = [b for b, _ in bd._exec_plan]
+        for b in blocks[:-1]:
+            self.assertNotIn(b, executed)
+        self.assertIn(blocks[-1], executed)
+
+    def test_fused_evaluate(self):
+        bd, (g1, g2, s, clip), null = self._chain_bd()
+        bd.evaluate({}, 0.0)
+        self.assertEqual(null.inport_value(0), 5)  # clip(2*3*2 - 1)
+        self.assertEqual(clip.outport_value(0), 5)
+        # intermediate values are not published
+        self.assertIsNone(g1.outport_slot(0).value)
+
+    def test_fuse_disabled(self):
+        bd, blocks, null = self._chain_bd(fuse=False)
+        self.assertEqual(bd.fused_chains, [])
+        bd.evaluate({}, 0.0)
+        self.assertEqual(null.inport_value(0), 5)
+        self.assertEqual(blocks[0].outport_value(0), 6)
+
+    def test_watched_breaks_chain(self):
+        bd, (g1, g2, s, clip), null = self._chain_bd()
+        bd.fuse_chains(watched=[g2])
+        self.assertEqual([c.blocks for c in bd.fused_chains], [(g1, g2), (s, clip)])
+        bd.evaluate({}, 0.0)
+        self.assertEqual(g2.outport_value(0), 12)
+        self.assertEqual(null.inport_value(0), 5)
+
+        bd.fuse_chains(enable=False)
+        self.assertEqual(bd.fused_chains, [])
+
+    def test_fan_in_and_fan_out(self):
+        bd = self.sim.blockdiagram()
+        c = bd.CONSTANT(np.r_[1.0, 2.0])
+        dmx = bd.DEMUX(2)
+        mux = bd.MUX(2)
+        g = bd.GAIN(2)
+        n1 = bd.NULL()
+        n2 = bd.NULL()
+        bd.connect(c, dmx)
+        bd.connect(dmx[0], mux[1])
+        bd.connect(dmx[1], mux[0])
+        bd.connect(mux, g)
+        bd.connect(g, n1, n2)  # fan out ends the chain
+        bd.compile(verbose=False)
+        self.assertEqual([ch.blocks for ch in bd.fused_chains], [(dmx, mux, g)])
+        bd.evaluate({}, 0.0)
+        nt.assert_array_equal(n1.inport_value(0), [4.0, 2.0])
+
+    def test_block_error_attribution(self):
+        bd = self.sim.blockdiagram()
+        c = bd.CONSTANT(1)
+        g = bd.GAIN(2)
+        f = bd.FUNCTION(lambda x: 1 / 0 if x > 10 else x)
+        null = bd.NULL()
+        bd.connect(c, g)
+        bd.connect(g, f)
+        bd.connect(f, null)
+        bd.compile(verbose=False)
+        self.assertEqual(len(bd.fused_chains), 1)
+
+        g.K = 20
+        buf = io.StringIO()
+        with redirect_stdout(buf), self.assertRaises(RuntimeError):
+            bd.evaluate({}, 0.0)
+        self.assertIn(f.name, buf.getvalue())
+        self.assertIn("ZeroDivisionError", buf.getvalue())
+
+    def test_run_with_watch(self):
+        bd, (g1, g2, s, clip), null = self._chain_bd()
+        out = self.sim.run(bd, T=0.5, watch=[g1])
+        self.assertTrue(np.all(out.y[:, 0] == 6))
+        self.assertEqual(bd.fused_chains[0].blocks, (g2, s, clip))
+
+    def test_deepcopy(self):
+        from copy import deepcopy
+
+        bd, blocks, null = self._chain_bd()
+        bd2 = deepcopy(bd)
+        self.assertIsNot(bd2.fused_chains[0].blocks[0], blocks[0])
+        bd2.evaluate({}, 0.0)
+        self.assertEqual(bd2.blocklist[-1].inport_value(0), 5)
+
+
+# ---------------------------------------------------------------------------
+class SignatureTest(SetUpMixin, unittest.TestCase):
+    """Output signatures recorded at compile time."""
+
+    def _bd(self):
+        bd = self.sim.blockdiagram()
+        const = bd.CONSTANT(np.r_[1.0, 2.0])
+        step = bd.STEP(T=1)
+        mux = bd.MUX(2)
+        gain = bd.GAIN(3)
+        bd.connect(const, mux[0])
+        bd.connect(step, mux[1])
+        bd.connect(mux, gain)
+        bd.connect(gain, bd.NULL())
+        bd.compile(verbose=False, fuse=False)
+        return bd, step, mux, gain
+
+    def test_signatures(self):
+        bd, step, mux, gain = self._bd()
+        sig = mux.outport_signature(0)
+        self.assertIs(sig.type, np.ndarray)
+        self.assertEqual(sig.shape, (3,))
+        self.assertEqual(sig.dtype, np.float64)
+        self.assertEqual(step.outport_signature(0), (int, None, None))
+
+        # only blocks with an in-place output method have buffers
+        self.assertEqual(gain._output_buffers[0].shape, (3,))
+        self.assertIsNone(step._output_buffers)
+
+    def test_not_compiled(self):
+        bd = self.sim.blockdiagram()
+        const = bd.CONSTANT(1)
+        bd.connect(const, bd.NULL())
+        bd.compile(verbose=False, evaluate=False)
+        with self.assertRaises(AssertionError):
+            const.outport_signature(0)
+
+    def test_evaluate_inplace(self):
+        bd, step, mux, gain = self._bd()
+        bd.evaluate({}, 2.0, inplace=True)
+        buf = gain._output_buffers[0]
+        self.assertIs(gain.outport_value(0), buf)
+        nt.assert_array_equal(buf, [3, 6, 3])
+
+        # without inplace new arrays are returned
+        bd.evaluate({}, 0.0)
+        self.assertIsNot(gain.outport_value(0), buf)
+        nt.assert_array_equal(gain.outport_value(0), [3, 6, 0])
+
+
+# ---------------------------------------------------------------------------
+class AtomicSubsystemTest(SetUpMixin, unittest.TestCase):
+    """Atomic subsystems share one compiled template."""
+
+    def _vehicle(self):
+        # first-order lag, output depends on the state only
+        ss = self.sim.blockdiagram(name="vehicle")
+        inp = ss.INPORT(1)
+        outp = ss.OUTPORT(1)
+        err = ss.SUM("+-")
+        gain = ss.GAIN(2, name="gain")
+        integ = ss.INTEGRATOR(x0=1, name="integ")
+        ss.connect(inp, err[0])
+        ss.connect(err, gain)
+        ss.connect(gain, integ)
+        ss.connect(integ, err[1], outp)
+        return ss
+
+    def _chain(self, ss, n, atomic, params=None):
+        bd = self.sim.blockdiagram()
+        prev = bd.CONSTANT(0.5)
+        for i in range(n):
+            kwargs = {"params": params[i]} if params is not None else {}
+            v = bd.SUBSYSTEM(ss, atomic=atomic, name=f"v{i}", **kwargs)
+            bd.connect(prev, v)
+            prev = v
+        bd.connect(prev, bd.NULL())
+        bd.compile(verbose=False)
+        return bd
+
+    def test_shared_template(self):
+        ss = self._vehicle()
+        flat = self._chain(ss, 4, False)
+        atomic = self._chain(ss, 4, True)
+        self.assertEqual(len(atomic.subsystem_templates), 1)
+        self.assertEqual(len(atomic.blocklist), 6)
+        self.assertEqual(atomic.nstates, 4)
+        self.assertEqual(atomic.statenames, flat.statenames)
+
+        template = next(iter(atomic.subsystem_templates.values()))
+        self.assertFalse(template.feedthrough)
+        self.assertEqual(atomic.blocknames["v0"].blockclass, "continuous")
+
+        x = np.r_[0.1, 0.2, 0.3, 0.4]
+        for bd in (flat, atomic):
+            bd.evaluate(bd.state_map(x), 1.0, sinks=False)
+        nt.assert_array_almost_equal(atomic.deriv(1.0), flat.deriv(1.0))
+
+    def test_params(self):
+        ss = self._vehicle()
+        params = [{"gain": {"K": k}} for k in (1, 3)] + [{"integ": {"_x0": [5.0]}}]
+        bd = self._chain(ss, 3, True, params=params)
+        nt.assert_array_equal(bd.getstate0(), [1, 1, 5])
+
+        x = np.r_[1.0, 2.0, 3.0]
+        bd.evaluate(bd.state_map(x), 0.0, sinks=False)
+        nt.assert_array_almost_equal(bd.deriv(0.0), [-0.5, 3 * (1 - 2), 2 * (2 - 3)])
+
+        with self.assertRaises(ValueError):
+            self._chain(ss, 1, True, params=[{"nosuchblock": {"K": 1}}])
+        with self.assertRaises(ValueError):
+            self._chain(ss, 1, True, params=[{"gain": {"nosuchattr": 1}}])
+
+        from bdsim.exceptions import BlockCreationError
+
+        with self.assertRaises(BlockCreationError):
+            self.sim.blockdiagram().SUBSYSTEM(ss, params={"gain": {"K": 1}})
+
+    def test_function_subsystem(self):
+        ss = self.sim.blockdiagram(name="double")
+        inp = ss.INPORT(1)
+        outp = ss.OUTPORT(1)
+        gain = ss.GAIN(2)
+        ss.connect(inp, gain)
+        ss.connect(gain, outp)
+
+        bd = self._chain(ss, 3, True)
+        self.assertEqual(bd.blocknames["v0"].blockclass, "function")
+        self.assertEqual(bd.nstates, 0)
+        self.assertEqual(bd.blocknames["v2"].outport_value(0), 4)
+
+    def test_unsupported(self):
+        ss = self.sim.blockdiagram(name="sampled")
+        inp = ss.INPORT(1)
+        outp = ss.OUTPORT(1)
+        zoh = ss.ZOH(ss.clock(0.1))
+        ss.connect(inp, zoh)
+        ss.connect(zoh, outp)
+        with self.assertRaises(ValueError):
+            self._chain(ss, 1, True)
+
+    def test_run(self):
+        ss = self._vehicle()
+        out1 = self.sim.run(self._chain(ss, 3, False), T=2)
+        out2 = self.sim.run(self._chain(ss, 3, True), T=2)
+        nt.assert_array_almost_equal(out1.t, out2.t)
+        nt.assert_array_almost_equal(out1.x, out2.x)
+
+
+# ---------------------------------------------------------------------------
+class BlockArrayTest(SetUpMixin, unittest.TestCase):
+    """One block that represents N identical blocks."""
+
+    def _bd(self, n, array):
+        # first-order lags x' = c - x with c = [i, i] for element i
+        bd = self.sim.blockdiagram()
+        c = np.repeat(np.arange(n, dtype=float), 2).reshape(n, 2)
+        if array:
+            x0 = np.c_[np.ones(n), np.zeros(n)]
+            integ = bd.blockarray(n, "INTEGRATOR", x0=x0, name="integ")
+            pairs = [(bd.CONSTANT(c), integ)]
+        else:
+            pairs = [(bd.CONSTANT(ci), bd.INTEGRATOR(x0=[1, 0])) for ci in c]
+        for const, integ in pairs:
+            err = bd.SUM("+-")
+            bd.connect(const, err[0])
+            bd.connect(integ, err[1], bd.NULL())
+            bd.connect(err, integ)
+        bd.compile(verbose=False)
+        return bd
+
+    def test_array(self):
+        bd = self._bd(3, True)
+        integ = bd.blocknames["integ"]
+        self.assertEqual(bd.nstates, 6)
+        self.assertEqual(integ.outport_value(0).shape, (3, 2))
+        nt.assert_array_equal(bd.getstate0(), [1, 0, 1, 0, 1, 0])
+
+        x = np.arange(6, dtype=float)
+        bd.evaluate(bd.state_map(x), 0.0, sinks=False)
+        nt.assert_array_equal(bd.deriv(0.0), [0, -1, -1, -2, -2, -3])
+
+    def test_run(self):
+        out1 = self.sim.run(self._bd(3, False), T=1)
+        out2 = self.sim.run(self._bd(3, True), T=1)
+        nt.assert_array_almost_equal(out1.t, out2.t)
+        nt.assert_array_almost_equal(out1.x, out2.x)
+
+    def test_fallback(self):
+        # FUNCTION has no vectorized methods, each element is called in turn
+        bd = self.sim.blockdiagram()
+        f = bd.blockarray(4, "FUNCTION", lambda x: x**2)
+        bd.connect(bd.CONSTANT(np.r_[1.0, 2, 3, 4]), f)
+        bd.connect(f, bd.NULL())
+        bd.compile(verbose=False)
+        self.assertEqual(f.blockclass, "function")
+        nt.assert_array_equal(f.outport_value(0), [1, 4, 9, 16])
+
+    def test_errors(self):
+        bd = self.sim.blockdiagram()
+        with self.assertRaises(ValueError):
+            bd.blockarray(4, "CONSTANT", 1)
+
+        f = bd.blockarray(4, "GAIN", 2)
+        bd.connect(bd.CONSTANT(np.r_[1.0, 2, 3]), f)
+        bd.connect(f, bd.NULL())
+        with redirect_stdout(io.StringIO()):
+            with self.assertRaises(RuntimeError):
+                bd.compile(verbose=False)
+
+
+# ---------------------------------------------------------------------------
+class InstrumentTest(SetUpMixin, unittest.TestCase):
+    """Lean and instrumented evaluation paths."""
+
+    def _bd(self, func=lambda x: 2 * x):
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR(x0=[1, 2], name="integ")
+        func = bd.FUNCTION(func, name="func")
+        gain = bd.GAIN(-0.5)
+        null = bd.NULL()
+        bd.connect(integ, func)
+        bd.connect(func, gain)
+        bd.connect(gain, integ, null)
+        bd.compile(verbose=False)
+        return bd
+
+    def test_same_values(self):
+        bd = self._bd()
+        x = np.r_[0.3, -1.0]
+        bd.evaluate(bd.state_map(x), 1.0)
+        yd = bd.deriv(1.0)
+        self.assertNotIn("evaluate", vars(bd))
+
+        bd.instrument(False)
+        self.assertIn("evaluate", vars(bd))
+        bd.evaluate(bd.state_map(x), 1.0)
+        nt.assert_array_almost_equal(bd.deriv(1.0), yd)
+        nt.assert_array_almost_equal(yd, [-0.3, 1.0])
+
+        bd.instrument(True)
+        self.assertNotIn("evaluate", vars(bd))
+        self.assertNotIn("deriv", vars(bd))
+
+    def test_errors(self):
+        bd = self._bd(func=lambda x: x if x[0] < 5 else x[5])
+        bd.instrument(False)
+        buf = io.StringIO()
+        with redirect_stdout(buf), self.assertRaises(RuntimeError):
+            bd.evaluate(bd.state_map(np.r_[10.0, 0.0]), 0.5)
+        self.assertIn("func.output] at t=0.5", buf.getvalue())
+
+    def test_run(self):
+        evaluate = []
+
+        def func(x):
+            evaluate.append(vars(bd).get("evaluate") if evaluate else None)
+            return 2 * x
+
+        bd = self._bd(func=func)
+        out = self.sim.run(bd, T=1)
+        # the lean path is used during the run and the instrumented one after
+        self.assertEqual(evaluate[-1], bd._evaluate_lean)
+        self.assertNotIn("evaluate", vars(bd))
+        out_debug = self.sim.run(bd, T=1, debug="x")
+        self.assertNotIn("evaluate", vars(bd))
+        nt.assert_array_almost_equal(out.x, out_debug.x)
+
+
+class ComponentsTest(SetUpMixin, unittest.TestCase):
+    """Independent parts of the continuous dynamics."""
+
+    def test_components(self):
+        # two plants driven by the same reference, the second through a
+        # sample and hold of the first, and a third coupled to the second
+        bd = self.sim.blockdiagram()
+        ref = bd.STEP(T=0.5)
+        p1 = bd.LTI_SISO(1, [1, 1], name="p1")
+        p2 = bd.LTI_SISO(1, [1, 2], name="p2")
+        p3 = bd.INTEGRATOR(name="p3")
+        zoh = bd.ZOH(bd.clock(0.1))
+        add = bd.SUM("++")
+        bd.connect(ref, p1, add[0])
+        bd.connect(p1, zoh)
+        bd.connect(zoh, add[1])
+        bd.connect(add, p2)
+        bd.connect(p2, p3)
+        bd.connect(p3, bd.NULL())
+        bd.compile(verbose=False)
+
+        self.assertEqual(bd.components, [[p1], [p2, p3]])
+        x = np.r_[0.5, 1.0, 2.0]
+        bd.evaluate(bd.state_map(x), 1.0)
+        yd = bd.deriv(1.0)
+        nt.assert_array_almost_equal(bd.deriv(1.0, blocks=[p2, p3]), yd[1:])
+
+        # an oscillator is a single component
+        bd = self.sim.blockdiagram()
+        i1 = bd.INTEGRATOR(x0=1)
+        i2 = bd.INTEGRATOR()
+        gain = bd.GAIN(-1)
+        bd.connect(i1, i2)
+        bd.connect(i2, gain)
+        bd.connect(gain, i1)
+        bd.compile(verbose=False)
+        self.assertEqual(bd.components, [[i1, i2]])
+
+    def test_sampled_linear(self):
+        # a plant driven by a sampled controller
+        bd = self.sim.blockdiagram()
+        err = bd.SUM("+-")
+        ctrl = bd.FUNCTION(lambda e: np.tanh(e))
+        zoh = bd.ZOH(bd.clock(0.1))
+        plant = bd.LTI_SISO(1, [1, 1, 0], name="plant")
+        integ = bd.INTEGRATOR(name="integ")
+        bd.connect(bd.CONSTANT(1), err[0])
+        bd.connect(plant, err[1], integ)
+        bd.connect(err, ctrl)
+        bd.connect(ctrl, zoh)
+        bd.connect(zoh, plant)
+        bd.connect(integ, bd.NULL())
+        bd.compile(verbose=False)
+        self.assertEqual(bd.exact, [[plant, integ]])
+        self.assertTrue(bd.sampled_linear([plant]))
+
+        self.assertFalse(bd.INTEGRATOR(min=0).islinear)
+        self.assertFalse(bd.SUM("++", mode="cc").islinear)
+        self.assertTrue(bd.GAIN(np.eye(2)).islinear)
+
+        # driven by a signal that changes between ticks, or nonlinear
+        for source in ("STEP", "FUNCTION"):
+            bd = self.sim.blockdiagram()
+            integ = bd.INTEGRATOR(x0=1)
+            if source == "STEP":
+                bd.connect(bd.STEP(T=0.5), integ)
+            else:
+                f = bd.FUNCTION(lambda x: -(x**3))
+                bd.connect(integ, f)
+                bd.connect(f, integ)
+            bd.compile(verbose=False)
+            self.assertEqual(bd.exact, [])
+
+
 class DeepCopyTest(SetUpMixin, unittest.TestCase):
     """__deepcopy__ preserves structure."""
 
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for channel.py, shared-memory channels.
+"""
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import unittest
+
+import numpy as np
+import numpy.testing as nt
+
+from bdsim.channel import SharedChannel
+
+_names = itertools.count()
+
+
+def channel_name():
+    return f"bdsim_test_{os.getpid()}_{next(_names)}"
+
+
+def echo(request, reply, n):
+    # peer that returns twice each record, in lockstep
+    with SharedChannel(request, timeout=5) as u, SharedChannel(reply, timeout=5) as y:
+        count = 0
+        for _ in range(n):
+            count, record = u.wait_read(count, timeout=5)
+            y.wait_acked(timeout=5)
+            y.write(2 * record)
+
+
+class SharedChannelTest(unittest.TestCase):
+    def test_create_attach(self):
+        dtype = np.dtype([("t", "<f8"), ("x", "<f4", (3,))])
+        name = channel_name()
+        with SharedChannel(name, dtype, create=True) as tx:
+            self.assertRaises(FileExistsError, SharedChannel, name, dtype, create=True)
+            with SharedChannel(name) as rx:
+                self.assertEqual(rx.dtype, dtype)
+                self.assertEqual(rx.read()[0], 0)
+
+                self.assertEqual(tx.write((1.5, [1, 2, 3])), 1)
+                n, record = rx.read()
+                self.assertEqual(n, 1)
+                self.assertEqual(record["t"], 1.5)
+                nt.assert_equal(record["x"], [1, 2, 3])
+                self.assertEqual(tx.written, 1)
+                self.assertEqual(tx.acked, 0)
+                rx.ack(n)
+                self.assertEqual(tx.acked, 1)
+
+            self.assertRaises(ValueError, SharedChannel, name, "<f8")
+        self.assertRaises(FileNotFoundError, SharedChannel, name)
+        self.assertRaises(ValueError, SharedChannel, name, create=True)
+        self.assertRaises(ValueError, SharedChannel, name, ("<f8", (3,)), create=True)
+
+    def test_timeout(self):
+        name = channel_name()
+        with SharedChannel(name, "<f8", create=True) as tx:
+            with SharedChannel(name) as rx:
+                self.assertRaises(TimeoutError, rx.wait_read, 0, timeout=0.01)
+                tx.wait_acked(timeout=0.01)
+                tx.write(1.0)
+                self.assertRaises(TimeoutError, tx.wait_acked, timeout=0.01)
+                self.assertEqual(rx.wait_read(0, timeout=0.01), (1, 1.0))
+                tx.wait_acked(timeout=0.01)
+
+                # a writer that died part-way through a write
+                tx._counters[0] += 1
+                self.assertRaises(TimeoutError, rx.read, timeout=0.01)
+
+    def test_consistent(self):
+        # the writer keeps every element of the record equal, a torn read
+        # would mix two records
+        name = channel_name()
+        dtype = np.dtype([("x", "<f8", (512,))])
+        with SharedChannel(name, dtype, create=True) as tx:
+            with SharedChannel(name) as rx:
+                def writer():
+                    for i in range(1, 2001):
+                        tx.write((np.full(512, i),))
+                        time.sleep(0)
+
+                thread = threading.Thread(target=writer)
+                thread.start()
+                n = 0
+                while n < 2000 and thread.is_alive():
+                    n, record = rx.read()
+                    self.assertTrue(np.all(record["x"] == n))
+                thread.join()
+                self.assertEqual(rx.read()[0], 2000)
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "no fork start method"
+    )
+    def test_process(self):
+        request, reply = channel_name(), channel_name()
+        with SharedChannel(request, "<f8", create=True) as u, SharedChannel(
+            reply, "<f8", create=True
+        ) as y:
+            peer = multiprocessing.get_context("fork").Process(
+                target=echo, args=(request, reply, 5)
+            )
+            peer.start()
+            count = 0
+            for i in range(5):
+                u.wait_acked(timeout=5)
+                u.write(i)
+                count, value = y.wait_read(count, timeout=5)
+                self.assertEqual(value, 2 * i)
+            peer.join(5)
+            self.assertEqual(peer.exitcode, 0)
+            # the peer did not remove the channels when it exited
+            u.write(0)
+
+
+# ---------------------------------------------------------------------------------------#
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for checkpoint.py, capturing the state of a simulation and resuming it.
+"""
+
+import io
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+import numpy.testing as nt
+
+import bdsim
+from bdsim.exceptions import SimulationContextError
+
+
+class CheckpointTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def _hybrid_bd(self):
+        """Feedback loop with a late step demand, a ZOH and a persistent FUNCTION."""
+
+        def count(u, userdata):
+            userdata["n"] = userdata.get("n", 0) + 1
+            return u
+
+        bd = self.sim.blockdiagram()
+        demand = bd.STEP(T=3, name="demand")
+        err = bd.SUM("+-")
+        gain = bd.GAIN(10, name="gain")
+        plant = bd.LTI_SISO(0.5, [2, 1], name="plant")
+        clock = bd.clock(0.1)
+        zoh = bd.ZOH(clock, name="zoh")
+        func = bd.FUNCTION(count, persistent=True, name="count")
+        integ = bd.INTEGRATOR(name="integ")
+        bd.connect(demand, err[0])
+        bd.connect(err, gain)
+        bd.connect(gain, plant)
+        bd.connect(plant, err[1], zoh)
+        bd.connect(zoh, func)
+        bd.connect(func, integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        return bd
+
+    def _run(self, bd, **kwargs):
+        return self.sim.run(bd, solver_args=dict(rtol=1e-10, atol=1e-10), **kwargs)
+
+    def _clock(self, bd, out):
+        return out[bd.clocklist[0].name.replace(".", "")]
+
+    def test_resume(self):
+        bd = self._hybrid_bd()
+        full = self._run(bd, T=5)
+        x_full = full.x[-1]
+        zoh_full = self._clock(bd, full).X[-1]
+
+        bd = self._hybrid_bd()
+        self._run(bd, T=2)
+        ckpt = self.sim.checkpoint()
+        self.assertAlmostEqual(ckpt.t, 2)
+        self.assertEqual(ckpt.bd, bd)
+        n = ckpt.blocks[bd.blocknames["count"]]["n"]
+
+        # the step at T=3 is after the checkpoint
+        out = self._run(bd, T=5, resume=ckpt)
+        self.assertAlmostEqual(out.t[0], 2)
+        self.assertAlmostEqual(out.t[-1], 5)
+        nt.assert_array_almost_equal(out.x[-1], x_full, decimal=6)
+        nt.assert_array_almost_equal(self._clock(bd, out).X[-1], zoh_full, decimal=6)
+        self.assertGreater(bd.blocknames["count"].userdata["n"], n)
+
+        # resuming doesn't change the checkpoint, so it can be reused
+        n_resumed = bd.blocknames["count"].userdata["n"]
+        self.assertEqual(ckpt.blocks[bd.blocknames["count"]]["n"], n)
+        out2 = self._run(bd, T=5, resume=ckpt)
+        nt.assert_array_almost_equal(out2.x, out.x)
+        self.assertEqual(bd.blocknames["count"].userdata["n"], n_resumed)
+
+    def test_fork(self):
+        bd = self._hybrid_bd()
+        self._run(bd, T=2)
+        ckpt = self.sim.checkpoint()
+
+        branch = ckpt.fork()
+        self.assertIsNot(branch.bd, bd)
+        self.assertAlmostEqual(branch.t, ckpt.t)
+        branch.bd.blocknames["gain"].K = 20
+        self.assertEqual(bd.blocknames["gain"].K, 10)
+
+        out = self._run(bd, T=5, resume=ckpt)
+        out_branch = self._run(branch.bd, T=5, resume=branch)
+        self.assertAlmostEqual(out_branch.t[0], 2)
+        nt.assert_array_almost_equal(out_branch.x[0], out.x[0])
+        self.assertFalse(np.allclose(out_branch.x[-1], out.x[-1]))
+
+    def test_discrete(self):
+        bd = self.sim.blockdiagram()
+        clock = bd.clock(0.5)
+        counter = bd.INTEGRATOR_S(clock, name="counter")
+        bd.connect(bd.CONSTANT(1), counter)
+        bd.connect(counter, bd.NULL())
+        bd.compile()
+
+        full = self.sim.run(bd, T=5)
+        self.sim.run(bd, T=2.2)
+        out = self.sim.run(bd, T=5, resume=self.sim.checkpoint())
+        clock, clock_full = self._clock(bd, out), self._clock(bd, full)
+        self.assertAlmostEqual(clock.t[0], 2.5)
+        nt.assert_array_almost_equal(clock.t, clock_full.t[4:])
+        nt.assert_array_almost_equal(clock.X, clock_full.X[4:])
+
+    def test_logs_released(self):
+        # only the end state of the last run is kept for checkpoint()
+        bd = self._hybrid_bd()
+        self._run(bd, T=2)
+        simstate = self.sim._last_context.simstate
+        self.assertEqual(simstate.tlist, [])
+        for clock_state in simstate.clock_states.values():
+            self.assertEqual(clock_state.tlog, [])
+        self.assertAlmostEqual(self.sim.checkpoint().t, 2)
+
+    def test_during_run(self):
+        # taken by a block at a logged sample, the state is that at the sample
+        checkpoints = []
+
+        def take(x):
+            if not checkpoints and x >= 1:
+                checkpoints.append(self.sim.checkpoint())
+            return x
+
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.FUNCTION(take))
+        bd.compile()
+        self._run(bd, T=2)
+        ckpt = checkpoints[0]
+        self.assertGreaterEqual(ckpt.t, 1)
+        nt.assert_array_almost_equal(ckpt.x, [ckpt.t])
+        out = self._run(bd, T=2, resume=ckpt)
+        nt.assert_array_almost_equal(out.x[-1], [2])
+
+        # not while the solver evaluates the derivative
+        def take(x):
+            self.sim.checkpoint()
+            return x
+
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        func = bd.FUNCTION(take)
+        bd.connect(bd.CONSTANT(1), func)
+        bd.connect(func, integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        with redirect_stdout(io.StringIO()), self.assertRaises(RuntimeError) as cm:
+            self._run(bd, T=2)
+        self.assertIsInstance(cm.exception.__cause__, SimulationContextError)
+
+    def test_errors(self):
+        bd = self._hybrid_bd()
+        self._run(bd, T=2)
+        ckpt = self.sim.checkpoint()
+        with self.assertRaises(ValueError):
+            self._run(bd, T=1, resume=ckpt)
+        with self.assertRaises(ValueError):
+            self._run(self._hybrid_bd(), T=5, resume=ckpt)
+
+        sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+        with self.assertRaises(SimulationContextError):
+            sim.checkpoint()
+
+
+if __name__ == "__main__":
+    unittest.main()
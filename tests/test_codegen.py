@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Tests for codegen.py, generation of a standalone NumPy module from a block diagram.
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as nt
+
+import bdsim
+from bdsim import codegen
+
+
+class CodegenTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "model.py"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _hybrid_bd(self):
+        """Feedback loop with an LTI plant, a ZOH and a callback FUNCTION block."""
+        bd = self.sim.blockdiagram()
+        demand = bd.STEP(T=1, name="demand")
+        err = bd.SUM("+-")
+        gain = bd.GAIN(10)
+        plant = bd.LTI_SISO(0.5, [2, 1], name="plant")
+        clock = bd.clock(0.1)
+        zoh = bd.ZOH(clock)
+        func = bd.FUNCTION(lambda x: 2 * x)
+        integ = bd.INTEGRATOR(x0=[1, 2], max=[10, 10])
+        mux = bd.MUX(2)
+        null = bd.NULL()
+        bd.connect(demand, err[0])
+        bd.connect(err, gain)
+        bd.connect(gain, plant)
+        bd.connect(plant, err[1], zoh, mux[0])
+        bd.connect(zoh, func)
+        bd.connect(func, mux[1])
+        bd.connect(mux, integ)
+        bd.connect(integ, null)
+        bd.compile()
+        return bd
+
+    def test_generated_source(self):
+        bd = self._hybrid_bd()
+        source = codegen.generate(bd)
+        fp = codegen.fingerprint(source)
+        self.assertEqual(len(fp), 64)
+        self.assertIn(f"FINGERPRINT = {fp!r}", source)
+        self.assertIn("def f(t, x, xd_clocks):", source)
+        self.assertIn("def next_0(t, x, xd_clocks):", source)
+        # FUNCTION has no emitter and calls back to the block
+        self.assertIn("_B[5].output_safe", source)
+        self.assertNotIn("_B[2]", source)
+
+        # generation is deterministic
+        self.assertEqual(codegen.generate(bd), source)
+
+    def test_matches_evaluate(self):
+        bd = self._hybrid_bd()
+        model = bd.codegen(self.path)
+        self.assertEqual(model.NSTATES, bd.nstates)
+
+        x = np.array([0.3, 1.0, 12.0])
+        xd = [np.array([0.5])]
+        for t in (0.5, 1.5):
+            state_map = bd.state_map(x)
+            bd.set_block_state(state_map, bd.clocklist[0].blocklist[0], xd[0])
+            bd.evaluate(state_map, t, sinks=False)
+
+            nt.assert_array_almost_equal(model.f(t, x, xd), bd.deriv(t))
+            nt.assert_array_almost_equal(
+                model.NEXT[0](t, x, xd), bd.next(t)[bd.clocklist[0]]
+            )
+            outputs = model.outputs(t, x, xd)
+            for name in ("demand", "plant", "zoh.0", "gain.0", "mux.0"):
+                nt.assert_array_almost_equal(
+                    outputs[name][0], bd.blocknames[name].outport_value(0)
+                )
+
+    def test_cache(self):
+        bd = self._hybrid_bd()
+        path = codegen.write(bd, self.path)
+        mtime = os.stat(path).st_mtime_ns
+        self.assertEqual(codegen.write(bd, self.path), path)
+        self.assertEqual(os.stat(path).st_mtime_ns, mtime)
+
+        # a hit is found from the diagram, the module isn't generated
+        with mock.patch.object(codegen, "generate", side_effect=AssertionError):
+            self.assertEqual(codegen.write(bd, self.path), path)
+
+        # a parameter change gives a new fingerprint
+        bd.blocknames["gain.0"].K = 20
+        fp = codegen.fingerprint(path.read_text())
+        codegen.write(bd, self.path)
+        self.assertNotEqual(codegen.fingerprint(path.read_text()), fp)
+
+    def test_diagram_fingerprint(self):
+        bd = self._hybrid_bd()
+        fp = codegen.diagram_fingerprint(bd)
+        self.assertEqual(fp, codegen.fingerprint(codegen.generate(bd)))
+        self.assertEqual(codegen.diagram_fingerprint(bd), fp)
+
+        # parameters, initial state, callbacks and wiring are all covered
+        changes = [
+            lambda b: None,
+            lambda b: setattr(b["plant"], "A", 2 * b["plant"].A),
+            lambda b: b["integrator.0"]._x0.__setitem__(0, 3),
+            lambda b: setattr(b["function.0"], "func", lambda x: 3 * x),
+            lambda b: setattr(b["mux.0"]._input_wires[0].start, "port", 1),
+        ]
+        fps = set()
+        for change in changes:
+            bd = self._hybrid_bd()
+            # clocks are numbered globally, name the clock as in the first one
+            bd.clocklist[0].name = "clock"
+            change(bd.blocknames)
+            fps.add(codegen.diagram_fingerprint(bd))
+        self.assertEqual(len(fps), len(changes))
+
+    def test_default_path(self):
+        bd = self._hybrid_bd()
+        old = os.environ.get("XDG_CACHE_HOME")
+        os.environ["XDG_CACHE_HOME"] = self.tmpdir.name
+        try:
+            path = codegen.write(bd)
+        finally:
+            if old is None:
+                del os.environ["XDG_CACHE_HOME"]
+            else:
+                os.environ["XDG_CACHE_HOME"] = old
+        self.assertEqual(path.parent, Path(self.tmpdir.name) / "bdsim" / "codegen")
+        self.assertIn(codegen.fingerprint(path.read_text())[:20], path.name)
+
+    def test_wrong_diagram(self):
+        bd = self._hybrid_bd()
+        path = codegen.write(bd, self.path)
+        other = self.sim.blockdiagram()
+        other.connect(other.CONSTANT(1), other.NULL())
+        other.compile()
+        with self.assertRaises(ValueError):
+            codegen.load(other, path)
+
+    def test_unsupported_parameters(self):
+        bd = self.sim.blockdiagram()
+        const = bd.CONSTANT(np.r_[0.1, 7.0])
+        wrap = bd.SUM("+", mode="rc")
+        integ = bd.INTEGRATOR(x0=[0, 0])
+        bd.connect(const, wrap)
+        bd.connect(wrap, integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        model = bd.codegen(self.path)
+        self.assertIn("_B[1].output_safe", codegen.generate(bd))
+        nt.assert_array_almost_equal(model.f(0, np.zeros(2), []), [0.1, 7 - 2 * np.pi])
+
+    def test_run(self):
+        out1 = self.sim.run(self._hybrid_bd(), T=3)
+        out2 = self.sim.run(self._hybrid_bd(), T=3, codegen=str(self.path))
+        self.assertTrue(self.path.exists())
+        nt.assert_array_almost_equal(out1.t, out2.t)
+        nt.assert_array_almost_equal(out1.x, out2.x)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Tests for cosim.py, co-simulation of several block diagrams.
+"""
+
+import multiprocessing
+import unittest
+
+import numpy as np
+import numpy.testing as nt
+
+import bdsim
+from bdsim.cosim import CoSimulation
+
+
+class CoSimulationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def _plant(self, x0=1.0):
+        # x' = u, y = x
+        bd = self.sim.blockdiagram("plant")
+        u = bd.INPORT(1)
+        y = bd.OUTPORT(1)
+        integ = bd.INTEGRATOR(x0=x0, name="integ")
+        bd.connect(u[0], integ)
+        bd.connect(integ, y[0])
+        bd.compile()
+        return bd
+
+    def _controller(self, K=1.0):
+        # u = -K y
+        bd = self.sim.blockdiagram("controller")
+        y = bd.INPORT(1)
+        u = bd.OUTPORT(1)
+        gain = bd.GAIN(-K)
+        bd.connect(y[0], gain)
+        bd.connect(gain, u[0])
+        bd.compile()
+        return bd
+
+    def _cosim(self, **kwargs):
+        cosim = CoSimulation(self.sim, step=0.01, **kwargs)
+        plant = cosim.add(self._plant(), solver_args=dict(rtol=1e-8, atol=1e-10))
+        controller = cosim.add(self._controller())
+        cosim.connect(plant[0], controller[0])
+        cosim.connect(controller[0], plant[0])
+        return cosim
+
+    def test_constructor(self):
+        self.assertRaises(ValueError, CoSimulation, self.sim, step=0)
+        self.assertRaises(ValueError, CoSimulation, self.sim, 0.1, coupling="newton")
+        self.assertRaises(ValueError, CoSimulation, self.sim, 0.1, extrapolation=2)
+        self.assertRaises(
+            ValueError,
+            CoSimulation,
+            self.sim,
+            0.1,
+            coupling="gauss-seidel",
+            parallel=True,
+        )
+
+        cosim = CoSimulation(self.sim, step=0.1)
+        plant = cosim.add(self._plant())
+        self.assertEqual((plant.nin, plant.nout), (1, 1))
+        self.assertEqual(plant.name, "plant")
+        self.assertRaises(ValueError, cosim.add, self._plant())
+        self.assertRaises(ValueError, cosim.connect, plant[1], plant[0])
+        self.assertRaises(ValueError, cosim.run, T=1)
+        cosim.connect(plant[0], plant[0])
+        self.assertRaises(ValueError, cosim.connect, plant[0], plant[0])
+
+        bd = self.sim.blockdiagram()
+        bd.connect(bd.CONSTANT(1), bd.NULL())
+        self.assertRaises(ValueError, cosim.add, bd, "notcompiled")
+
+    def test_coupling(self):
+        # the feedback loop x' = -x split over two partitions, the error is
+        # of the order of the macro step
+        for coupling in ("jacobi", "gauss-seidel"):
+            for extrapolation in (0, 1):
+                with self.subTest(coupling=coupling, extrapolation=extrapolation):
+                    cosim = self._cosim(coupling=coupling, extrapolation=extrapolation)
+                    out = cosim.run(T=1)
+                    nt.assert_almost_equal(out.t[-1], 1.0)
+                    self.assertEqual(len(out.t), 101)
+                    plant = out.plant
+                    self.assertAlmostEqual(plant.t[-1], 1.0)
+                    error = abs(plant.x[-1, 0] - np.exp(-1))
+                    self.assertLess(error, 0.01)
+
+    def test_extrapolation(self):
+        # linear extrapolation is more accurate than holding the inputs
+        errors = []
+        for extrapolation in (0, 1):
+            out = self._cosim(extrapolation=extrapolation).run(T=1)
+            errors.append(abs(out.plant.x[-1, 0] - np.exp(-1)))
+        self.assertLess(errors[1], errors[0] / 10)
+
+    def test_multirate(self):
+        # each partition keeps its own solver statistics
+        out = self._cosim().run(T=0.5)
+        self.assertGreater(out.plant[".stats"].ydot_calls, 0)
+        self.assertEqual(out.controller[".stats"].ydot_calls, 0)
+
+    def test_stop(self):
+        cosim = self._cosim()
+        bd = self.sim.blockdiagram("stop")
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.STOP(func=lambda t: t >= 0.3))
+        bd.compile()
+        cosim.add(bd)
+        out = cosim.run(T=1)
+        self.assertLess(out.t[-1], 0.35)
+        self.assertLess(out.plant.t[-1], 0.35)
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "no fork start method"
+    )
+    def test_parallel(self):
+        serial = self._cosim().run(T=0.5)
+        parallel = self._cosim(parallel=True).run(T=0.5)
+        nt.assert_almost_equal(parallel.plant.x, serial.plant.x)
+        nt.assert_equal(parallel.t, serial.t)
+
+
+# ---------------------------------------------------------------------------------------#
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for exact.py, exact solution of linear dynamics with constant inputs.
+"""
+
+import unittest
+
+import numpy as np
+import numpy.testing as nt
+import scipy.linalg
+
+from bdsim.exact import ExactPropagator
+
+
+class ExactPropagatorTest(unittest.TestCase):
+    A = np.array([[0.0, 1.0], [-4.0, -0.5]])
+    b = np.r_[0.0, 2.0]
+
+    def _propagator(self):
+        calls = []
+
+        def fun(t, x):
+            calls.append(t)
+            return self.A @ x + self.b
+
+        return ExactPropagator(fun, 2), calls
+
+    def test_linearize(self):
+        propagator, calls = self._propagator()
+        nt.assert_array_almost_equal(propagator.linearize(0), self.A)
+        self.assertEqual(len(calls), 3)
+
+    def test_solve(self):
+        propagator, calls = self._propagator()
+        x0 = np.r_[1.0, 0.0]
+        result = propagator.solve((1.0, 2.0), x0, max_step=0.3)
+        self.assertTrue(result.success)
+        nt.assert_array_almost_equal(result.t, np.linspace(1, 2, 5))
+        self.assertEqual(result.y.shape, (2, 5))
+        self.assertEqual(result.nfev, 4)
+
+        # x(t) = e^{A h} x0 + A^-1 (e^{A h} - I) b
+        def exact(h):
+            E = scipy.linalg.expm(self.A * h)
+            return E @ x0 + np.linalg.solve(self.A, (E - np.eye(2)) @ self.b)
+
+        for t, y in zip(result.t, result.y.T):
+            nt.assert_array_almost_equal(y, exact(t - 1))
+        nt.assert_array_almost_equal(result.sol(1.6), exact(0.6))
+
+        # the state matrix and the transition matrices are reused
+        calls.clear()
+        result = propagator.solve((2.0, 3.0), x0, t_eval=[2.0, 2.25, 3.0])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result.nfev, 1)
+        nt.assert_array_almost_equal(result.y[:, -1], exact(1))
+
+    def test_cache(self):
+        propagator = ExactPropagator(lambda t, x: -x, 1, cache=2)
+        propagator.linearize(0)
+        for h in (0.1, 0.2, 0.3):
+            nt.assert_array_almost_equal(
+                propagator.transition(h)[0], [np.exp(-h), (1 - np.exp(-h))]
+            )
+        self.assertLessEqual(len(propagator._expm), 2)
+
+
+# ---------------------------------------------------------------------------------------#
+if __name__ == "__main__":
+
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Tests for profiler.py, per-block and per-phase timing of a simulation run.
+"""
+
+import contextlib
+import io
+import unittest
+
+import numpy as np
+
+import bdsim
+from bdsim.profiler import Profiler
+
+
+class ProfilerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def _bd(self):
+        bd = self.sim.blockdiagram()
+        demand = bd.STEP(T=1, name="demand")
+        err = bd.SUM("+-", name="err")
+        gain = bd.GAIN(10, name="gain")
+        plant = bd.LTI_SISO(0.5, [2, 1], name="plant")
+        zoh = bd.ZOH(bd.clock(0.5), name="zoh")
+        bd.connect(demand, err[0])
+        bd.connect(err, gain)
+        bd.connect(gain, plant)
+        bd.connect(plant, err[1], zoh)
+        bd.connect(zoh, bd.NULL(name="null"))
+        bd.compile()
+        return bd
+
+    def test_nesting(self):
+        profiler = Profiler()
+
+        def inner():
+            return 1
+
+        inner = profiler.wrap(inner, "b", "output", "gain")
+
+        def outer():
+            return inner() + inner()
+
+        outer = profiler.wrap(outer, "bdsim", "evaluate")
+        self.assertEqual(outer(), 2)
+
+        calls, total, self_time = profiler.entries[("b", "gain", "output")]
+        self.assertEqual(calls, 2)
+        self.assertAlmostEqual(total, self_time)
+        calls, total, self_time = profiler.entries[("bdsim", "engine", "evaluate")]
+        self.assertEqual(calls, 1)
+        self.assertLess(self_time, total)
+
+    def test_run(self):
+        bd = self._bd()
+        out = self.sim.run(bd, T=2, profile=True)
+        profile = out.profile
+
+        rows = {
+            (name, method): calls
+            for name, method, calls in zip(
+                profile.name, profile.method, profile.calls
+            )
+        }
+        # gain is fusible but profiling disables fusion
+        self.assertEqual(rows[("gain", "output")], rows[("bdsim", "evaluate")])
+        self.assertEqual(rows[("plant", "deriv")], out.stats.ydot_calls)
+        self.assertEqual(rows[("zoh", "next")], 4)
+        for phase in ("solve_ivp", "replay", "state_map", "graphics"):
+            self.assertIn(("bdsim", phase), rows)
+        self.assertTrue(np.all(np.diff(profile.self) <= 0))
+        self.assertTrue(np.all(profile.self <= profile.total + 1e-12))
+
+        # the timed wrappers are removed after the run
+        self.assertNotIn("evaluate", vars(bd))
+        self.assertNotIn("output_safe", vars(bd.blocknames["gain"]))
+
+        # same results as an unprofiled run
+        out2 = self.sim.run(bd, T=2)
+        np.testing.assert_array_almost_equal(out.x, out2.x)
+        self.assertNotIn(".profile", out2)
+
+    def test_report(self):
+        sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=False)
+        bd = self._bd()
+        with self.assertRaises(ValueError):
+            sim.report(bd, type="profile")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            sim.run(bd, T=1, profile=True)
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            sim.report(bd, type="profile", sortby="calls", limit=3)
+        report = buf.getvalue()
+        self.assertIn("self (ms)", report)
+        self.assertNotIn("solve_ivp", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
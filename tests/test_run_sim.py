@@ -15,12 +15,16 @@ Targets:
   - update_parameters()
 """
 
+import asyncio
 import os
 import shutil
 import sys
 from pathlib import Path
 import importlib.util
+import inspect
+import multiprocessing
 import tempfile
+import time
 import unittest
 import io
 import contextlib
@@ -32,6 +36,7 @@ from matplotlib import animation
 
 import bdsim
 from bdsim.exceptions import EventProbeOutsideIntervalError, IntegrationFailureError
+from bdsim.run_realtime import Pacer
 from bdsim.run_sim import TimeQ, Progress, BDSimState, BDSim, Options, _LazyBlockClass
 
 
@@ -167,6 +172,38 @@ class BDSimStateTest(unittest.TestCase):
         with self.assertRaises(EventProbeOutsideIntervalError):
             state.ensure_event_probe_evaluated(_DummyBD(), 0.05, np.array([0.0]))
 
+    def test_event_probe_cone(self):
+        sim = bdsim.BDSim(graphics=None, progress=False, banner=False)
+        bd = sim.blockdiagram()
+        calls = []
+        velocity = bd.INTEGRATOR(x0=0)
+        position = bd.INTEGRATOR(x0=10)
+        ground = bd.EVENT("-", lambda block: None)
+        other = bd.FUNCTION(lambda v: calls.append(v) or v)
+        bd.connect(bd.CONSTANT(-9.81), velocity)
+        bd.connect(velocity, position, other)
+        bd.connect(position, ground)
+        bd.connect(other, bd.NULL())
+        bd.compile(verbose=False)
+
+        state = BDSimState()
+        state.declare_crossing_event(lambda t, y: 0.0, ground)
+        state.begin_event_probe_interval(0.0, 1.0)
+        ncalls = len(calls)
+
+        # only the integrator that feeds the EVENT block is evaluated
+        state.ensure_event_probe_evaluated(bd, 0.5, np.r_[-1.0, 3.0])
+        self.assertEqual(ground.inport_value(0), 3.0)
+        self.assertEqual(len(calls), ncalls)
+        self.assertEqual(len(state._event_probe_plan), 1)
+
+        # a probe at the point of the last evaluation does not evaluate
+        state.mark_event_probe_evaluated(0.6, np.r_[-2.0, 2.0])
+        state.ensure_event_probe_evaluated(bd, 0.6, np.r_[-2.0, 2.0])
+        self.assertEqual(ground.inport_value(0), 3.0)
+        state.ensure_event_probe_evaluated(bd, 0.6, np.r_[-2.0, 1.0])
+        self.assertEqual(ground.inport_value(0), 1.0)
+
 
 # ---------------------------------------------------------------------------
 class BDSimStrTest(unittest.TestCase):
@@ -1641,5 +1678,398 @@ class OptionsNoGraphicsEnvTest(unittest.TestCase):
             self._restore_env(old)
 
 
+
+# ---------------------------------------------------------------------------
+class RealtimeTest(unittest.TestCase):
+    """Tests for the soft real-time runner, run_realtime.py."""
+
+    def _sim(self, **kwargs):
+        return bdsim.BDSimRealtime(
+            graphics=None, progress=False, banner=False, quiet=True, **kwargs
+        )
+
+    def _pacer(self, overrun):
+        now = [0.0]
+        pacer = Pacer(overrun=overrun, clock=lambda: now[0])
+        simstate = SimpleNamespace(tf=1.0, stop=None)
+        pacer.start(SimpleNamespace(nstates=0), simstate, 0.0)
+        # the interval ending at t=0.1 finishes 0.05s late
+        now[0] = 0.15
+        pacer.wait(0.1, simstate)
+        return pacer, simstate
+
+    def test_arguments(self):
+        with self.assertRaises(ValueError):
+            Pacer(overrun="nosuchpolicy")
+        with self.assertRaises(ValueError):
+            Pacer(speed=0)
+        with self.assertRaises(ValueError):
+            self._sim(period=-1)
+
+    def test_overrun(self):
+        pacer, simstate = self._pacer("skip")
+        self.assertEqual(pacer.miss, [True])
+        self.assertAlmostEqual(pacer.latency[0], 0.05)
+        self.assertAlmostEqual(pacer.slip, 0.05)
+        self.assertAlmostEqual(pacer.deadline(0.2), 0.25)
+        self.assertIsNone(simstate.stop)
+
+        pacer, simstate = self._pacer("catchup")
+        self.assertEqual(pacer.slip, 0)
+        self.assertAlmostEqual(pacer.deadline(0.2), 0.2)
+        self.assertIsNone(simstate.stop)
+
+        pacer, simstate = self._pacer("stop")
+        self.assertIs(simstate.stop, pacer)
+
+    def test_discrete(self):
+        sim = self._sim(speed=5, tolerance=0.05)
+        bd = sim.blockdiagram()
+        zoh = bd.ZOH(bd.clock(0.05))
+        bd.connect(bd.WAVEFORM("sine", freq=1), zoh)
+        bd.connect(zoh, bd.NULL())
+        bd.compile(verbose=False)
+
+        start = time.perf_counter()
+        out = sim.run(bd, T=0.5)
+        elapsed = time.perf_counter() - start
+        self.assertGreaterEqual(elapsed, 0.5 / 5)
+
+        realtime = out[".realtime"]
+        self.assertEqual(realtime.ticks, 10)
+        self.assertEqual(realtime.misses, 0)
+        nt.assert_array_almost_equal(realtime.t, np.arange(1, 11) * 0.05)
+        self.assertGreaterEqual(realtime.latency.min(), 0)
+
+    def test_continuous(self):
+        sim = self._sim(speed=10, period=0.1, tolerance=0.05)
+        bd = sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.NULL())
+        bd.compile(verbose=False)
+
+        out = sim.run(bd, T=1)
+        self.assertEqual(out[".realtime"].ticks, 10)
+        self.assertAlmostEqual(out.x[-1, 0], 1)
+        self.assertEqual(out.stats.restarts_by_reason, {"event": 9, "end": 1})
+
+    def test_stop(self):
+        sim = self._sim(overrun="stop")
+        bd = sim.blockdiagram()
+        zoh = bd.ZOH(bd.clock(0.01))
+        slow = bd.FUNCTION(lambda u: time.sleep(0.03) or u)
+        bd.connect(bd.CONSTANT(1), slow)
+        bd.connect(slow, zoh)
+        bd.connect(zoh, bd.NULL())
+        bd.compile(verbose=False)
+
+        out = sim.run(bd, T=1)
+        realtime = out[".realtime"]
+        self.assertEqual(realtime.misses, 1)
+        self.assertLess(realtime.t[-1], 0.1)
+
+
+
+# ---------------------------------------------------------------------------
+class AsyncRunTest(unittest.TestCase):
+    """Tests for BDSim.run_async() and BDSim.stream()."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(
+            graphics=None, progress=False, banner=False, quiet=True, sysargs=False
+        )
+
+    def _bd(self, gain=1):
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        zoh = bd.ZOH(bd.clock(0.1))
+        bd.connect(bd.CONSTANT(gain), integ)
+        bd.connect(integ, zoh)
+        bd.connect(zoh, bd.NULL())
+        bd.compile(verbose=False)
+        return bd, zoh
+
+    def test_run_async(self):
+        bd, _ = self._bd()
+        expected = self.sim.run(bd, T=1)
+
+        async def main():
+            return await asyncio.gather(
+                self.sim.run_async(bd, T=1), self.sim.run_async(self._bd(2)[0], T=1)
+            )
+
+        out, out2 = asyncio.run(main())
+        nt.assert_array_equal(out.t, expected.t)
+        nt.assert_array_equal(out.x, expected.x)
+        self.assertAlmostEqual(out.x[-1, 0], 1)
+        self.assertAlmostEqual(out2.x[-1, 0], 2)
+        self.assertIsNone(self.sim._get_context())
+
+        with self.assertRaises(TypeError):
+            asyncio.run(self.sim.run_async(bd, nosuchargument=1))
+
+    def test_arguments(self):
+        # the generator takes the parameters of run() by keyword only
+        run = inspect.signature(BDSim.run).parameters
+        gen = inspect.signature(BDSim._run).parameters
+        self.assertEqual(list(gen), list(run))
+        for name in list(gen)[2:]:
+            self.assertEqual(gen[name].kind, inspect.Parameter.KEYWORD_ONLY)
+
+        bd, _ = self._bd()
+        expected = self.sim.run(bd, T=1, dt=0.25)
+        out = asyncio.run(self.sim.run_async(bd, T=1, dt=0.25))
+        nt.assert_array_equal(out.t, expected.t)
+        self.assertIn(0.75, out.t)
+
+    def test_stream(self):
+        bd, zoh = self._bd()
+        expected = self.sim.run(bd, T=1, watch=[zoh])
+
+        async def main():
+            return [s async for s in self.sim.stream(bd, T=1, watch=[zoh])]
+
+        samples = asyncio.run(main())
+        nt.assert_array_equal([s.t for s in samples], expected.t)
+        nt.assert_array_equal(np.array([s.x for s in samples]), expected.x)
+        nt.assert_array_equal([s.y[0] for s in samples], expected.y[:, 0])
+
+    def test_cancel(self):
+        bd, _ = self._bd()
+
+        async def main():
+            task = asyncio.create_task(self.sim.run_async(bd, T=1000))
+            for _ in range(5):
+                await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            async for sample in self.sim.stream(bd, T=1000):
+                if sample.t > 0.5:
+                    break
+            return sample
+
+        sample = asyncio.run(main())
+        self.assertLess(sample.t, 1)
+        self.assertIsNone(self.sim._get_context())
+
+
+# ---------------------------------------------------------------------------
+class EndHookTest(unittest.TestCase):
+    """Tests for the hooks called at the end of a run."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(
+            graphics=None, progress=False, banner=False, quiet=True, sysargs=False
+        )
+
+    def _run(self, func):
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        f = bd.FUNCTION(func)
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, f)
+        bd.connect(f, bd.NULL())
+        bd.compile(verbose=False)
+
+        called = []
+
+        def fail():
+            called.append("fail")
+            raise OSError("disk full")
+
+        run = self.sim._start(bd, dict(T=1))
+        simstate = next(run)
+        simstate.declare_end_hook(fail)
+        simstate.declare_end_hook(lambda: called.append("close"))
+        try:
+            while True:
+                next(run)
+        except StopIteration:
+            pass
+        finally:
+            self.assertEqual(called, ["fail", "close"])
+            self.assertIsNone(self.sim._get_context())
+
+    def test_hook_error(self):
+        # the remaining hooks are called and then the error is raised
+        with self.assertRaises(OSError):
+            self._run(lambda x: x)
+
+    def test_run_error(self):
+        # the error that ended the run is not masked by a hook error
+        def func(x):
+            if x > 0.5:
+                raise ValueError("bad input")
+            return x
+
+        with self.assertWarns(UserWarning), self.assertRaises(Exception) as cm:
+            with contextlib.redirect_stdout(io.StringIO()):
+                self._run(func)
+        self.assertNotIsInstance(cm.exception, OSError)
+
+
+# ---------------------------------------------------------------------------
+class PartitionTest(unittest.TestCase):
+    """Tests for integrating independent parts of the dynamics separately."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(
+            graphics=None, progress=False, banner=False, quiet=True, sysargs=False
+        )
+
+    def _bd(self):
+        # a slow and a fast plant driven by the same reference, the slow plant
+        # is also driven by a sample of the fast one
+        bd = self.sim.blockdiagram()
+        ref = bd.STEP(T=0.5)
+        fast = bd.LTI_SISO(100, [1, 100], name="fast")
+        slow = bd.LTI_SISO(1, [1, 1], name="slow")
+        zoh = bd.ZOH(bd.clock(0.25))
+        add = bd.SUM("++")
+        bd.connect(ref, fast, add[0])
+        bd.connect(fast, zoh)
+        bd.connect(zoh, add[1])
+        bd.connect(add, slow)
+        bd.connect(slow, bd.NULL())
+        bd.compile(verbose=False)
+        return bd
+
+    def test_partition(self):
+        bd = self._bd()
+        args = dict(T=2, solver_args=dict(rtol=1e-8, atol=1e-10))
+        whole = self.sim.run(bd, **args)
+        parts = self.sim.run(bd, partition=True, **args)
+        self.assertEqual(parts.xnames, whole.xnames)
+        self.assertEqual(parts.x.shape[1], 2)
+        nt.assert_array_almost_equal(parts.x[-1], whole.x[-1], decimal=6)
+        self.assertGreater(parts[".stats"].accepted_steps, 0)
+        # the output grid is kept
+        whole = self.sim.run(bd, dt=0.1, **args)
+        parts = self.sim.run(bd, dt=0.1, partition=True, **args)
+        nt.assert_array_almost_equal(parts.t, whole.t)
+        nt.assert_array_almost_equal(parts.x, whole.x, decimal=6)
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "no fork start method"
+    )
+    def test_parallel(self):
+        bd = self._bd()
+        serial = self.sim.run(bd, T=2, partition=True)
+        parallel = self.sim.run(bd, T=2, partition="parallel")
+        nt.assert_array_almost_equal(parallel.x, serial.x)
+        nt.assert_equal(parallel.t, serial.t)
+        self.assertEqual(
+            parallel[".stats"].accepted_steps, serial[".stats"].accepted_steps
+        )
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "no fork start method"
+    )
+    def test_parallel_memory(self):
+        # the input history of the delay can't be shared with the workers,
+        # the parts are integrated serially
+        bd = self.sim.blockdiagram()
+        ref = bd.WAVEFORM("sine", freq=2)
+        delay = bd.DELAY(0.05)
+        p1 = bd.LTI_SISO(1, [1, 1])
+        p2 = bd.LTI_SISO(10, [1, 10])
+        bd.connect(ref, delay, p1)
+        bd.connect(delay, p2)
+        bd.connect(p1, bd.NULL())
+        bd.connect(p2, bd.NULL())
+        bd.compile(verbose=False)
+        self.assertEqual(len(bd.components), 2)
+
+        serial = self.sim.run(bd, T=2, partition=True)
+        with self.assertWarns(UserWarning):
+            parallel = self.sim.run(bd, T=2, partition="parallel")
+        nt.assert_array_almost_equal(parallel.x, serial.x)
+
+    @unittest.skipUnless(
+        "fork" in multiprocessing.get_all_start_methods(), "no fork start method"
+    )
+    def test_parallel_source(self):
+        # the signal of an INPORT is set from outside the diagram and can't be
+        # shared with the workers, the parts are integrated serially
+        bd = self.sim.blockdiagram()
+        inport = bd.INPORT(2)
+        bd.connect(inport[0], bd.INTEGRATOR())
+        bd.connect(inport[1], bd.INTEGRATOR())
+        bd.compile(verbose=False)
+        self.assertEqual(len(bd.components), 2)
+        self.assertFalse(inport.istimefunction)
+
+        inport.signal = lambda t: [1.0, 2.0]
+        serial = self.sim.run(bd, T=2, partition=True)
+        with self.assertWarns(UserWarning):
+            parallel = self.sim.run(bd, T=2, partition="parallel")
+        nt.assert_array_almost_equal(parallel.x, serial.x)
+        nt.assert_array_almost_equal(parallel.x[-1], [2, 4])
+
+
+# ---------------------------------------------------------------------------
+class ExactTest(unittest.TestCase):
+    """Tests for the exact solution of linear plants driven by sampled signals."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(
+            graphics=None, progress=False, banner=False, quiet=True, sysargs=False
+        )
+
+    def _bd(self, fast=False):
+        # a sampled proportional controller around the plant 1/s(s+1)
+        bd = self.sim.blockdiagram()
+        err = bd.SUM("+-")
+        zoh = bd.ZOH(bd.clock(0.05))
+        plant = bd.LTI_SISO(1, [1, 1, 0], name="plant")
+        bd.connect(bd.CONSTANT(1), err[0])
+        bd.connect(plant, err[1])
+        bd.connect(err, zoh)
+        bd.connect(zoh, plant)
+        if fast:
+            # a nonlinear plant that is integrated
+            integ = bd.INTEGRATOR(x0=1, name="fast")
+            f = bd.FUNCTION(lambda x: -(x**3))
+            bd.connect(integ, f, bd.NULL())
+            bd.connect(f, integ)
+        bd.compile(verbose=False)
+        return bd
+
+    def test_exact(self):
+        bd = self._bd()
+        args = dict(T=2, solver_args=dict(rtol=1e-10, atol=1e-12))
+        numeric = self.sim.run(bd, exact=False, **args)
+        exact = self.sim.run(bd, **args)
+        self.assertEqual(exact.xnames, numeric.xnames)
+        nt.assert_array_almost_equal(exact.x[-1], numeric.x[-1], decimal=7)
+        self.assertEqual(exact[".stats"].accepted_steps, 0)
+        self.assertGreater(numeric[".stats"].accepted_steps, 0)
+        # points no further apart than max_step, or on the output grid
+        self.assertLessEqual(np.diff(exact.t).max(), 0.02 + 1e-9)
+        exact = self.sim.run(bd, dt=0.1, **args)
+        numeric = self.sim.run(bd, dt=0.1, exact=False, **args)
+        nt.assert_array_almost_equal(exact.t, numeric.t)
+        nt.assert_array_almost_equal(exact.x, numeric.x, decimal=7)
+
+    def test_mixed(self):
+        # the nonlinear part is integrated, the linear part is exact
+        bd = self._bd(fast=True)
+        self.assertEqual(len(bd.components), 2)
+        self.assertEqual(len(bd.exact), 1)
+        args = dict(T=2, solver_args=dict(rtol=1e-10, atol=1e-12))
+        numeric = self.sim.run(bd, exact=False, **args)
+        for partition in (False, True):
+            out = self.sim.run(bd, partition=partition, **args)
+            nt.assert_array_almost_equal(out.x[-1], numeric.x[-1], decimal=7)
+            self.assertGreater(out[".stats"].accepted_steps, 0)
+
+
 if __name__ == "__main__":
     unittest.main()
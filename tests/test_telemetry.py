@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for telemetry.py, solver statistics of a simulation run.
+"""
+
+import contextlib
+import io
+import unittest
+
+import numpy as np
+
+import bdsim
+from bdsim.telemetry import SolverTelemetry
+
+
+class TelemetryTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def _bd(self):
+        bd = self.sim.blockdiagram()
+        demand = bd.STEP(T=1)
+        err = bd.SUM("+-")
+        plant = bd.LTI_SISO(0.5, [2, 1])
+        zoh = bd.ZOH(bd.clock(0.5))
+        bd.connect(demand, err[0])
+        bd.connect(err, plant)
+        bd.connect(plant, err[1], zoh)
+        bd.connect(zoh, bd.NULL())
+        bd.compile()
+        return bd
+
+    def test_method(self):
+        telemetry = SolverTelemetry()
+        solver = telemetry.method("RK45")
+        self.assertTrue(issubclass(solver, bdsim.run_sim.integrate.RK45))
+        self.assertIs(telemetry.method("RK45"), solver)
+        self.assertEqual(telemetry.method("nosuchsolver"), "nosuchsolver")
+
+    def test_explicit(self):
+        out = self.sim.run(self._bd(), T=3, solver_args=dict(method="RK45"))
+        stats = out.stats
+        # two evaluations to start each interval, six per attempted step
+        attempts = (stats.nfev - 2 * stats.run_interval_calls) / 6
+        self.assertEqual(attempts, stats.accepted_steps + stats.rejected_steps)
+        self.assertEqual(stats.accepted_steps, len(out.t) - 1)
+        self.assertEqual(stats.restarts_by_reason, {"clock": 6})
+        self.assertLessEqual(stats.min_step, stats.median_step)
+        self.assertAlmostEqual(stats.max_step, 0.03)
+        self.assertEqual((stats.njev, stats.nlu), (0, 0))
+
+    def test_implicit(self):
+        out = self.sim.run(self._bd(), T=3, solver_args=dict(method="Radau"))
+        stats = out.stats
+        self.assertIsNone(stats.rejected_steps)
+        self.assertGreater(stats.njev, 0)
+        self.assertGreater(stats.nlu, 0)
+        self.assertGreater(stats.accepted_steps, 0)
+
+    def test_crossing(self):
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.STOP(func=lambda x: x - 1.5))
+        bd.compile()
+        out = self.sim.run(bd, T=3)
+        self.assertEqual(out.stats.restarts_by_reason, {"stop": 1})
+
+        # a crossing that doesn't stop the run
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        err = bd.SUM("+-")
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, err[0])
+        bd.connect(bd.CONSTANT(1.5), err[1])
+        bd.connect(err, bd.EVENT("+", lambda block: None))
+        bd.connect(integ, bd.NULL())
+        bd.compile()
+        out = self.sim.run(bd, T=3)
+        self.assertEqual(out.stats.restarts_by_reason, {"crossing": 1, "end": 1})
+
+    def test_discrete(self):
+        bd = self.sim.blockdiagram()
+        counter = bd.INTEGRATOR_S(bd.clock(0.5))
+        bd.connect(bd.CONSTANT(1), counter)
+        bd.connect(counter, bd.NULL())
+        bd.compile()
+        stats = self.sim.run(bd, T=2).stats
+        self.assertEqual(stats.nfev, 0)
+        self.assertEqual(stats.restarts_by_reason, {})
+        self.assertTrue(np.isnan(stats.median_step))
+
+    def test_log(self):
+        sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=False)
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            sim.run(self._bd(), T=1, debug="o")
+        lines = [line for line in buf.getvalue().splitlines() if "DEBUG.ode" in line]
+        self.assertEqual(len(lines), 2)
+        self.assertIn("[0, 0.5] nfev=", lines[0])
+        self.assertIn("solver restarts:", buf.getvalue())
+
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            sim.run(self._bd(), T=1, debug="o", solver_args=dict(method="LSODA"))
+        self.assertIn("(rejected n/a,", buf.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
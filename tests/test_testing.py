@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for testing.py, random block diagrams.
+"""
+
+import tempfile
+import unittest
+import warnings
+from pathlib import Path
+
+import numpy as np
+import numpy.testing as nt
+
+import bdsim
+from bdsim.blockdiagram import bdload
+from bdsim.testing import random_diagram, random_spec
+
+
+class RandomDiagramTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def test_spec(self):
+        args = dict(blocks=100, depth=5, clocks=2, states=6)
+        spec = random_spec(**args, seed=0)
+        self.assertEqual(len(spec.clocks), 2)
+        self.assertAlmostEqual(spec.nblocks, 100, delta=10)
+        self.assertEqual(max(block.layer for block in spec.blocks), 6)
+        types = {"CONSTANT", "STEP", "GAIN", "SUM", "LTI_SISO", "INTEGRATOR", "ZOH"}
+        self.assertLessEqual({block.type for block in spec.blocks}, types | {"NULL"})
+
+        # the same seed gives the same diagram
+        same = random_spec(**args, seed=0)
+        self.assertEqual(spec.blocks, same.blocks)
+        self.assertEqual(spec.wires, same.wires)
+        self.assertNotEqual(spec.wires, random_spec(**args, seed=1).wires)
+
+    def test_run(self):
+        bd = random_diagram(
+            self.sim, blocks=150, depth=6, clocks=2, states=8, subsystems=2, seed=2
+        )
+        bd.compile()
+        self.assertGreaterEqual(bd.nstates, 8)
+        self.assertEqual(len(bd.clocklist), 2)
+        # subsystems are flattened when compiled
+        self.assertFalse(any(b.type == "subsystem" for b in bd.blocklist))
+
+        out = self.sim.run(bd, T=5)
+        self.assertAlmostEqual(out.t[-1], 5)
+        # every block is non-expansive and the sources are no larger than 1
+        self.assertLessEqual(np.abs(out.x).max(), 1)
+
+    def test_save(self):
+        spec = random_spec(
+            blocks=80, clocks=1, states=4, subsystems=2, nesting=2, seed=3
+        )
+        bd = spec.build(self.sim.blockdiagram())
+        bd.compile()
+        out = self.sim.run(bd, T=2)
+
+        with tempfile.TemporaryDirectory() as folder:
+            files = spec.save(Path(folder) / "model.bd")
+            # a file for the diagram and each subsystem, nested too
+            self.assertEqual(len(files), 5)
+            self.assertEqual(files[-1].name, "model.bd")
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                loaded = bdload(self.sim.blockdiagram(), files[-1], allow_eval=True)
+                loaded.compile()
+        self.assertEqual(len(loaded.blocklist), len(bd.blocklist))
+        self.assertEqual(len(loaded.clocklist), 1)
+        out_loaded = self.sim.run(loaded, T=2)
+        nt.assert_array_almost_equal(out_loaded.x, out.x)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Tests for trace.py, Chrome trace-event timeline of a simulation run.
+"""
+
+import json
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+import bdsim
+from bdsim.trace import Tracer
+
+
+class TraceTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.sim = bdsim.BDSim(graphics=None, progress=False, banner=False, quiet=True)
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmpdir.name) / "trace.json"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _events(self):
+        trace = json.loads(self.path.read_text())
+        return trace["traceEvents"]
+
+    def test_sampling(self):
+        tracer = Tracer(str(self.path), rhs_every=3)
+        f = tracer.wrap(lambda x: 2 * x, "f", "test", args=lambda x: {"x": x})
+        g = tracer.wrap(lambda x: x, "f", "test", every=3)
+        self.assertEqual([f(1), g(2), g(3), g(4)], [2, 2, 3, 4])
+        # f records every call, g every third call of either
+        self.assertEqual(len(tracer.events), 2)
+        self.assertEqual(tracer.events[0]["args"], {"x": 1})
+        tracer.instant("tick", "clock")
+        tracer.write()
+        events = self._events()
+        self.assertEqual([e["ph"] for e in events], ["X", "X", "i"])
+        self.assertGreaterEqual(events[0]["dur"], 0)
+
+    def test_run(self):
+        bd = self.sim.blockdiagram()
+        demand = bd.STEP(T=1)
+        err = bd.SUM("+-")
+        plant = bd.LTI_SISO(0.5, [2, 1])
+        clock = bd.clock(0.5)
+        zoh = bd.ZOH(clock)
+        bd.connect(demand, err[0])
+        bd.connect(err, plant)
+        bd.connect(plant, err[1], zoh)
+        bd.connect(zoh, bd.NULL())
+        bd.compile()
+
+        out = self.sim.run(bd, T=3, trace=str(self.path))
+        events = self._events()
+        counts = Counter((e["name"], e["ph"]) for e in events)
+        self.assertEqual(counts[("tick", "i")], 6)
+        self.assertEqual(counts[("interval_hybrid", "X")], 6)
+        self.assertEqual(counts[("solve_ivp", "X")], 6)
+        self.assertEqual(counts[("ydot", "X")], out.stats.ydot_calls // 10)
+        self.assertGreater(counts[("graphics", "X")], 0)
+
+        ticks = [e["args"]["t"] for e in events if e["name"] == "tick"]
+        self.assertEqual(ticks, [0.5, 1.0, 1.5, 2.0, 2.5, 3.0])
+        intervals = [e for e in events if e["name"] == "interval_hybrid"]
+        self.assertEqual(intervals[0]["args"], {"t0": 0.0, "t1": 0.5})
+
+        # the wrappers are removed after the run
+        self.assertNotIn("savestate", vars(clock))
+        self.assertNotIn("step", vars(bd))
+
+    def test_stop(self):
+        bd = self.sim.blockdiagram()
+        integ = bd.INTEGRATOR()
+        bd.connect(bd.CONSTANT(1), integ)
+        bd.connect(integ, bd.STOP(func=lambda x: x - 1.5, name="stop"))
+        bd.compile()
+
+        self.sim.run(bd, T=3, trace=str(self.path))
+        events = {e["name"]: e for e in self._events() if e["ph"] == "i"}
+        self.assertEqual(events["crossing"]["args"]["block"], "stop")
+        self.assertAlmostEqual(events["crossing"]["args"]["t"], 1.5)
+        self.assertEqual(events["stop"]["args"]["block"], "stop")
+
+
+if __name__ == "__main__":
+    unittest.main()